@@ -5,11 +5,22 @@ from .dataset_builder import DatasetBuilder
 from .data_splitter import DataSplitter
 from .yaml_generator import YAMLGenerator
 from .command_generator import CommandGenerator
+from .label_cache import LabelCache
+from .index_reservation import IndexReservation
+from .transfer_engine import TransferEngine, TransferReport, TransferPlan
+from .storage import StorageBackend, LocalStorage
 
 __all__ = [
     'ImageProcessor',
     'DatasetBuilder',
     'DataSplitter',
     'YAMLGenerator',
-    'CommandGenerator'
+    'CommandGenerator',
+    'LabelCache',
+    'IndexReservation',
+    'TransferEngine',
+    'TransferReport',
+    'TransferPlan',
+    'StorageBackend',
+    'LocalStorage'
 ]
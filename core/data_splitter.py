@@ -1,9 +1,12 @@
 """数据划分器 - Step 3"""
 
 import random
-from typing import List, Tuple
+from array import array
+from typing import Dict, List, Sequence, Tuple
 import os
-from utils.file_utils import safe_copy_file
+from core.dataset_builder import DatasetBuilder
+from core.storage import StorageBackend
+from models.image_table import ImageTable
 
 
 class DataSplitter:
@@ -57,32 +60,172 @@ class DataSplitter:
         except Exception as e:
             return [], [], [], f"数据划分失败: {str(e)}"
 
+    @staticmethod
+    def split_table(
+        table: ImageTable,
+        train_ratio: float,
+        val_ratio: float,
+        test_ratio: float,
+        seed: int = 42
+    ) -> Tuple[Tuple[int, int, int], str]:
+        """
+        按比例划分图片记录表（直接写入表的子集列，不创建路径列表）
+
+        与 split_data 使用相同的打乱方式：同样的图片顺序与种子得到完全相同的划分。
+
+        Args:
+            table: 图片记录表
+            train_ratio: 训练集比例 (0-100)
+            val_ratio: 验证集比例 (0-100)
+            test_ratio: 测试集比例 (0-100)
+            seed: 随机种子（保证可复现）
+
+        Returns:
+            ((train 数量, val 数量, test 数量), 错误消息)
+        """
+        try:
+            total = len(table)
+            if total == 0:
+                return (0, 0, 0), "图片列表为空"
+
+            # 打乱行号（random.shuffle 的结果只取决于长度和种子，与元素内容无关）
+            random.seed(seed)
+            order = list(range(total))
+            random.shuffle(order)
+
+            train_count = int(total * train_ratio / 100)
+            val_count = int(total * val_ratio / 100)
+
+            codes = array('b', bytes(total))
+            for position, row in enumerate(order):
+                if position < train_count:
+                    codes[row] = 0
+                elif position < train_count + val_count:
+                    codes[row] = 1
+                else:
+                    codes[row] = 2
+            table.set_subset_codes(codes)
+
+            return (train_count, val_count, total - train_count - val_count), ""
+
+        except Exception as e:
+            return (0, 0, 0), f"数据划分失败: {str(e)}"
+
     @staticmethod
     def copy_images_to_subset(
-        images: List[str],
-        target_dir: str
+        images: Sequence[str],
+        target_dir: str,
+        verify: bool = False,
+        physical_order: bool = False
     ) -> Tuple[int, str]:
         """
-        复制图片到目标目录
+        复制图片到目标目录（并发复制；源或目标可以在对象存储中）
 
         Args:
-            images: 图片路径列表
+            images: 图片路径列表（也可以是 ImageTable.paths(subset) 视图）
             target_dir: 目标目录
+            verify: 复制后校验大小与内容哈希（失败自动重试）
+            physical_order: 按源文件的磁盘物理位置顺序读取
 
         Returns:
             (成功复制的数量, 错误消息)
         """
         try:
-            os.makedirs(target_dir, exist_ok=True)
+            storage = StorageBackend.for_path(target_dir)
+            storage.makedirs(target_dir)
+
+            pairs = (
+                (img_path, storage.join(target_dir, os.path.basename(img_path)))
+                for img_path in images
+            )
+            report, error = StorageBackend.copy_files(pairs, verify=verify, physical_order=physical_order)
+            if error:
+                return report.copied, f"复制图片失败: {error}"
 
-            success_count = 0
-            for img_path in images:
-                filename = os.path.basename(img_path)
-                dst_path = os.path.join(target_dir, filename)
-                safe_copy_file(img_path, dst_path)
-                success_count += 1
+            print(f"复制到 {target_dir}: {report.summary()}")
+            if not report.ok:
+                return report.copied, f"复制图片失败（{len(report.failures)} 个文件）:\n{report.format_failures()}"
 
-            return success_count, ""
+            return report.copied, ""
 
         except Exception as e:
             return 0, f"复制图片失败: {str(e)}"
+
+    @staticmethod
+    def place_split(
+        table: ImageTable,
+        dataset_root: str,
+        verify: bool = False,
+        physical_order: bool = False
+    ) -> Tuple[Tuple[int, int, int], str]:
+        """
+        按记录表的子集列把图片放入 images/<subset>/（增量）
+
+        已在目标子集中的图片不动；在其他子集中的（之前的划分结果）连同同名标签一起移动过去；
+        数据集中还没有的才从表中的路径（temp/）复制。
+        因此修改比例或种子后重新划分，不会在多个子集中留下同一张图片，已有的标注也跟随图片移动。
+        每个子集的移动一起并发执行（数据集在对象存储中时为服务端复制 + 批量删除）。
+
+        Args:
+            table: 已划分的图片记录表（temp/ 中的图片）
+            dataset_root: 数据集根目录
+            verify: 复制后校验大小与内容哈希
+            physical_order: 按源文件的磁盘物理位置顺序读取
+
+        Returns:
+            ((复制数, 移动数, 未变数), 错误消息)
+        """
+        try:
+            storage = StorageBackend.for_path(dataset_root)
+            subsets = DatasetBuilder.STRUCTURE['images']
+            wanted = {os.path.basename(path) for path in table.paths()}
+
+            # 本批图片当前所在的子集，以及各子集已有的标签
+            location: Dict[str, str] = {}
+            labels: Dict[str, set] = {}
+            for subset in subsets:
+                images_dir = DatasetBuilder.get_images_path(dataset_root, subset)
+                if storage.isdir(images_dir):
+                    for name, _ in storage.list_directory(images_dir).images():
+                        if name in wanted:
+                            location[name] = subset
+                labels_dir = DatasetBuilder.get_labels_path(dataset_root, subset)
+                labels[subset] = set(storage.list_directory(labels_dir).files()) if storage.isdir(labels_dir) else set()
+
+            copied = moved = kept = 0
+            for subset in subsets:
+                images_dir = DatasetBuilder.get_images_path(dataset_root, subset)
+                labels_dir = DatasetBuilder.get_labels_path(dataset_root, subset)
+                storage.makedirs(images_dir)
+                to_copy = []
+                to_move = []
+                for path in table.paths(subset):
+                    name = os.path.basename(path)
+                    current = location.get(name)
+                    if current == subset:
+                        kept += 1
+                    elif current is not None:
+                        to_move.append((storage.join(DatasetBuilder.get_images_path(dataset_root, current), name),
+                                        storage.join(images_dir, name)))
+                        label_name = os.path.splitext(name)[0] + '.txt'
+                        if label_name in labels[current]:
+                            to_move.append((storage.join(DatasetBuilder.get_labels_path(dataset_root, current), label_name),
+                                            storage.join(labels_dir, label_name)))
+                        moved += 1
+                    else:
+                        to_copy.append(path)
+
+                if to_move:
+                    storage.makedirs(labels_dir)
+                    storage.rename_many(to_move)
+
+                if to_copy:
+                    count, error = DataSplitter.copy_images_to_subset(to_copy, images_dir, verify, physical_order)
+                    copied += count
+                    if error:
+                        return (copied, moved, kept), f"复制到 {subset} 失败: {error}"
+
+            return (copied, moved, kept), ""
+
+        except Exception as e:
+            return (0, 0, 0), f"放置划分结果失败: {str(e)}"
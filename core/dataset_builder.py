@@ -1,18 +1,27 @@
 """数据集目录结构构建器 - Step 2"""
 
+import json
 import os
-from typing import Tuple
-from utils.file_utils import safe_create_directory
+import re
+from typing import Dict, List, Optional, Tuple
+from core.image_processor import ImageProcessor
+from core.storage import StorageBackend
 
 
 class DatasetBuilder:
-    """YOLO 数据集目录结构构建器"""
+    """YOLO 数据集目录结构构建器（数据集根目录可以是本地路径或对象存储路径，见 StorageBackend）"""
 
     STRUCTURE = {
         'images': ['train', 'val', 'test'],
         'labels': ['train', 'val', 'test']
     }
 
+    # 数据集中的编号图片：任意位数数字 + 支持的图片扩展名
+    INDEX_PATTERN = re.compile(r'^(\d+)\.(jpg|jpeg|png|bmp|tiff|tif)$', re.IGNORECASE)
+
+    # 重新编号进行中保存在数据集根目录的重命名计划（中断后据此恢复原文件名）
+    RENUMBER_PLAN_NAME = '.renumber-plan.json'
+
     @staticmethod
     def validate_not_exists(path: str) -> Tuple[bool, str]:
         """
@@ -24,7 +33,7 @@ class DatasetBuilder:
         Returns:
             (是否有效, 错误消息)
         """
-        if os.path.exists(path):
+        if StorageBackend.for_path(path).exists(path):
             return False, f"路径已存在，请选择其他位置或名称: {path}"
         return True, ""
 
@@ -54,7 +63,8 @@ class DatasetBuilder:
         """
         try:
             # 数据集根目录
-            dataset_root = os.path.join(parent_dir, dataset_name)
+            storage = StorageBackend.for_path(parent_dir)
+            dataset_root = storage.join(parent_dir, dataset_name)
 
             # 检查是否已存在
             valid, error = DatasetBuilder.validate_not_exists(dataset_root)
@@ -63,18 +73,16 @@ class DatasetBuilder:
 
             # 创建主目录结构
             for main_dir, sub_dirs in DatasetBuilder.STRUCTURE.items():
-                main_path = os.path.join(dataset_root, main_dir)
-                safe_create_directory(main_path)
+                main_path = storage.join(dataset_root, main_dir)
+                storage.makedirs(main_path)
 
                 # 创建子目录
                 for sub_dir in sub_dirs:
-                    sub_path = os.path.join(main_path, sub_dir)
-                    safe_create_directory(sub_path)
+                    sub_path = storage.join(main_path, sub_dir)
+                    storage.makedirs(sub_path)
 
             # 创建 classes.txt（空文件）
-            classes_file = os.path.join(dataset_root, 'labels', 'classes.txt')
-            with open(classes_file, 'w', encoding='utf-8') as f:
-                f.write("")
+            storage.write_text(storage.join(dataset_root, 'labels', 'classes.txt'), "")
 
             return dataset_root, ""
 
@@ -93,7 +101,7 @@ class DatasetBuilder:
         Returns:
             完整路径
         """
-        return os.path.join(dataset_root, 'images', subset)
+        return StorageBackend.for_path(dataset_root).join(dataset_root, 'images', subset)
 
     @staticmethod
     def get_labels_path(dataset_root: str, subset: str) -> str:
@@ -107,7 +115,7 @@ class DatasetBuilder:
         Returns:
             完整路径
         """
-        return os.path.join(dataset_root, 'labels', subset)
+        return StorageBackend.for_path(dataset_root).join(dataset_root, 'labels', subset)
 
     @staticmethod
     def get_classes_file_path(dataset_root: str) -> str:
@@ -120,7 +128,7 @@ class DatasetBuilder:
         Returns:
             完整路径
         """
-        return os.path.join(dataset_root, 'labels', 'classes.txt')
+        return StorageBackend.for_path(dataset_root).join(dataset_root, 'labels', 'classes.txt')
 
     @staticmethod
     def validate_existing_structure(dataset_root: str) -> Tuple[bool, str]:
@@ -143,22 +151,23 @@ class DatasetBuilder:
             (False, "错误描述") 如果结构无效
         """
         # 检查目录是否存在
-        if not os.path.exists(dataset_root):
+        storage = StorageBackend.for_path(dataset_root)
+        if not storage.exists(dataset_root):
             return False, f"目录不存在: {dataset_root}"
 
-        if not os.path.isdir(dataset_root):
+        if not storage.isdir(dataset_root):
             return False, f"路径不是目录: {dataset_root}"
 
         # 检查必需的子目录
         required_paths = [
-            ('images/train', os.path.join(dataset_root, 'images', 'train')),
-            ('images/val', os.path.join(dataset_root, 'images', 'val')),
-            ('images/test', os.path.join(dataset_root, 'images', 'test'))
+            ('images/train', storage.join(dataset_root, 'images', 'train')),
+            ('images/val', storage.join(dataset_root, 'images', 'val')),
+            ('images/test', storage.join(dataset_root, 'images', 'test'))
         ]
 
         missing = []
         for display_path, full_path in required_paths:
-            if not os.path.exists(full_path):
+            if not storage.exists(full_path):
                 missing.append(display_path)
 
         if missing:
@@ -170,12 +179,62 @@ class DatasetBuilder:
 
         return True, ""
 
+    @staticmethod
+    def scan_index_stats(dataset_root: str) -> Tuple[int, Dict[int, int], str]:
+        """
+        一次遍历所有子集，统计数字编号图片的最大编号与编号位数分布
+
+        编号模式: <数字>.{ext}，位数不限（兼容 0001.jpg 与 12345.jpg 混合的旧数据集）
+
+        Args:
+            dataset_root: 数据集根目录路径
+
+        Returns:
+            (最大编号, {位数: 文件数}, 错误消息)
+        """
+        try:
+            storage = StorageBackend.for_path(dataset_root)
+            max_idx = 0
+            widths: Dict[int, int] = {}
+
+            for subset in DatasetBuilder.STRUCTURE['images']:
+                subset_path = DatasetBuilder.get_images_path(dataset_root, subset)
+                if not storage.isdir(subset_path):
+                    continue
+
+                try:
+                    for name in storage.list_directory(subset_path).files():
+                        match = DatasetBuilder.INDEX_PATTERN.match(name)
+                        if match:
+                            digits = match.group(1)
+                            max_idx = max(max_idx, int(digits))
+                            widths[len(digits)] = widths.get(len(digits), 0) + 1
+                except OSError as e:
+                    return 0, {}, f"无法读取目录 {subset}: {str(e)}"
+
+            return max_idx, widths, ""
+
+        except Exception as e:
+            return 0, {}, f"扫描图片编号失败: {str(e)}"
+
+    @staticmethod
+    def dominant_index_width(widths: Dict[int, int]) -> int:
+        """
+        数据集中最常见的编号位数（数量相同时取较宽者）
+
+        Returns:
+            位数，没有编号图片时返回 0
+        """
+        if not widths:
+            return 0
+        return max(widths, key=lambda width: (widths[width], width))
+
     @staticmethod
     def find_max_image_index(dataset_root: str) -> Tuple[int, str]:
         """
-        扫描所有子集中的图片，查找最大的4位编号
+        扫描所有子集中的图片，查找最大编号
 
-        编号模式: ####.{ext} 其中 #### 为 0001-9999
+        编号模式: <数字>.{ext}，任意位数
 
         Args:
             dataset_root: 数据集根目录路径
@@ -186,33 +245,217 @@ class DatasetBuilder:
 
         示例:
             数据集包含 0001.jpg, 0155.png → 返回 (155, "")
+            数据集包含 9999.jpg, 10000.jpg → 返回 (10000, "")
             空数据集 → 返回 (0, "")
         """
+        max_idx, _, error = DatasetBuilder.scan_index_stats(dataset_root)
+        return max_idx, error
+
+    @staticmethod
+    def withdraw_batch(dataset_root: str, temp_folder: Optional[str], first: int, last: int) -> Tuple[int, str]:
+        """
+        撤回一批导入的图片：删除 temp/ 与 images/<subset>/ 中编号在 [first, last] 内的图片
+
+        用于 Step 1 结果变化后重新执行 Step 2。这批图片已有标注文件时不做任何删除
+        （标注是人工成果，编号对应的图片变化后需要人工确认如何处理）。
+
+        Args:
+            dataset_root: 数据集根目录
+            temp_folder: temp/ 文件夹（None 表示没有）
+            first: 起始编号
+            last: 结束编号
+
+        Returns:
+            (删除的图片数量, 错误消息)
+        """
         try:
-            import re
-            # 匹配4位数字 + 支持的图片扩展名
-            pattern = re.compile(r'^(\d{4})\.(jpg|jpeg|png|bmp|tiff|tif)$', re.IGNORECASE)
+            storage = StorageBackend.for_path(dataset_root)
+            for subset in DatasetBuilder.STRUCTURE['labels']:
+                labels_dir = DatasetBuilder.get_labels_path(dataset_root, subset)
+                if not storage.isdir(labels_dir):
+                    continue
+                for name in storage.list_directory(labels_dir).files():
+                    stem, ext = os.path.splitext(name)
+                    if ext.lower() == '.txt' and stem.isdigit() and first <= int(stem) <= last:
+                        return 0, (f"本批图片已有标注文件（如 labels/{subset}/{name}），"
+                                   f"无法自动撤回编号 {first}-{last}，请手动处理后重新执行 Step 2")
+
+            directories = [DatasetBuilder.get_images_path(dataset_root, subset)
+                           for subset in DatasetBuilder.STRUCTURE['images']]
+            if temp_folder:
+                directories.append(temp_folder)
+
+            removed = 0
+            for directory in directories:
+                # temp/ 总在本地，数据集根目录可能在对象存储中
+                directory_storage = StorageBackend.for_path(directory)
+                if not directory_storage.isdir(directory):
+                    continue
+                batch = []
+                for name in directory_storage.list_directory(directory).files():
+                    match = DatasetBuilder.INDEX_PATTERN.match(name)
+                    if match and first <= int(match.group(1)) <= last:
+                        batch.append(directory_storage.join(directory, name))
+                removed += directory_storage.remove_many(batch)
 
-            max_idx = 0
-            subsets = ['train', 'val', 'test']
+            return removed, ""
 
-            for subset in subsets:
-                subset_path = DatasetBuilder.get_images_path(dataset_root, subset)
-                if not os.path.exists(subset_path):
+        except Exception as e:
+            return 0, f"撤回图片失败: {str(e)}"
+
+    @staticmethod
+    def renumber_dataset(
+        dataset_root: str,
+        width: int = 0,
+        compact: bool = False,
+        max_workers: Optional[int] = None
+    ) -> Tuple[int, str]:
+        """
+        将数据集的编号统一为同一位数（可选重新连续编号），图片与同名标签一起重命名
+
+        重命名分两阶段并发执行（先全部改为临时名，再改为目标名），
+        因此新旧文件名互相覆盖的情况（如压缩编号时）也是安全的。
+        已有的标签与目标名冲突由每个目录的一次列表判断，不逐个文件检查。
+        开始重命名前检查冲突：同一编号出现多次（如 0001.jpg 与 00001.png）时不做任何修改。
+
+        重命名前先把计划（原名 / 临时名 / 目标名与当前阶段）写入数据集根目录的 RENUMBER_PLAN_NAME；
+        中途失败时按计划把已改名的文件恢复为原名，进程崩溃遗留的计划在下次重新编号时先恢复。
+
+        Args:
+            dataset_root: 数据集根目录
+            width: 目标位数（0 表示自动：默认 4 位，最大编号更宽时随之加宽）
+            compact: 为 True 时按原编号顺序重新从 1 连续编号
+            max_workers: 并发重命名的线程数（None 表示按实测吞吐自动调节）
+
+        Returns:
+            (重命名的图片数量, 错误消息)
+        """
+        try:
+            valid, error = DatasetBuilder.validate_existing_structure(dataset_root)
+            if not valid:
+                return 0, error
+
+            storage = StorageBackend.for_path(dataset_root)
+
+            plan_path = storage.join(dataset_root, DatasetBuilder.RENUMBER_PLAN_NAME)
+            if storage.exists(plan_path):
+                restored, error = DatasetBuilder.restore_renumber(dataset_root)
+                if error:
+                    return 0, error
+                print(f"重新编号: 上次重新编号中断，已恢复 {restored} 个文件的原名")
+
+            # 收集编号图片: (编号, 子集, 文件名)；同时记录图片与标签目录中已有的文件
+            entries = []
+            owners: Dict[int, str] = {}
+            duplicates = []
+            existing = set()
+            for subset in DatasetBuilder.STRUCTURE['images']:
+                images_dir = DatasetBuilder.get_images_path(dataset_root, subset)
+                for name in storage.list_directory(images_dir).files():
+                    existing.add(storage.join(images_dir, name))
+                    match = DatasetBuilder.INDEX_PATTERN.match(name)
+                    if not match:
+                        continue
+                    index = int(match.group(1))
+                    if index in owners:
+                        duplicates.append(f"{owners[index]} / {subset}/{name}")
+                    owners[index] = f"{subset}/{name}"
+                    entries.append((index, subset, name))
+                labels_dir = DatasetBuilder.get_labels_path(dataset_root, subset)
+                if storage.isdir(labels_dir):
+                    existing.update(storage.join(labels_dir, name) for name in storage.list_directory(labels_dir).files())
+
+            if duplicates:
+                listed = '\n'.join(duplicates[:5])
+                more = f"\n…… 共 {len(duplicates)} 处" if len(duplicates) > 5 else ""
+                return 0, f"存在重复编号，请先手动处理:\n{listed}{more}"
+
+            if not entries:
+                return 0, ""
+
+            entries.sort()
+            last_index = len(entries) if compact else entries[-1][0]
+            width = ImageProcessor.resolve_index_width(last_index, width)
+
+            # 重命名计划（只包含名称有变化的文件）
+            plan = []
+            renamed_images = 0
+            for position, (index, subset, name) in enumerate(entries, start=1):
+                new_index = position if compact else index
+                stem, ext = os.path.splitext(name)
+                new_stem = f"{new_index:0{width}d}"
+                if new_stem == stem:
                     continue
 
-                try:
-                    filenames = os.listdir(subset_path)
-                except OSError as e:
-                    return 0, f"无法读取目录 {subset}: {str(e)}"
+                images_dir = DatasetBuilder.get_images_path(dataset_root, subset)
+                plan.append((storage.join(images_dir, name), storage.join(images_dir, new_stem + ext)))
+                renamed_images += 1
+
+                labels_dir = DatasetBuilder.get_labels_path(dataset_root, subset)
+                label_path = storage.join(labels_dir, stem + '.txt')
+                if label_path in existing:
+                    plan.append((label_path, storage.join(labels_dir, new_stem + '.txt')))
+
+            if not plan:
+                return 0, ""
+
+            # 目标名已被计划外的文件占用（如没有对应图片的孤立标签）时放弃
+            sources = {src for src, _ in plan}
+            conflicts = [dst for _, dst in plan if dst not in sources and dst in existing]
+            if conflicts:
+                return 0, f"目标文件已存在，无法重新编号:\n" + '\n'.join(conflicts[:5])
+
+            staged = [
+                (src, storage.join(storage.split(src)[0], f".renumber-{i}.tmp"), dst)
+                for i, (src, dst) in enumerate(plan)
+            ]
+            state = {'phase': 1, 'files': staged}
+            storage.write_text(plan_path, json.dumps(state, ensure_ascii=False))
+            try:
+                storage.rename_many([(src, tmp) for src, tmp, _ in staged], max_workers)
+                state['phase'] = 2
+                storage.write_text(plan_path, json.dumps(state, ensure_ascii=False))
+                storage.rename_many([(tmp, dst) for _, tmp, dst in staged], max_workers)
+            except Exception as e:
+                restored, error = DatasetBuilder.restore_renumber(dataset_root)
+                if error:
+                    return 0, f"重新编号失败: {str(e)}\n{error}"
+                return 0, f"重新编号失败（已恢复 {restored} 个文件的原名）: {str(e)}"
+
+            storage.remove(plan_path)
+            return renamed_images, ""
+
+        except Exception as e:
+            return 0, f"重新编号失败: {str(e)}"
+
+    @staticmethod
+    def restore_renumber(dataset_root: str) -> Tuple[int, str]:
+        """
+        按保存的重命名计划把中断的重新编号恢复为原文件名（可重复执行），完成后删除计划
+
+        第二阶段已开始时，先把已改为目标名的文件改回临时名，再把全部临时名改回原名。
+
+        Returns:
+            (恢复的文件数, 错误消息)；失败时计划保留，可再次恢复
+        """
+        storage = StorageBackend.for_path(dataset_root)
+        plan_path = storage.join(dataset_root, DatasetBuilder.RENUMBER_PLAN_NAME)
+        try:
+            state = json.loads(storage.read_text(plan_path))
+            staged: List[List[str]] = state['files']
 
-                for filename in filenames:
-                    match = pattern.match(filename)
-                    if match:
-                        idx = int(match.group(1))
-                        max_idx = max(max_idx, idx)
+            if state['phase'] >= 2:
+                # 第一阶段已全部完成：临时名不存在的文件已改为目标名
+                storage.rename_many([
+                    (dst, tmp) for _, tmp, dst in staged
+                    if not storage.exists(tmp) and storage.exists(dst)
+                ])
+            pairs = [(tmp, src) for src, tmp, _ in staged if storage.exists(tmp)]
+            storage.rename_many(pairs)
 
-            return max_idx, ""
+            storage.remove(plan_path)
+            return len(pairs), ""
 
         except Exception as e:
-            return 0, f"扫描图片编号失败: {str(e)}"
+            return 0, (f"恢复重新编号前的文件名失败: {str(e)}\n"
+                       f"（重命名计划保存在 {plan_path}，再次执行重新编号时会先恢复）")
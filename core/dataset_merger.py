@@ -0,0 +1,268 @@
+"""数据集合并 - 多个 YOLO 数据集合并为一个，统一类别列表与编号"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.data_splitter import DataSplitter
+from core.dataset_builder import DatasetBuilder
+from core.image_processor import ImageProcessor
+from core.label_rewriter import LabelRewriter
+from core.operation_log import OperationLog
+from core.transfer_engine import TransferEngine
+from core.yaml_generator import YAMLGenerator
+from models.image_table import ImageTable
+from utils.file_utils import is_image_file, natural_sort_key
+
+
+class DatasetMerger:
+    """
+    合并多个 YOLO 数据集
+
+    类别按来源顺序首次出现的先后合并（同名类别视为同一类），
+    每个来源得到一张 旧编号 -> 新编号 的映射表，标签类别列按表改写；
+    图片按 来源 → 子集 → 原文件名（自然排序）的顺序重新编号为 1..N。
+    图片可用硬链接代替复制（同一文件系统时不复制数据；注意硬链接与源文件共享内容）。
+    """
+
+    @staticmethod
+    def read_classes(dataset_root: str) -> List[str]:
+        """读取 labels/classes.txt（不存在时返回空列表）"""
+        try:
+            with open(DatasetBuilder.get_classes_file_path(dataset_root), 'r', encoding='utf-8') as f:
+                return [line.strip() for line in f if line.strip()]
+        except OSError:
+            return []
+
+    @staticmethod
+    def unify_classes(class_lists: Sequence[List[str]]) -> Tuple[List[str], List[np.ndarray]]:
+        """
+        合并类别列表
+
+        Args:
+            class_lists: 每个来源的类别列表
+
+        Returns:
+            (合并后的类别列表, 每个来源的映射表 remap[旧编号] = 新编号)
+        """
+        unified: List[str] = []
+        lookup: Dict[str, int] = {}
+        remaps = []
+        for classes in class_lists:
+            remap = np.empty(len(classes), dtype=np.int32)
+            for old_id, name in enumerate(classes):
+                new_id = lookup.get(name)
+                if new_id is None:
+                    new_id = len(unified)
+                    lookup[name] = new_id
+                    unified.append(name)
+                remap[old_id] = new_id
+            remaps.append(remap)
+        return unified, remaps
+
+    @staticmethod
+    def _scan_source(table: ImageTable, dataset_root: str, source_id: int):
+        """将一个来源数据集的图片追加到表中（子集编码取自所在子目录）"""
+        for code, subset in enumerate(ImageTable.SUBSETS):
+            images_dir = DatasetBuilder.get_images_path(dataset_root, subset)
+            if not os.path.isdir(images_dir):
+                continue
+            with os.scandir(images_dir) as it:
+                entries = [
+                    (entry.name, entry.stat().st_size)
+                    for entry in it
+                    if is_image_file(entry.name) and entry.is_file()
+                ]
+            entries.sort(key=lambda item: natural_sort_key(item[0]))
+            for name, size in entries:
+                row = table.append(images_dir, name, size, source_id)
+                table.subset_codes[row] = code
+
+    @staticmethod
+    def preview(dataset_roots: Sequence[str]) -> Tuple[List[str], List[Tuple[str, int, List[str]]], str]:
+        """
+        合并前预览
+
+        Returns:
+            (合并后的类别列表, [(来源, 图片数, 该来源中新增的类别), ...], 错误消息)
+        """
+        try:
+            class_lists = [DatasetMerger.read_classes(root) for root in dataset_roots]
+            unified, _ = DatasetMerger.unify_classes(class_lists)
+
+            seen = set()
+            rows = []
+            for root, classes in zip(dataset_roots, class_lists):
+                table = ImageTable()
+                DatasetMerger._scan_source(table, root, 0)
+                added = [name for name in classes if name not in seen]
+                seen.update(classes)
+                rows.append((root, len(table), added))
+            return unified, rows, ""
+
+        except Exception as e:
+            return [], [], f"读取数据集失败: {str(e)}"
+
+    @staticmethod
+    def merge(
+        dataset_roots: Sequence[str],
+        parent_dir: str,
+        dataset_name: str,
+        ratios: Optional[Tuple[float, float, float]] = None,
+        seed: int = 42,
+        index_width: int = 0,
+        link: bool = True,
+        max_workers: int = TransferEngine.DEFAULT_WORKERS
+    ) -> Tuple[Dict, str]:
+        """
+        合并数据集到 parent_dir/dataset_name（新建）
+
+        新建的目录与文件记入事务（OperationLog）：失败时回滚，不留下写了一半的目标数据集，
+        成功时提交（之后可撤销）；已有活动事务时记入该事务，由调用方提交或回滚。
+
+        Args:
+            dataset_roots: 来源数据集根目录（顺序决定类别与编号顺序）
+            parent_dir: 目标父目录
+            dataset_name: 目标数据集名称
+            ratios: (train, val, test) 百分比；None 表示保留每张图片原来的子集
+            seed: 重新划分时的随机种子
+            index_width: 编号位数（0 表示自动）
+            link: 图片优先使用硬链接
+            max_workers: 并发线程数
+
+        Returns:
+            (合并结果摘要, 错误消息)
+        """
+        own_txn = None
+        if OperationLog.active() is None:
+            try:
+                own_txn = OperationLog.begin(f"合并数据集 {dataset_name}")
+            except (OSError, RuntimeError) as e:
+                return {}, f"无法开始记录文件操作: {str(e)}"
+
+        summary, error = DatasetMerger._merge(dataset_roots, parent_dir, dataset_name, ratios, seed,
+                                              index_width, link, max_workers)
+        if own_txn is not None:
+            if not error:
+                own_txn.commit()
+            else:
+                undone, rollback_error = own_txn.rollback()
+                if rollback_error:
+                    error += f"\n回滚未完成: {rollback_error}"
+                elif undone:
+                    error += f"\n（已撤销 {undone} 项文件修改）"
+        return summary, error
+
+    @staticmethod
+    def _merge(
+        dataset_roots: Sequence[str],
+        parent_dir: str,
+        dataset_name: str,
+        ratios: Optional[Tuple[float, float, float]],
+        seed: int,
+        index_width: int,
+        link: bool,
+        max_workers: int
+    ) -> Tuple[Dict, str]:
+        try:
+            if len(dataset_roots) < 2:
+                return {}, "至少需要选择两个数据集"
+            if len({os.path.normcase(os.path.abspath(root)) for root in dataset_roots}) != len(dataset_roots):
+                return {}, "数据集列表中有重复的目录"
+            for root in dataset_roots:
+                valid, error = DatasetBuilder.validate_existing_structure(root)
+                if not valid:
+                    return {}, f"{root}:\n{error}"
+
+            class_lists = [DatasetMerger.read_classes(root) for root in dataset_roots]
+            classes, remaps = DatasetMerger.unify_classes(class_lists)
+            if not classes:
+                return {}, "所有来源数据集的 classes.txt 都为空"
+
+            table = ImageTable()
+            for root in dataset_roots:
+                DatasetMerger._scan_source(table, root, table.add_source(root))
+            if len(table) == 0:
+                return {}, "来源数据集中没有图片"
+
+            if ratios is not None:
+                _, error = DataSplitter.split_table(table, *ratios, seed=seed)
+                if error:
+                    return {}, error
+
+            dataset_root, error = DatasetBuilder.create_structure(parent_dir, dataset_name)
+            if error:
+                return {}, error
+            success, error = YAMLGenerator.write_classes_file(
+                DatasetBuilder.get_classes_file_path(dataset_root), classes
+            )
+            if not success:
+                return {}, error
+
+            width = ImageProcessor.resolve_index_width(len(table), index_width)
+            table.assign_indices(1)
+
+            image_pairs = []
+            label_jobs = []
+            for row in range(len(table)):
+                record = table[row]
+                subset = record.subset
+                new_name = ImageProcessor.format_new_name(record.index, record.ext, width)
+                image_pairs.append((
+                    record.path,
+                    os.path.join(DatasetBuilder.get_images_path(dataset_root, subset), new_name)
+                ))
+
+                source_root = table.sources[table.source_ids[row]]
+                source_subset = os.path.basename(record.directory)
+                label_src = os.path.join(
+                    DatasetBuilder.get_labels_path(source_root, source_subset), record.stem + '.txt'
+                )
+                label_dst = os.path.join(
+                    DatasetBuilder.get_labels_path(dataset_root, subset),
+                    os.path.splitext(new_name)[0] + '.txt'
+                )
+                label_jobs.append((label_src, label_dst, remaps[table.source_ids[row]]))
+
+            report, error = TransferEngine.copy_files(image_pairs, max_workers=max_workers, link=link)
+            if error:
+                return {}, error
+            print(f"合并图片: {report.summary()}")
+            if not report.ok:
+                return {}, f"复制图片失败（{len(report.failures)} 个文件）:\n{report.format_failures()}"
+
+            def rewrite(job):
+                src, dst, remap = job
+                try:
+                    kept, dropped, _ = LabelRewriter.remap_file(src, dst, remap, atomic=False)
+                    return 1, kept, dropped
+                except FileNotFoundError:
+                    return 0, 0, 0  # 未标注的图片
+
+            labels = boxes = dropped_boxes = 0
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for written, kept, dropped in executor.map(rewrite, label_jobs):
+                    labels += written
+                    boxes += kept
+                    dropped_boxes += dropped
+
+            summary = {
+                'dataset_root': dataset_root,
+                'classes': classes,
+                'images': len(table),
+                'linked': report.linked,
+                'labels': labels,
+                'boxes': boxes,
+                'dropped_boxes': dropped_boxes,
+                'subsets': dict(zip(ImageTable.SUBSETS, table.subset_counts())),
+                'sources': [
+                    (root, table.source_ids.count(source_id))
+                    for source_id, root in enumerate(table.sources)
+                ],
+            }
+            return summary, ""
+
+        except Exception as e:
+            return {}, f"合并数据集失败: {str(e)}"
@@ -0,0 +1,379 @@
+"""数据集统计报告 - 类别分布、每图标注框数、标注框尺寸与子集均衡性"""
+
+import html
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.dataset_builder import DatasetBuilder
+from utils.file_utils import atomic_write, is_image_file
+from utils.image_header import read_image_size
+
+
+# 每个进程任务处理的图片数：足够大以摊薄进程间传输开销
+_CHUNK_SIZE = 2000
+
+
+def _read_chunk(pairs: List[Tuple[str, str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    读取一批 (图片, 标签) 的尺寸与标注（在子进程中执行）
+
+    Returns:
+        (尺寸与状态 int64 数组 (n, 4): 宽, 高, 标注框数, 状态,
+         标注 float32 数组 (m, 5): class, x, y, w, h,
+         每个标注框所属的批内图片序号 int32 数组 (m,))
+        状态: 0 正常, 1 无标签文件, 2 标签格式错误；图片文件头无法解析时再加 4
+    """
+    info = np.zeros((len(pairs), 4), dtype=np.int64)
+    boxes = []
+    owners = []
+
+    for i, (image_path, label_path) in enumerate(pairs):
+        try:
+            info[i, 0], info[i, 1] = read_image_size(image_path)
+        except (OSError, ValueError):
+            info[i, 3] += 4
+
+        try:
+            with open(label_path, 'rb') as f:
+                text = f.read()
+        except FileNotFoundError:
+            info[i, 3] += 1
+            continue
+
+        if not text.strip():
+            continue
+        # 按空白（含换行）切分后一次性转换为浮点数组
+        try:
+            values = np.array(text.split(), dtype=np.float32)
+        except ValueError:
+            values = None
+        if values is None or values.size % 5 or (values[::5] < 0).any():
+            info[i, 3] += 2
+            continue
+
+        rows = values.reshape(-1, 5)
+        info[i, 2] = len(rows)
+        boxes.append(rows)
+        owners.append(np.full(len(rows), i, dtype=np.int32))
+
+    if boxes:
+        return info, np.concatenate(boxes), np.concatenate(owners)
+    return info, np.empty((0, 5), dtype=np.float32), np.empty(0, dtype=np.int32)
+
+
+class DatasetStats:
+    """
+    数据集统计
+
+    并行读取全部 labels/<subset>/*.txt 与图片文件头，汇总为 NumPy 数组后向量化计算，
+    输出按类别、按子集的汇总与直方图（JSON + 独立的 HTML 报告）。
+    """
+
+    REPORT_DIR = 'reports'
+    JSON_NAME = 'dataset_stats.json'
+    HTML_NAME = 'dataset_stats.html'
+
+    # 直方图分箱
+    BOXES_PER_IMAGE_BINS = [0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30, 50, 100, 1000000]
+    SIZE_BINS = np.linspace(0.0, 1.0, 21)  # 归一化宽 / 高
+    AREA_BINS = np.array([0, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0])
+    ASPECT_BINS = np.array([0, 0.25, 0.5, 0.75, 1.0, 1.33, 2.0, 4.0, 1e9])
+
+    @staticmethod
+    def _list_pairs(dataset_root: str, subset: str) -> List[Tuple[str, str]]:
+        """子集内的 (图片路径, 标签路径)，按文件名排序"""
+        images_dir = DatasetBuilder.get_images_path(dataset_root, subset)
+        labels_dir = DatasetBuilder.get_labels_path(dataset_root, subset)
+        if not os.path.isdir(images_dir):
+            return []
+
+        with os.scandir(images_dir) as it:
+            names = sorted(entry.name for entry in it if is_image_file(entry.name) and entry.is_file())
+        return [
+            (os.path.join(images_dir, name), os.path.join(labels_dir, os.path.splitext(name)[0] + '.txt'))
+            for name in names
+        ]
+
+    @staticmethod
+    def _read_classes(dataset_root: str) -> List[str]:
+        try:
+            with open(DatasetBuilder.get_classes_file_path(dataset_root), 'r', encoding='utf-8') as f:
+                return [line.strip() for line in f if line.strip()]
+        except OSError:
+            return []
+
+    @staticmethod
+    def _histogram(values: np.ndarray, bins) -> Dict:
+        counts, edges = np.histogram(values, bins=bins)
+        return {'edges': [float(e) for e in edges], 'counts': counts.tolist()}
+
+    @staticmethod
+    def _describe(values: np.ndarray) -> Dict:
+        """均值 / 分位数摘要"""
+        if values.size == 0:
+            return {'count': 0}
+        p5, p50, p95 = np.percentile(values, [5, 50, 95])
+        return {
+            'count': int(values.size),
+            'mean': float(values.mean()),
+            'min': float(values.min()),
+            'p5': float(p5),
+            'median': float(p50),
+            'p95': float(p95),
+            'max': float(values.max()),
+        }
+
+    @staticmethod
+    def collect(dataset_root: str, max_workers: Optional[int] = None) -> Tuple[Dict, str]:
+        """
+        统计数据集
+
+        Args:
+            dataset_root: 数据集根目录
+            max_workers: 进程数（None 表示 CPU 核数）
+
+        Returns:
+            (统计结果字典, 错误消息)
+        """
+        try:
+            started = time.perf_counter()
+            classes = DatasetStats._read_classes(dataset_root)
+            subsets = DatasetBuilder.STRUCTURE['images']
+
+            # 所有子集的文件对一起分块，进程池只启动一次
+            pairs_by_subset = {subset: DatasetStats._list_pairs(dataset_root, subset) for subset in subsets}
+            chunks = []
+            for code, subset in enumerate(subsets):
+                pairs = pairs_by_subset[subset]
+                for start in range(0, len(pairs), _CHUNK_SIZE):
+                    chunks.append((code, start, pairs[start:start + _CHUNK_SIZE]))
+
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(_read_chunk, [chunk[2] for chunk in chunks]))
+
+            # 拼接为整体数组：图片级 info / subset，标注框级 boxes / 所属图片
+            image_offset = 0
+            infos, image_subsets, box_list, box_images = [], [], [], []
+            for (code, _, chunk_pairs), (info, boxes, owners) in zip(chunks, results):
+                infos.append(info)
+                image_subsets.append(np.full(len(chunk_pairs), code, dtype=np.int8))
+                box_list.append(boxes)
+                box_images.append(owners.astype(np.int64) + image_offset)
+                image_offset += len(chunk_pairs)
+
+            info = np.concatenate(infos) if infos else np.zeros((0, 4), dtype=np.int64)
+            image_subset = np.concatenate(image_subsets) if image_subsets else np.zeros(0, dtype=np.int8)
+            boxes = np.concatenate(box_list) if box_list else np.zeros((0, 5), dtype=np.float32)
+            box_image = np.concatenate(box_images) if box_images else np.zeros(0, dtype=np.int64)
+
+            stats = DatasetStats._summarize(classes, subsets, info, image_subset, boxes, box_image)
+            stats['dataset_root'] = dataset_root
+            stats['generated_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+            stats['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+            return stats, ""
+
+        except Exception as e:
+            return {}, f"统计数据集失败: {str(e)}"
+
+    @staticmethod
+    def _summarize(classes: List[str], subsets: List[str], info: np.ndarray, image_subset: np.ndarray,
+                   boxes: np.ndarray, box_image: np.ndarray) -> Dict:
+        """由数组计算全部汇总（纯向量运算）"""
+        class_ids = boxes[:, 0].astype(np.int64)
+        num_classes = max(len(classes), int(class_ids.max()) + 1 if class_ids.size else 0)
+        names = classes + [f"<未定义 {i}>" for i in range(len(classes), num_classes)]
+
+        widths, heights = info[:, 0], info[:, 1]
+        box_w, box_h = boxes[:, 3], boxes[:, 4]
+        box_subset = image_subset[box_image]
+        box_area = box_w * box_h
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 像素宽高比（图片尺寸未知时按归一化值计算）
+            px_w = np.where(widths[box_image] > 0, box_w * widths[box_image], box_w)
+            px_h = np.where(heights[box_image] > 0, box_h * heights[box_image], box_h)
+            aspect = np.where(px_h > 0, px_w / px_h, 0)
+
+        status = info[:, 3]
+        boxes_per_image = info[:, 2]
+
+        # 按 (子集, 类别) 计数
+        subset_class = np.bincount(
+            box_subset.astype(np.int64) * num_classes + class_ids,
+            minlength=len(subsets) * num_classes
+        ).reshape(len(subsets), num_classes) if num_classes else np.zeros((len(subsets), 0), dtype=np.int64)
+
+        # 每个类别出现在多少张图片中（图片 × 类别去重）
+        pair_keys = np.unique(box_image * max(num_classes, 1) + class_ids)
+        images_per_class = np.bincount(pair_keys % max(num_classes, 1), minlength=num_classes)
+
+        per_subset = {}
+        for code, subset in enumerate(subsets):
+            mask = image_subset == code
+            counts = boxes_per_image[mask]
+            per_subset[subset] = {
+                'images': int(mask.sum()),
+                'labeled_images': int((mask & (boxes_per_image > 0)).sum()),
+                'background_images': int((mask & (boxes_per_image == 0) & (status == 0)).sum()),
+                'missing_labels': int((mask & (status % 4 == 1)).sum()),
+                'invalid_labels': int((mask & (status % 4 == 2)).sum()),
+                'unreadable_images': int((mask & (status >= 4)).sum()),
+                'boxes': int(counts.sum()),
+                'boxes_per_image': DatasetStats._describe(counts.astype(np.float64)),
+                'class_counts': subset_class[code].tolist(),
+            }
+
+        per_class = []
+        for class_id, name in enumerate(names):
+            mask = class_ids == class_id
+            per_class.append({
+                'id': class_id,
+                'name': name,
+                'boxes': int(mask.sum()),
+                'images': int(images_per_class[class_id]) if num_classes else 0,
+                'by_subset': {subset: int(subset_class[code, class_id]) for code, subset in enumerate(subsets)},
+                'width': DatasetStats._describe(box_w[mask]),
+                'height': DatasetStats._describe(box_h[mask]),
+                'area': DatasetStats._describe(box_area[mask]),
+            })
+
+        out_of_range = int(((boxes[:, 1:] < 0) | (boxes[:, 1:] > 1)).any(axis=1).sum())
+
+        return {
+            'classes': names,
+            'totals': {
+                'images': int(len(info)),
+                'boxes': int(len(boxes)),
+                'out_of_range_boxes': out_of_range,
+                'image_width': DatasetStats._describe(widths[widths > 0].astype(np.float64)),
+                'image_height': DatasetStats._describe(heights[heights > 0].astype(np.float64)),
+            },
+            'subsets': per_subset,
+            'per_class': per_class,
+            'histograms': {
+                'boxes_per_image': DatasetStats._histogram(boxes_per_image, DatasetStats.BOXES_PER_IMAGE_BINS),
+                'box_width': DatasetStats._histogram(box_w, DatasetStats.SIZE_BINS),
+                'box_height': DatasetStats._histogram(box_h, DatasetStats.SIZE_BINS),
+                'box_area': DatasetStats._histogram(box_area, DatasetStats.AREA_BINS),
+                'aspect_ratio': DatasetStats._histogram(aspect, DatasetStats.ASPECT_BINS),
+            },
+        }
+
+    # ========== 报告输出 ==========
+
+    @staticmethod
+    def _svg_bars(labels: List[str], values: List[int], width: int = 640, bar_height: int = 18) -> str:
+        """水平条形图（内联 SVG，报告不依赖任何外部资源）"""
+        peak = max(values) if values and max(values) > 0 else 1
+        label_width = 150
+        rows = []
+        for i, (label, value) in enumerate(zip(labels, values)):
+            y = i * (bar_height + 4)
+            length = (width - label_width - 80) * value / peak
+            rows.append(
+                f'<text x="{label_width - 6}" y="{y + bar_height - 5}" text-anchor="end">{html.escape(label)}</text>'
+                f'<rect x="{label_width}" y="{y}" width="{length:.1f}" height="{bar_height}" fill="#2196F3"/>'
+                f'<text x="{label_width + length + 4:.1f}" y="{y + bar_height - 5}">{value}</text>'
+            )
+        height = len(labels) * (bar_height + 4)
+        return (f'<svg width="{width}" height="{height}" font-size="12" font-family="sans-serif">'
+                + ''.join(rows) + '</svg>')
+
+    @staticmethod
+    def _histogram_svg(histogram: Dict, fmt: str = '{:g}') -> str:
+        edges = histogram['edges']
+        labels = [f"{fmt.format(lo)} – {fmt.format(hi)}" for lo, hi in zip(edges, edges[1:])]
+        return DatasetStats._svg_bars(labels, histogram['counts'])
+
+    @staticmethod
+    def render_html(stats: Dict) -> str:
+        """生成独立的 HTML 报告"""
+        subsets = list(stats['subsets'])
+        totals = stats['totals']
+        parts = [
+            '<!DOCTYPE html><html><head><meta charset="utf-8"><title>数据集统计报告</title>',
+            '<style>body{font-family:sans-serif;margin:24px;color:#333}table{border-collapse:collapse;margin:8px 0 24px}'
+            'td,th{border:1px solid #ddd;padding:4px 10px;text-align:right}th{background:#f5f5f5}'
+            'td:first-child,th:first-child{text-align:left}h2{margin-top:32px}</style></head><body>',
+            f'<h1>数据集统计报告</h1><p>{html.escape(stats["dataset_root"])}<br>'
+            f'生成时间: {stats["generated_at"]}（耗时 {stats["elapsed_seconds"]} 秒）</p>',
+            f'<p>图片 {totals["images"]} 张，标注框 {totals["boxes"]} 个，坐标越界的标注框 {totals["out_of_range_boxes"]} 个</p>',
+        ]
+
+        # 子集汇总
+        parts.append('<h2>子集</h2><table><tr><th>子集</th><th>图片</th><th>有标注</th><th>背景图</th>'
+                     '<th>缺少标签</th><th>标签格式错误</th><th>图片无法读取</th><th>标注框</th><th>每图平均框数</th></tr>')
+        for subset, s in stats['subsets'].items():
+            mean = s['boxes_per_image'].get('mean', 0)
+            parts.append(
+                f'<tr><td>{subset}</td><td>{s["images"]}</td><td>{s["labeled_images"]}</td>'
+                f'<td>{s["background_images"]}</td><td>{s["missing_labels"]}</td><td>{s["invalid_labels"]}</td>'
+                f'<td>{s["unreadable_images"]}</td><td>{s["boxes"]}</td><td>{mean:.2f}</td></tr>'
+            )
+        parts.append('</table>')
+
+        # 类别汇总
+        parts.append('<h2>类别</h2><table><tr><th>ID</th><th>类别</th><th>标注框</th><th>图片</th>'
+                     + ''.join(f'<th>{s}</th>' for s in subsets)
+                     + '<th>宽度中位数</th><th>高度中位数</th></tr>')
+        for c in stats['per_class']:
+            parts.append(
+                f'<tr><td>{c["id"]}</td><td>{html.escape(c["name"])}</td><td>{c["boxes"]}</td><td>{c["images"]}</td>'
+                + ''.join(f'<td>{c["by_subset"][s]}</td>' for s in subsets)
+                + f'<td>{c["width"].get("median", 0):.3f}</td><td>{c["height"].get("median", 0):.3f}</td></tr>'
+            )
+        parts.append('</table>')
+        parts.append(DatasetStats._svg_bars([c['name'] for c in stats['per_class']],
+                                            [c['boxes'] for c in stats['per_class']]))
+
+        # 直方图
+        titles = {
+            'boxes_per_image': ('每张图片的标注框数', '{:g}'),
+            'box_width': ('标注框宽度（归一化）', '{:.2f}'),
+            'box_height': ('标注框高度（归一化）', '{:.2f}'),
+            'box_area': ('标注框面积（占图片比例）', '{:g}'),
+            'aspect_ratio': ('标注框宽高比（像素）', '{:g}'),
+        }
+        for key, (title, fmt) in titles.items():
+            parts.append(f'<h2>{title}</h2>')
+            parts.append(DatasetStats._histogram_svg(stats['histograms'][key], fmt))
+
+        parts.append('</body></html>')
+        return '\n'.join(parts)
+
+    @staticmethod
+    def generate_report(dataset_root: str, output_dir: Optional[str] = None,
+                        max_workers: Optional[int] = None) -> Tuple[Dict, List[str], str]:
+        """
+        统计数据集并写出 JSON 与 HTML 报告
+
+        Args:
+            dataset_root: 数据集根目录
+            output_dir: 输出目录（默认 <dataset_root>/reports）
+            max_workers: 进程数
+
+        Returns:
+            (统计结果, [JSON 路径, HTML 路径], 错误消息)
+        """
+        stats, error = DatasetStats.collect(dataset_root, max_workers)
+        if error:
+            return {}, [], error
+
+        try:
+            output_dir = output_dir or os.path.join(dataset_root, DatasetStats.REPORT_DIR)
+            json_path = os.path.join(output_dir, DatasetStats.JSON_NAME)
+            html_path = os.path.join(output_dir, DatasetStats.HTML_NAME)
+
+            with atomic_write(json_path) as f:
+                json.dump(stats, f, ensure_ascii=False, indent=2)
+            with atomic_write(html_path) as f:
+                f.write(DatasetStats.render_html(stats))
+
+            return stats, [json_path, html_path], ""
+
+        except Exception as e:
+            return stats, [], f"写入统计报告失败: {str(e)}"
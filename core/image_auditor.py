@@ -0,0 +1,114 @@
+"""图片完整性审计 - 扫描时过滤损坏图片，或对已有数据集做独立检查"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from core.storage import StorageBackend
+from utils.file_utils import is_image_file
+from utils.image_integrity import check_image_integrity
+
+
+class ImageAuditor:
+    """并发检查图片结构完整性（进程池，检查逻辑见 utils.image_integrity）"""
+
+    # 少量文件时直接在当前进程检查，避免进程池启动开销
+    INLINE_THRESHOLD = 64
+
+    @staticmethod
+    def check_files(
+        paths: Sequence[str],
+        max_workers: Optional[int] = None
+    ) -> Tuple[List[Tuple[int, str, str]], str]:
+        """
+        检查一组图片
+
+        对象存储中的图片（如 s3://）不在这里检查（需要先下载），复制到本地后可检查数据集。
+
+        Args:
+            paths: 图片路径序列（也可以是 ImageTable 路径视图）
+            max_workers: 进程数（None 表示 CPU 核数）
+
+        Returns:
+            ([(序号, 路径, 问题描述), ...], 错误消息)
+        """
+        try:
+            total = len(paths)
+            if any(not StorageBackend.is_local(path) for path in paths):
+                rows = [i for i in range(total) if StorageBackend.is_local(paths[i])]
+                print(f"检查图片完整性: 跳过 {total - len(rows)} 张对象存储中的图片")
+                local_paths = [paths[i] for i in rows]
+                problems, error = ImageAuditor.check_files(local_paths, max_workers)
+                return [(rows[i], path, reason) for i, path, reason in problems], error
+
+            if total < ImageAuditor.INLINE_THRESHOLD:
+                results = map(check_image_integrity, paths)
+                return ImageAuditor._collect(paths, results), ""
+
+            workers = max_workers or os.cpu_count() or 1
+            chunksize = max(1, min(256, total // (workers * 16)))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(check_image_integrity, paths, chunksize=chunksize)
+                return ImageAuditor._collect(paths, results), ""
+
+        except Exception as e:
+            return [], f"检查图片完整性失败: {str(e)}"
+
+    @staticmethod
+    def _collect(paths: Sequence[str], results) -> List[Tuple[int, str, str]]:
+        return [
+            (i, paths[i], reason)
+            for i, reason in enumerate(results)
+            if reason
+        ]
+
+    @staticmethod
+    def audit_dataset(
+        dataset_root: str,
+        max_workers: Optional[int] = None
+    ) -> Tuple[int, List[Tuple[int, str, str]], str]:
+        """
+        检查数据集 images/train|val|test 与 temp/ 中的全部图片
+
+        Args:
+            dataset_root: 数据集根目录
+            max_workers: 进程数
+
+        Returns:
+            (检查的图片数, [(序号, 路径, 问题描述), ...], 错误消息)
+        """
+        # 延迟导入：DatasetBuilder 依赖 ImageProcessor，而 ImageProcessor 扫描时依赖本模块
+        from core.dataset_builder import DatasetBuilder
+
+        try:
+            directories = [
+                DatasetBuilder.get_images_path(dataset_root, subset)
+                for subset in DatasetBuilder.STRUCTURE['images']
+            ]
+            directories.append(os.path.join(dataset_root, 'temp'))
+
+            paths = []
+            for directory in directories:
+                if not os.path.isdir(directory):
+                    continue
+                with os.scandir(directory) as it:
+                    paths.extend(
+                        entry.path for entry in it
+                        if is_image_file(entry.name) and entry.is_file()
+                    )
+            paths.sort()
+
+            problems, error = ImageAuditor.check_files(paths, max_workers)
+            return len(paths), problems, error
+
+        except Exception as e:
+            return 0, [], f"检查数据集失败: {str(e)}"
+
+    @staticmethod
+    def format_problems(problems: List[Tuple[int, str, str]], limit: int = 0) -> str:
+        """问题列表文本（limit > 0 时最多列出 limit 条）"""
+        shown = problems[:limit] if limit > 0 else problems
+        lines = [f"{path}: {reason}" for _, path, reason in shown]
+        if len(shown) < len(problems):
+            lines.append(f"…… 共 {len(problems)} 个文件")
+        return '\n'.join(lines)
@@ -1,62 +1,314 @@
 """图片处理器 - Step 1"""
 
 import os
-from typing import List, Tuple
-from utils.file_utils import natural_sort, is_image_file, safe_copy_file
+from typing import Dict, List, Optional, Sequence, Tuple
+from core.image_auditor import ImageAuditor
+from core.storage import StorageBackend
+from core.transfer_engine import TransferEngine
+from models.image_table import ImageTable
+from utils.file_utils import natural_sort_key
+from utils.worker_tuner import map_unordered
 
 
 class ImageProcessor:
     """图片扫描、重命名、复制处理器"""
 
+    # 默认编号位数（0001.jpg）；编号超出位数时自动加宽
+    DEFAULT_INDEX_WIDTH = 4
+
     @staticmethod
-    def scan_images(folder_path: str) -> Tuple[List[str], str]:
+    def scan_images(folder_path: str, check_integrity: bool = False) -> Tuple[List[str], str]:
         """
         扫描文件夹中的图片文件
 
+        本地文件夹未变化时直接使用扫描缓存（ScanCache）中排好序的结果；
+        也可以是对象存储路径（如 s3://bucket/raw，见 StorageBackend）。
+
         Args:
             folder_path: 文件夹路径
+            check_integrity: 是否检查文件结构完整性并排除损坏的图片
 
         Returns:
             (图片文件路径列表, 错误消息)
         """
         try:
-            if not os.path.exists(folder_path):
+            storage = StorageBackend.for_path(folder_path)
+            if not storage.exists(folder_path):
                 return [], f"文件夹不存在: {folder_path}"
 
-            if not os.path.isdir(folder_path):
+            if not storage.isdir(folder_path):
                 return [], f"路径不是文件夹: {folder_path}"
 
-            # 扫描所有文件
-            all_files = []
-            for filename in os.listdir(folder_path):
-                filepath = os.path.join(folder_path, filename)
-                if os.path.isfile(filepath) and is_image_file(filename):
-                    all_files.append(filepath)
+            # 目录项已按文件名自然排序
+            sorted_files = [storage.join(folder_path, name)
+                            for name, _ in storage.list_directory(folder_path).images()]
 
-            if not all_files:
+            if not sorted_files:
                 return [], "文件夹中没有找到图片文件（支持的格式：jpg, jpeg, png, bmp, tiff）"
 
-            # 自然排序
-            sorted_files = natural_sort(all_files)
+            if check_integrity:
+                problems, error = ImageAuditor.check_files(sorted_files)
+                if error:
+                    return [], error
+                if problems:
+                    print(f"扫描图片: 排除 {len(problems)} 张损坏的图片:\n"
+                          f"{ImageAuditor.format_problems(problems, 20)}")
+                    corrupt = {i for i, _, _ in problems}
+                    sorted_files = [p for i, p in enumerate(sorted_files) if i not in corrupt]
+                    if not sorted_files:
+                        return [], "文件夹中的图片均已损坏"
 
             return sorted_files, ""
 
         except Exception as e:
             return [], f"扫描图片失败: {str(e)}"
 
+    @staticmethod
+    def scan_image_table(folder_path: str) -> Tuple[ImageTable, str]:
+        """
+        扫描文件夹中的图片文件，结果存入列式记录表（含文件大小）
+
+        与 scan_images 顺序一致（自然排序），但不为每张图片保留完整路径字符串，
+        适合数十万以上的图片。
+
+        Args:
+            folder_path: 文件夹路径
+
+        Returns:
+            (图片记录表, 错误消息)
+        """
+        try:
+            storage = StorageBackend.for_path(folder_path)
+            if not storage.exists(folder_path):
+                return ImageTable(), f"文件夹不存在: {folder_path}"
+
+            if not storage.isdir(folder_path):
+                return ImageTable(), f"路径不是文件夹: {folder_path}"
+
+            # 已自然排序（本地文件夹未变化时来自扫描缓存）
+            entries = storage.list_directory(folder_path).images()
+
+            if not entries:
+                return ImageTable(), "文件夹中没有找到图片文件（支持的格式：jpg, jpeg, png, bmp, tiff）"
+
+            table = ImageTable()
+            for name, size in entries:
+                table.append(folder_path, name, size)
+
+            return table, ""
+
+        except Exception as e:
+            return ImageTable(), f"扫描图片失败: {str(e)}"
+
+    @staticmethod
+    def _list_directory(directory: str, recursive: bool = False) -> Tuple[List[Tuple[str, str, int]], List[str], int]:
+        """
+        列出一个目录中的图片与子目录（不跟随符号链接目录；目录未变化时使用扫描缓存）
+
+        Returns:
+            ([(所在目录, 文件名, 大小), ...], 子目录列表（recursive 为 False 时为空）, 目录项总数)
+        """
+        storage = StorageBackend.for_path(directory)
+        listing = storage.list_directory(directory)
+        entries = [(directory, name, size) for name, size in listing.images()]
+        subdirs = [storage.join(directory, name) for name in listing.subdirs()] if recursive else []
+        return entries, subdirs, len(listing)
+
+    @staticmethod
+    def _list_remote(folder: str, recursive: bool) -> List[Tuple[str, str, int]]:
+        """列出对象存储中的来源文件夹（递归时按前缀一次分页列出全部键，不逐层请求）"""
+        storage = StorageBackend.for_path(folder)
+        if recursive:
+            return storage.list_tree(folder)
+        return [(folder, name, size) for name, size in storage.list_directory(folder).images()]
+
+    @staticmethod
+    def scan_sources(
+        folders: Sequence[str],
+        recursive: bool = False,
+        max_workers: Optional[int] = None
+    ) -> Tuple[ImageTable, str]:
+        """
+        并发扫描多个来源文件夹，合并为一张记录表
+
+        以目录为单位并发列出（递归时逐层展开子目录），并发数按实测吞吐自动调节。
+        顺序确定：按来源文件夹的给定顺序拼接，每个来源内部按相对路径自然排序，
+        与各目录的扫描完成先后无关。每条记录保留来源 ID（ImageRecord.source）。
+        重复的来源文件夹、以及被多个来源（递归时嵌套）同时覆盖的文件只保留一次。
+        来源可以是对象存储路径（如 s3://bucket/raw），与本地文件夹同时并发列出。
+
+        Args:
+            folders: 来源文件夹列表
+            recursive: 是否包含子文件夹
+            max_workers: 并发扫描的线程数（None 表示自动调节）
+
+        Returns:
+            (图片记录表, 错误消息)
+        """
+        try:
+            unique_folders = []
+            seen_folders = set()
+            for folder in folders:
+                key = StorageBackend.for_path(folder).normalize(folder)
+                if key not in seen_folders:
+                    seen_folders.add(key)
+                    unique_folders.append(folder)
+
+            if not unique_folders:
+                return ImageTable(), "没有选择来源文件夹"
+
+            for folder in unique_folders:
+                storage = StorageBackend.for_path(folder)
+                if not storage.exists(folder):
+                    return ImageTable(), f"文件夹不存在: {folder}"
+                if not storage.isdir(folder):
+                    return ImageTable(), f"路径不是文件夹: {folder}"
+
+            results: Dict[int, List[Tuple[str, str, int]]] = {i: [] for i in range(len(unique_folders))}
+            level = [(i, folder) for i, folder in enumerate(unique_folders) if StorageBackend.is_local(folder)]
+            remote = [(i, folder) for i, folder in enumerate(unique_folders) if not StorageBackend.is_local(folder)]
+            if remote:
+                listed = map_unordered(lambda item: ImageProcessor._list_remote(item[1], recursive),
+                                       remote, max_workers=len(remote))
+                for (source, _), entries in listed:
+                    results[source] = entries
+
+            # 目录遍历以系统调用为主，线程即可并发；按层展开，每层的目录一起并发列出
+            tuner = None
+            if max_workers is None and level:
+                tuner = TransferEngine.create_tuner('scan', level[0][1], unit='项')
+            try:
+                while level:
+                    next_level = []
+                    listed = map_unordered(
+                        lambda item: ImageProcessor._list_directory(item[1], recursive),
+                        level,
+                        max_workers=max_workers or TransferEngine.DEFAULT_WORKERS,
+                        tuner=tuner,
+                        measure=lambda result: result[2]
+                    )
+                    for (source, _), (entries, subdirs, _) in listed:
+                        results[source].extend(entries)
+                        next_level.extend((source, subdir) for subdir in subdirs)
+                    level = next_level
+            finally:
+                if tuner is not None:
+                    tuner.finish()
+
+            table = ImageTable()
+            seen_files = set()
+            for source, folder in enumerate(unique_folders):
+                storage = StorageBackend.for_path(folder)
+                entries = results[source]
+                # 非递归时只有一个目录，扫描结果已按文件名自然排序；递归时按相对来源文件夹的路径排序
+                if recursive:
+                    entries.sort(key=lambda e: natural_sort_key(
+                        storage.relpath(storage.join(e[0], e[1]), folder)))
+                source_id = table.add_source(folder)
+                for directory, name, size in entries:
+                    key = storage.normalize(storage.join(directory, name))
+                    if key in seen_files:
+                        continue
+                    seen_files.add(key)
+                    table.append(directory, name, size, source_id)
+
+            if len(table) == 0:
+                return table, "所选文件夹中没有找到图片文件（支持的格式：jpg, jpeg, png, bmp, tiff）"
+
+            return table, ""
+
+        except Exception as e:
+            return ImageTable(), f"扫描图片失败: {str(e)}"
+
+    @staticmethod
+    def get_sources_fingerprint(folders: Sequence[str]) -> Optional[List[List[int]]]:
+        """
+        获取多个来源文件夹的指纹（每个文件夹一次 stat）
+
+        注意：只反映各文件夹自身的变化，递归扫描时子文件夹内的变化不会体现。
+
+        Returns:
+            每个文件夹的指纹（见 get_folder_fingerprint）；任一文件夹不存在时返回 None
+        """
+        fingerprints = []
+        for folder in folders:
+            fingerprint = ImageProcessor.get_folder_fingerprint(folder)
+            if fingerprint is None:
+                return None
+            fingerprints.append(fingerprint)
+        return fingerprints
+
+    @staticmethod
+    def get_folder_fingerprint(folder_path: str) -> Optional[List[int]]:
+        """
+        获取文件夹指纹（一次 stat：修改时间 + inode + 大小）
+
+        目录中增删、重命名文件都会改变目录的修改时间，
+        因此指纹不变时可以直接复用上次的扫描结果。
+        对象存储路径没有目录修改时间，指纹由一次列目录得到（见 StorageBackend.fingerprint）。
+
+        Args:
+            folder_path: 文件夹路径
+
+        Returns:
+            本地文件夹为 [mtime_ns, inode, size]，文件夹不存在（或存储无法访问）时返回 None
+        """
+        try:
+            return StorageBackend.for_path(folder_path).fingerprint(folder_path)
+        except (ValueError, RuntimeError) as e:
+            print(f"获取文件夹指纹失败: {str(e)}")
+            return None
+
+    @staticmethod
+    def resolve_index_width(last_index: int, width: int = 0) -> int:
+        """
+        确定编号位数
+
+        Args:
+            last_index: 本次将使用的最大编号
+            width: 指定位数（0 表示自动：默认 4 位）
+
+        Returns:
+            不小于 last_index 位数的编号位数，保证同一批文件名等宽
+        """
+        return max(width or ImageProcessor.DEFAULT_INDEX_WIDTH, len(str(last_index)))
+
+    @staticmethod
+    def format_new_name(index: int, ext: str, width: int = DEFAULT_INDEX_WIDTH) -> str:
+        """
+        生成重命名后的文件名
+
+        Args:
+            index: 数据集编号
+            ext: 原始扩展名（含点，任意大小写；为空时使用 .jpg）
+            width: 编号位数（不足补零）
+
+        Returns:
+            新文件名，如 0001.jpg
+        """
+        if not ext:
+            ext = '.jpg'  # 默认扩展名
+        return f"{index:0{width}d}{ext.lower()}"
+
     @staticmethod
     def rename_and_copy(
         images: List[str],
         output_folder: str,
-        start_index: int = 1
+        start_index: int = 1,
+        width: int = DEFAULT_INDEX_WIDTH,
+        verify: bool = False,
+        physical_order: bool = False
     ) -> Tuple[List[str], str]:
         """
-        重命名并复制图片到目标文件夹
+        重命名并复制图片到目标文件夹（并发复制；源或目标在对象存储中时为并发下载 / 上传 / 服务端复制）
 
         Args:
-            images: 原始图片路径列表（已排序）
+            images: 原始图片路径列表（已排序；也可以是 ImageTable.paths() 视图）
             output_folder: 输出文件夹
             start_index: 起始编号（默认从 1 开始）
+            width: 编号位数（见 resolve_index_width）
+            verify: 复制后校验大小与内容哈希（失败自动重试）
+            physical_order: 按源文件的磁盘物理位置顺序读取（新文件名仍按 images 的顺序编号）
 
         Returns:
             (新图片路径列表, 错误消息)
@@ -65,24 +317,27 @@ class ImageProcessor:
         """
         try:
             # 创建输出文件夹
-            os.makedirs(output_folder, exist_ok=True)
+            storage = StorageBackend.for_path(output_folder)
+            storage.makedirs(output_folder)
 
             new_images = []
-            total = len(images)
 
-            for i, src_path in enumerate(images, start=start_index):
-                # 获取原始扩展名
-                _, ext = os.path.splitext(src_path)
-                if not ext:
-                    ext = '.jpg'  # 默认扩展名
+            def pairs():
+                for i, src_path in enumerate(images, start=start_index):
+                    # 生成新文件名：定宽数字 + 原扩展名
+                    _, ext = os.path.splitext(src_path)
+                    new_filename = ImageProcessor.format_new_name(i, ext, width)
+                    dst_path = storage.join(output_folder, new_filename)
+                    new_images.append(dst_path)
+                    yield src_path, dst_path
 
-                # 生成新文件名：4 位数字 + 原扩展名
-                new_filename = f"{i:04d}{ext.lower()}"
-                dst_path = os.path.join(output_folder, new_filename)
+            report, error = StorageBackend.copy_files(pairs(), verify=verify, physical_order=physical_order)
+            if error:
+                return [], f"重命名复制失败: {error}"
 
-                # 复制文件
-                safe_copy_file(src_path, dst_path)
-                new_images.append(dst_path)
+            print(f"重命名复制: {report.summary()}")
+            if not report.ok:
+                return [], f"重命名复制失败（{len(report.failures)} 个文件）:\n{report.format_failures()}"
 
             return new_images, ""
 
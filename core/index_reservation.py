@@ -0,0 +1,289 @@
+"""数据集编号预留 - 多个写入者同时扩展同一数据集时分配互不重叠的编号区间"""
+
+import json
+import os
+import socket
+import time
+import uuid
+from typing import List, Optional, Tuple
+
+from core.dataset_builder import DatasetBuilder
+from utils.file_utils import atomic_write, safe_create_directory
+
+
+class IndexReservation:
+    """
+    一段已预留的编号区间 [start, end]
+
+    预留信息保存在数据集根目录的 .reservations/ 下（可位于 NFS / SMB 共享目录）：
+        lock              短暂持有的互斥锁（O_EXCL 创建，内容含持有者令牌），只保护"计算区间 + 写记录"这一步
+        next_index        下一个可分配的编号（高水位），避免每次预留都扫描整个数据集
+        <start>-<end>.json  预留记录（持有者、过期时间）
+
+    复制文件期间不持有锁，多个写入者可以同时复制各自的区间。
+    预留记录带租约：持有者崩溃后，过期记录在下一次预留时被清理；
+    高水位只增不减，因此过期区间不会被重新分配（最多留下编号空缺）。
+    """
+
+    DIR_NAME = '.reservations'
+    LOCK_NAME = 'lock'
+    COUNTER_NAME = 'next_index'
+
+    # 锁文件超过此时间未释放视为持有者已崩溃（正常持有时间为毫秒级）
+    LOCK_STALE_SECONDS = 60.0
+    # 默认租约：界面中 Step 2 到 Step 3 之间可能间隔较长
+    DEFAULT_LEASE_SECONDS = 12 * 3600
+
+    def __init__(self, dataset_root: str, start: int, end: int, path: str, expires: float):
+        self.dataset_root = dataset_root
+        self.start = start
+        self.end = end
+        self.path = path
+        self.expires = expires
+
+    def __len__(self) -> int:
+        return self.end - self.start + 1
+
+    def __repr__(self) -> str:
+        return f"IndexReservation({self.start}-{self.end}, {self.path})"
+
+    # ========== 锁 ==========
+
+    @staticmethod
+    def _get_dir(dataset_root: str) -> str:
+        return os.path.join(dataset_root, IndexReservation.DIR_NAME)
+
+    @staticmethod
+    def _acquire_lock(lock_path: str, timeout: float) -> Optional[str]:
+        """
+        O_EXCL 创建锁文件；锁过期时接管，超时返回 None
+
+        Returns:
+            持有者令牌（释放时用于确认锁仍属于自己）
+        """
+        deadline = time.monotonic() + timeout
+        delay = 0.01
+        token = uuid.uuid4().hex
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                try:
+                    age = time.time() - os.stat(lock_path).st_mtime
+                except FileNotFoundError:
+                    continue  # 锁刚被释放，立即重试
+                if age > IndexReservation.LOCK_STALE_SECONDS:
+                    owner = IndexReservation._read_record(lock_path) or {}
+                    if IndexReservation._remove_lock(lock_path, owner.get('token')):
+                        print(f"编号预留: 接管过期的锁（{age:.0f} 秒未释放）: {lock_path}")
+                    continue
+
+                if time.monotonic() >= deadline:
+                    return None
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+                continue
+
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({**IndexReservation._owner_info(), 'token': token}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            return token
+
+    @staticmethod
+    def _remove_lock(lock_path: str, token: Optional[str]) -> bool:
+        """
+        删除持有者令牌为 token 的锁文件
+
+        先把锁文件原子地改为唯一的名称（多个进程同时接管同一把过期锁时只有一个能改名成功），
+        再确认令牌；改名期间锁已被他人重新创建（令牌不同）时放回原处，不删除他人的锁。
+
+        Returns:
+            是否删除了该锁
+        """
+        taken = f"{lock_path}.{uuid.uuid4().hex}.taken"
+        try:
+            os.rename(lock_path, taken)
+        except FileNotFoundError:
+            return False
+        owner = IndexReservation._read_record(taken) or {}
+        if owner.get('token') == token:
+            os.remove(taken)
+            return True
+        try:
+            os.link(taken, lock_path)
+        except FileExistsError:
+            print(f"编号预留: 锁已被其他写入者重新获取: {lock_path}")
+        except OSError:
+            # 不支持硬链接的文件系统：锁位置空闲时改回原名
+            if not os.path.exists(lock_path):
+                os.rename(taken, lock_path)
+                return False
+        try:
+            os.remove(taken)
+        except FileNotFoundError:
+            pass
+        return False
+
+    @staticmethod
+    def _owner_info() -> dict:
+        return {'host': socket.gethostname(), 'pid': os.getpid(), 'time': time.time()}
+
+    # ========== 预留记录 ==========
+
+    @staticmethod
+    def _read_record(path: str) -> Optional[dict]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def list_active(dataset_root: str, purge_expired: bool = False) -> List[dict]:
+        """
+        列出未过期的预留记录
+
+        Args:
+            dataset_root: 数据集根目录
+            purge_expired: 是否删除过期记录（应在持有锁时进行）
+        """
+        directory = IndexReservation._get_dir(dataset_root)
+        if not os.path.isdir(directory):
+            return []
+
+        now = time.time()
+        active = []
+        for name in os.listdir(directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(directory, name)
+            record = IndexReservation._read_record(path)
+            if record is None:
+                continue
+            if record.get('expires', 0) < now:
+                if purge_expired:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                continue
+            record['path'] = path
+            active.append(record)
+        return active
+
+    @staticmethod
+    def reserve(
+        dataset_root: str,
+        count: int,
+        min_start: int = 1,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        timeout: float = 30.0
+    ) -> Tuple[Optional['IndexReservation'], str]:
+        """
+        原子地预留 count 个连续编号
+
+        区间起点取以下各项的最大值：高水位计数、所有有效预留的终点 + 1、min_start
+        （调用方已知的下限，如自己扫描得到的最大编号 + 1，用于兼容不使用预留的写入者）。
+        高水位文件不存在时扫描一次数据集初始化。
+
+        Args:
+            dataset_root: 数据集根目录
+            count: 需要的编号数量
+            min_start: 区间起点下限
+            lease_seconds: 租约时长（秒）
+            timeout: 等待锁的最长时间（秒）
+
+        Returns:
+            (预留, 错误消息)
+        """
+        try:
+            if count <= 0:
+                return None, "预留数量必须大于 0"
+
+            directory = IndexReservation._get_dir(dataset_root)
+            safe_create_directory(directory)
+            lock_path = os.path.join(directory, IndexReservation.LOCK_NAME)
+            counter_path = os.path.join(directory, IndexReservation.COUNTER_NAME)
+
+            token = IndexReservation._acquire_lock(lock_path, timeout)
+            if token is None:
+                return None, f"等待编号预留锁超时（{timeout:.0f} 秒）: {lock_path}"
+
+            try:
+                try:
+                    with open(counter_path, 'r', encoding='utf-8') as f:
+                        next_index = int(f.read().strip())
+                except (OSError, ValueError):
+                    max_idx, error = DatasetBuilder.find_max_image_index(dataset_root)
+                    if error:
+                        return None, error
+                    next_index = max_idx + 1
+
+                active = IndexReservation.list_active(dataset_root, purge_expired=True)
+                start = max([next_index, min_start] + [r['end'] + 1 for r in active])
+                end = start + count - 1
+                expires = time.time() + lease_seconds
+
+                record_path = os.path.join(directory, f"{start:012d}-{end:012d}.json")
+                record = {'start': start, 'end': end, 'expires': expires,
+                          **IndexReservation._owner_info()}
+                fd = os.open(record_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(record, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                with atomic_write(counter_path) as f:
+                    f.write(str(end + 1))
+
+            finally:
+                if not IndexReservation._remove_lock(lock_path, token):
+                    print(f"编号预留: 锁在持有期间被接管（持有超过 {IndexReservation.LOCK_STALE_SECONDS:.0f} 秒）: {lock_path}")
+
+            return IndexReservation(dataset_root, start, end, record_path, expires), ""
+
+        except Exception as e:
+            return None, f"预留编号失败: {str(e)}"
+
+    @staticmethod
+    def load(dataset_root: str, path: str) -> Optional['IndexReservation']:
+        """从记录文件恢复预留（记录不存在或已过期时返回 None）"""
+        record = IndexReservation._read_record(path)
+        if record is None or record.get('expires', 0) < time.time():
+            return None
+        return IndexReservation(dataset_root, record['start'], record['end'], path, record['expires'])
+
+    def renew(self, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> str:
+        """
+        续租
+
+        Returns:
+            错误消息（记录已被清理时返回错误，此时区间可能已不安全）
+        """
+        try:
+            if not os.path.exists(self.path):
+                return f"编号预留已失效: {self.start}-{self.end}"
+            self.expires = time.time() + lease_seconds
+            record = {'start': self.start, 'end': self.end, 'expires': self.expires,
+                      **IndexReservation._owner_info()}
+            with atomic_write(self.path) as f:
+                json.dump(record, f)
+            return ""
+        except Exception as e:
+            return f"续租编号预留失败: {str(e)}"
+
+    def release(self) -> str:
+        """
+        释放预留（文件已写入数据集后调用；高水位不回退）
+
+        Returns:
+            错误消息
+        """
+        try:
+            os.remove(self.path)
+            return ""
+        except FileNotFoundError:
+            return ""
+        except Exception as e:
+            return f"释放编号预留失败: {str(e)}"
@@ -0,0 +1,361 @@
+"""收件箱监视入库 - 持续扩展已有数据集（无界面模式）"""
+
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from core.dataset_builder import DatasetBuilder
+from core.image_processor import ImageProcessor
+from core.index_reservation import IndexReservation
+from core.transfer_engine import TransferEngine
+from utils.file_utils import fast_copy_file, is_image_file, natural_sort, rename_noreplace, safe_create_directory
+from utils.io_priority import lower_current_thread_priority
+from utils.inotify import Inotify, IN_CLOSE_WRITE, IN_MOVED_TO
+
+
+class IngestWatcher:
+    """
+    监视收件箱目录，将新到达且已写完的图片分批追加到已有数据集
+
+    相当于自动执行扩展模式的 Step 2 + Step 3：
+        - 启动时只扫描一次数据集（最大编号、各子集数量），之后每批只在内存中递增
+        - 每批通过 IndexReservation 预留编号区间，多个写入者（多台机器）可同时入库
+        - 新图片按到达文件名自然排序后依次编号，按比例分配到 train / val / test
+          （每批内用固定种子打乱后，按累计数量与目标比例的差额分配，长期比例保持准确）
+        - 先写入隐藏临时文件再重命名，数据集中不会出现半个文件
+        - 入库后的原图移动到收件箱下的 _ingested/ 目录，收件箱本身就是待处理队列
+
+    文件是否写完：inotify 可用时以 IN_CLOSE_WRITE / IN_MOVED_TO 事件为准；
+    否则（或启动前已存在的文件）以大小和修改时间在 settle_seconds 内不变为准。
+
+    内存占用有上限：同时跟踪的候选文件不超过 max_tracked 个，
+    其余文件留在收件箱中，待当前文件入库后再纳入。
+    """
+
+    DONE_DIR_NAME = '_ingested'
+
+    # 每批编号预留的租约（秒）：入库进程崩溃后，其预留在此时间后失效
+    RESERVATION_LEASE_SECONDS = 3600
+
+    def __init__(
+        self,
+        inbox: str,
+        dataset_root: str,
+        train_ratio: float = 70.0,
+        val_ratio: float = 20.0,
+        test_ratio: float = 10.0,
+        seed: int = 42,
+        batch_size: int = 500,
+        settle_seconds: float = 2.0,
+        poll_interval: float = 2.0,
+        use_inotify: bool = True,
+        index_width: int = 0
+    ):
+        """
+        Args:
+            inbox: 收件箱目录（只监视顶层文件）
+            dataset_root: 已有数据集根目录
+            train_ratio / val_ratio / test_ratio: 划分比例 (0-100)
+            seed: 随机种子（批内打乱，保证可复现）
+            batch_size: 每批最多入库的图片数
+            settle_seconds: 轮询模式下判定文件写完所需的稳定时间
+            poll_interval: 轮询 / 等待事件的间隔（秒）
+            use_inotify: 是否优先使用 inotify
+            index_width: 编号位数（0 表示沿用数据集中最常见的位数）
+        """
+        self.inbox = inbox
+        self.dataset_root = dataset_root
+        self.ratios = (train_ratio, val_ratio, test_ratio)
+        self.seed = seed
+        self.batch_size = max(1, batch_size)
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.index_width = index_width
+        self.max_tracked = self.batch_size * 4
+
+        self.done_dir = os.path.join(inbox, self.DONE_DIR_NAME)
+        self.next_index = 1
+        self.subset_counts = [0, 0, 0]
+        self.total_ingested = 0
+
+        # 候选文件: 文件名 -> [大小, 修改时间, 稳定起始时刻, 是否已收到写完事件]
+        self._tracked: Dict[str, list] = {}
+        self._backlog = True  # 收件箱中可能还有未纳入跟踪的文件
+        self._inotify: Optional[Inotify] = None
+
+    # ========== 生命周期 ==========
+
+    def start(self) -> str:
+        """
+        校验目录、读取数据集当前状态并开始监视
+
+        Returns:
+            错误消息（成功时为空字符串）
+        """
+        try:
+            if not os.path.isdir(self.inbox):
+                return f"收件箱不存在: {self.inbox}"
+
+            valid, error = DatasetBuilder.validate_existing_structure(self.dataset_root)
+            if not valid:
+                return error
+
+            max_idx, widths, error = DatasetBuilder.scan_index_stats(self.dataset_root)
+            if error:
+                return error
+            self.next_index = max_idx + 1
+            if not self.index_width:
+                self.index_width = DatasetBuilder.dominant_index_width(widths)
+
+            for i, subset in enumerate(DatasetBuilder.STRUCTURE['images']):
+                images_dir = DatasetBuilder.get_images_path(self.dataset_root, subset)
+                with os.scandir(images_dir) as it:
+                    self.subset_counts[i] = sum(1 for entry in it if is_image_file(entry.name))
+                safe_create_directory(DatasetBuilder.get_labels_path(self.dataset_root, subset))
+
+            safe_create_directory(self.done_dir)
+
+            if self.use_inotify:
+                try:
+                    self._inotify = Inotify(self.inbox, IN_CLOSE_WRITE | IN_MOVED_TO)
+                except OSError as e:
+                    print(f"入库: inotify 不可用，改用轮询（{e}）")
+
+            mode = "inotify" if self._inotify else f"轮询（每 {self.poll_interval} 秒）"
+            print(f"入库: 监视 {self.inbox} → {self.dataset_root}，"
+                  f"下一个编号 {self.next_index}，模式: {mode}")
+            return ""
+
+        except Exception as e:
+            return f"启动入库监视失败: {str(e)}"
+
+    def close(self):
+        """停止监视"""
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+
+    def run(self, stop_event: Optional[threading.Event] = None) -> str:
+        """
+        持续监视并入库，直到 stop_event 被设置
+
+        Returns:
+            错误消息（正常停止时为空字符串）
+        """
+        stop_event = stop_event or threading.Event()
+        error = self.start()
+        if error:
+            return error
+
+        # 限速配置中的优先级：入库在当前线程中复制
+        limiter = TransferEngine.shared_limiter()
+        if limiter.io_priority:
+            priority_error = lower_current_thread_priority(limiter.io_priority)
+            if priority_error:
+                print(f"入库: 降低优先级失败: {priority_error}")
+
+        try:
+            while not stop_event.is_set():
+                _, error = self.poll_once(stop_event)
+                if error:
+                    return error
+            return ""
+        finally:
+            self.close()
+            print(f"入库: 已停止，本次共入库 {self.total_ingested} 张图片")
+
+    def poll_once(self, stop_event: Optional[threading.Event] = None) -> Tuple[int, str]:
+        """
+        等待一个周期，把已写完的文件分批入库
+
+        Returns:
+            (本周期入库数量, 错误消息)
+        """
+        if self._inotify:
+            events, overflow = self._inotify.read_events(self.poll_interval)
+            now = time.monotonic()
+            for _, name in events:
+                self._track(name, now, closed=True)
+            if overflow:
+                self._backlog = True
+        elif stop_event is not None:
+            stop_event.wait(self.poll_interval)
+        else:
+            time.sleep(self.poll_interval)
+
+        # 轮询模式每个周期都扫描目录；inotify 模式只在有积压或事件溢出时扫描
+        if self._backlog or not self._inotify:
+            self._scan_inbox()
+
+        placed_total = 0
+        for ready in self._take_ready_batches():
+            placed, error = self.process_batch(ready)
+            placed_total += placed
+            if error:
+                return placed_total, error
+        return placed_total, ""
+
+    # ========== 候选文件跟踪 ==========
+
+    def _track(self, name: str, now: float, closed: bool = False):
+        """纳入或更新一个候选文件"""
+        if name.startswith('.') or not is_image_file(name):
+            return
+
+        observation = self._tracked.get(name)
+        if observation is None:
+            if len(self._tracked) >= self.max_tracked:
+                self._backlog = True
+                return
+            self._tracked[name] = [-1, -1, now, closed]
+        elif closed:
+            observation[3] = True
+
+    def _scan_inbox(self):
+        """扫描收件箱顶层，纳入新出现的图片（受 max_tracked 限制）"""
+        now = time.monotonic()
+        self._backlog = False
+        with os.scandir(self.inbox) as it:
+            for entry in it:
+                if entry.name in self._tracked or not entry.is_file():
+                    continue
+                self._track(entry.name, now)
+                if self._backlog:
+                    break
+
+    def _take_ready_batches(self) -> List[List[str]]:
+        """
+        重新 stat 候选文件，取出已写完的文件（自然排序后按 batch_size 分批）
+
+        大小或修改时间仍在变化的文件重置稳定计时；已消失的文件不再跟踪。
+        """
+        now = time.monotonic()
+        ready = []
+        for name, observation in list(self._tracked.items()):
+            try:
+                st = os.stat(os.path.join(self.inbox, name))
+            except FileNotFoundError:
+                del self._tracked[name]
+                continue
+
+            if (st.st_size, st.st_mtime_ns) != (observation[0], observation[1]):
+                changed = observation[0] >= 0
+                observation[0], observation[1] = st.st_size, st.st_mtime_ns
+                observation[2] = now
+                if changed:
+                    observation[3] = False  # 写完事件之后又被修改，重新等待
+                if not observation[3]:
+                    continue
+
+            if st.st_size > 0 and (observation[3] or now - observation[2] >= self.settle_seconds):
+                ready.append(name)
+
+        for name in ready:
+            del self._tracked[name]
+        ready = natural_sort(ready)
+        return [ready[i:i + self.batch_size] for i in range(0, len(ready), self.batch_size)]
+
+    # ========== 入库 ==========
+
+    def _next_subset(self) -> int:
+        """选出当前数量与目标比例差额最大的子集"""
+        total = sum(self.subset_counts) + 1
+        deficits = [
+            ratio * total / 100 - count
+            for ratio, count in zip(self.ratios, self.subset_counts)
+        ]
+        return deficits.index(max(deficits))
+
+    def process_batch(self, names: List[str]) -> Tuple[int, str]:
+        """
+        将一批收件箱中的图片编号、划分并放入数据集
+
+        Args:
+            names: 收件箱中的文件名（已排序，编号按此顺序分配）
+
+        Returns:
+            (成功入库数量, 错误消息)；出错时已入库的文件保留，编号不回退
+
+        目标编号已被占用的文件跳过（记录到输出），原图留在收件箱中，下个周期换新编号入库。
+        """
+        subsets = DatasetBuilder.STRUCTURE['images']
+        reservation, error = IndexReservation.reserve(
+            self.dataset_root, len(names), min_start=self.next_index,
+            lease_seconds=self.RESERVATION_LEASE_SECONDS
+        )
+        if error:
+            self._backlog = True
+            return 0, error
+        start_index = reservation.start
+        width = ImageProcessor.resolve_index_width(start_index + len(names) - 1, self.index_width)
+
+        # 批内用固定种子打乱分配顺序，避免连续拍摄的图片集中落入同一子集
+        order = list(range(len(names)))
+        random.Random(f"{self.seed}:{start_index}").shuffle(order)
+        assignment = [0] * len(names)
+        for position in order:
+            subset_code = self._next_subset()
+            assignment[position] = subset_code
+            self.subset_counts[subset_code] += 1
+
+        placed_codes = []  # 已入库文件的子集
+        handled = 0  # 已处理（入库或跳过）的文件数
+        limiter = TransferEngine.shared_limiter()
+        try:
+            for offset, name in enumerate(names):
+                src = os.path.join(self.inbox, name)
+                new_name = ImageProcessor.format_new_name(
+                    start_index + offset, os.path.splitext(name)[1], width
+                )
+                target_dir = DatasetBuilder.get_images_path(self.dataset_root, subsets[assignment[offset]])
+                dst = os.path.join(target_dir, new_name)
+                # 先写隐藏临时文件，复制完成后再原子重命名
+                tmp = os.path.join(target_dir, f".{new_name}.part")
+                try:
+                    if os.path.exists(dst):
+                        raise FileExistsError(f"目标文件已存在: {dst}")
+
+                    limiter.acquire(os.path.getsize(src) if limiter.bytes_per_sec else 0)
+                    fast_copy_file(src, tmp)
+                    # 检查之后仍可能有别的写入者占用该编号：重命名不覆盖已有文件
+                    rename_noreplace(tmp, dst)
+                except FileExistsError:
+                    # 编号被未经预留的写入占用：跳过该文件，编号照常前进
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                    print(f"入库: 跳过 {name}（目标文件已存在: {dst}），留在收件箱中稍后重新入库")
+                    self.subset_counts[assignment[offset]] -= 1
+                    self.next_index = start_index + offset + 1
+                    self._backlog = True
+                    handled += 1
+                    continue
+
+                done_path = os.path.join(self.done_dir, name)
+                if os.path.exists(done_path):
+                    done_path = os.path.join(self.done_dir, f"{os.path.splitext(new_name)[0]}_{name}")
+                os.replace(src, done_path)
+
+                self.next_index = start_index + offset + 1
+                placed_codes.append(assignment[offset])
+                handled += 1
+
+            return len(placed_codes), ""
+
+        except Exception as e:
+            # 未入库的文件不计入子集数量，下个周期重新纳入
+            for offset in range(handled, len(names)):
+                self.subset_counts[assignment[offset]] -= 1
+            self._backlog = True
+            return len(placed_codes), f"入库失败: {str(e)}"
+
+        finally:
+            reservation.release()
+            placed = len(placed_codes)
+            self.total_ingested += placed
+            if placed:
+                train, val, test = (placed_codes.count(i) for i in range(3))
+                print(f"入库: {placed} 张图片，编号 {start_index}-{self.next_index - 1}"
+                      f"（train {train} / val {val} / test {test}）")
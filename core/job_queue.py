@@ -0,0 +1,569 @@
+"""批量任务队列 - 多个数据集任务（DatasetConfig 草稿）由进程池并行执行"""
+
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from core.dataset_merger import DatasetMerger
+from core.image_processor import ImageProcessor
+from core.pipeline_runner import PipelineRunner
+from core.storage import StorageBackend
+from models.dataset_config import DatasetConfig
+from utils import file_lock
+from utils.draft_manager import DraftManager
+from utils.file_utils import atomic_write
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    """本机进程是否仍在运行（无法判断时视为仍在运行）"""
+    if not pid:
+        return False
+    if sys.platform == 'win32':
+        # Windows 上 os.kill 会终止进程，改用 OpenProcess 查询退出码
+        import ctypes
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return ctypes.get_last_error() == 5  # ERROR_ACCESS_DENIED：进程存在但无权查询
+        try:
+            code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+                return True
+            return code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class Job:
+    """队列中的一个任务"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    CANCELLING = "cancelling"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    STATUS_DISPLAY = {
+        PENDING: "等待中",
+        RUNNING: "运行中",
+        CANCELLING: "正在取消",
+        DONE: "已完成",
+        FAILED: "失败",
+        CANCELLED: "已取消",
+    }
+
+    def __init__(self, job_id: str, name: str, image_count: int = 0):
+        self.id = job_id
+        self.name = name
+        self.image_count = image_count
+        self.status = Job.PENDING
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.pid: Optional[int] = None
+        # 运行中的任务由启动它的调度器持有（调度器令牌、所在主机与进程、租约到期时间）
+        self.owner: Optional[str] = None
+        self.host: Optional[str] = None
+        self.scheduler_pid: Optional[int] = None
+        self.lease: Optional[float] = None
+        self.executed: List[int] = []
+        self.skipped: List[int] = []
+        self.error = ""
+
+    @property
+    def is_active(self) -> bool:
+        """是否正在运行（含正在取消）"""
+        return self.status in (Job.RUNNING, Job.CANCELLING)
+
+    def get_status_display(self) -> str:
+        return self.STATUS_DISPLAY.get(self.status, "未知")
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Job':
+        job = cls(data['id'], data.get('name', data['id']), data.get('image_count', 0))
+        for key in ('status', 'created', 'started', 'finished', 'pid', 'owner', 'host', 'scheduler_pid', 'lease',
+                    'executed', 'skipped', 'error'):
+            if key in data:
+                setattr(job, key, data[key])
+        return job
+
+
+def _run_job(config_path: str, log_path: str, result_path: str, job_workers: int):
+    """
+    子进程入口：执行一个任务的全部步骤（输出写入任务日志）
+
+    结果写入 result_path: {"executed": [...], "skipped": [...], "error": "..."}
+    """
+    from core.transfer_engine import TransferEngine
+    from utils.worker_tuner import WorkerTuner
+
+    # 终端中的 Ctrl+C 只由调度器处理（停止启动新任务），不中断正在运行的任务
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    log_file = open(log_path, 'a', encoding='utf-8', buffering=1)
+    sys.stdout = sys.stderr = log_file
+    executed, skipped, error = [], [], ""
+    try:
+        # 单个任务的并发上限（多个任务同时运行时避免各自占满线程）
+        WorkerTuner.MAX_WORKERS = job_workers
+        TransferEngine.DEFAULT_WORKERS = min(TransferEngine.DEFAULT_WORKERS, job_workers)
+
+        print(f"===== {datetime.now():%Y-%m-%d %H:%M:%S} 开始执行（进程 {os.getpid()}）=====")
+        config = DraftManager.load_draft(config_path)
+        # 每完成一步写回草稿：进程被终止后重新运行，从未完成的步骤继续
+        executed, skipped, error = PipelineRunner.run_all(
+            config, on_step=lambda _: DraftManager.save_draft(config, config_path)
+        )
+        DraftManager.save_draft(config, config_path)
+        print(f"===== {datetime.now():%Y-%m-%d %H:%M:%S} {'失败: ' + error if error else '完成'} =====")
+
+    except Exception as e:
+        traceback.print_exc()
+        error = f"任务执行失败: {str(e)}"
+
+    finally:
+        with atomic_write(result_path) as f:
+            json.dump({'executed': executed, 'skipped': skipped, 'error': error}, f, ensure_ascii=False)
+        log_file.close()
+
+
+class JobQueue:
+    """
+    持久化的任务队列与调度器
+
+    每个任务是一份 DatasetConfig 草稿，由 PipelineRunner.run_all 在独立进程中执行
+    （增量执行：中断后重新运行会跳过已完成的步骤）。队列目录（默认 APP_DATA_DIR/jobs）:
+        queue.json        任务列表与状态
+        queue.lock        修改 queue.json 时持有的文件锁（界面与无界面运行器可同时操作队列）
+        <id>.json         任务的 DatasetConfig 草稿（执行后写回结果状态）
+        <id>.log          任务日志
+        <id>.result.json  子进程写入的执行结果
+
+    调度：同时运行最多 max_jobs 个任务（全局上限），每个任务内的复制 / 扫描并发不超过 job_workers（单任务上限）。
+    图片数不少于 large_job_images 的大任务最多占用 max_jobs - 1 个位置，
+    始终留一个位置给小任务，小任务不必排在大任务后面。
+
+    取消通过队列文件传递（状态改为 cancelling），调度器终止对应进程；
+    被终止的步骤留下的未完成事务由调度器立即回滚（OperationLog）。
+
+    界面与无界面运行器可以同时运行调度器，各自只管理自己启动的任务：运行中的任务记录持有者
+    （调度器令牌、主机、进程号）与租约，持有者每次轮询续期。其他调度器只在持有者确定已退出
+    （同一主机上调度器进程与任务进程都已结束，或调度器进程仍在但租约已过期且任务进程已结束）
+    或租约已过期（其他主机）时接管，回滚中断的步骤并重新排队。
+    """
+
+    DEFAULT_DIR = os.path.join(DraftManager.APP_DATA_DIR, 'jobs')
+    STATE_NAME = 'queue.json'
+    LOCK_NAME = 'queue.lock'
+
+    DEFAULT_MAX_JOBS = 2
+    DEFAULT_JOB_WORKERS = 8
+    LARGE_JOB_IMAGES = 20000
+    POLL_SECONDS = 0.5
+    # 运行中任务的租约（持有者每次轮询续期；超过此时间未续期视为调度器已失去响应）
+    LEASE_SECONDS = 60.0
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_jobs: int = DEFAULT_MAX_JOBS,
+        job_workers: int = DEFAULT_JOB_WORKERS,
+        large_job_images: int = LARGE_JOB_IMAGES
+    ):
+        """
+        Args:
+            directory: 队列目录（默认 DEFAULT_DIR）
+            max_jobs: 同时运行的任务数
+            job_workers: 每个任务的最大线程数
+            large_job_images: 大任务的图片数阈值
+        """
+        self.directory = directory or JobQueue.DEFAULT_DIR
+        self.max_jobs = max(1, max_jobs)
+        self.job_workers = max(1, job_workers)
+        self.large_job_images = large_job_images
+        self._processes: Dict[str, multiprocessing.Process] = {}
+        self._shutdown = threading.Event()
+        self.owner = uuid.uuid4().hex
+        self.host = socket.gethostname()
+
+    # ========== 路径与持久化 ==========
+
+    def config_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def log_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.log")
+
+    def _result_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.result.json")
+
+    @contextmanager
+    def _locked(self):
+        """持有队列文件锁，产出任务列表；退出时写回"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, self.LOCK_NAME), 'a') as lock:
+            file_lock.lock(lock)
+            try:
+                jobs = self._read()
+                yield jobs
+                with atomic_write(os.path.join(self.directory, self.STATE_NAME)) as f:
+                    json.dump({'jobs': [job.to_dict() for job in jobs]}, f, ensure_ascii=False, indent=1)
+            finally:
+                file_lock.unlock(lock)
+
+    def _read(self) -> List[Job]:
+        try:
+            with open(os.path.join(self.directory, self.STATE_NAME), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return [Job.from_dict(item) for item in data.get('jobs', [])]
+        except (OSError, ValueError, KeyError):
+            return []
+
+    def jobs(self) -> List[Job]:
+        """全部任务（按加入顺序）"""
+        return self._read()
+
+    # ========== 管理 ==========
+
+    @staticmethod
+    def new_config(
+        raw_folders: Sequence[str],
+        dataset_root: str,
+        classes: Optional[List[str]] = None,
+        ratios: Sequence[float] = (70.0, 20.0, 10.0),
+        seed: int = 42,
+        recursive: bool = False,
+        index_width: int = 0
+    ) -> Tuple[Optional[DatasetConfig], str]:
+        """
+        由参数创建任务配置（数据集目录不存在时新建，存在时扩展）
+
+        扩展已有数据集且未指定类别时，沿用数据集的 classes.txt。
+
+        Returns:
+            (DatasetConfig, 错误消息)
+        """
+        folders = [os.path.abspath(folder) if StorageBackend.is_local(folder) else folder
+                   for folder in raw_folders]
+        try:
+            missing = [folder for folder in folders if not StorageBackend.for_path(folder).isdir(folder)]
+        except Exception as e:
+            return None, f"无法访问原始图片文件夹: {str(e)}"
+        if missing:
+            return None, f"原始图片文件夹不存在: {', '.join(missing)}"
+
+        config = DatasetConfig()
+        config.raw_source_folders = folders
+        config.raw_images_folder = folders[0] if folders else None
+        config.scan_recursive = recursive
+        config.index_width = index_width
+        config.train_ratio, config.val_ratio, config.test_ratio = ratios
+        config.random_seed = seed
+
+        dataset_root = os.path.abspath(dataset_root)
+        if os.path.exists(dataset_root):
+            config.dataset_mode = 'extend'
+            config.dataset_root = dataset_root
+            config.classes = list(classes) if classes else DatasetMerger.read_classes(dataset_root)
+        else:
+            config.dataset_mode = 'create'
+            config.dataset_parent_dir = os.path.dirname(dataset_root)
+            config.dataset_name = os.path.basename(dataset_root)
+            config.classes = list(classes or [])
+
+        if not config.classes:
+            return None, "请指定类别列表"
+        return config, ""
+
+    def add(self, config: DatasetConfig, name: str = "") -> Tuple[Optional[Job], str]:
+        """
+        加入任务（保存配置的副本，之后修改界面中的会话不影响任务）
+
+        Returns:
+            (Job, 错误消息)
+        """
+        unconfigured = [n for n in sorted(DatasetConfig.STEP_DEPENDENCIES)
+                        if not PipelineRunner.is_configured(config, n)]
+        if unconfigured:
+            return None, f"Step {', '.join(map(str, unconfigured))} 缺少参数，无法加入队列"
+
+        # 图片数决定任务大小（调度用）；Step 1 未执行时扫描来源文件夹估计
+        image_count = config.image_count
+        if not image_count:
+            table, error = ImageProcessor.scan_sources(config.raw_source_folders, config.scan_recursive)
+            if error:
+                return None, error
+            image_count = len(table)
+
+        job_id = f"{datetime.now():%Y%m%d-%H%M%S-%f}"
+        name = name or config.dataset_name or os.path.basename(config.dataset_root or "") or job_id
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            DraftManager.save_draft(config, self.config_path(job_id))
+            job = Job(job_id, name, image_count)
+            with self._locked() as jobs:
+                jobs.append(job)
+            return job, ""
+        except OSError as e:
+            return None, f"加入任务失败: {str(e)}"
+
+    def add_draft(self, draft_path: str, name: str = "") -> Tuple[Optional[Job], str]:
+        """由草稿文件加入任务"""
+        try:
+            config = DraftManager.load_draft(draft_path)
+        except (ValueError, OSError) as e:
+            return None, str(e)
+        return self.add(config, name or os.path.splitext(os.path.basename(draft_path))[0])
+
+    def _update(self, job_id: str, allowed: Sequence[str], status: Optional[str]) -> str:
+        with self._locked() as jobs:
+            for job in jobs:
+                if job.id == job_id:
+                    if job.status not in allowed:
+                        return f"任务{job.get_status_display()}，无法执行此操作"
+                    if status is None:
+                        jobs.remove(job)
+                    else:
+                        job.status = status
+                        if status == Job.PENDING:
+                            job.error = ""
+                            job.started = job.finished = None
+                    return ""
+        return f"任务不存在: {job_id}"
+
+    def cancel(self, job_id: str) -> str:
+        """取消任务（运行中的任务由调度器终止进程并回滚当前步骤）"""
+        with self._locked() as jobs:
+            for job in jobs:
+                if job.id == job_id:
+                    if job.status == Job.PENDING:
+                        job.status = Job.CANCELLED
+                    elif job.status == Job.RUNNING:
+                        job.status = Job.CANCELLING
+                    else:
+                        return f"任务{job.get_status_display()}，无法取消"
+                    return ""
+        return f"任务不存在: {job_id}"
+
+    def retry(self, job_id: str) -> str:
+        """重新排队失败 / 已取消 / 已完成的任务（已完成的步骤会被跳过）"""
+        return self._update(job_id, (Job.FAILED, Job.CANCELLED, Job.DONE), Job.PENDING)
+
+    def remove(self, job_id: str) -> str:
+        """移除未在运行的任务（删除配置与日志）"""
+        error = self._update(job_id, (Job.PENDING, Job.DONE, Job.FAILED, Job.CANCELLED), None)
+        if not error:
+            for path in (self.config_path(job_id), self.log_path(job_id), self._result_path(job_id)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return error
+
+    # ========== 调度 ==========
+
+    def _is_large(self, job: Job) -> bool:
+        return job.image_count >= self.large_job_images
+
+    def _pick(self, jobs: List[Job]) -> Optional[Job]:
+        """下一个可启动的任务（按加入顺序；大任务不占用最后一个位置）"""
+        running = [job for job in jobs if job.is_active]
+        if len(running) >= self.max_jobs:
+            return None
+        large_slots = self.max_jobs - 1 if self.max_jobs > 1 else 1
+        large_running = sum(self._is_large(job) for job in running)
+        for job in jobs:
+            if job.status != Job.PENDING:
+                continue
+            if self._is_large(job) and large_running >= large_slots:
+                continue
+            return job
+        return None
+
+    def _start(self, job: Job):
+        result_path = self._result_path(job.id)
+        if os.path.exists(result_path):
+            os.remove(result_path)
+        # spawn：子进程不继承界面进程的线程与 Qt 状态
+        context = multiprocessing.get_context('spawn')
+        process = context.Process(
+            target=_run_job,
+            args=(self.config_path(job.id), self.log_path(job.id), result_path, self.job_workers),
+            name=f"job-{job.id}",
+            daemon=False
+        )
+        process.start()
+        self._processes[job.id] = process
+        job.status = Job.RUNNING
+        job.pid = process.pid
+        job.owner = self.owner
+        job.host = self.host
+        job.scheduler_pid = os.getpid()
+        job.lease = time.time() + self.LEASE_SECONDS
+        job.started = time.time()
+        job.finished = None
+        job.error = ""
+
+    def _rollback_interrupted(self, pid: Optional[int], log: Callable[[str], None]):
+        """回滚被终止 / 崩溃的任务进程留下的未完成事务"""
+        from core.operation_log import OperationLog
+
+        for item in OperationLog.incomplete():
+            txn_pid = item['id'].rsplit('-', 1)[-1]
+            if pid is not None and txn_pid == str(pid):
+                undone, error = OperationLog.undo(item['id'])
+                log(f"回滚中断的 {item['name']}: {undone} 项文件修改" + (f"（{error}）" if error else ""))
+
+    def _finish(self, job: Job, process: multiprocessing.Process, log: Callable[[str], None]):
+        result = {}
+        try:
+            with open(self._result_path(job.id), 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        job.finished = time.time()
+        job.lease = None
+        job.executed = result.get('executed', [])
+        job.skipped = result.get('skipped', [])
+        if job.status == Job.CANCELLING:
+            job.status = Job.CANCELLED
+            job.error = "已取消"
+        elif not result:
+            job.status = Job.FAILED
+            job.error = f"任务进程异常退出（退出码 {process.exitcode}）"
+        elif result.get('error'):
+            job.status = Job.FAILED
+            job.error = result['error']
+        else:
+            job.status = Job.DONE
+        if not result:
+            self._rollback_interrupted(job.pid, log)
+        log(f"任务 {job.name}: {job.get_status_display()}" + (f" - {job.error}" if job.error else ""))
+
+    def _owner_gone(self, job: Job) -> bool:
+        """不由本调度器管理的运行中任务，其持有者是否确定已不再运行它"""
+        if job.owner == self.owner:
+            return True  # 本调度器启动、进程已被终止（shutdown）
+        lease_expired = job.lease is None or time.time() > job.lease
+        if job.host in (None, self.host):
+            # 任务进程可能比调度器活得久：只在任务进程也已结束时接管
+            if _pid_alive(job.pid):
+                return False
+            return lease_expired or not _pid_alive(job.scheduler_pid)
+        # 其他主机上的进程无法查询，只能依据租约
+        return lease_expired
+
+    def _poll(self, jobs: List[Job], log: Callable[[str], None]):
+        """处理结束的进程与取消请求；续期本调度器的任务，接管持有者已退出的"运行中"任务"""
+        for job in jobs:
+            if not job.is_active:
+                continue
+            process = self._processes.get(job.id)
+            if process is None:
+                if not self._owner_gone(job):
+                    continue  # 由另一个调度器（界面 / 命令行）运行中
+                # 持有者退出或崩溃时仍在运行：重新排队（增量执行，已完成的步骤会跳过）
+                self._rollback_interrupted(job.pid, log)
+                job.status = Job.CANCELLED if job.status == Job.CANCELLING else Job.PENDING
+                job.pid = job.owner = job.host = job.scheduler_pid = job.lease = None
+                log(f"任务 {job.name}: 上次运行中断，{'已取消' if job.status == Job.CANCELLED else '重新排队'}")
+                continue
+            if job.status == Job.CANCELLING and process.is_alive():
+                process.terminate()
+                process.join(5)
+            if not process.is_alive():
+                process.join()
+                del self._processes[job.id]
+                self._finish(job, process, log)
+            else:
+                job.lease = time.time() + self.LEASE_SECONDS
+
+    def run(
+        self,
+        stop_event: Optional[threading.Event] = None,
+        until_empty: bool = True,
+        log: Callable[[str], None] = print
+    ) -> Tuple[int, int]:
+        """
+        运行调度循环
+
+        Args:
+            stop_event: 置位后不再启动新任务，等待运行中的任务结束后返回
+            until_empty: 没有等待中与运行中的任务时返回（否则一直等待新任务，直到 stop_event）
+            log: 进度输出
+
+        Returns:
+            (完成的任务数, 失败的任务数)
+        """
+        done = failed = 0
+        while True:
+            if self._shutdown.is_set():
+                self._terminate_all()
+                return done, failed
+            stopping = stop_event is not None and stop_event.is_set()
+            with self._locked() as jobs:
+                before = {job.id: job.status for job in jobs}
+                self._poll(jobs, log)
+                for job in jobs:
+                    if before.get(job.id) != job.status:
+                        done += job.status == Job.DONE
+                        failed += job.status == Job.FAILED
+                while not stopping:
+                    job = self._pick(jobs)
+                    if job is None:
+                        break
+                    self._start(job)
+                    log(f"任务 {job.name}: 开始（{job.image_count} 张图片，日志 {self.log_path(job.id)}）")
+                idle = not any(job.is_active for job in jobs)
+                pending = any(job.status == Job.PENDING for job in jobs)
+
+            if idle and (stopping or (until_empty and not pending)):
+                return done, failed
+            time.sleep(self.POLL_SECONDS)
+
+    def shutdown(self):
+        """
+        请求调度循环立即终止它启动的全部任务进程并返回（退出程序时使用）
+
+        队列中的状态保持"运行中"，下次运行调度器时回滚中断的步骤并重新排队。
+        """
+        self._shutdown.set()
+
+    def _terminate_all(self):
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes.values():
+            process.join(5)
+        self._processes.clear()
+
+    def start_background(self, log: Callable[[str], None] = print) -> Tuple[threading.Thread, threading.Event]:
+        """在后台线程运行调度循环（界面使用），置位返回的事件后停止"""
+        stop_event = threading.Event()
+        thread = threading.Thread(
+            target=self.run, kwargs={'stop_event': stop_event, 'until_empty': False, 'log': log},
+            name="job-queue", daemon=True
+        )
+        thread.start()
+        return thread, stop_event
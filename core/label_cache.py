@@ -0,0 +1,257 @@
+"""训练标签缓存 - Step 5 附加步骤
+
+为每个子集生成一个紧凑的二进制缓存文件（labels/<subset>.labelcache），
+训练时只需读取一个文件即可获得全部图片路径、尺寸、标注与损坏标记，
+无需在首个 epoch 之前重新扫描整个数据集。
+"""
+
+import hashlib
+import os
+import struct
+import zlib
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from utils.file_utils import atomic_write, is_image_file
+from utils.image_header import read_image_size
+
+
+class LabelCache:
+    """YOLO 训练标签缓存构建 / 加载器"""
+
+    MAGIC = b'YLC1'
+    VERSION = 1
+    SUFFIX = '.labelcache'
+    SUBSETS = ['train', 'val', 'test']
+
+    # 记录标记位
+    FLAG_CORRUPT_IMAGE = 1   # 图片文件头无法解析
+    FLAG_MISSING_LABEL = 2   # 没有对应的 .txt 标注文件
+    FLAG_INVALID_LABEL = 4   # 标注文件中存在无法解析的行
+
+    # 文件头: magic(4) + version(H) + 指纹(16) + 记录数(I)
+    _HEADER = struct.Struct('<4sH16sI')
+    # 记录头: 路径长度(H) + 宽(I) + 高(I) + 标记(B) + 标注框数(I)
+    _RECORD = struct.Struct('<HIIBI')
+
+    @staticmethod
+    def get_cache_path(dataset_root: str, subset: str) -> str:
+        """获取子集缓存文件路径"""
+        return os.path.join(dataset_root, 'labels', subset + LabelCache.SUFFIX)
+
+    @staticmethod
+    def _list_subset_files(dataset_root: str, subset: str) -> Tuple[List[str], str]:
+        """列出子集中的图片（相对 dataset_root 的路径，已排序）与标签目录"""
+        images_dir = os.path.join(dataset_root, 'images', subset)
+        labels_dir = os.path.join(dataset_root, 'labels', subset)
+
+        rel_paths = []
+        if os.path.isdir(images_dir):
+            with os.scandir(images_dir) as it:
+                for entry in it:
+                    if entry.is_file() and is_image_file(entry.name):
+                        rel_paths.append(f"images/{subset}/{entry.name}")
+        rel_paths.sort()
+        return rel_paths, labels_dir
+
+    @staticmethod
+    def compute_fingerprint(dataset_root: str, subset: str) -> bytes:
+        """
+        计算子集指纹（图片与标注文件的相对路径 + 大小 + mtime）
+
+        只做 stat，不读取文件内容。任何文件的增删改都会改变指纹。
+        """
+        digest = hashlib.md5()
+        for directory in ('images', 'labels'):
+            subset_dir = os.path.join(dataset_root, directory, subset)
+            if not os.path.isdir(subset_dir):
+                continue
+            entries = []
+            with os.scandir(subset_dir) as it:
+                for entry in it:
+                    if entry.is_file():
+                        st = entry.stat()
+                        entries.append((entry.name, st.st_size, st.st_mtime_ns))
+            entries.sort()
+            digest.update(directory.encode('utf-8'))
+            for name, size, mtime_ns in entries:
+                digest.update(f"{name}\0{size}\0{mtime_ns}\n".encode('utf-8'))
+        return digest.digest()
+
+    @staticmethod
+    def _read_record(dataset_root: str, labels_dir: str, rel_path: str) -> Tuple[int, int, int, array]:
+        """读取单张图片的尺寸与标注（在线程池中执行）"""
+        flags = 0
+        width = height = 0
+        try:
+            width, height = read_image_size(os.path.join(dataset_root, rel_path))
+        except (OSError, ValueError, struct.error):
+            flags |= LabelCache.FLAG_CORRUPT_IMAGE
+
+        labels = array('f')
+        stem = os.path.splitext(os.path.basename(rel_path))[0]
+        label_path = os.path.join(labels_dir, stem + '.txt')
+        try:
+            with open(label_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.split()
+                    if not parts:
+                        continue
+                    if len(parts) != 5:
+                        flags |= LabelCache.FLAG_INVALID_LABEL
+                        continue
+                    try:
+                        values = [float(v) for v in parts]
+                    except ValueError:
+                        flags |= LabelCache.FLAG_INVALID_LABEL
+                        continue
+                    labels.extend(values)
+        except FileNotFoundError:
+            flags |= LabelCache.FLAG_MISSING_LABEL
+        except (OSError, UnicodeDecodeError):
+            flags |= LabelCache.FLAG_INVALID_LABEL
+
+        return width, height, flags, labels
+
+    @staticmethod
+    def build_subset_cache(
+        dataset_root: str,
+        subset: str,
+        max_workers: int = 8,
+        force: bool = False
+    ) -> Tuple[str, str]:
+        """
+        构建单个子集的标签缓存
+
+        Args:
+            dataset_root: 数据集根目录
+            subset: 子集名称 ('train', 'val', 'test')
+            max_workers: 并行读取线程数
+            force: 为 True 时忽略已有的有效缓存
+
+        Returns:
+            (缓存文件路径, 错误消息)
+
+        文件格式（zlib 压缩的记录区）:
+            header: magic, version, 指纹, 记录数
+            record: 路径长度, 宽, 高, 标记, 标注框数, 路径(utf-8), 标注(float32 * 5 * 框数)
+        """
+        try:
+            cache_path = LabelCache.get_cache_path(dataset_root, subset)
+            fingerprint = LabelCache.compute_fingerprint(dataset_root, subset)
+
+            if not force and LabelCache._read_fingerprint(cache_path) == fingerprint:
+                return cache_path, ""
+
+            rel_paths, labels_dir = LabelCache._list_subset_files(dataset_root, subset)
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(
+                    lambda p: LabelCache._read_record(dataset_root, labels_dir, p),
+                    rel_paths
+                ))
+
+            body = bytearray()
+            for rel_path, (width, height, flags, labels) in zip(rel_paths, results):
+                path_bytes = rel_path.encode('utf-8')
+                body += LabelCache._RECORD.pack(len(path_bytes), width, height, flags, len(labels) // 5)
+                body += path_bytes
+                body += labels.tobytes()
+
+            header = LabelCache._HEADER.pack(
+                LabelCache.MAGIC, LabelCache.VERSION, fingerprint, len(rel_paths)
+            )
+
+            # 原子替换，避免训练进程读到半个缓存
+            with atomic_write(cache_path, 'wb') as f:
+                f.write(header)
+                f.write(zlib.compress(bytes(body), 1))
+
+            return cache_path, ""
+
+        except Exception as e:
+            return "", f"生成 {subset} 标签缓存失败: {str(e)}"
+
+    @staticmethod
+    def build_all(dataset_root: str, max_workers: int = 8) -> Tuple[List[str], str]:
+        """
+        为 train / val / test 三个子集构建标签缓存
+
+        Returns:
+            (缓存文件路径列表, 错误消息)
+        """
+        cache_paths = []
+        for subset in LabelCache.SUBSETS:
+            cache_path, error = LabelCache.build_subset_cache(dataset_root, subset, max_workers)
+            if error:
+                return cache_paths, error
+            cache_paths.append(cache_path)
+        return cache_paths, ""
+
+    @staticmethod
+    def _read_fingerprint(cache_path: str) -> Optional[bytes]:
+        """只读取缓存文件头中的指纹，文件不存在或格式不符时返回 None"""
+        try:
+            with open(cache_path, 'rb') as f:
+                header = f.read(LabelCache._HEADER.size)
+            magic, version, fingerprint, _ = LabelCache._HEADER.unpack(header)
+            if magic != LabelCache.MAGIC or version != LabelCache.VERSION:
+                return None
+            return fingerprint
+        except (OSError, struct.error):
+            return None
+
+    @staticmethod
+    def is_cache_valid(dataset_root: str, subset: str) -> bool:
+        """检查缓存是否与当前文件一致（基于大小 / mtime 指纹）"""
+        cache_path = LabelCache.get_cache_path(dataset_root, subset)
+        cached = LabelCache._read_fingerprint(cache_path)
+        return cached is not None and cached == LabelCache.compute_fingerprint(dataset_root, subset)
+
+    @staticmethod
+    def load_cache(cache_path: str) -> Tuple[List[Dict], str]:
+        """
+        加载标签缓存
+
+        Args:
+            cache_path: 缓存文件路径
+
+        Returns:
+            (记录列表, 错误消息)
+            记录格式: {'path', 'width', 'height', 'flags', 'labels'}
+            其中 labels 为扁平的 array('f')，每 5 个值为一个框 (cls, cx, cy, w, h)
+        """
+        try:
+            with open(cache_path, 'rb') as f:
+                data = f.read()
+
+            header_size = LabelCache._HEADER.size
+            magic, version, _, count = LabelCache._HEADER.unpack(data[:header_size])
+            if magic != LabelCache.MAGIC or version != LabelCache.VERSION:
+                return [], f"不支持的缓存格式: {cache_path}"
+
+            body = zlib.decompress(data[header_size:])
+            records = []
+            offset = 0
+            record_size = LabelCache._RECORD.size
+            for _ in range(count):
+                path_len, width, height, flags, box_count = LabelCache._RECORD.unpack_from(body, offset)
+                offset += record_size
+                path = body[offset:offset + path_len].decode('utf-8')
+                offset += path_len
+                labels = array('f')
+                labels.frombytes(body[offset:offset + box_count * 20])
+                offset += box_count * 20
+                records.append({
+                    'path': path,
+                    'width': width,
+                    'height': height,
+                    'flags': flags,
+                    'labels': labels
+                })
+
+            return records, ""
+
+        except Exception as e:
+            return [], f"加载标签缓存失败: {str(e)}"
@@ -0,0 +1,252 @@
+"""YOLO 标签类别编号改写 - 合并数据集、修改类别列表时批量重映射 class id"""
+
+import codecs
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from core.dataset_builder import DatasetBuilder
+from core.operation_log import OperationLog
+from utils.file_utils import atomic_write
+
+
+class LabelRewriter:
+    """
+    按映射表改写标签文件中的类别编号
+
+    映射表为 int32 数组：remap[旧编号] = 新编号，-1 表示删除该类别的标注框。
+    每个文件的类别列一次性查表（向量化），坐标部分按原文保留，不做浮点往返。
+    """
+
+    # 类别编号无法解析的行（原样保留）
+    UNPARSED = -2
+
+    @staticmethod
+    def _parse_class_id(head: bytes) -> int:
+        """解析类别编号（兼容 "+1"、"0.0" 等写法），无法解析时返回 UNPARSED"""
+        try:
+            return int(head)
+        except ValueError:
+            pass
+        try:
+            value = float(head)
+        except ValueError:
+            return LabelRewriter.UNPARSED
+        return int(value) if value.is_integer() else LabelRewriter.UNPARSED
+
+    @staticmethod
+    def remap_text(text: bytes, remap: np.ndarray) -> Tuple[bytes, int, int, int]:
+        """
+        改写一个标签文件的内容
+
+        超出映射表范围的类别编号视为无效，对应标注框被删除；
+        无法解析为整数的行（不是标注框）原样保留。文件开头的 UTF-8 BOM 被去除。
+
+        Args:
+            text: 标签文件原始内容
+            remap: 类别编号映射表
+
+        Returns:
+            (新内容, 保留的标注框数, 删除的标注框数, 编号改变的标注框数)
+        """
+        if text.startswith(codecs.BOM_UTF8):
+            text = text[len(codecs.BOM_UTF8):]
+        lines = [line for line in text.splitlines() if line.strip()]
+        if not lines:
+            return b"", 0, 0, 0
+
+        heads = []
+        tails = []
+        for line in lines:
+            parts = line.split(None, 1)
+            heads.append(parts[0])
+            tails.append(parts[1] if len(parts) > 1 else b"")
+
+        try:
+            old_ids = np.array(heads).astype(np.int64)
+        except ValueError:
+            # 个别行的类别编号不是纯整数：逐行解析
+            old_ids = np.array([LabelRewriter._parse_class_id(h) for h in heads], dtype=np.int64)
+
+        unparsed = old_ids == LabelRewriter.UNPARSED
+        valid = (old_ids >= 0) & (old_ids < len(remap))
+        new_ids = np.full(len(old_ids), -1, dtype=np.int64)
+        new_ids[valid] = remap[old_ids[valid]]
+
+        boxes = new_ids >= 0
+        keep = np.flatnonzero(boxes | unparsed)
+        out = b"".join(
+            lines[i] + b"\n" if unparsed[i]
+            else b"%d %s\n" % (new_ids[i], tails[i]) if tails[i] else b"%d\n" % new_ids[i]
+            for i in keep
+        )
+        kept = int(boxes.sum())
+        dropped = len(lines) - len(keep)
+        remapped = int((boxes & (new_ids != old_ids)).sum())
+        return out, kept, dropped, remapped
+
+    @staticmethod
+    def remap_file(src: str, dst: str, remap: np.ndarray, atomic: bool = True) -> Tuple[int, int, int]:
+        """
+        读取 src、改写类别编号后写入 dst（src 与 dst 可以相同）
+
+        atomic 为 True 时经临时文件 fsync 后替换（原地改写必须如此）；
+        写入全新的目标目录时可关闭以省去每个文件的 fsync。
+
+        Returns:
+            (保留的标注框数, 删除的标注框数, 编号改变的标注框数)
+        """
+        with open(src, 'rb') as f:
+            text = f.read()
+        out, kept, dropped, remapped = LabelRewriter.remap_text(text, remap)
+        if src == dst and not dropped and not remapped:
+            return kept, dropped, remapped
+        OperationLog.will_create(dst)
+        if atomic:
+            with atomic_write(dst, 'wb') as f:
+                f.write(out)
+        else:
+            with open(dst, 'wb') as f:
+                f.write(out)
+        return kept, dropped, remapped
+
+    @staticmethod
+    def diff_classes(old_classes: Sequence[str], new_classes: Sequence[str]) -> Tuple[np.ndarray, List[str], List[str]]:
+        """
+        比较新旧类别列表（按类别名称匹配）
+
+        Returns:
+            (映射表 remap[旧编号] = 新编号 / -1, 删除的类别, 新增的类别)
+        """
+        lookup = {name: new_id for new_id, name in enumerate(new_classes)}
+        remap = np.array([lookup.get(name, -1) for name in old_classes], dtype=np.int32)
+        deleted = [name for name in old_classes if name not in lookup]
+        old_names = set(old_classes)
+        added = [name for name in new_classes if name not in old_names]
+        return remap, deleted, added
+
+    @staticmethod
+    def is_identity(remap: np.ndarray) -> bool:
+        """映射表是否不改变任何编号（新列表只在末尾追加类别时成立）"""
+        return bool((remap == np.arange(len(remap))).all())
+
+    @staticmethod
+    def _list_label_files(dataset_root: str) -> List[str]:
+        """labels/train|val|test 下的全部标签文件"""
+        paths = []
+        for subset in DatasetBuilder.STRUCTURE['labels']:
+            labels_dir = DatasetBuilder.get_labels_path(dataset_root, subset)
+            if not os.path.isdir(labels_dir):
+                continue
+            with os.scandir(labels_dir) as it:
+                paths.extend(
+                    entry.path for entry in it
+                    if entry.name.endswith('.txt') and entry.is_file()
+                )
+        return paths
+
+    @staticmethod
+    def rewrite_dataset(
+        dataset_root: str,
+        remap: np.ndarray,
+        dry_run: bool = False,
+        max_workers: int = 8
+    ) -> Tuple[Dict[str, int], str]:
+        """
+        按映射表原地改写数据集的全部标签文件
+
+        分两阶段：先把需要改写的文件全部写入同目录的临时文件（失败时删除临时文件，不修改任何标签），
+        全部成功后再逐个替换原文件。替换前整批记入当前事务（OperationLog.will_create_many，
+        原文件移入回收目录，整批只 fsync 日志两次），替换阶段失败时回滚事务即可恢复全部原文件；
+        没有活动事务时自行开始一个事务，失败时回滚、成功时提交（之后可撤销）。
+        临时文件在替换前统一落盘（os.sync，不支持的平台逐个 fsync），不逐个文件 fsync。
+
+        Args:
+            dataset_root: 数据集根目录
+            remap: 类别编号映射表
+            dry_run: 只统计受影响的文件与标注框，不写入
+            max_workers: 并发线程数
+
+        Returns:
+            ({'files', 'changed_files', 'boxes', 'remapped_boxes', 'dropped_boxes'}, 错误消息)
+        """
+        stats = {'files': 0, 'changed_files': 0, 'boxes': 0, 'remapped_boxes': 0, 'dropped_boxes': 0}
+        staged = []  # (标签文件, 临时文件)
+
+        def stage(path):
+            """计算新内容，需要改写时写入临时文件"""
+            with open(path, 'rb') as f:
+                out, kept, dropped, remapped = LabelRewriter.remap_text(f.read(), remap)
+            tmp = None
+            if not dry_run and (dropped or remapped):
+                directory, name = os.path.split(path)
+                tmp = os.path.join(directory, f".{name}.remap.tmp")
+                with open(tmp, 'wb') as f:
+                    f.write(out)
+                    if not hasattr(os, 'sync'):
+                        f.flush()
+                        os.fsync(f.fileno())
+            return path, tmp, kept, dropped, remapped
+
+        def swap(pair):
+            path, tmp = pair
+            os.replace(tmp, path)
+
+        # 第一阶段：只写临时文件
+        try:
+            paths = LabelRewriter._list_label_files(dataset_root)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for path, tmp, kept, dropped, remapped in executor.map(stage, paths):
+                    stats['files'] += 1
+                    stats['boxes'] += kept + dropped
+                    stats['remapped_boxes'] += remapped
+                    stats['dropped_boxes'] += dropped
+                    if dropped or remapped:
+                        stats['changed_files'] += 1
+                    if tmp:
+                        staged.append((path, tmp))
+        except Exception as e:
+            LabelRewriter._remove_temps(dataset_root)
+            return stats, f"改写标签文件失败（未修改任何标签文件）: {str(e)}"
+
+        if dry_run or not staged:
+            return stats, ""
+
+        # 第二阶段：替换原文件（记入事务）
+        own_txn = None
+        try:
+            if OperationLog.active() is None:
+                own_txn = OperationLog.begin("改写标签类别编号", trash_root=dataset_root)
+            if hasattr(os, 'sync'):
+                os.sync()
+            OperationLog.will_create_many([path for path, _ in staged])
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(swap, staged))
+            if own_txn is not None:
+                own_txn.commit()
+            return stats, ""
+
+        except Exception as e:
+            LabelRewriter._remove_temps(dataset_root)
+            error = f"替换标签文件失败: {str(e)}"
+            if own_txn is not None:
+                _, rollback_error = own_txn.rollback()
+                error += f"\n回滚失败: {rollback_error}" if rollback_error else "（已恢复全部原文件）"
+            return stats, error
+
+    @staticmethod
+    def _remove_temps(dataset_root: str):
+        """删除改写留下的临时文件"""
+        for subset in DatasetBuilder.STRUCTURE['labels']:
+            labels_dir = DatasetBuilder.get_labels_path(dataset_root, subset)
+            if not os.path.isdir(labels_dir):
+                continue
+            with os.scandir(labels_dir) as it:
+                for entry in it:
+                    if entry.name.endswith('.remap.tmp'):
+                        try:
+                            os.remove(entry.path)
+                        except OSError:
+                            pass
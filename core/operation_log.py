@@ -0,0 +1,605 @@
+"""文件操作日志 - 记录步骤执行中的每一项文件修改，支持整步撤销与失败后回滚"""
+
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils import file_lock
+from utils.draft_manager import DraftManager
+
+
+class OperationLog:
+    """
+    一次事务（通常是一个步骤的一次执行）的只追加操作日志
+
+    日志为 JSON Lines，保存在 LOG_DIR/<事务编号>.log：
+        {"op": "begin", "id": ..., "name": ..., "trash": ..., "pid": ..., "time": ..., "meta": {...}}
+        {"op": "mkdir", "path": ...}              新建的目录
+        {"op": "create", "path": ...}             新建的文件（复制、硬链接、写入）
+        {"op": "move", "src": ..., "dst": ...}    重命名 / 移动
+        {"op": "delete", "path": ..., "trash": ...}  删除或将被覆盖的文件（移入回收目录，不真正删除）
+        {"op": "commit" | "rollback" | "undo", "time": ...}  结束记录
+
+    每项修改都先记录、后执行，撤销按相反顺序执行且每项都可重复执行（目标已不存在时跳过），
+    因此中途崩溃的事务也能回滚。移动与删除的记录在执行前 fsync（批量操作整批记录后 fsync 一次）；
+    新建文件与目录的记录按批写入（FLUSH_ENTRIES 条或 FLUSH_SECONDS 秒），断电时最后一批可能丢失，
+    未记录的新建文件会残留，但已有的文件不会被移走而无记录。
+
+    执行中的事务持有日志文件的锁（utils.file_lock），其他进程据此区分正在执行与崩溃遗留的事务。
+
+    被删除 / 覆盖的文件移入 <trash_root>/.oplog_trash/<事务编号>/（与数据集在同一文件系统，重命名即可），
+    未指定 trash_root 时放在被删除文件所在目录下。回收目录保留到事务被清理（见 KEEP_TRANSACTIONS）。
+
+    进程内同一时间只有一个活动事务（active()）；各修改函数在没有活动事务时直接执行、不记录。
+    suspended() 只对当前线程暂停记录，其他线程（如正在执行的步骤）照常记录。
+    """
+
+    LOG_DIR = os.path.join(DraftManager.APP_DATA_DIR, 'oplog')
+    SUFFIX = '.log'
+    TRASH_DIR_NAME = '.oplog_trash'
+
+    FLUSH_ENTRIES = 512
+    FLUSH_SECONDS = 0.5
+    # 保留的已结束事务数（更早的删除日志与回收目录，之后无法撤销）
+    KEEP_TRANSACTIONS = 200
+    # 日志数超过 KEEP_TRANSACTIONS + PURGE_SLACK 时才在提交后清理（不必每次提交都清理）
+    PURGE_SLACK = 50
+    # 判断事务是否结束时只读取日志末尾（结束记录总是最后一行）
+    TAIL_BYTES = 4096
+
+    FILE_OPS = ('create', 'move', 'delete')
+    END_OPS = ('commit', 'rollback', 'undo')
+
+    _active: Optional['OperationLog'] = None
+    _suspended = threading.local()
+
+    def __init__(self, txn_id: str, name: str, trash_root: Optional[str]):
+        self.id = txn_id
+        self.name = name
+        self.trash_root = trash_root
+        self.path = OperationLog.log_path(txn_id)
+        self.count = 0  # 已记录的文件修改数
+        self._lock = threading.Lock()
+        self._pending: List[str] = []
+        self._last_flush = time.monotonic()
+        self._trash_seq = itertools.count(1)
+        self._new_dirs = set()  # 本事务新建的目录（其中的文件不可能是覆盖，省去逐个 lstat）
+        self._file = None
+
+    # ========== 事务 ==========
+
+    @staticmethod
+    def log_path(txn_id: str) -> str:
+        return os.path.join(OperationLog.LOG_DIR, txn_id + OperationLog.SUFFIX)
+
+    @staticmethod
+    def active() -> Optional['OperationLog']:
+        """当前活动事务（当前线程暂停记录时为 None）"""
+        if getattr(OperationLog._suspended, 'depth', 0):
+            return None
+        return OperationLog._active
+
+    @staticmethod
+    @contextmanager
+    def suspended():
+        """在当前线程中暂停记录（用于随后即删除的临时文件，如后台的试探复制）"""
+        state = OperationLog._suspended
+        state.depth = getattr(state, 'depth', 0) + 1
+        try:
+            yield
+        finally:
+            state.depth -= 1
+
+    @staticmethod
+    def begin(name: str, trash_root: Optional[str] = None, meta: Optional[dict] = None) -> 'OperationLog':
+        """
+        开始事务并设为活动事务
+
+        Args:
+            name: 事务名称（如 "Step 3（划分数据集）"）
+            trash_root: 回收目录所在目录（通常是数据集根目录）
+            meta: 附加信息（如步骤编号）
+
+        Returns:
+            OperationLog
+
+        Raises:
+            OSError: 无法创建日志文件
+            RuntimeError: 已有活动事务
+        """
+        if OperationLog._active is not None:
+            raise RuntimeError(f"已有进行中的事务: {OperationLog._active.name}")
+
+        # 编号按开始时间排序（微秒 + 进程号）
+        txn_id = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{os.getpid()}"
+        txn = OperationLog(txn_id, name, trash_root)
+        os.makedirs(OperationLog.LOG_DIR, exist_ok=True)
+        txn._file = open(txn.path, 'a', encoding='utf-8')
+        # 持有期间其他进程不会把它当作崩溃遗留的事务回滚
+        if not file_lock.try_lock(txn._file):
+            txn._file.close()
+            raise OSError(f"无法锁定操作日志: {txn.path}")
+        txn._append({
+            'op': 'begin', 'id': txn_id, 'name': name, 'trash': trash_root,
+            'pid': os.getpid(), 'time': time.time(), 'meta': meta or {}
+        })
+        txn.flush()
+        OperationLog._active = txn
+        return txn
+
+    def _append(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._pending.append(line)
+            if (len(self._pending) >= self.FLUSH_ENTRIES
+                    or time.monotonic() - self._last_flush >= self.FLUSH_SECONDS):
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._pending and self._file is not None:
+            self._file.write(''.join(self._pending))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending.clear()
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        """立即写入并 fsync 尚未写入的记录"""
+        with self._lock:
+            self._flush_locked()
+
+    def _release(self):
+        file_lock.unlock(self._file)
+        self._file.close()
+        self._file = None
+
+    def _close(self, end_op: str):
+        self._append({'op': end_op, 'time': time.time()})
+        self.flush()
+        self._release()
+        if OperationLog._active is self:
+            OperationLog._active = None
+
+    def commit(self):
+        """提交事务（修改保留，之后仍可用 undo() 撤销）；没有任何修改的事务直接删除日志"""
+        if self.count == 0:
+            self.discard()
+            return
+        self._close('commit')
+        if len(OperationLog._transaction_ids()) > OperationLog.KEEP_TRANSACTIONS + OperationLog.PURGE_SLACK:
+            OperationLog.purge()
+
+    def discard(self):
+        """结束事务并删除日志（只用于没有修改的事务）"""
+        self._close('commit')
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def rollback(self, max_workers: Optional[int] = None) -> Tuple[int, str]:
+        """
+        回滚未提交的事务（撤销已做的全部修改）
+
+        Returns:
+            (撤销的修改数, 错误消息)
+        """
+        self.flush()
+        self._release()
+        if OperationLog._active is self:
+            OperationLog._active = None
+        return OperationLog.undo(self.id, max_workers)
+
+    # ========== 记录修改（没有活动事务时只执行，不记录） ==========
+
+    def _record(self, record: dict, sync: bool = False):
+        """记录一项修改（sync 为 True 时立即 fsync，用于移动 / 删除这类执行后无法从磁盘推断的修改）"""
+        self._append(record)
+        with self._lock:
+            self.count += 1
+        if sync:
+            self.flush()
+
+    def _trash_path(self, path: str) -> str:
+        root = self.trash_root or os.path.dirname(path)
+        return os.path.join(root, self.TRASH_DIR_NAME, self.id,
+                            f"{next(self._trash_seq)}-{os.path.basename(path)}")
+
+    @staticmethod
+    def makedirs(path: str):
+        """创建目录（含缺失的上级目录），记录新建的每一级"""
+        txn = OperationLog.active()
+        if txn is not None:
+            missing = []
+            current = os.path.abspath(path)
+            while not os.path.isdir(current):
+                missing.append(current)
+                parent = os.path.dirname(current)
+                if parent == current:
+                    break
+                current = parent
+            for directory in reversed(missing):
+                txn._record({'op': 'mkdir', 'path': directory})
+                txn._new_dirs.add(directory)
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def will_create(path: str):
+        """
+        即将在 path 新建 / 覆盖文件（在写入前调用）
+
+        已有同名文件时先移入回收目录，撤销时恢复（同名目录保持不动，由随后的写入报错）；
+        没有活动事务时不做任何事。
+        """
+        txn = OperationLog.active()
+        if txn is None:
+            return
+        path = os.path.abspath(path)
+        if (os.path.dirname(path) not in txn._new_dirs
+                and os.path.lexists(path) and not os.path.isdir(path)):
+            OperationLog.remove(path)
+        txn._record({'op': 'create', 'path': path})
+
+    @staticmethod
+    def _move_to_trash(path: str, trash: str):
+        os.makedirs(os.path.dirname(trash), exist_ok=True)
+        try:
+            os.rename(path, trash)
+        except OSError:
+            # 回收目录在其他文件系统上：复制后删除
+            shutil.move(path, trash)
+
+    @staticmethod
+    def will_create_many(paths: Sequence[str]):
+        """
+        即将新建 / 覆盖一批文件（在写入前调用，之后由调用方写入，可以并发）
+
+        分两批记录、各 fsync 一次：先记录已有同名文件的删除并移入回收目录，再记录全部新建。
+        中途崩溃时回滚不会删除尚未移入回收目录的原文件；没有活动事务时不做任何事。
+        """
+        txn = OperationLog.active()
+        if txn is None:
+            return
+        paths = [os.path.abspath(path) for path in paths]
+        OperationLog.remove_many([
+            path for path in paths
+            if os.path.dirname(path) not in txn._new_dirs and os.path.lexists(path) and not os.path.isdir(path)
+        ])
+        for path in paths:
+            txn._record({'op': 'create', 'path': path})
+        txn.flush()
+
+    @staticmethod
+    def remove(path: str):
+        """删除文件（有活动事务时移入回收目录）"""
+        txn = OperationLog.active()
+        if txn is None:
+            os.remove(path)
+            return
+        path = os.path.abspath(path)
+        trash = txn._trash_path(path)
+        txn._record({'op': 'delete', 'path': path, 'trash': trash}, sync=True)
+        OperationLog._move_to_trash(path, trash)
+
+    @staticmethod
+    def remove_many(paths: Sequence[str]):
+        """删除一批文件（有活动事务时整批记录、fsync 一次后再逐个移入回收目录）"""
+        txn = OperationLog.active()
+        if txn is None:
+            for path in paths:
+                os.remove(path)
+            return
+        moves = []
+        for path in paths:
+            path = os.path.abspath(path)
+            trash = txn._trash_path(path)
+            txn._record({'op': 'delete', 'path': path, 'trash': trash})
+            moves.append((path, trash))
+        txn.flush()
+        for path, trash in moves:
+            OperationLog._move_to_trash(path, trash)
+
+    @staticmethod
+    def rename(src: str, dst: str):
+        """重命名 / 移动文件"""
+        txn = OperationLog.active()
+        if txn is not None:
+            txn._record({'op': 'move', 'src': os.path.abspath(src), 'dst': os.path.abspath(dst)}, sync=True)
+        os.rename(src, dst)
+
+    @staticmethod
+    def will_move(pairs: Sequence[Tuple[str, str]]):
+        """
+        即将移动一批文件（在移动前调用，之后由调用方用 os.rename 执行，可以并发）
+
+        整批记录后 fsync 一次，避免逐个 rename() 时每个文件一次 fsync；没有活动事务时不做任何事。
+        """
+        txn = OperationLog.active()
+        if txn is None:
+            return
+        for src, dst in pairs:
+            txn._record({'op': 'move', 'src': os.path.abspath(src), 'dst': os.path.abspath(dst)})
+        txn.flush()
+
+    # ========== 读取与撤销 ==========
+
+    @staticmethod
+    def read(txn_id: str) -> Tuple[dict, List[dict], Optional[str]]:
+        """
+        读取事务日志（忽略崩溃时写了一半的最后一行）
+
+        Returns:
+            (begin 记录, 修改记录列表, 结束类型或 None)
+
+        Raises:
+            OSError: 日志不存在或无法读取
+        """
+        header: dict = {}
+        entries = []
+        end = None
+        with open(OperationLog.log_path(txn_id), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                op = record.get('op')
+                if op == 'begin':
+                    header = record
+                elif op in OperationLog.END_OPS:
+                    end = op
+                else:
+                    entries.append(record)
+        return header, entries, end
+
+    @staticmethod
+    def _undo_one(record: dict) -> str:
+        """撤销一项修改（可重复执行），返回失败原因"""
+        op = record['op']
+        try:
+            if op == 'create':
+                try:
+                    os.remove(record['path'])
+                except FileNotFoundError:
+                    pass
+            elif op == 'move':
+                if os.path.lexists(record['dst']) and not os.path.lexists(record['src']):
+                    os.rename(record['dst'], record['src'])
+            elif op == 'delete':
+                if os.path.lexists(record['trash']) and not os.path.lexists(record['path']):
+                    os.makedirs(os.path.dirname(record['path']), exist_ok=True)
+                    try:
+                        os.rename(record['trash'], record['path'])
+                    except OSError:
+                        shutil.move(record['trash'], record['path'])
+            return ""
+        except OSError as e:
+            return str(e)
+
+    @staticmethod
+    def _batches(records: Iterable[dict]) -> Iterable[List[dict]]:
+        """
+        把（已反序的）修改记录分成可并发执行的批次
+
+        同一批内没有两项涉及同一路径，批次之间保持顺序；
+        一次步骤的修改通常互不相关（如复制 10 万个不同的文件），整体只有一批。
+        """
+        batch: List[dict] = []
+        touched = set()
+        for record in records:
+            paths = ([record['src'], record['dst']] if record['op'] == 'move' else [record['path']])
+            if touched.intersection(paths):
+                yield batch
+                batch = []
+                touched.clear()
+            batch.append(record)
+            touched.update(paths)
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _acquire(txn_id: str):
+        """打开日志并取得排他锁（其他进程正在执行时返回 None）"""
+        f = open(OperationLog.log_path(txn_id), 'a', encoding='utf-8')
+        if not file_lock.try_lock(f):
+            f.close()
+            return None
+        return f
+
+    @staticmethod
+    def _release_file(f):
+        file_lock.unlock(f)
+        f.close()
+
+    @staticmethod
+    def undo(txn_id: str, max_workers: Optional[int] = None) -> Tuple[int, str]:
+        """
+        撤销事务的全部修改（按相反顺序，互不相关的修改并发执行）
+
+        删除新建的文件、把移动的文件移回、从回收目录恢复删除 / 覆盖的文件，最后删除新建的空目录。
+        某些修改撤销失败时继续处理其余修改，回收目录保留，可修复后再次撤销。
+
+        Args:
+            txn_id: 事务编号
+            max_workers: 并发数（None 表示按实测吞吐自动调节）
+
+        Returns:
+            (撤销的修改数, 错误消息)
+        """
+        # 延迟导入：TransferEngine 的复制也通过本模块记录
+        from core.transfer_engine import TransferEngine
+        from utils.worker_tuner import map_unordered
+
+        active = OperationLog._active
+        if active is not None and active.id == txn_id:
+            return 0, "事务仍在进行中，请使用回滚"
+
+        try:
+            header, entries, end = OperationLog.read(txn_id)
+        except OSError as e:
+            return 0, f"读取操作日志失败（可能已被清理）: {str(e)}"
+        if end in ('rollback', 'undo'):
+            return 0, "该操作已撤销"
+
+        log_file = OperationLog._acquire(txn_id)
+        if log_file is None:
+            return 0, "该事务正在其他进程中执行"
+
+        try:
+            records = [record for record in entries if record.get('op') in OperationLog.FILE_OPS]
+            failures = []
+            tuner = None
+            if max_workers is None and records:
+                tuner = TransferEngine.create_tuner('undo', header.get('trash') or OperationLog.LOG_DIR,
+                                                    unit='文件')
+            try:
+                for batch in OperationLog._batches(reversed(records)):
+                    for record, reason in map_unordered(OperationLog._undo_one, batch,
+                                                        max_workers=max_workers or 8, tuner=tuner):
+                        if reason:
+                            failures.append((record, reason))
+            finally:
+                if tuner is not None:
+                    tuner.finish()
+
+            # 回收目录：全部恢复后删除（失败时保留被删除的文件）
+            trash_dirs = {os.path.dirname(record['trash']) for record in records if record['op'] == 'delete'}
+            if not failures:
+                for trash_dir in trash_dirs:
+                    shutil.rmtree(trash_dir, ignore_errors=True)
+                    try:
+                        os.rmdir(os.path.dirname(trash_dir))
+                    except OSError:
+                        pass
+
+            # 新建的目录：从最深一级开始删除，非空（有事务外的文件）时保留
+            for record in reversed(entries):
+                if record.get('op') == 'mkdir':
+                    try:
+                        os.rmdir(record['path'])
+                    except OSError:
+                        pass
+
+            end_op = 'undo' if end == 'commit' else 'rollback'
+            if failures:
+                lines = [f"{record.get('path') or record.get('dst')}: {reason}" for record, reason in failures[:10]]
+                if len(failures) > 10:
+                    lines.append(f"…… 共 {len(failures)} 项失败")
+                return len(records) - len(failures), "部分修改撤销失败:\n" + '\n'.join(lines)
+
+            log_file.write(json.dumps({'op': end_op, 'time': time.time()}) + '\n')
+            log_file.flush()
+            os.fsync(log_file.fileno())
+            return len(records), ""
+
+        except Exception as e:
+            return 0, f"撤销失败: {str(e)}"
+
+        finally:
+            OperationLog._release_file(log_file)
+
+    # ========== 管理 ==========
+
+    @staticmethod
+    def _transaction_ids() -> List[str]:
+        """全部事务编号（按开始时间从新到旧；编号以开始时间开头，只列目录、不读取日志）"""
+        try:
+            names = os.listdir(OperationLog.LOG_DIR)
+        except OSError:
+            return []
+        return sorted((name[:-len(OperationLog.SUFFIX)] for name in names if name.endswith(OperationLog.SUFFIX)),
+                      reverse=True)
+
+    @staticmethod
+    def _end_of(txn_id: str) -> Optional[str]:
+        """只读取日志的最后一行判断事务的结束类型（未结束、日志损坏或无法读取时为 None）"""
+        try:
+            with open(OperationLog.log_path(txn_id), 'rb') as f:
+                size = f.seek(0, os.SEEK_END)
+                f.seek(max(0, size - OperationLog.TAIL_BYTES))
+                last = f.read().rstrip(b'\n').rsplit(b'\n', 1)[-1]
+            op = json.loads(last.decode('utf-8')).get('op')
+        except (OSError, ValueError, AttributeError):
+            return None
+        return op if op in OperationLog.END_OPS else None
+
+    @staticmethod
+    def _summary(txn_id: str) -> Optional[Dict]:
+        try:
+            header, entries, end = OperationLog.read(txn_id)
+        except OSError:
+            return None
+        return {
+            'id': txn_id,
+            'name': header.get('name', txn_id),
+            'time': header.get('time', 0.0),
+            'changes': sum(record.get('op') in OperationLog.FILE_OPS for record in entries),
+            'end': end,
+            'meta': header.get('meta', {}),
+            'trash': header.get('trash'),
+        }
+
+    @staticmethod
+    def list_transactions() -> List[Dict]:
+        """
+        全部事务（按开始时间从新到旧；读取每个日志，只用于查看历史）
+
+        Returns:
+            [{'id', 'name', 'time', 'changes', 'end', 'meta', 'trash'}, ...]；end 为 None 表示未结束
+        """
+        summaries = (OperationLog._summary(txn_id) for txn_id in OperationLog._transaction_ids())
+        return [item for item in summaries if item is not None]
+
+    @staticmethod
+    def incomplete() -> List[Dict]:
+        """
+        崩溃遗留的未结束事务（不包括本进程与其他进程正在执行的事务）
+
+        已结束的事务只读取日志末尾判断，只有未结束的事务读取整个日志。
+        """
+        result = []
+        active = OperationLog._active
+        for txn_id in OperationLog._transaction_ids():
+            if (active is not None and txn_id == active.id) or OperationLog._end_of(txn_id) is not None:
+                continue
+            log_file = OperationLog._acquire(txn_id)
+            if log_file is None:
+                continue
+            OperationLog._release_file(log_file)
+            item = OperationLog._summary(txn_id)
+            if item is not None and item['end'] is None:
+                result.append(item)
+        return result
+
+    @staticmethod
+    def purge(keep: Optional[int] = None):
+        """
+        删除最早的已结束事务（日志与回收目录），保留最近 keep 个事务
+
+        按编号（开始时间）排序，只读取超出保留数的日志；未结束的事务不删除。
+        """
+        keep = OperationLog.KEEP_TRANSACTIONS if keep is None else keep
+        for txn_id in OperationLog._transaction_ids()[keep:]:
+            if OperationLog._end_of(txn_id) is None:
+                continue
+            try:
+                _, entries, _ = OperationLog.read(txn_id)
+            except OSError:
+                continue
+            trash_dirs = {os.path.dirname(record['trash']) for record in entries if record.get('op') == 'delete'}
+            for trash_dir in trash_dirs:
+                shutil.rmtree(trash_dir, ignore_errors=True)
+                try:
+                    os.rmdir(os.path.dirname(trash_dir))
+                except OSError:
+                    pass
+            try:
+                os.remove(OperationLog.log_path(txn_id))
+            except OSError:
+                pass
@@ -0,0 +1,514 @@
+"""流程执行器 - 按步骤依赖图增量执行 Step 1-6（输入指纹未变化的步骤跳过）"""
+
+import hashlib
+import json
+import os
+from typing import Callable, List, Optional, Tuple
+
+from core.command_generator import CommandGenerator
+from core.data_splitter import DataSplitter
+from core.dataset_builder import DatasetBuilder
+from core.dataset_merger import DatasetMerger
+from core.image_auditor import ImageAuditor
+from core.image_processor import ImageProcessor
+from core.index_reservation import IndexReservation
+from core.label_rewriter import LabelRewriter
+from core.operation_log import OperationLog
+from core.yaml_generator import YAMLGenerator
+from models.dataset_config import DatasetConfig
+from models.step_state import StepStatus
+
+
+class PipelineRunner:
+    """
+    增量执行整个流程（"全部运行"）
+
+    每个步骤的输入指纹 = 本步骤参数 + 上游步骤（DatasetConfig.STEP_DEPENDENCIES）的输出指纹；
+    步骤完成时记录输入与输出指纹。全部运行时按编号顺序检查：
+    - 已完成、输入指纹未变、输出仍在磁盘上：跳过
+    - 否则重新执行；重新执行后输出指纹不变时（如重新扫描得到相同的图片），下游步骤的输入指纹也不变，继续跳过
+
+    例如只修改 YAML 文件名时只重新执行 Step 5，不会复制任何图片；
+    修改划分比例时 Step 3 只在子集间移动需要变动的图片（DataSplitter.place_split），Step 4 / Step 6 不受影响。
+
+    执行使用 DatasetConfig 中保存的参数，不弹出对话框；从未执行过（缺少参数）的步骤需要先在界面中手动执行一次。
+    每个步骤的文件修改记录在一个事务中（OperationLog）：执行失败时自动回滚，完成后可用 undo_step() 撤销。
+    """
+
+    STEP_NAMES = {
+        1: "原始图片导入",
+        2: "数据集目录结构创建",
+        3: "数据划分",
+        4: "类别管理",
+        5: "YAML 文件生成",
+        6: "LabelImg 命令生成",
+    }
+
+    # ========== 指纹 ==========
+
+    @staticmethod
+    def _digest(*parts) -> str:
+        data = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.blake2b(data.encode('utf-8'), digest_size=16).hexdigest()
+
+    @staticmethod
+    def _upstream(config: DatasetConfig, step_number: int) -> List[Optional[str]]:
+        return [config.get_step(dep).output_fingerprint for dep in DatasetConfig.STEP_DEPENDENCIES[step_number]]
+
+    @staticmethod
+    def input_fingerprint(config: DatasetConfig, step_number: int) -> str:
+        """步骤的输入指纹（只包含影响输出的参数；校验复制、读取顺序等不改变结果的选项不计入）"""
+        if step_number == 1:
+            params = [config.raw_source_folders, config.scan_recursive, config.check_integrity]
+        elif step_number == 2:
+            location = ([config.dataset_parent_dir, config.dataset_name] if config.dataset_mode == 'create'
+                        else [config.dataset_root])
+            params = [config.dataset_mode, location, config.index_width]
+        elif step_number == 3:
+            params = [config.train_ratio, config.val_ratio, config.test_ratio, config.random_seed]
+        elif step_number == 4:
+            params = [config.classes]
+        elif step_number == 5:
+            params = [config.yaml_filename]
+            if config.yaml_list_mode:
+                params += [config.yaml_list_mode, config.yaml_list_ratios, config.random_seed]
+            if config.kfold_folds:
+                params += ['kfold', config.kfold_folds, config.random_seed]
+        else:
+            params = []
+        return PipelineRunner._digest(step_number, params, PipelineRunner._upstream(config, step_number))
+
+    @staticmethod
+    def output_fingerprint(config: DatasetConfig, step_number: int) -> str:
+        """步骤当前输出的指纹"""
+        table = config.image_table
+        if step_number == 1:
+            digest = hashlib.blake2b(digest_size=16)
+            for path, size in zip(table.paths(), table.sizes):
+                digest.update(f"{path}\0{size}\n".encode('utf-8', 'surrogateescape'))
+            return digest.hexdigest()
+        if step_number == 2:
+            return PipelineRunner._digest(config.dataset_root, config.temp_folder, config.batch_index_range,
+                                          PipelineRunner._upstream(config, 2))
+        if step_number == 3:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(table.indices.tobytes())
+            digest.update(table.subset_codes.tobytes())
+            return digest.hexdigest()
+        if step_number == 4:
+            return PipelineRunner._digest(config.classes)
+        if step_number == 5:
+            return PipelineRunner._digest(config.yaml_path)
+        return PipelineRunner._digest(config.labelimg_commands)
+
+    @staticmethod
+    def outputs_exist(config: DatasetConfig, step_number: int) -> bool:
+        """步骤的输出是否仍在磁盘上（被手动删除时需要重新执行）"""
+        if step_number == 2:
+            return bool(config.temp_folder) and os.path.isdir(config.temp_folder)
+        if step_number == 4:
+            return bool(config.dataset_root) and os.path.isfile(
+                DatasetBuilder.get_classes_file_path(config.dataset_root))
+        if step_number == 5:
+            return bool(config.yaml_path) and os.path.isfile(config.yaml_path)
+        return True
+
+    @staticmethod
+    def record(config: DatasetConfig, step_number: int) -> bool:
+        """
+        步骤完成后记录输入与输出指纹
+
+        Returns:
+            输出指纹是否变化（未变化时下游步骤不需要重新生成）
+        """
+        step = config.get_step(step_number)
+        previous = step.output_fingerprint
+        step.input_fingerprint = PipelineRunner.input_fingerprint(config, step_number)
+        step.output_fingerprint = PipelineRunner.output_fingerprint(config, step_number)
+        return previous is None or previous != step.output_fingerprint
+
+    @staticmethod
+    def is_up_to_date(config: DatasetConfig, step_number: int) -> bool:
+        """已完成、输入指纹未变且输出仍存在"""
+        step = config.get_step(step_number)
+        return (step.status == StepStatus.COMPLETED
+                and step.input_fingerprint is not None
+                and step.input_fingerprint == PipelineRunner.input_fingerprint(config, step_number)
+                and PipelineRunner.outputs_exist(config, step_number))
+
+    @staticmethod
+    def is_configured(config: DatasetConfig, step_number: int) -> bool:
+        """DatasetConfig 中是否有执行该步骤所需的参数"""
+        if step_number == 1:
+            return bool(config.raw_source_folders)
+        if step_number == 2:
+            if config.dataset_mode == 'create':
+                return bool(config.dataset_parent_dir and config.dataset_name)
+            return config.dataset_mode == 'extend' and bool(config.dataset_root)
+        if step_number == 4:
+            return bool(config.classes)
+        return True  # Step 3 / 5 / 6 的参数都有默认值
+
+    @staticmethod
+    def adopt_legacy_state(config: DatasetConfig):
+        """
+        旧版本保存的会话没有指纹：已完成的步骤按当前状态补记指纹（视为最新），
+        并由记录表的编号推算本批图片的编号区间
+        """
+        for step_number in sorted(DatasetConfig.STEP_DEPENDENCIES):
+            step = config.get_step(step_number)
+            if step.status == StepStatus.COMPLETED and step.input_fingerprint is None:
+                PipelineRunner.record(config, step_number)
+        if config.batch_index_range is None and config.temp_folder:
+            index_range = config.image_table.index_range()
+            if index_range:
+                config.batch_index_range = list(index_range)
+
+    # ========== 执行 ==========
+
+    @staticmethod
+    def run_all(
+        config: DatasetConfig,
+        log: Callable[[str], None] = print,
+        on_step: Optional[Callable[[int], None]] = None
+    ) -> Tuple[List[int], List[int], str]:
+        """
+        按依赖顺序执行全部步骤，跳过输入未变化的步骤
+
+        Args:
+            config: 工作流状态（执行结果直接写入）
+            log: 进度输出
+            on_step: 每个步骤执行完成后调用（参数为步骤编号），如保存草稿以便中断后继续
+
+        Returns:
+            (执行的步骤, 跳过的步骤, 错误消息)；出错时停在出错的步骤
+        """
+        PipelineRunner.adopt_legacy_state(config)
+        executed = []
+        skipped = []
+        for step_number in sorted(DatasetConfig.STEP_DEPENDENCIES):
+            name = PipelineRunner.STEP_NAMES[step_number]
+            # Step 1 非递归时比较文件夹指纹即可；递归扫描依靠扫描缓存重新检查，结果不变时下游照常跳过
+            if PipelineRunner.is_up_to_date(config, step_number) and not (
+                    step_number == 1 and PipelineRunner._sources_changed(config)):
+                skipped.append(step_number)
+                log(f"Step {step_number}（{name}）: 未变化，跳过")
+                continue
+
+            if not PipelineRunner.is_configured(config, step_number):
+                return executed, skipped, f"Step {step_number}（{name}）尚未配置，请先在界面中执行一次"
+
+            log(f"Step {step_number}（{name}）: 执行")
+            snapshot = config.to_dict(compact=True)
+            try:
+                txn = PipelineRunner.begin_transaction(config, step_number)
+            except (OSError, RuntimeError) as e:
+                return executed, skipped, f"Step {step_number}（{name}）无法开始记录文件操作: {str(e)}"
+            try:
+                summary, error = getattr(PipelineRunner, f"_run_step{step_number}")(config)
+            except Exception as e:
+                summary, error = "", str(e)
+
+            if error:
+                # 回滚本步骤的文件修改并恢复执行前的状态（上次的结果仍可在界面中使用）
+                undone, rollback_error = txn.rollback()
+                config.__dict__.update(DatasetConfig.from_dict(snapshot).__dict__)
+                log(f"Step {step_number}（{name}）: 已回滚 {undone} 项文件修改")
+                if rollback_error:
+                    error += f"\n回滚未完成: {rollback_error}"
+                step = config.get_step(step_number)
+                if step.status == StepStatus.COMPLETED:
+                    step.mark_need_regenerate()
+                step.error_message = error
+                return executed, skipped, f"Step {step_number}（{name}）失败: {error}"
+
+            txn.commit()
+            changed = PipelineRunner.record(config, step_number)
+            config.get_step(step_number).complete(summary)
+            if txn.count:
+                config.get_step(step_number).transaction_ids.append(txn.id)
+            if changed:
+                config.mark_dependent_steps_need_regenerate(step_number)
+            executed.append(step_number)
+            if on_step is not None:
+                on_step(step_number)
+
+        return executed, skipped, ""
+
+    @staticmethod
+    def begin_transaction(config: DatasetConfig, step_number: int) -> OperationLog:
+        """
+        开始记录步骤的文件修改（回收目录放在数据集根目录下）
+
+        Raises:
+            OSError: 无法创建日志
+            RuntimeError: 已有进行中的事务
+        """
+        name = f"Step {step_number}（{PipelineRunner.STEP_NAMES[step_number]}）"
+        return OperationLog.begin(name, trash_root=config.dataset_root,
+                                  meta={'step': step_number, 'dataset_root': config.dataset_root})
+
+    @staticmethod
+    def undo_step(config: DatasetConfig, step_number: int) -> Tuple[List[int], int, str]:
+        """
+        撤销步骤各次执行的全部文件修改（恢复到从未执行该步骤时的状态）
+
+        依赖它的步骤建立在它的结果之上，其事务一并撤销（全部事务按执行时间从新到旧）。
+        撤销的步骤重置为未完成，没有文件修改的下游步骤标记为需要重新生成；
+        数据集目录因此被删除时（撤销新建数据集的 Step 2），清除数据集路径。
+
+        Returns:
+            (撤销的步骤, 撤销的文件修改数, 错误消息)
+        """
+        if not config.get_step(step_number).transaction_ids:
+            return [], 0, "该步骤没有可撤销的文件修改记录"
+
+        steps = [step_number] + DatasetConfig.dependent_steps(step_number)
+        transactions = sorted(
+            ((txn_id, n) for n in steps for txn_id in config.get_step(n).transaction_ids),
+            reverse=True
+        )
+        undone_steps = set()
+        total = 0
+        for txn_id, n in transactions:
+            count, error = OperationLog.undo(txn_id)
+            total += count
+            if error and error != "该操作已撤销":
+                # 已撤销的事务不再保留，便于修复后继续撤销其余事务
+                for m in steps:
+                    step = config.get_step(m)
+                    step.transaction_ids = sorted(t for t, k in transactions if k == m and t <= txn_id)
+                return sorted(undone_steps), total, f"撤销 Step {n} 失败: {error}"
+            undone_steps.add(n)
+
+        for n in steps:
+            step = config.get_step(n)
+            if n == step_number or n in undone_steps:
+                step.reset()
+            elif step.status == StepStatus.COMPLETED:
+                step.mark_need_regenerate()
+
+        if 2 in undone_steps:
+            PipelineRunner._release_reservation(config)
+            config.batch_index_range = None
+        if config.dataset_root and not os.path.isdir(config.dataset_root):
+            for n in range(2, 7):
+                config.get_step(n).reset()
+            config.dataset_root = None
+            config.temp_folder = None
+        return sorted(undone_steps), total, ""
+
+    @staticmethod
+    def _sources_changed(config: DatasetConfig) -> bool:
+        """来源文件夹可能已变化（递归扫描时总是视为可能变化）"""
+        if config.scan_recursive:
+            return True
+        fingerprint = ImageProcessor.get_sources_fingerprint(config.raw_source_folders)
+        return fingerprint is None or fingerprint != config.raw_folder_fingerprint
+
+    @staticmethod
+    def step1_summary(config: DatasetConfig) -> str:
+        """Step 1 卡片摘要"""
+        folders = config.raw_source_folders
+        if len(folders) == 1:
+            location = f"路径: {folders[0]}"
+        else:
+            location = f"来源: {len(folders)} 个文件夹（{folders[0]} 等）"
+        if config.scan_recursive:
+            location += "（含子文件夹）"
+        return f"{location}\n找到 {config.image_count} 张图片"
+
+    @staticmethod
+    def _run_step1(config: DatasetConfig) -> Tuple[str, str]:
+        """重新扫描来源文件夹；图片列表不变时保留原记录表（编号与划分仍然有效）"""
+        table, error = ImageProcessor.scan_sources(config.raw_source_folders, config.scan_recursive)
+        if error:
+            return "", error
+        if config.check_integrity:
+            problems, error = ImageAuditor.check_files(table.paths())
+            if error:
+                return "", error
+            if problems:
+                corrupt = {row for row, _, _ in problems}
+                table = table.select_rows(row for row in range(len(table)) if row not in corrupt)
+                if not len(table):
+                    return "", "所选文件夹中的图片均未通过完整性检查"
+                print(f"Step 1: 排除 {len(problems)} 张损坏的图片")
+
+        config.raw_folder_fingerprint = ImageProcessor.get_sources_fingerprint(table.sources)
+        if list(table.paths()) != list(config.image_table.paths()) or list(table.sizes) != list(config.image_table.sizes):
+            config.image_table = table
+            config.image_count = len(table)
+            config.raw_source_folders = list(table.sources)
+            config.raw_images_folder = config.raw_source_folders[0]
+        return PipelineRunner.step1_summary(config), ""
+
+    @staticmethod
+    def _release_reservation(config: DatasetConfig):
+        if config.index_reservation:
+            reservation = IndexReservation.load(config.dataset_root or "", config.index_reservation)
+            if reservation:
+                error = reservation.release()
+                if error:
+                    print(error)
+            config.index_reservation = None
+
+    @staticmethod
+    def _run_step2(config: DatasetConfig) -> Tuple[str, str]:
+        """创建（或验证）数据集目录，撤回上一批图片后重新编号复制到 temp/"""
+        table = config.image_table
+        if not len(table):
+            return "", "没有需要导入的图片"
+
+        if config.dataset_mode == 'create':
+            dataset_root = os.path.join(config.dataset_parent_dir, config.dataset_name)
+            if not os.path.exists(dataset_root):
+                _, error = DatasetBuilder.create_structure(config.dataset_parent_dir, config.dataset_name)
+                if error:
+                    return "", error
+        else:
+            dataset_root = config.dataset_root
+        valid, error = DatasetBuilder.validate_existing_structure(dataset_root)
+        if not valid:
+            return "", error
+
+        temp_folder = os.path.join(dataset_root, "temp")
+        OperationLog.makedirs(temp_folder)
+
+        # 撤回上一批（编号区间内的 temp/ 与子集图片）
+        if config.batch_index_range and config.dataset_root == dataset_root:
+            first, last = config.batch_index_range
+            removed, error = DatasetBuilder.withdraw_batch(dataset_root, temp_folder, first, last)
+            if error:
+                return "", error
+            print(f"Step 2: 已撤回上一批图片 {removed} 张（编号 {first}-{last}）")
+        config.batch_index_range = None
+        PipelineRunner._release_reservation(config)
+
+        reservation = None
+        max_index, widths, error = DatasetBuilder.scan_index_stats(dataset_root)
+        if error:
+            return "", error
+        if config.dataset_mode == 'create':
+            start_index = 1
+            width = ImageProcessor.resolve_index_width(len(table), config.index_width)
+        else:
+            reservation, error = IndexReservation.reserve(dataset_root, len(table), min_start=max_index + 1)
+            if error:
+                return "", error
+            start_index = reservation.start
+            width = ImageProcessor.resolve_index_width(
+                start_index + len(table) - 1,
+                config.index_width or DatasetBuilder.dominant_index_width(widths)
+            )
+
+        _, error = ImageProcessor.rename_and_copy(
+            config.processed_images, temp_folder, start_index=start_index, width=width,
+            verify=config.verify_copies, physical_order=config.physical_order
+        )
+        if error:
+            if reservation:
+                reservation.release()
+            return "", error
+
+        end_index = start_index + len(table) - 1
+        table.assign_indices(start_index)
+        table.clear_subsets()
+        config.dataset_root = dataset_root
+        config.temp_folder = temp_folder
+        config.batch_index_range = [start_index, end_index]
+        config.index_reservation = reservation.path if reservation else None
+
+        if config.dataset_mode == 'create':
+            return f"数据集: {dataset_root}\n已复制 {config.image_count} 张图片到 temp/", ""
+        return (f"扩展数据集: {dataset_root}\n"
+                f"新增 {config.image_count} 张图片 (编号 {start_index:0{width}d}-{end_index:0{width}d})"), ""
+
+    @staticmethod
+    def _run_step3(config: DatasetConfig) -> Tuple[str, str]:
+        """按保存的比例与种子划分，增量放入各子集"""
+        temp_table, error = ImageProcessor.scan_image_table(config.temp_folder)
+        if error:
+            return "", error
+        index_range = config.image_table.index_range()
+        if index_range:
+            temp_table = temp_table.select_index_range(*index_range)
+        if not len(temp_table):
+            return "", "temp/ 文件夹中没有图片"
+
+        counts, error = DataSplitter.split_table(
+            temp_table, config.train_ratio, config.val_ratio, config.test_ratio, seed=config.random_seed
+        )
+        if error:
+            return "", error
+
+        (copied, moved, kept), error = DataSplitter.place_split(
+            temp_table, config.dataset_root, config.verify_copies, config.physical_order
+        )
+        if error:
+            return "", error
+        print(f"Step 3: 复制 {copied} 张，在子集间移动 {moved} 张，{kept} 张保持不变")
+
+        config.train_count, config.val_count, config.test_count = counts
+        config.image_table.copy_subsets_by_index(temp_table)
+        PipelineRunner._release_reservation(config)
+        return (f"比例: {config.train_ratio:.0f}% / {config.val_ratio:.0f}% / {config.test_ratio:.0f}%\n"
+                f"Train: {counts[0]} 张 | Val: {counts[1]} 张 | Test: {counts[2]} 张"), ""
+
+    @staticmethod
+    def _run_step4(config: DatasetConfig) -> Tuple[str, str]:
+        """写入 classes.txt（已有文件的类别顺序不同时需要改写标签，交给界面确认）"""
+        classes_file = DatasetBuilder.get_classes_file_path(config.dataset_root)
+        existing = DatasetMerger.read_classes(config.dataset_root)
+        if existing:
+            remap, _, _ = LabelRewriter.diff_classes(existing, config.classes)
+            if not LabelRewriter.is_identity(remap):
+                return "", "数据集中 classes.txt 的类别顺序与配置不同，改写标签需要确认，请在界面中执行 Step 4"
+
+        success, error = YAMLGenerator.write_classes_file(classes_file, config.classes)
+        if not success:
+            return "", error
+        preview = ", ".join(config.classes[:3])
+        if len(config.classes) > 3:
+            preview += f", ... ({len(config.classes) - 3} 个更多)"
+        return f"{len(config.classes)} 个类别: {preview}", ""
+
+    @staticmethod
+    def _run_step5(config: DatasetConfig) -> Tuple[str, str]:
+        """删除旧 YAML 后生成新的 YAML（设置了折数时重新生成 K 折交叉验证配置）"""
+        deleted, error = YAMLGenerator.remove_yaml_files(config.dataset_root)
+        if error:
+            return "", error
+        for name in deleted:
+            print(f"已删除旧 YAML 文件: {name}")
+        yaml_path, error = YAMLGenerator.generate_training_yaml(
+            config.dataset_root, config.classes, config.yaml_filename,
+            config.yaml_list_mode, config.yaml_list_ratios, config.random_seed
+        )
+        if error:
+            return "", error
+        config.yaml_path = yaml_path
+
+        # 旧的折 YAML 已随其他 YAML 一起删除：按保存的折数重新生成，不再需要时清理折列表
+        if config.kfold_folds:
+            fold_paths, error = YAMLGenerator.generate_kfold(
+                config.dataset_root, config.classes, config.kfold_folds, config.random_seed
+            )
+            if error:
+                return "", error
+            return f"YAML 文件: {yaml_path}\n{len(fold_paths)} 折交叉验证", ""
+        error = YAMLGenerator.remove_kfold_files(config.dataset_root)
+        if error:
+            return "", error
+        return f"YAML 文件: {yaml_path}", ""
+
+    @staticmethod
+    def _run_step6(config: DatasetConfig) -> Tuple[str, str]:
+        """生成 LabelImg 命令"""
+        classes_file = DatasetBuilder.get_classes_file_path(config.dataset_root)
+        commands, error = CommandGenerator.generate_commands(config.dataset_root, classes_file)
+        if error:
+            return "", error
+        config.labelimg_commands = commands
+        return "命令已生成", ""
+
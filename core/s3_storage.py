@@ -0,0 +1,478 @@
+"""S3 兼容对象存储后端（AWS S3、MinIO 等）- 需要可选依赖 boto3"""
+
+import errno
+import itertools
+import json
+import os
+import posixpath
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from core.operation_log import OperationLog
+from core.storage import StorageBackend
+from core.transfer_engine import TransferEngine, TransferReport
+from utils.draft_manager import DraftManager
+from utils.file_utils import ensure_directory, is_image_file, natural_sort_key
+from utils.scan_cache import DirectoryListing
+from utils.worker_tuner import WorkerTuner, map_unordered
+
+
+class S3Storage(StorageBackend):
+    """
+    s3://<bucket>/<key 前缀> 路径的存储后端
+
+    - 列目录：list_objects_v2 分页列出（每次请求最多 PAGE_SIZE 个键）；递归扫描按前缀一次列出
+      全部键，不逐层请求子目录
+    - 传输：文件之间并发（并发数按实测吞吐自动调节，按 端点/桶 记录），
+      大于 multipart_mb 的文件再分段并发上传 / 下载
+    - 桶内复制与移动：服务端复制（大文件分段服务端复制），数据不经过本机
+    - 批量删除：delete_objects，每次请求最多 DELETE_BATCH 个键
+
+    对象存储中的修改不记入操作日志（无法撤销）；下载到本地的文件照常记录。
+    目录只是键的前缀；makedirs 写入空的 "prefix/" 占位对象（与控制台"创建文件夹"相同），
+    空目录也能被 isdir 识别（如刚创建的数据集结构）。
+
+    连接参数读取配置文件 CONFIG_PATH（可选），凭证使用 boto3 的标准来源
+    （环境变量 AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY、~/.aws/credentials 等，不保存在本程序中）。
+
+    配置文件格式:
+        {"s3": {"endpoint_url": "http://127.0.0.1:9000", "region_name": "us-east-1",
+                "profile": "", "multipart_mb": 8, "part_concurrency": 4}}
+    """
+
+    SCHEME = 's3'
+    CONFIG_PATH = os.path.join(DraftManager.APP_DATA_DIR, 'storage.json')
+
+    PAGE_SIZE = 1000
+    DELETE_BATCH = 1000
+    MULTIPART_MB = 8
+    PART_CONCURRENCY = 4
+    # 网络传输以等待延迟为主，每个 CPU 允许的并发数比本地复制高
+    PER_CPU = 16.0
+
+    def __init__(self, config_path: Optional[str] = None):
+        """
+        Raises:
+            RuntimeError: 未安装 boto3
+        """
+        try:
+            import boto3
+            from boto3.exceptions import Boto3Error
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+            from botocore.exceptions import BotoCoreError, ClientError
+        except ImportError:
+            raise RuntimeError("访问 s3:// 路径需要安装 boto3（pip install boto3）")
+
+        settings = self._load_settings(config_path or S3Storage.CONFIG_PATH)
+        self.endpoint_url = settings.get('endpoint_url') or None
+        part_concurrency = int(settings.get('part_concurrency') or S3Storage.PART_CONCURRENCY)
+        chunk_size = int(settings.get('multipart_mb') or S3Storage.MULTIPART_MB) * 1024 * 1024
+
+        session = boto3.session.Session(profile_name=settings.get('profile') or None)
+        self.client = session.client(
+            's3',
+            endpoint_url=self.endpoint_url,
+            region_name=settings.get('region_name') or None,
+            config=Config(
+                # 每个文件一个连接，分段传输时每段一个连接
+                max_pool_connections=WorkerTuner.MAX_WORKERS * part_concurrency,
+                retries={'max_attempts': 5, 'mode': 'adaptive'}
+            )
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=chunk_size,
+            multipart_chunksize=chunk_size,
+            max_concurrency=part_concurrency,
+            use_threads=True
+        )
+        self._client_error = ClientError
+        self._errors = (OSError, BotoCoreError, ClientError, Boto3Error)
+
+    @staticmethod
+    def _load_settings(path: str) -> Dict:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                settings = json.load(f).get('s3')
+            return settings if isinstance(settings, dict) else {}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    # ========== 路径 ==========
+
+    @staticmethod
+    def _parse(path: str) -> Tuple[str, str]:
+        """s3://bucket/a/b -> ('bucket', 'a/b')（Windows 上 os.path.join 产生的反斜杠视为分隔符）"""
+        rest = path.split('://', 1)[1].replace('\\', '/')
+        bucket, _, key = rest.partition('/')
+        if not bucket:
+            raise ValueError(f"存储路径缺少桶名: {path}")
+        return bucket, '/'.join(part for part in key.split('/') if part)
+
+    @staticmethod
+    def _url(bucket: str, key: str) -> str:
+        return f"s3://{bucket}/{key}" if key else f"s3://{bucket}"
+
+    @staticmethod
+    def _prefix(key: str) -> str:
+        """目录键前缀（根目录为空字符串）"""
+        return key + '/' if key else ''
+
+    def normalize(self, path: str) -> str:
+        return self._url(*self._parse(path))
+
+    def join(self, path: str, *parts: str) -> str:
+        return posixpath.join(path.replace('\\', '/'), *parts)
+
+    def split(self, path: str) -> Tuple[str, str]:
+        bucket, key = self._parse(path)
+        return self._url(bucket, posixpath.dirname(key)), posixpath.basename(key)
+
+    def relpath(self, path: str, start: str) -> str:
+        _, key = self._parse(path)
+        _, start_key = self._parse(start)
+        return key[len(self._prefix(start_key)):]
+
+    # ========== 查询 ==========
+
+    def _not_found(self, error) -> bool:
+        code = str(error.response.get('Error', {}).get('Code', ''))
+        return code in ('404', 'NoSuchKey', 'NoSuchBucket', 'NotFound')
+
+    def _os_error(self, error, path: str) -> OSError:
+        if isinstance(error, self._client_error) and self._not_found(error):
+            return FileNotFoundError(errno.ENOENT, "不存在", path)
+        return OSError(f"{path}: {str(error)}")
+
+    def _head(self, path: str) -> Optional[Dict]:
+        """对象元数据（不存在时返回 None）"""
+        bucket, key = self._parse(path)
+        if not key:
+            return None
+        try:
+            return self.client.head_object(Bucket=bucket, Key=key)
+        except self._client_error as e:
+            if self._not_found(e):
+                return None
+            raise self._os_error(e, path)
+
+    def _size(self, path: str) -> int:
+        if StorageBackend.is_local(path):
+            return os.path.getsize(path)
+        head = self._head(path)
+        if head is None:
+            raise FileNotFoundError(errno.ENOENT, "不存在", path)
+        return head['ContentLength']
+
+    def exists(self, path: str) -> bool:
+        return self._head(path) is not None or self.isdir(path)
+
+    def isdir(self, path: str) -> bool:
+        """桶存在且为根目录，或前缀下至少有一个键"""
+        bucket, key = self._parse(path)
+        try:
+            if not key:
+                self.client.head_bucket(Bucket=bucket)
+                return True
+            response = self.client.list_objects_v2(Bucket=bucket, Prefix=self._prefix(key), MaxKeys=1)
+            return response.get('KeyCount', 0) > 0
+        except self._client_error as e:
+            if self._not_found(e):
+                return False
+            raise self._os_error(e, path)
+
+    def _pages(self, bucket: str, prefix: str, delimiter: str = ''):
+        paginator = self.client.get_paginator('list_objects_v2')
+        kwargs = {'Bucket': bucket, 'Prefix': prefix, 'PaginationConfig': {'PageSize': S3Storage.PAGE_SIZE}}
+        if delimiter:
+            kwargs['Delimiter'] = delimiter
+        return paginator.paginate(**kwargs)
+
+    def list_directory(self, path: str) -> DirectoryListing:
+        """
+        列出前缀下一层的键（子目录为 CommonPrefixes）
+
+        DirectoryListing.mtime_ns 为最新对象的修改时间（用于指纹），inode 为 0。
+        """
+        bucket, key = self._parse(path)
+        prefix = self._prefix(key)
+        items = []
+        newest = 0
+        try:
+            for page in self._pages(bucket, prefix, delimiter='/'):
+                for common in page.get('CommonPrefixes', []):
+                    name = common['Prefix'][len(prefix):].rstrip('/')
+                    if name:
+                        items.append((natural_sort_key(name), name,
+                                      DirectoryListing.DIR | DirectoryListing.DIR_OR_LINK, 0))
+                for obj in page.get('Contents', []):
+                    name = obj['Key'][len(prefix):]
+                    if not name:
+                        continue  # 目录占位对象（"prefix/"）
+                    newest = max(newest, int(obj['LastModified'].timestamp() * 1e9))
+                    size = obj['Size'] if is_image_file(name) else 0
+                    items.append((natural_sort_key(name), name, DirectoryListing.FILE, size))
+        except self._errors as e:
+            raise self._os_error(e, path)
+
+        if not items and not self.isdir(path):
+            raise FileNotFoundError(errno.ENOENT, "目录不存在", path)
+
+        items.sort()
+        return DirectoryListing(
+            self._url(bucket, key), newest, 0,
+            [item[1] for item in items],
+            bytes(item[2] for item in items),
+            array('q', (item[3] for item in items))
+        )
+
+    def list_tree(self, path: str) -> List[Tuple[str, str, int]]:
+        """不带分隔符分页列出前缀下的全部键（请求数只与键的总数有关，与目录层数无关）"""
+        bucket, key = self._parse(path)
+        prefix = self._prefix(key)
+        entries = []
+        try:
+            for page in self._pages(bucket, prefix):
+                for obj in page.get('Contents', []):
+                    directory, _, name = obj['Key'].rpartition('/')
+                    if is_image_file(name):
+                        entries.append((self._url(bucket, directory), name, obj['Size']))
+        except self._errors as e:
+            raise self._os_error(e, path)
+
+        if not entries and not self.isdir(path):
+            raise FileNotFoundError(errno.ENOENT, "目录不存在", path)
+        return entries
+
+    def fingerprint(self, path: str) -> Optional[List[int]]:
+        """[最新对象修改时间, 目录项数, 图片总大小]（需要列出一次目录）"""
+        try:
+            listing = self.list_directory(path)
+            return [listing.mtime_ns, len(listing), sum(listing.sizes)]
+        except OSError:
+            return None
+
+    # ========== 修改 ==========
+
+    def makedirs(self, path: str):
+        bucket, key = self._parse(path)
+        if not key:
+            return
+        try:
+            self.client.put_object(Bucket=bucket, Key=self._prefix(key), Body=b'')
+        except self._errors as e:
+            raise self._os_error(e, path)
+
+    def read_text(self, path: str) -> str:
+        bucket, key = self._parse(path)
+        try:
+            response = self.client.get_object(Bucket=bucket, Key=key)
+            return response['Body'].read().decode('utf-8')
+        except self._errors as e:
+            raise self._os_error(e, path)
+
+    def write_text(self, path: str, text: str):
+        bucket, key = self._parse(path)
+        try:
+            self.client.put_object(Bucket=bucket, Key=key, Body=text.encode('utf-8'),
+                                   ContentType='text/plain; charset=utf-8')
+        except self._errors as e:
+            raise self._os_error(e, path)
+
+    def remove(self, path: str):
+        bucket, key = self._parse(path)
+        try:
+            self.client.delete_object(Bucket=bucket, Key=key)
+        except self._errors as e:
+            raise self._os_error(e, path)
+
+    def remove_many(self, paths: Sequence[str]) -> int:
+        """按桶分组，每次请求删除最多 DELETE_BATCH 个键"""
+        keys: Dict[str, List[str]] = {}
+        for path in paths:
+            bucket, key = self._parse(path)
+            keys.setdefault(bucket, []).append(key)
+        for bucket, bucket_keys in keys.items():
+            for i in range(0, len(bucket_keys), S3Storage.DELETE_BATCH):
+                batch = bucket_keys[i:i + S3Storage.DELETE_BATCH]
+                try:
+                    response = self.client.delete_objects(
+                        Bucket=bucket,
+                        Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                    )
+                except self._errors as e:
+                    raise self._os_error(e, self._url(bucket, batch[0]))
+                failed = response.get('Errors', [])
+                if failed:
+                    raise OSError(f"删除失败（{len(failed)} 个）: "
+                                  f"{self._url(bucket, failed[0]['Key'])}: {failed[0].get('Message', '')}")
+        return len(paths)
+
+    def _server_copy(self, src: str, dst: str):
+        """服务端复制（大于分段阈值时分段复制）"""
+        src_bucket, src_key = self._parse(src)
+        dst_bucket, dst_key = self._parse(dst)
+        self.client.copy({'Bucket': src_bucket, 'Key': src_key}, dst_bucket, dst_key,
+                         Config=self.transfer_config)
+
+    def rename(self, src: str, dst: str):
+        """服务端复制后删除源对象（复制请求成功返回、目标对象已写入后才删除）"""
+        try:
+            self._server_copy(src, dst)
+        except self._errors as e:
+            raise self._os_error(e, src)
+        self.remove(src)
+
+    def _tuner(self, kind: str, path: str, unit: str = 'bytes') -> WorkerTuner:
+        """按 端点/桶 记录的并发调节器（与本地复制共用历史记录文件）"""
+        bucket, _ = self._parse(path)
+        key = f"{kind}:{self.endpoint_url or 's3'}/{bucket}"
+        return WorkerTuner(key, start=TransferEngine.DEFAULT_WORKERS * 2, per_cpu=S3Storage.PER_CPU,
+                           config_path=TransferEngine.TUNING_PATH, unit=unit)
+
+    def rename_many(self, pairs: Sequence[Tuple[str, str]], max_workers: Optional[int] = None) -> int:
+        """
+        并发移动（每个文件对：服务端复制，成功后立即删除该源对象）
+
+        任何时刻每个文件都至少在源或目标之一存在（中途失败时已移动的在目标、其余在源，
+        个别文件可能两处都有），调用方据此恢复（如 DatasetBuilder.restore_renumber）。
+
+        Raises:
+            OSError: 复制或删除失败（其余文件对不再继续）
+        """
+        if not pairs:
+            return 0
+        tuner = self._tuner('s3-rename', pairs[0][0], unit='文件') if max_workers is None else None
+        try:
+            for _ in map_unordered(lambda pair: self.rename(pair[0], pair[1]), pairs,
+                                   max_workers=max_workers or TransferEngine.DEFAULT_WORKERS * 2, tuner=tuner):
+                pass
+        finally:
+            if tuner is not None:
+                tuner.finish()
+        return len(pairs)
+
+    # ========== 传输 ==========
+
+    def _transfer_one(self, src: str, dst: str, verify: bool, retries: int,
+                      limiter) -> Tuple[int, int, int, str]:
+        """
+        传输单个文件：下载（对象 -> 本地）、上传（本地 -> 对象）或服务端复制（对象 -> 对象）
+
+        下载先写入同目录的临时文件再改名，中断时不留下不完整的目标文件。
+        verify 时比较源与目标的大小（内容由 SDK 传输时的校验和保证）。
+
+        Returns:
+            (字节数, 重试次数, 状态, 失败原因)；状态: 0 已传输, 1 已校验
+        """
+        src_local = StorageBackend.is_local(src)
+        dst_local = StorageBackend.is_local(dst)
+
+        if limiter.active:
+            try:
+                limiter.acquire(self._size(src) if limiter.bytes_per_sec else 0)
+            except self._errors as e:
+                return 0, 0, 0, str(e)
+
+        reason = ""
+        for attempt in range(retries + 1):
+            try:
+                if src_local:
+                    bucket, key = self._parse(dst)
+                    self.client.upload_file(src, bucket, key, Config=self.transfer_config)
+                elif dst_local:
+                    bucket, key = self._parse(src)
+                    self.client.download_file(bucket, key, dst, Config=self.transfer_config)
+                else:
+                    self._server_copy(src, dst)
+
+                size = self._size(dst)
+                if not verify:
+                    return size, attempt, 0, ""
+                src_size = self._size(src)
+                if src_size != size:
+                    reason = f"大小不一致（源 {src_size} / 目标 {size} 字节）"
+                    continue
+                return size, attempt, 1, ""
+
+            except self._errors as e:
+                reason = str(e)
+
+        return 0, retries, 0, reason
+
+    def transfer(
+        self,
+        pairs: Iterable[Tuple[str, str]],
+        verify: bool = False,
+        max_workers: Optional[int] = None,
+        retries: int = 2,
+        physical_order: bool = False
+    ) -> Tuple[TransferReport, str]:
+        """
+        并发传输（physical_order 对对象存储无意义，忽略）
+
+        下载到本地时与 TransferEngine 一样先创建目标目录并记入操作日志。
+        """
+        report = TransferReport()
+        start = time.perf_counter()
+        limiter = TransferEngine.shared_limiter()
+
+        tuner = None
+        try:
+            pairs = iter(pairs)
+            first = next(pairs, None)
+            if first is None:
+                report.seconds = time.perf_counter() - start
+                return report, ""
+            pairs = itertools.chain([first], pairs)
+
+            if limiter.active:
+                print(f"传输限速: {limiter.describe()}")
+            if max_workers is None and not (limiter.bytes_per_sec or limiter.files_per_sec):
+                if StorageBackend.is_local(first[0]):
+                    tuner = self._tuner('s3-upload', first[1])
+                elif StorageBackend.is_local(first[1]):
+                    tuner = self._tuner('s3-download', first[0])
+                else:
+                    tuner = self._tuner('s3-copy', first[1])
+
+            created_dirs = set()
+            logged = OperationLog.active() is not None
+
+            def prepared():
+                for src, dst in pairs:
+                    if StorageBackend.is_local(dst):
+                        directory = os.path.dirname(dst)
+                        if logged and directory and directory not in created_dirs:
+                            OperationLog.makedirs(directory)
+                        ensure_directory(directory, created_dirs)
+                        OperationLog.will_create(dst)
+                    yield src, dst
+
+            results = map_unordered(
+                lambda pair: self._transfer_one(pair[0], pair[1], verify, retries, limiter),
+                prepared(),
+                max_workers=max_workers or TransferEngine.DEFAULT_WORKERS * 2,
+                tuner=tuner,
+                measure=lambda result: result[0]
+            )
+            for (src, dst), (size, retried, state, reason) in results:
+                report.retried += retried
+                if reason:
+                    report.failures.append((src, dst, reason))
+                else:
+                    report.copied += 1
+                    report.bytes += size
+                    report.verified += state == 1
+
+            report.seconds = time.perf_counter() - start
+            return report, ""
+
+        except Exception as e:
+            report.seconds = time.perf_counter() - start
+            return report, f"对象存储传输失败: {str(e)}"
+
+        finally:
+            if tuner is not None:
+                tuner.finish()
@@ -0,0 +1,356 @@
+"""存储后端 - 按路径选择本地文件系统或对象存储（s3:// 等），统一列目录、传输与修改操作"""
+
+import abc
+import itertools
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from core.operation_log import OperationLog
+from core.transfer_engine import TransferEngine, TransferReport
+from utils.file_utils import atomic_write
+from utils.scan_cache import DirectoryListing, ScanCache
+from utils.worker_tuner import map_unordered
+
+
+class StorageBackend(abc.ABC):
+    """
+    存储后端接口（抽象基类，具体后端实现全部抽象方法）
+
+    ImageProcessor / DataSplitter / DatasetBuilder / YAMLGenerator 的文件操作都经由
+    StorageBackend.for_path(路径) 取得的后端完成：普通路径使用本地文件系统（LocalStorage），
+    "<scheme>://" 开头的路径使用注册的对象存储后端（如 s3://bucket/prefix 使用 S3Storage）。
+
+    目录在对象存储中是键的前缀，不需要创建；目录列表与本地一样按文件名自然排序（DirectoryListing）。
+    批量复制用 StorageBackend.copy_files，按每个文件对的源 / 目标后端分派。
+    """
+
+    SCHEME = ''
+
+    _URL_PATTERN = re.compile(r'^([A-Za-z][A-Za-z0-9+.-]+)://')
+    _lock = threading.Lock()
+    _factories: Dict[str, Callable[[], 'StorageBackend']] = {}
+    _instances: Dict[str, 'StorageBackend'] = {}
+
+    # ========== 后端选择 ==========
+
+    @staticmethod
+    def scheme_of(path: str) -> str:
+        """路径的 URL 前缀（本地路径为空字符串）"""
+        match = StorageBackend._URL_PATTERN.match(path or '')
+        return match.group(1).lower() if match else ''
+
+    @staticmethod
+    def is_local(path: str) -> bool:
+        return not StorageBackend.scheme_of(path)
+
+    @staticmethod
+    def register(scheme: str, factory: Callable[[], 'StorageBackend']):
+        """注册对象存储后端（factory 在首次访问该前缀的路径时调用一次）"""
+        with StorageBackend._lock:
+            StorageBackend._factories[scheme.lower()] = factory
+            StorageBackend._instances.pop(scheme.lower(), None)
+
+    @staticmethod
+    def for_path(path: str) -> 'StorageBackend':
+        """
+        路径所在的存储后端
+
+        Raises:
+            ValueError: 不支持的 URL 前缀
+            RuntimeError: 后端依赖未安装或配置无效（由后端抛出）
+        """
+        scheme = StorageBackend.scheme_of(path)
+        if not scheme:
+            return LOCAL_STORAGE
+        with StorageBackend._lock:
+            backend = StorageBackend._instances.get(scheme)
+            if backend is None:
+                factory = StorageBackend._factories.get(scheme)
+                if factory is None:
+                    raise ValueError(f"不支持的存储路径: {path}")
+                backend = factory()
+                StorageBackend._instances[scheme] = backend
+            return backend
+
+    # ========== 路径 ==========
+
+    @abc.abstractmethod
+    def normalize(self, path: str) -> str:
+        """用于判断是否为同一位置的比较键"""
+
+    @abc.abstractmethod
+    def join(self, path: str, *parts: str) -> str:
+        """拼接路径"""
+
+    @abc.abstractmethod
+    def split(self, path: str) -> Tuple[str, str]:
+        """(所在目录, 名称)"""
+
+    @abc.abstractmethod
+    def relpath(self, path: str, start: str) -> str:
+        """path 相对于目录 start 的路径（path 位于 start 之下）"""
+
+    # ========== 查询 ==========
+
+    @abc.abstractmethod
+    def exists(self, path: str) -> bool:
+        """文件或目录是否存在"""
+
+    @abc.abstractmethod
+    def isdir(self, path: str) -> bool:
+        """是否为目录（对象存储中为存在该前缀的键）"""
+
+    @abc.abstractmethod
+    def fingerprint(self, path: str) -> Optional[List[int]]:
+        """
+        目录指纹：目录中增删、覆盖文件后指纹改变，指纹不变时可以复用上次的扫描结果
+
+        Returns:
+            整数列表，目录不存在时返回 None
+        """
+
+    @abc.abstractmethod
+    def list_directory(self, path: str) -> DirectoryListing:
+        """
+        列出目录（按文件名自然排序）
+
+        Raises:
+            OSError: 目录不存在或无法读取
+        """
+
+    def list_tree(self, path: str) -> List[Tuple[str, str, int]]:
+        """
+        递归列出目录下的全部图片（不跟随符号链接目录）
+
+        默认逐层列出子目录；能一次按前缀列出全部键的后端应覆盖此方法。
+
+        Returns:
+            [(所在目录, 文件名, 大小), ...]（顺序不保证）
+        """
+        entries = []
+        pending = [path]
+        while pending:
+            directory = pending.pop()
+            listing = self.list_directory(directory)
+            entries.extend((directory, name, size) for name, size in listing.images())
+            pending.extend(self.join(directory, name) for name in listing.subdirs())
+        return entries
+
+    # ========== 修改 ==========
+
+    @abc.abstractmethod
+    def makedirs(self, path: str):
+        """创建目录（已存在时忽略）"""
+
+    @abc.abstractmethod
+    def read_text(self, path: str) -> str:
+        """读取文本文件（UTF-8）"""
+
+    @abc.abstractmethod
+    def write_text(self, path: str, text: str):
+        """写入文本文件（UTF-8，覆盖已有文件）"""
+
+    @abc.abstractmethod
+    def remove(self, path: str):
+        """删除文件"""
+
+    def remove_many(self, paths: Sequence[str]) -> int:
+        """
+        删除一批文件
+
+        Returns:
+            删除的数量
+        """
+        for path in paths:
+            self.remove(path)
+        return len(paths)
+
+    @abc.abstractmethod
+    def rename(self, src: str, dst: str):
+        """移动文件（同一后端内）"""
+
+    @abc.abstractmethod
+    def rename_many(self, pairs: Sequence[Tuple[str, str]], max_workers: Optional[int] = None) -> int:
+        """
+        并发移动一批文件（同一后端内，各文件对之间互不依赖）
+
+        Returns:
+            移动的数量
+        """
+
+    @abc.abstractmethod
+    def transfer(
+        self,
+        pairs: Iterable[Tuple[str, str]],
+        verify: bool = False,
+        max_workers: Optional[int] = None,
+        retries: int = 2,
+        physical_order: bool = False
+    ) -> Tuple[TransferReport, str]:
+        """
+        并发复制 (源, 目标) 文件对（源或目标至少有一方属于本后端，另一方为本地或本后端）
+
+        Returns:
+            (传输报告, 错误消息)
+        """
+
+    # ========== 跨后端复制 ==========
+
+    @staticmethod
+    def _route(pair: Tuple[str, str]) -> str:
+        """文件对由哪个后端传输：有对象存储一方时为其前缀，两端都是本地时为空字符串"""
+        src_scheme = StorageBackend.scheme_of(pair[0])
+        dst_scheme = StorageBackend.scheme_of(pair[1])
+        if src_scheme and dst_scheme and src_scheme != dst_scheme:
+            raise ValueError(f"不支持在不同的对象存储之间直接复制: {pair[0]} -> {pair[1]}")
+        return src_scheme or dst_scheme
+
+    @staticmethod
+    def copy_files(
+        pairs: Iterable[Tuple[str, str]],
+        verify: bool = False,
+        max_workers: Optional[int] = None,
+        retries: int = 2,
+        physical_order: bool = False
+    ) -> Tuple[TransferReport, str]:
+        """
+        并发复制 (源, 目标) 文件对，按源 / 目标所在的后端分派
+
+        连续的、属于同一后端的文件对作为一批交给该后端（多个来源依次排列时每个来源一批），
+        pairs 可以是惰性序列；各批的结果合并为一份报告。
+
+        Args:
+            pairs: (源路径, 目标路径) 序列
+            verify: 复制后校验
+            max_workers: 线程数（None 表示自动调节）
+            retries: 单个文件失败后的重试次数
+            physical_order: 按源文件的磁盘物理位置顺序读取（只对本地源文件有效）
+
+        Returns:
+            (传输报告, 错误消息)
+        """
+        report = TransferReport()
+        start = time.perf_counter()
+        try:
+            for scheme, group in itertools.groupby(pairs, key=StorageBackend._route):
+                backend = StorageBackend.for_path(f"{scheme}://") if scheme else LOCAL_STORAGE
+                part, error = backend.transfer(group, verify, max_workers, retries, physical_order)
+                report.copied += part.copied
+                report.verified += part.verified
+                report.retried += part.retried
+                report.linked += part.linked
+                report.bytes += part.bytes
+                report.failures.extend(part.failures)
+                if error:
+                    report.seconds = time.perf_counter() - start
+                    return report, error
+
+            report.seconds = time.perf_counter() - start
+            return report, ""
+
+        except Exception as e:
+            report.seconds = time.perf_counter() - start
+            return report, f"批量复制失败: {str(e)}"
+
+
+class LocalStorage(StorageBackend):
+    """
+    本地文件系统
+
+    列目录使用扫描缓存（ScanCache），修改经由操作日志（OperationLog，可撤销），
+    复制使用 TransferEngine（内核态复制、并发自动调节、限速）。
+    """
+
+    def normalize(self, path: str) -> str:
+        return os.path.normcase(os.path.abspath(path))
+
+    def join(self, path: str, *parts: str) -> str:
+        return os.path.join(path, *parts)
+
+    def split(self, path: str) -> Tuple[str, str]:
+        return os.path.split(path)
+
+    def relpath(self, path: str, start: str) -> str:
+        return os.path.relpath(path, start)
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(path)
+
+    def isdir(self, path: str) -> bool:
+        return os.path.isdir(path)
+
+    def fingerprint(self, path: str) -> Optional[List[int]]:
+        """一次 stat：[mtime_ns, inode, size]"""
+        try:
+            st = os.stat(path)
+            return [st.st_mtime_ns, st.st_ino, st.st_size]
+        except OSError:
+            return None
+
+    def list_directory(self, path: str) -> DirectoryListing:
+        return ScanCache.list_directory(path)
+
+    def makedirs(self, path: str):
+        OperationLog.makedirs(path)
+
+    def read_text(self, path: str) -> str:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def write_text(self, path: str, text: str):
+        OperationLog.will_create(path)
+        with atomic_write(path) as f:
+            f.write(text)
+
+    def remove(self, path: str):
+        OperationLog.remove(path)
+
+    def remove_many(self, paths: Sequence[str]) -> int:
+        OperationLog.remove_many(paths)
+        return len(paths)
+
+    def rename(self, src: str, dst: str):
+        OperationLog.rename(src, dst)
+
+    def rename_many(self, pairs: Sequence[Tuple[str, str]], max_workers: Optional[int] = None) -> int:
+        """并发重命名（元数据操作，并发数按实测吞吐自动调节；整批先记录到操作日志）"""
+        if not pairs:
+            return 0
+        OperationLog.will_move(pairs)
+        tuner = None
+        if max_workers is None:
+            tuner = TransferEngine.create_tuner('rename', os.path.dirname(pairs[0][0]), unit='文件')
+        try:
+            for _ in map_unordered(lambda pair: os.rename(pair[0], pair[1]), pairs,
+                                   max_workers=max_workers or TransferEngine.DEFAULT_WORKERS, tuner=tuner):
+                pass
+        finally:
+            if tuner is not None:
+                tuner.finish()
+        return len(pairs)
+
+    def transfer(
+        self,
+        pairs: Iterable[Tuple[str, str]],
+        verify: bool = False,
+        max_workers: Optional[int] = None,
+        retries: int = 2,
+        physical_order: bool = False
+    ) -> Tuple[TransferReport, str]:
+        return TransferEngine.copy_files(pairs, verify=verify, max_workers=max_workers, retries=retries,
+                                         physical_order=physical_order)
+
+
+LOCAL_STORAGE = LocalStorage()
+
+
+def _create_s3_storage() -> StorageBackend:
+    # 延迟导入：boto3 是可选依赖，只有访问 s3:// 路径时才需要
+    from core.s3_storage import S3Storage
+    return S3Storage()
+
+
+StorageBackend.register('s3', _create_s3_storage)
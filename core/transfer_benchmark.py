@@ -0,0 +1,250 @@
+"""文件复制基准测试 - 按文件大小分档比较复制方式的吞吐，以及文件名顺序与物理位置顺序的读取对比"""
+
+import os
+import random
+import shutil
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from core.transfer_engine import TransferEngine
+from utils.file_utils import ensure_directory, fast_copy_file, safe_copy_file
+
+
+class TransferBenchmark:
+    """
+    在指定目录（应位于待测磁盘上）生成测试文件，逐档比较复制方式
+
+    每档文件总量相同，文件数 = 总量 / 单个文件大小。
+    各方式交替运行多轮、取最快一轮，减少运行顺序与系统噪声的影响；
+    每轮复制前对源文件执行 POSIX_FADV_DONTNEED，尽量让各方式从相同的缓存状态开始
+    （无法保证完全冷缓存，结果以相对比较为主）。
+    """
+
+    WORK_DIR_NAME = '.transfer_benchmark'
+
+    # (档位名称, 单个文件大小)
+    SIZE_BUCKETS = (
+        ('16 KB', 16 * 1024),
+        ('256 KB', 256 * 1024),
+        ('4 MB', 4 * 1024 * 1024),
+        ('64 MB', 64 * 1024 * 1024),
+    )
+
+    @staticmethod
+    def _methods() -> List[Tuple[str, Callable[[List[Tuple[str, str]]], None]]]:
+        """(名称, 复制一批文件对的函数)"""
+
+        def baseline(pairs):
+            for src, dst in pairs:
+                safe_copy_file(src, dst)
+
+        def fast(pairs, preserve_metadata=True):
+            created = set()
+            for src, dst in pairs:
+                ensure_directory(os.path.dirname(dst), created)
+                fast_copy_file(src, dst, preserve_metadata)
+
+        return [
+            ('safe_copy_file', baseline),
+            ('fast_copy_file', fast),
+            ('fast_copy_file（不保留元数据）', lambda pairs: fast(pairs, preserve_metadata=False)),
+        ]
+
+    @staticmethod
+    def _drop_cache(paths: Sequence[str]):
+        if not hasattr(os, 'posix_fadvise'):
+            return
+        for path in paths:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+
+    @staticmethod
+    def _create_files(directory: str, count: int, size: int) -> List[str]:
+        """生成 count 个 size 字节的文件（随机块重复填充，避免被压缩 / 去重的文件系统优化掉）"""
+        pattern = os.urandom(min(size, 1024 * 1024))
+        paths = []
+        for i in range(count):
+            path = os.path.join(directory, f"{i:06d}.bin")
+            with open(path, 'wb') as f:
+                remaining = size
+                while remaining > 0:
+                    block = pattern[:remaining]
+                    f.write(block)
+                    remaining -= len(block)
+            paths.append(path)
+        return paths
+
+    @staticmethod
+    def run(
+        work_dir: str,
+        bytes_per_bucket: int = 256 * 1024 * 1024,
+        buckets: Sequence[Tuple[str, int]] = SIZE_BUCKETS,
+        subdirs: int = 8,
+        rounds: int = 3
+    ) -> Tuple[List[Dict], str]:
+        """
+        运行基准测试（结束后删除测试文件）
+
+        Args:
+            work_dir: 测试目录（在其下创建临时子目录）
+            bytes_per_bucket: 每档的文件总量
+            buckets: 文件大小分档
+            subdirs: 目标文件分布的子目录数（体现逐文件创建目录的开销）
+            rounds: 每种方式运行的轮数（取最快一轮）
+
+        Returns:
+            ([{'bucket', 'method', 'files', 'seconds', 'files_per_sec', 'mb_per_sec'}, ...], 错误消息)
+        """
+        root = os.path.join(work_dir, TransferBenchmark.WORK_DIR_NAME)
+        results = []
+        try:
+            if os.path.exists(root):
+                shutil.rmtree(root)
+
+            for bucket_name, size in buckets:
+                count = max(1, bytes_per_bucket // size)
+                src_dir = os.path.join(root, 'src')
+                os.makedirs(src_dir)
+                sources = TransferBenchmark._create_files(src_dir, count, size)
+
+                methods = TransferBenchmark._methods()
+                best = [float('inf')] * len(methods)
+                dst_dir = os.path.join(root, 'dst')
+                pairs = [
+                    (src, os.path.join(dst_dir, str(i % subdirs), os.path.basename(src)))
+                    for i, src in enumerate(sources)
+                ]
+                for _ in range(rounds):
+                    for m, (_, method) in enumerate(methods):
+                        TransferBenchmark._drop_cache(sources)
+                        start = time.perf_counter()
+                        method(pairs)
+                        best[m] = min(best[m], time.perf_counter() - start)
+                        shutil.rmtree(dst_dir)
+
+                for (method_name, _), seconds in zip(methods, best):
+                    results.append({
+                        'bucket': bucket_name,
+                        'method': method_name,
+                        'files': count,
+                        'seconds': seconds,
+                        'files_per_sec': count / seconds if seconds > 0 else 0.0,
+                        'mb_per_sec': count * size / 1024 / 1024 / seconds if seconds > 0 else 0.0,
+                    })
+
+                shutil.rmtree(src_dir)
+
+            return results, ""
+
+        except Exception as e:
+            return results, f"基准测试失败: {str(e)}"
+
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    @staticmethod
+    def run_order(
+        work_dir: str,
+        files: int = 2000,
+        size: int = 256 * 1024,
+        max_workers: int = 1,
+        rounds: int = 3,
+        seed: int = 42
+    ) -> Tuple[List[Dict], str]:
+        """
+        读取顺序基准测试：文件名顺序 vs 物理位置顺序
+
+        模拟"文件名顺序与写入顺序无关"的归档盘：按打乱的顺序创建文件，
+        且每个文件分两半、与其他文件交错写入（制造碎片）。
+        随后分别按文件名（自然排序）与物理位置顺序复制，物理顺序的耗时包含排序本身。
+        差距取决于存储介质：机械硬盘上寻道占主导，SSD / 内存缓存上差距很小。
+
+        Args:
+            work_dir: 测试目录（应位于待测磁盘上）
+            files: 文件数
+            size: 单个文件大小
+            max_workers: 复制线程数（机械硬盘上通常 1-2 最佳）
+            rounds: 轮数（取最快一轮）
+            seed: 打乱写入顺序的随机种子
+
+        Returns:
+            ([{'bucket', 'method', 'files', 'seconds', 'files_per_sec', 'mb_per_sec'}, ...], 错误消息)
+        """
+        root = os.path.join(work_dir, TransferBenchmark.WORK_DIR_NAME)
+        try:
+            if os.path.exists(root):
+                shutil.rmtree(root)
+            src_dir = os.path.join(root, 'src')
+            os.makedirs(src_dir)
+
+            names = [f"{i}.bin" for i in range(files)]
+            sources = [os.path.join(src_dir, name) for name in names]
+            creation = list(range(files))
+            random.Random(seed).shuffle(creation)
+
+            pattern = os.urandom(size)
+            half = size // 2
+            handles = {}
+            try:
+                # 前一半按打乱顺序写入，后一半再按另一种顺序追加 -> 区段交错
+                for i in creation:
+                    handles[i] = open(sources[i], 'wb')
+                    handles[i].write(pattern[:half])
+                    handles[i].flush()
+                for i in reversed(creation):
+                    handles[i].write(pattern[half:])
+                    handles[i].close()
+            finally:
+                for f in handles.values():
+                    f.close()
+            if hasattr(os, 'sync'):
+                os.sync()
+
+            dst_dir = os.path.join(root, 'dst')
+            pairs = [(src, os.path.join(dst_dir, os.path.basename(src))) for src in sources]
+            best = {'文件名顺序': float('inf'), '物理位置顺序': float('inf')}
+            for _ in range(rounds):
+                for method in best:
+                    TransferBenchmark._drop_cache(sources)
+                    start = time.perf_counter()
+                    report, error = TransferEngine.copy_files(
+                        pairs, max_workers=max_workers, physical_order=(method == '物理位置顺序')
+                    )
+                    seconds = time.perf_counter() - start
+                    if error or not report.ok:
+                        return [], error or report.format_failures(1)
+                    best[method] = min(best[method], seconds)
+                    shutil.rmtree(dst_dir)
+
+            bucket = f"{size // 1024} KB"
+            return [
+                {
+                    'bucket': bucket,
+                    'method': method,
+                    'files': files,
+                    'seconds': seconds,
+                    'files_per_sec': files / seconds if seconds > 0 else 0.0,
+                    'mb_per_sec': files * size / 1024 / 1024 / seconds if seconds > 0 else 0.0,
+                }
+                for method, seconds in best.items()
+            ], ""
+
+        except Exception as e:
+            return [], f"基准测试失败: {str(e)}"
+
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    @staticmethod
+    def format_results(results: List[Dict]) -> str:
+        """结果表格文本"""
+        lines = [f"{'文件大小':<10}{'方式':<34}{'文件数':>8}{'秒':>9}{'文件/秒':>11}{'MB/s':>10}"]
+        for r in results:
+            lines.append(
+                f"{r['bucket']:<10}{r['method']:<34}{r['files']:>8}{r['seconds']:>9.2f}"
+                f"{r['files_per_sec']:>11.0f}{r['mb_per_sec']:>10.1f}"
+            )
+        return '\n'.join(lines)
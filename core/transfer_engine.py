@@ -0,0 +1,475 @@
+"""并发文件传输引擎 - Step 2 / Step 3 的批量复制与完整性校验"""
+
+import itertools
+import os
+import shutil
+import time
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from core.operation_log import OperationLog
+from utils.draft_manager import DraftManager
+from utils.file_utils import copy_file_with_hash, ensure_directory, fast_copy_file, hash_file
+from utils.io_priority import lower_current_thread_priority
+from utils.physical_layout import physical_order as physical_order_of
+from utils.rate_limiter import RateLimiter
+from utils.worker_tuner import WorkerTuner, map_unordered, mount_point
+
+
+class TransferReport:
+    """一次批量传输的结果统计"""
+
+    def __init__(self):
+        self.copied = 0  # 成功的文件数
+        self.verified = 0  # 通过校验的文件数
+        self.retried = 0  # 重试次数（校验失败或读写出错后重新复制）
+        self.linked = 0  # 以硬链接代替复制的文件数
+        self.bytes = 0  # 成功复制的字节数
+        self.seconds = 0.0  # 总耗时
+        self.failures: List[Tuple[str, str, str]] = []  # (源, 目标, 原因)
+
+    @property
+    def ok(self) -> bool:
+        """是否全部成功"""
+        return not self.failures
+
+    @property
+    def throughput_mb(self) -> float:
+        """平均吞吐（MB/s）"""
+        return self.bytes / 1024 / 1024 / self.seconds if self.seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        """一行摘要"""
+        text = (f"{self.copied} 个文件，{self.bytes / 1024 / 1024:.1f} MB，"
+                f"{self.seconds:.1f} 秒（{self.throughput_mb:.1f} MB/s）")
+        if self.linked:
+            text += f"，硬链接 {self.linked} 个"
+        if self.verified:
+            text += f"，校验通过 {self.verified} 个"
+        if self.retried:
+            text += f"，重试 {self.retried} 次"
+        if self.failures:
+            text += f"，失败 {len(self.failures)} 个"
+        return text
+
+    def format_failures(self, limit: int = 10) -> str:
+        """失败列表（最多 limit 条）"""
+        lines = [f"{src} -> {dst}: {reason}" for src, dst, reason in self.failures[:limit]]
+        if len(self.failures) > limit:
+            lines.append(f"…… 共 {len(self.failures)} 个文件失败")
+        return '\n'.join(lines)
+
+
+class TransferPlan:
+    """批量传输前的预检结果：空间是否足够、预计耗时"""
+
+    def __init__(self, files: int, total_bytes: int, required: int, free: int, target_dir: str,
+                 followup_bytes: int = 0):
+        self.files = files
+        self.bytes = total_bytes  # 源文件总大小
+        self.required = required  # 目标磁盘上需要的空间（含块对齐开销，硬链接时为 0）
+        self.free = free  # 目标磁盘可用空间（已扣除保留余量）
+        self.target_dir = target_dir
+        self.followup_bytes = followup_bytes  # 后续步骤在同一磁盘上还需要的空间（只提示，不阻止）
+        self.probe_mb = 0.0  # 试探复制测得的吞吐（MB/s），0 表示未测
+        self.estimated_seconds: Optional[float] = None  # 不校验时的预计耗时
+        self.probing = False  # 试探复制正在后台进行（完成后上面两项才有值）
+
+    @property
+    def fits(self) -> bool:
+        """空间是否足够本次传输"""
+        return self.required <= self.free
+
+    @property
+    def fits_followup(self) -> bool:
+        """空间是否也足够后续步骤"""
+        return self.required + self.followup_bytes <= self.free
+
+    @staticmethod
+    def format_bytes(value: float) -> str:
+        for unit in ('B', 'KB', 'MB', 'GB'):
+            if abs(value) < 1024:
+                return f"{value:.1f} {unit}" if unit != 'B' else f"{value:.0f} B"
+            value /= 1024
+        return f"{value:.2f} TB"
+
+    @staticmethod
+    def format_duration(seconds: float) -> str:
+        if seconds < 1:
+            return "不到 1 秒"
+        seconds = int(seconds + 0.5)
+        if seconds < 60:
+            return f"{seconds} 秒"
+        if seconds < 3600:
+            return f"{seconds // 60} 分 {seconds % 60} 秒"
+        return f"{seconds // 3600} 小时 {seconds % 3600 // 60} 分"
+
+    def summary(self, verify: bool = False) -> str:
+        """多行摘要（用于预览对话框；校验时每个文件多读一遍，预计耗时按两倍计）"""
+        lines = [
+            f"数据量: {self.files} 个文件，{self.format_bytes(self.bytes)}",
+            f"目标磁盘需要: {self.format_bytes(self.required)}，可用: {self.format_bytes(self.free)}",
+        ]
+        if self.estimated_seconds is not None:
+            seconds = self.estimated_seconds * (2 if verify else 1)
+            lines.append(f"预计耗时: {self.format_duration(seconds)}"
+                         f"（试探复制 {self.probe_mb:.1f} MB/s）")
+        elif self.probing:
+            lines.append("预计耗时: 正在试探复制…")
+        if not self.fits:
+            lines.append(f"空间不足: 还差 {self.format_bytes(self.required - self.free)}")
+        elif not self.fits_followup:
+            lines.append(f"注意: 后续步骤还需要约 {self.format_bytes(self.followup_bytes)}，当前剩余空间不够")
+        return '\n'.join(lines)
+
+
+class TransferEngine:
+    """
+    线程池批量复制
+
+    复制以系统调用为主（hashlib 在大块数据上也会释放 GIL），线程即可并发。
+    任务按需提交，同时在途的任务数有上限，路径列表可以是惰性序列（如 ImageTable 路径视图）。
+    未指定线程数时按实测吞吐自动调节并发（WorkerTuner），结果按 源挂载点->目标挂载点 记录，
+    下次复制同一对设备时直接从记录的并发数开始。
+    """
+
+    DEFAULT_WORKERS = 8
+    HASH_ALGORITHM = 'blake2b'
+
+    # 预检：目标磁盘保留的余量（不用满整个磁盘）
+    RESERVE_BYTES = 256 * 1024 * 1024
+    # 预检：试探复制的样本上限
+    PROBE_MAX_FILES = 32
+    PROBE_MAX_BYTES = 64 * 1024 * 1024
+    PROBE_DIR_NAME = '.transfer_probe'
+
+    # 限速配置（所有复制共享，修改后运行中的复制在 1 秒内生效）
+    LIMITS_PATH = os.path.join(DraftManager.APP_DATA_DIR, 'transfer_limits.json')
+    _shared_limiter: Optional[RateLimiter] = None
+
+    # 自动调节并发的历史记录（按设备）
+    TUNING_PATH = os.path.join(DraftManager.APP_DATA_DIR, 'worker_tuning.json')
+
+    @staticmethod
+    def shared_limiter() -> RateLimiter:
+        """进程内共享的限速器（首次使用时从配置文件加载）"""
+        if TransferEngine._shared_limiter is None:
+            TransferEngine._shared_limiter = RateLimiter(config_path=TransferEngine.LIMITS_PATH)
+        return TransferEngine._shared_limiter
+
+    @staticmethod
+    def create_tuner(kind: str, *paths: str, per_cpu: float = 8.0, unit: str = 'bytes') -> WorkerTuner:
+        """
+        创建按设备记录的并发调节器
+
+        Args:
+            kind: 任务类型（如 'copy'、'scan'、'rename'），不同类型分别记录
+            paths: 任务涉及的路径（取各自的挂载点组成记录键）
+            per_cpu: 每个可用 CPU 允许的并发数
+            unit: 吞吐单位
+
+        Returns:
+            WorkerTuner
+        """
+        key = f"{kind}:" + '->'.join(mount_point(path) for path in paths)
+        return WorkerTuner(key, start=TransferEngine.DEFAULT_WORKERS, per_cpu=per_cpu,
+                           config_path=TransferEngine.TUNING_PATH, unit=unit)
+
+    @staticmethod
+    def _copy_one(src: str, dst: str, verify: bool, retries: int, link: bool = False,
+                  preserve_metadata: bool = True,
+                  limiter: Optional[RateLimiter] = None) -> Tuple[int, int, int, str]:
+        """
+        复制单个文件（可选校验，失败时重试）
+
+        不校验时使用 fast_copy_file（copy_file_range / sendfile 内核态复制）。
+
+        校验方式：复制时对读到的源数据计算哈希（源文件只读一次），
+        复制后比较大小，再丢弃目标文件页缓存重新读取计算哈希，确认存储上的数据完整。
+        link 为 True 时优先创建硬链接（同一文件系统内不复制数据，也无需校验），失败时退回复制；
+        目标已存在时视为失败（不覆盖，有活动事务时已有文件在此之前已由 will_create 移入回收目录）。
+        limiter 不为 None 时，复制前取令牌（硬链接不计入；未限制字节速率时不读取文件大小）。
+
+        Returns:
+            (字节数, 重试次数, 状态, 失败原因)；状态: 0 复制, 1 已校验, 2 硬链接
+        """
+        if link:
+            try:
+                os.link(src, dst)
+                return os.path.getsize(dst), 0, 2, ""
+            except FileExistsError:
+                return 0, 0, 0, "目标文件已存在"
+            except OSError:
+                pass  # 跨文件系统或不支持硬链接：按普通复制处理
+
+        if limiter is not None:
+            try:
+                limiter.acquire(os.path.getsize(src) if limiter.bytes_per_sec else 0)
+            except OSError as e:
+                return 0, 0, 0, str(e)
+
+        reason = ""
+        for attempt in range(retries + 1):
+            try:
+                if not verify:
+                    return fast_copy_file(src, dst, preserve_metadata), attempt, 0, ""
+
+                size, src_hash = copy_file_with_hash(src, dst, TransferEngine.HASH_ALGORITHM)
+                src_size = os.path.getsize(src)
+                dst_size = os.path.getsize(dst)
+                if src_size != size or dst_size != size:
+                    reason = f"大小不一致（源 {src_size} / 读取 {size} / 目标 {dst_size} 字节）"
+                    continue
+
+                _, dst_hash = hash_file(dst, TransferEngine.HASH_ALGORITHM, drop_cache=True)
+                if dst_hash != src_hash:
+                    reason = "内容哈希不一致"
+                    continue
+
+                return size, attempt, 1, ""
+
+            except OSError as e:
+                reason = str(e)
+
+        return 0, retries, 0, reason
+
+    @staticmethod
+    def copy_files(
+        pairs: Iterable[Tuple[str, str]],
+        verify: bool = False,
+        max_workers: Optional[int] = None,
+        retries: int = 2,
+        link: bool = False,
+        preserve_metadata: bool = True,
+        limiter: Optional[RateLimiter] = None,
+        physical_order: bool = False
+    ) -> Tuple[TransferReport, str]:
+        """
+        并发复制 (源, 目标) 文件对
+
+        单个文件失败不会中断其余文件，失败记录在报告中，由调用方决定如何处理。
+
+        Args:
+            pairs: (源路径, 目标路径) 序列
+            verify: 是否校验大小与内容哈希
+            max_workers: 线程数（None 表示自动调节；设置了速率限制时固定为 DEFAULT_WORKERS）
+            retries: 单个文件失败后的重试次数
+            link: 优先使用硬链接（源与目标在同一文件系统时不复制数据）
+            preserve_metadata: 保留权限与修改时间（不校验时有效；校验复制总是保留）
+            limiter: 限速器（默认使用共享限速器 shared_limiter()，未设置限速时无开销）
+            physical_order: 按源文件在磁盘上的物理位置顺序读取（机械硬盘减少寻道；
+                            目标文件名不变，需要先取得全部文件对）
+
+        Returns:
+            (传输报告, 错误消息)
+        """
+        report = TransferReport()
+        start = time.perf_counter()
+
+        # 限速器始终传给工作线程：复制进行中开启或调整限速也能立即生效
+        limiter = limiter or TransferEngine.shared_limiter()
+        io_priority = limiter.io_priority if limiter.active else ''
+        priority_errors = []
+
+        def init_worker():
+            # 优先级以线程为单位：只降低复制线程，不影响界面线程
+            error = lower_current_thread_priority(io_priority)
+            if error and not priority_errors:
+                priority_errors.append(error)
+                print(f"降低复制线程优先级失败: {error}")
+
+        tuner = None
+        try:
+            if physical_order:
+                pairs = list(pairs)
+                pairs = [pairs[i] for i in physical_order_of([src for src, _ in pairs])]
+
+            pairs = iter(pairs)
+            first = next(pairs, None)
+            if first is None:
+                report.seconds = time.perf_counter() - start
+                return report, ""
+            pairs = itertools.chain([first], pairs)
+
+            if limiter.active:
+                print(f"复制限速: {limiter.describe()}")
+            if max_workers is None:
+                if limiter.bytes_per_sec or limiter.files_per_sec:
+                    # 限速时吞吐由令牌桶决定，测不出并发的影响
+                    max_workers = TransferEngine.DEFAULT_WORKERS
+                else:
+                    # 校验复制要计算哈希，CPU 占比高，每个 CPU 的并发上限取小
+                    kind = 'link' if link else ('copy-verify' if verify else 'copy')
+                    tuner = TransferEngine.create_tuner(kind, os.path.dirname(first[0]),
+                                                        os.path.dirname(first[1]),
+                                                        per_cpu=2.0 if verify else 8.0)
+
+            created_dirs = set()
+            logged = OperationLog.active() is not None
+
+            def prepared():
+                for src, dst in pairs:
+                    # 目标目录只创建一次；有活动事务时先记录（在收集结果的线程中，记录顺序确定）
+                    directory = os.path.dirname(dst)
+                    if logged and directory and directory not in created_dirs:
+                        OperationLog.makedirs(directory)
+                    ensure_directory(directory, created_dirs)
+                    OperationLog.will_create(dst)
+                    yield src, dst
+
+            results = map_unordered(
+                lambda pair: TransferEngine._copy_one(pair[0], pair[1], verify, retries, link,
+                                                      preserve_metadata, limiter),
+                prepared(),
+                max_workers=max_workers or TransferEngine.DEFAULT_WORKERS,
+                tuner=tuner,
+                measure=lambda result: result[0],
+                initializer=init_worker if io_priority else None
+            )
+            for (src, dst), (size, retried, state, reason) in results:
+                report.retried += retried
+                if reason:
+                    report.failures.append((src, dst, reason))
+                else:
+                    report.copied += 1
+                    report.bytes += size
+                    report.verified += state == 1
+                    report.linked += state == 2
+
+            report.seconds = time.perf_counter() - start
+            return report, ""
+
+        except Exception as e:
+            report.seconds = time.perf_counter() - start
+            return report, f"批量复制失败: {str(e)}"
+
+        finally:
+            if tuner is not None:
+                tuner.finish()
+
+    @staticmethod
+    def _existing_ancestor(path: str) -> str:
+        """path 本身或最近的已存在上级目录（目标目录可能尚未创建）"""
+        path = os.path.abspath(path)
+        while not os.path.exists(path):
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            path = parent
+        return path
+
+    @staticmethod
+    def probe_throughput(
+        paths: Sequence[str],
+        target_dir: str,
+        max_workers: Optional[int] = None
+    ) -> Tuple[float, str]:
+        """
+        从 paths 中均匀抽取少量文件，实际复制到目标磁盘并 fsync，测量吞吐
+
+        样本均匀分布在整个列表中，平均文件大小接近整体；与正式复制使用相同的线程数
+        （max_workers 为 None 时取这对设备上次自动调节的结果，样本太少不在试探中调节）。
+        试探文件写入目标磁盘上的临时目录，测量后删除。
+
+        Returns:
+            (吞吐 字节/秒（0 表示无法测量）, 错误消息)
+        """
+        probe_dir = os.path.join(TransferEngine._existing_ancestor(target_dir),
+                                 f"{TransferEngine.PROBE_DIR_NAME}-{os.getpid()}")
+        try:
+            total = len(paths)
+            if total == 0:
+                return 0.0, ""
+            step = max(1, total // TransferEngine.PROBE_MAX_FILES)
+            sample = []
+            sample_bytes = 0
+            for i in range(0, total, step):
+                sample.append(paths[i])
+                sample_bytes += os.path.getsize(paths[i])
+                if len(sample) >= TransferEngine.PROBE_MAX_FILES or sample_bytes >= TransferEngine.PROBE_MAX_BYTES:
+                    break
+
+            pairs = [(src, os.path.join(probe_dir, f"{i}{os.path.splitext(src)[1]}"))
+                     for i, src in enumerate(sample)]
+            if max_workers is None:
+                max_workers = TransferEngine.create_tuner('copy', os.path.dirname(sample[0]), target_dir).workers
+            start = time.perf_counter()
+            # 试探文件测量后即删除，不计入操作日志
+            with OperationLog.suspended():
+                report, error = TransferEngine.copy_files(pairs, max_workers=max_workers, retries=0)
+            if error or not report.ok:
+                return 0.0, error or report.format_failures(1)
+            # 计入写回存储的时间，避免只测到页缓存的速度（Windows 的 fsync 需要可写句柄）
+            for _, dst in pairs:
+                fd = os.open(dst, os.O_RDWR)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            seconds = time.perf_counter() - start
+            return (report.bytes / seconds if seconds > 0 else 0.0), ""
+
+        except Exception as e:
+            return 0.0, f"试探复制失败: {str(e)}"
+
+        finally:
+            shutil.rmtree(probe_dir, ignore_errors=True)
+
+    @staticmethod
+    def preflight(
+        paths: Sequence[str],
+        total_bytes: int,
+        target_dir: str,
+        link: bool = False,
+        followup_bytes: int = 0,
+        probe: bool = True
+    ) -> Tuple[Optional[TransferPlan], str]:
+        """
+        传输前预检：目标磁盘空间是否足够、预计耗时
+
+        Args:
+            paths: 源文件路径序列（用于试探复制；大小由调用方从扫描结果汇总，不再逐个 stat）
+            total_bytes: 源文件总大小
+            target_dir: 目标目录（可以尚未创建）
+            link: 硬链接模式（同一文件系统时不占用数据空间）
+            followup_bytes: 后续步骤在同一磁盘上还需要的空间（如 Step 2 之后 Step 3 的再次复制）
+            probe: 是否进行试探复制以估计耗时
+
+        Returns:
+            (预检结果, 错误消息)
+        """
+        try:
+            anchor = TransferEngine._existing_ancestor(target_dir)
+            files = len(paths)
+
+            # 块对齐开销：平均每个文件浪费半个块
+            block_size = os.statvfs(anchor).f_frsize if hasattr(os, 'statvfs') else 4096
+            required = total_bytes + files * block_size // 2
+            if link and files and os.stat(paths[0]).st_dev == os.stat(anchor).st_dev:
+                required = 0
+            free = max(0, shutil.disk_usage(anchor).free - TransferEngine.RESERVE_BYTES)
+
+            plan = TransferPlan(files, total_bytes, required, free, target_dir, followup_bytes)
+            if probe and required and plan.fits:
+                TransferEngine.estimate_duration(plan, paths)
+            return plan, ""
+
+        except Exception as e:
+            return None, f"传输预检失败: {str(e)}"
+
+    @staticmethod
+    def estimate_duration(plan: TransferPlan, paths: Sequence[str]):
+        """
+        试探复制，把吞吐与预计耗时填入 plan
+
+        可以在后台线程中执行（界面先显示空间检查结果）：调用前把 plan.probing 设为 True，
+        完成后（无论成功与否）置为 False。
+        """
+        try:
+            rate, error = TransferEngine.probe_throughput(paths, plan.target_dir)
+            if error:
+                print(f"传输预检: {error}")
+            elif rate > 0:
+                plan.probe_mb = rate / 1024 / 1024
+                plan.estimated_seconds = plan.bytes / rate
+        finally:
+            plan.probing = False
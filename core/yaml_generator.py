@@ -1,17 +1,56 @@
 """YAML 文件生成器 - Step 5"""
 
-import os
-from typing import List, Tuple
+import random
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from core.dataset_builder import DatasetBuilder
+from core.label_cache import LabelCache
+from core.storage import StorageBackend
 
 
 class YAMLGenerator:
     """YOLO 训练配置 YAML 文件生成器"""
 
+    # 图片列表文件名：位于数据集根目录，条目为 ./images/<子目录>/<文件名>
+    # （YOLO 训练时 "./" 开头的条目相对于列表文件所在目录解析，数据集可整体移动）
+    IMAGE_LIST_NAMES = {'train': 'train.txt', 'val': 'val.txt', 'test': 'test.txt'}
+    FOLD_LIST_FORMAT = "fold_{fold}_{subset}.txt"
+    FOLD_YAML_FORMAT = "data_fold_{fold}.yaml"
+
+    # Step 5 中 YAML 引用图片的方式
+    LIST_MODE_DIRS = ''  # 子集目录
+    LIST_MODE_SUBSETS = 'subsets'  # 图片列表（按当前子集目录）
+    LIST_MODE_RESPLIT = 'resplit'  # 图片列表（按新比例重新划分，不移动图片）
+    LIST_MODES = {
+        LIST_MODE_DIRS: "子集目录（images/train 等）",
+        LIST_MODE_SUBSETS: "图片列表 train.txt / val.txt / test.txt（按当前子集目录）",
+        LIST_MODE_RESPLIT: "图片列表，按新比例重新划分全部图片（不移动图片）",
+    }
+
+    @staticmethod
+    def _write_yaml(
+        yaml_path: str,
+        dataset_root: str,
+        entries: Dict[str, Optional[str]],
+        classes: List[str]
+    ):
+        """写入 YAML（entries: 子集 -> 目录或列表文件，None 表示省略该子集）"""
+        lines = [f"path: {dataset_root}"]
+        lines += [f"{subset}: {value}" for subset, value in entries.items() if value]
+        lines += ["", "names:"]
+
+        # 添加类别（使用列表格式）
+        for class_name in classes:
+            lines.append(f"  - {class_name}")
+
+        StorageBackend.for_path(yaml_path).write_text(yaml_path, '\n'.join(lines))
+
     @staticmethod
     def generate_yaml(
         dataset_root: str,
         classes: List[str],
-        output_filename: str = "data.yaml"
+        output_filename: str = "data.yaml",
+        use_image_lists: bool = False
     ) -> Tuple[str, str]:
         """
         生成 YOLO 训练 YAML 文件
@@ -20,15 +59,17 @@ class YAMLGenerator:
             dataset_root: 数据集根目录
             classes: 类别列表
             output_filename: YAML 文件名
+            use_image_lists: 引用 train.txt / val.txt / test.txt 图片列表（按当前子集目录生成），
+                             而不是直接引用子集目录
 
         Returns:
             (YAML 文件路径, 错误消息)
 
         生成格式:
             path: <dataset_root_path>
-            train: images/train
-            val: images/val
-            test: images/test
+            train: images/train          （或 train.txt）
+            val: images/val              （或 val.txt）
+            test: images/test            （或 test.txt）
 
             names:
               - class_name_1
@@ -39,31 +80,286 @@ class YAMLGenerator:
                 return "", "类别列表不能为空"
 
             # YAML 文件路径
-            yaml_path = os.path.join(dataset_root, output_filename)
-
-            # 生成 YAML 内容
-            lines = [
-                f"path: {dataset_root}",
-                "train: images/train",
-                "val: images/val",
-                "test: images/test",
-                "",
-                "names:"
-            ]
-
-            # 添加类别（使用列表格式）
-            for class_name in classes:
-                lines.append(f"  - {class_name}")
-
-            # 写入文件
-            with open(yaml_path, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(lines))
+            yaml_path = StorageBackend.for_path(dataset_root).join(dataset_root, output_filename)
+
+            if use_image_lists:
+                lists = {
+                    subset: YAMLGenerator.collect_image_pool(dataset_root, (subset,))
+                    for subset in DatasetBuilder.STRUCTURE['images']
+                }
+                YAMLGenerator.write_image_lists(dataset_root, lists)
+                entries = dict(YAMLGenerator.IMAGE_LIST_NAMES)
+            else:
+                entries = {subset: f"images/{subset}" for subset in DatasetBuilder.STRUCTURE['images']}
 
+            YAMLGenerator._write_yaml(yaml_path, dataset_root, entries, classes)
             return yaml_path, ""
 
         except Exception as e:
             return "", f"生成 YAML 文件失败: {str(e)}"
 
+    @staticmethod
+    def generate_training_yaml(
+        dataset_root: str,
+        classes: List[str],
+        output_filename: str = "data.yaml",
+        list_mode: str = LIST_MODE_DIRS,
+        ratios: Sequence[float] = (70.0, 20.0, 10.0),
+        seed: int = 42
+    ) -> Tuple[str, str]:
+        """
+        按引用方式生成 Step 5 的 YAML（LIST_MODES 之一）
+
+        Args:
+            dataset_root: 数据集根目录
+            classes: 类别列表
+            output_filename: YAML 文件名
+            list_mode: 引用方式
+            ratios: 重新划分的 train / val / test 比例（只用于 LIST_MODE_RESPLIT）
+            seed: 重新划分的随机种子
+
+        Returns:
+            (YAML 文件路径, 错误消息)
+        """
+        if list_mode == YAMLGenerator.LIST_MODE_RESPLIT:
+            train_ratio, val_ratio, test_ratio = ratios
+            return YAMLGenerator.generate_split_lists(
+                dataset_root, classes, train_ratio, val_ratio, test_ratio, seed, output_filename
+            )
+        if list_mode not in YAMLGenerator.LIST_MODES:
+            return "", f"未知的 YAML 引用方式: {list_mode}"
+        return YAMLGenerator.generate_yaml(
+            dataset_root, classes, output_filename,
+            use_image_lists=list_mode == YAMLGenerator.LIST_MODE_SUBSETS
+        )
+
+    @staticmethod
+    def collect_image_pool(
+        dataset_root: str,
+        subsets: Sequence[str] = ('train', 'val', 'test')
+    ) -> List[str]:
+        """
+        收集图片池（相对数据集根目录的路径，如 images/train/0001.jpg，按自然排序）
+
+        图片留在原位置，标签按 images/ -> labels/ 的对应关系查找，因此无需复制即可重新划分。
+        """
+        storage = StorageBackend.for_path(dataset_root)
+        pool = []
+        for subset in subsets:
+            images_dir = DatasetBuilder.get_images_path(dataset_root, subset)
+            if not storage.isdir(images_dir):
+                continue
+            # 目录列表已按文件名自然排序
+            pool.extend(f"images/{subset}/{name}" for name, _ in storage.list_directory(images_dir).images())
+        return pool
+
+    @staticmethod
+    def write_image_lists(
+        dataset_root: str,
+        lists: Dict[str, Sequence[str]],
+        file_names: Optional[Dict[str, str]] = None
+    ) -> List[str]:
+        """
+        写入图片列表文件（每行 ./<相对路径>）
+
+        Args:
+            dataset_root: 数据集根目录
+            lists: 子集 -> 图片相对路径列表
+            file_names: 子集 -> 列表文件名（默认 IMAGE_LIST_NAMES）
+
+        Returns:
+            列表文件路径
+        """
+        storage = StorageBackend.for_path(dataset_root)
+        file_names = file_names or YAMLGenerator.IMAGE_LIST_NAMES
+        paths = []
+        for subset, images in lists.items():
+            path = storage.join(dataset_root, file_names[subset])
+            storage.write_text(path, ''.join(f"./{image}\n" for image in images))
+            paths.append(path)
+        return paths
+
+    @staticmethod
+    def generate_split_lists(
+        dataset_root: str,
+        classes: List[str],
+        train_ratio: float,
+        val_ratio: float,
+        test_ratio: float,
+        seed: int = 42,
+        output_filename: str = "data_split.yaml"
+    ) -> Tuple[str, str]:
+        """
+        按新的比例重新划分全部图片，只写图片列表与 YAML（不移动、不复制图片）
+
+        打乱方式与 DataSplitter.split_data 一致：同样的图片顺序与种子得到相同的划分。
+
+        Args:
+            dataset_root: 数据集根目录
+            classes: 类别列表
+            train_ratio / val_ratio / test_ratio: 比例 (0-100)
+            seed: 随机种子
+            output_filename: YAML 文件名
+
+        Returns:
+            (YAML 文件路径, 错误消息)
+        """
+        try:
+            if not classes:
+                return "", "类别列表不能为空"
+            pool = YAMLGenerator.collect_image_pool(dataset_root)
+            if not pool:
+                return "", "数据集中没有图片"
+
+            rng = random.Random(seed)
+            rng.shuffle(pool)
+            train_count = int(len(pool) * train_ratio / 100)
+            val_count = int(len(pool) * val_ratio / 100)
+            lists = {
+                'train': pool[:train_count],
+                'val': pool[train_count:train_count + val_count],
+                'test': pool[train_count + val_count:],
+            }
+            YAMLGenerator.write_image_lists(dataset_root, lists)
+
+            yaml_path = StorageBackend.for_path(dataset_root).join(dataset_root, output_filename)
+            entries = {subset: YAMLGenerator.IMAGE_LIST_NAMES[subset] if images else None
+                       for subset, images in lists.items()}
+            YAMLGenerator._write_yaml(yaml_path, dataset_root, entries, classes)
+            return yaml_path, ""
+
+        except Exception as e:
+            return "", f"生成划分列表失败: {str(e)}"
+
+    @staticmethod
+    def generate_kfold(
+        dataset_root: str,
+        classes: List[str],
+        k: int = 5,
+        seed: int = 42,
+        holdout_test: bool = True
+    ) -> Tuple[List[str], str]:
+        """
+        生成 K 折交叉验证的图片列表与 YAML（不复制图片）
+
+        图片池打乱后均分为 K 份；第 i 折以第 i 份为 val，其余为 train：
+            fold_<i>_train.txt / fold_<i>_val.txt / data_fold_<i>.yaml
+
+        Args:
+            dataset_root: 数据集根目录
+            classes: 类别列表
+            k: 折数（>= 2）
+            seed: 随机种子
+            holdout_test: images/test 不参与交叉验证，作为每一折共同的 test
+
+        Returns:
+            (YAML 文件路径列表, 错误消息)
+        """
+        try:
+            if not classes:
+                return [], "类别列表不能为空"
+            if k < 2:
+                return [], "折数至少为 2"
+
+            storage = StorageBackend.for_path(dataset_root)
+            subsets = ('train', 'val') if holdout_test else ('train', 'val', 'test')
+            pool = YAMLGenerator.collect_image_pool(dataset_root, subsets)
+            if len(pool) < k:
+                return [], f"图片数（{len(pool)}）少于折数（{k}）"
+
+            # 清理上一次生成的折列表与折 YAML（折数可能变少）
+            YAMLGenerator._remove_kfold_files(storage, dataset_root)
+
+            rng = random.Random(seed)
+            rng.shuffle(pool)
+            bounds = [len(pool) * i // k for i in range(k + 1)]
+            has_test = holdout_test and bool(YAMLGenerator.collect_image_pool(dataset_root, ('test',)))
+
+            yaml_paths = []
+            for fold in range(1, k + 1):
+                start, end = bounds[fold - 1], bounds[fold]
+                file_names = {
+                    subset: YAMLGenerator.FOLD_LIST_FORMAT.format(fold=fold, subset=subset)
+                    for subset in ('train', 'val')
+                }
+                YAMLGenerator.write_image_lists(
+                    dataset_root,
+                    {'train': pool[:start] + pool[end:], 'val': pool[start:end]},
+                    file_names
+                )
+
+                yaml_path = storage.join(dataset_root, YAMLGenerator.FOLD_YAML_FORMAT.format(fold=fold))
+                entries = dict(file_names, test="images/test" if has_test else None)
+                YAMLGenerator._write_yaml(yaml_path, dataset_root, entries, classes)
+                yaml_paths.append(yaml_path)
+
+            return yaml_paths, ""
+
+        except Exception as e:
+            return [], f"生成交叉验证配置失败: {str(e)}"
+
+    @staticmethod
+    def _remove_kfold_files(storage: StorageBackend, dataset_root: str):
+        storage.remove_many([
+            storage.join(dataset_root, name) for name in storage.list_directory(dataset_root).files()
+            if (name.startswith('fold_') and name.endswith('.txt'))
+            or (name.startswith('data_fold_') and name.endswith('.yaml'))
+        ])
+
+    @staticmethod
+    def remove_kfold_files(dataset_root: str) -> str:
+        """
+        删除 K 折交叉验证的图片列表与 YAML（不再生成交叉验证时调用）
+
+        Returns:
+            错误消息
+        """
+        try:
+            YAMLGenerator._remove_kfold_files(StorageBackend.for_path(dataset_root), dataset_root)
+            return ""
+        except Exception as e:
+            return f"删除交叉验证配置失败: {str(e)}"
+
+    @staticmethod
+    def generate_label_cache(
+        dataset_root: str,
+        max_workers: int = 8
+    ) -> Tuple[List[str], str]:
+        """
+        生成训练标签缓存（YAML 生成后的可选附加步骤）
+
+        每个子集生成 labels/<subset>.labelcache，包含图片路径、尺寸、
+        标注数组与损坏标记；文件未变化时（大小 / mtime 指纹一致）直接复用。
+
+        Args:
+            dataset_root: 数据集根目录
+            max_workers: 并行读取线程数
+
+        Returns:
+            (缓存文件路径列表, 错误消息)
+        """
+        return LabelCache.build_all(dataset_root, max_workers)
+
+    @staticmethod
+    def remove_yaml_files(dataset_root: str) -> Tuple[List[str], str]:
+        """
+        删除数据集根目录下的全部 YAML 文件（生成新的 YAML 之前调用，根目录只保留一个配置）
+
+        Returns:
+            (删除的文件名列表, 错误消息)
+        """
+        deleted = []
+        try:
+            storage = StorageBackend.for_path(dataset_root)
+            names = [name for name in storage.list_directory(dataset_root).files()
+                     if name.lower().endswith(('.yaml', '.yml'))]
+            storage.remove_many([storage.join(dataset_root, name) for name in names])
+            deleted.extend(names)
+            return deleted, ""
+
+        except Exception as e:
+            return deleted, f"删除旧 YAML 文件失败: {str(e)}"
+
     @staticmethod
     def write_classes_file(
         classes_file_path: str,
@@ -84,13 +380,13 @@ class YAMLGenerator:
                 return False, "类别列表不能为空"
 
             # 确保目录存在
-            directory = os.path.dirname(classes_file_path)
+            storage = StorageBackend.for_path(classes_file_path)
+            directory, _ = storage.split(classes_file_path)
             if directory:
-                os.makedirs(directory, exist_ok=True)
+                storage.makedirs(directory)
 
             # 写入文件（每行一个类别）
-            with open(classes_file_path, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(classes))
+            storage.write_text(classes_file_path, '\n'.join(classes))
 
             return True, ""
 
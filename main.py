@@ -1,12 +1,193 @@
 """YOLO 数据集预处理工具 - 程序入口"""
 
+import argparse
+import multiprocessing
+import signal
 import sys
-from PySide6.QtWidgets import QApplication
-from ui.main_window import MainWindow
+import threading
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """解析命令行参数（不带参数时启动图形界面）"""
+    parser = argparse.ArgumentParser(description="YOLO Dataset Preprocessing Tool")
+
+    ingest = parser.add_argument_group("收件箱监视入库（无界面模式）")
+    ingest.add_argument("--ingest", metavar="INBOX", help="监视的收件箱目录")
+    ingest.add_argument("--dataset", metavar="ROOT", help="要扩展的已有数据集根目录")
+    ingest.add_argument("--ratios", nargs=3, type=float, default=[70.0, 20.0, 10.0],
+                        metavar=("TRAIN", "VAL", "TEST"), help="划分比例（默认 70 20 10）")
+    ingest.add_argument("--seed", type=int, default=42, help="随机种子（默认 42）")
+    ingest.add_argument("--batch-size", type=int, default=500, help="每批最多入库的图片数")
+    ingest.add_argument("--settle", type=float, default=2.0, help="轮询模式下判定文件写完的稳定秒数")
+    ingest.add_argument("--poll", type=float, default=2.0, help="轮询间隔（秒）")
+    ingest.add_argument("--index-width", type=int, default=0,
+                        help="编号位数（默认沿用数据集中最常见的位数）")
+    ingest.add_argument("--no-inotify", action="store_true", help="禁用 inotify，只使用轮询")
+    ingest.add_argument("--limit-mbps", type=float, default=None,
+                        help="复制限速（MB/s，0 表示不限；运行中可修改限速配置文件调整）")
+    ingest.add_argument("--limit-files", type=float, default=None, help="复制限速（文件/秒，0 表示不限）")
+    ingest.add_argument("--io-priority", choices=["low", "idle"], default=None,
+                        help="降低入库复制的 CPU / 磁盘优先级（仅 Linux）")
+
+    benchmark = parser.add_argument_group("复制基准测试（无界面模式）")
+    benchmark.add_argument("--benchmark-copy", metavar="DIR",
+                           help="在 DIR 所在磁盘上按文件大小分档比较复制方式")
+    benchmark.add_argument("--benchmark-mb", type=int, default=256, help="每档测试文件总量（MB，默认 256）")
+    benchmark.add_argument("--benchmark-mode", choices=["size", "order"], default="size",
+                           help="size: 按文件大小比较复制方式；order: 比较文件名顺序与物理位置顺序读取")
+    benchmark.add_argument("--benchmark-workers", type=int, default=1, help="order 模式的复制线程数（默认 1）")
+
+    jobs = parser.add_argument_group("批量任务队列（无界面模式，队列与界面共用）")
+    jobs.add_argument("--job-add", nargs="+", metavar="DRAFT", help="把草稿文件（会话 JSON）加入队列")
+    jobs.add_argument("--job-new", nargs="+", metavar="RAW",
+                      help="由原始图片文件夹创建任务（可以是 s3://bucket/prefix；需 --dataset；"
+                           "目录不存在时新建，存在时扩展；使用 --ratios / --seed / --index-width）")
+    jobs.add_argument("--classes", nargs="+", metavar="NAME", help="--job-new 的类别列表（扩展时默认沿用数据集）")
+    jobs.add_argument("--recursive", action="store_true", help="--job-new 扫描子文件夹")
+    jobs.add_argument("--job-list", action="store_true", help="列出队列中的任务")
+    jobs.add_argument("--job-cancel", metavar="ID", help="取消任务（运行中的任务由调度器终止并回滚当前步骤）")
+    jobs.add_argument("--job-retry", metavar="ID", help="重新排队任务（已完成的步骤跳过）")
+    jobs.add_argument("--job-run", action="store_true", help="运行队列直到没有等待中的任务")
+    jobs.add_argument("--max-jobs", type=int, default=2, help="同时运行的任务数（默认 2）")
+    jobs.add_argument("--job-workers", type=int, default=8, help="每个任务的最大线程数（默认 8）")
+
+    args = parser.parse_args(argv)
+    if args.ingest and not args.dataset:
+        parser.error("--ingest 需要同时指定 --dataset")
+    if args.job_new and not args.dataset:
+        parser.error("--job-new 需要同时指定 --dataset")
+    return args
+
+
+def run_ingest(args: argparse.Namespace) -> int:
+    """运行收件箱监视入库，Ctrl+C / SIGTERM 时正常退出"""
+    from core.ingest_watcher import IngestWatcher
+    from core.transfer_engine import TransferEngine
+    from utils.validator import validate_ratios
+
+    valid, error = validate_ratios(*args.ratios)
+    if not valid:
+        print(error, file=sys.stderr)
+        return 2
+
+    # 命令行限速只作用于本进程（不写入配置文件）；之后修改配置文件仍会生效
+    limiter = TransferEngine.shared_limiter()
+    if args.limit_mbps is not None or args.limit_files is not None or args.io_priority:
+        limiter.set_limits(
+            limiter.bytes_per_sec if args.limit_mbps is None else args.limit_mbps * 1024 * 1024,
+            limiter.files_per_sec if args.limit_files is None else args.limit_files,
+            args.io_priority or limiter.io_priority
+        )
+    print(f"复制限速: {limiter.describe()}（配置文件: {TransferEngine.LIMITS_PATH}）")
+
+    watcher = IngestWatcher(
+        args.ingest, args.dataset, *args.ratios,
+        seed=args.seed,
+        batch_size=args.batch_size,
+        settle_seconds=args.settle,
+        poll_interval=args.poll,
+        use_inotify=not args.no_inotify,
+        index_width=args.index_width
+    )
+
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+
+    error = watcher.run(stop_event)
+    if error:
+        print(error, file=sys.stderr)
+        return 1
+    return 0
+
+
+def run_benchmark(args: argparse.Namespace) -> int:
+    """运行复制基准测试并打印结果表格"""
+    from core.transfer_benchmark import TransferBenchmark
+
+    if args.benchmark_mode == "order":
+        size = 256 * 1024
+        results, error = TransferBenchmark.run_order(
+            args.benchmark_copy, max(1, args.benchmark_mb * 1024 * 1024 // size), size,
+            max_workers=args.benchmark_workers
+        )
+    else:
+        results, error = TransferBenchmark.run(args.benchmark_copy, args.benchmark_mb * 1024 * 1024)
+    if results:
+        print(TransferBenchmark.format_results(results))
+    if error:
+        print(error, file=sys.stderr)
+        return 1
+    return 0
+
+
+def run_jobs(args: argparse.Namespace) -> int:
+    """管理并运行批量任务队列；运行时 Ctrl+C / SIGTERM 不再启动新任务，等待运行中的任务结束"""
+    from core.job_queue import JobQueue
+    from utils.validator import validate_ratios
+
+    queue = JobQueue(max_jobs=args.max_jobs, job_workers=args.job_workers)
+    status = 0
+
+    if args.job_new:
+        valid, error = validate_ratios(*args.ratios)
+        if valid:
+            config, error = JobQueue.new_config(
+                args.job_new, args.dataset, args.classes, args.ratios,
+                seed=args.seed, recursive=args.recursive, index_width=args.index_width
+            )
+            if config is not None:
+                job, error = queue.add(config)
+        if error:
+            print(error, file=sys.stderr)
+            return 2
+        print(f"已加入任务 {job.id}: {job.name}（{job.image_count} 张图片）")
+
+    for draft in args.job_add or []:
+        job, error = queue.add_draft(draft)
+        if error:
+            print(f"{draft}: {error}", file=sys.stderr)
+            status = 2
+        else:
+            print(f"已加入任务 {job.id}: {job.name}（{job.image_count} 张图片）")
+
+    for job_id, action in ((args.job_cancel, queue.cancel), (args.job_retry, queue.retry)):
+        if job_id:
+            error = action(job_id)
+            if error:
+                print(error, file=sys.stderr)
+                status = 2
+
+    if args.job_list:
+        for job in queue.jobs():
+            steps = ','.join(map(str, job.executed)) or '-'
+            print(f"{job.id}  {job.get_status_display():<6}{job.image_count:>8} 张  执行 {steps:<12}{job.name}"
+                  + (f"  {job.error}" if job.error else ""))
+
+    if args.job_run:
+        stop_event = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stop_event.set())
+        done, failed = queue.run(stop_event)
+        print(f"完成 {done} 个任务，失败 {failed} 个")
+        if failed:
+            status = 1
+    return status
 
 
 def main():
     """程序主入口"""
+    args = parse_args()
+    if args.ingest:
+        sys.exit(run_ingest(args))
+    if args.benchmark_copy:
+        sys.exit(run_benchmark(args))
+    if any((args.job_add, args.job_new, args.job_list, args.job_cancel, args.job_retry, args.job_run)):
+        sys.exit(run_jobs(args))
+
+    from PySide6.QtWidgets import QApplication
+    from ui.main_window import MainWindow
+
     app = QApplication(sys.argv)
     app.setApplicationName("YOLO Dataset Preprocessing Tool")
 
@@ -17,4 +198,7 @@ def main():
 
 
 if __name__ == "__main__":
+    # 打包后的程序中，进程池（图片检查、统计报告、批量任务）的工作进程也从这里启动，
+    # 必须先交给 multiprocessing 处理，否则每个工作进程都会再打开一个主界面
+    multiprocessing.freeze_support()
     main()
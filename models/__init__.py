@@ -2,5 +2,7 @@
 
 from .dataset_config import DatasetConfig
 from .step_state import StepState, StepStatus
+from .path_list import CompactPathList
+from .image_table import ImageTable, ImageRecord
 
-__all__ = ['DatasetConfig', 'StepState', 'StepStatus']
+__all__ = ['DatasetConfig', 'StepState', 'StepStatus', 'CompactPathList', 'ImageTable', 'ImageRecord']
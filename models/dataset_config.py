@@ -1,22 +1,46 @@
 """数据集配置数据模型"""
 
-from typing import List, Optional
+from typing import List, Optional, Sequence
+from models.image_table import ImageTable
+from models.path_list import CompactPathList
 from models.step_state import StepState
 
 
 class DatasetConfig:
     """数据集配置 - 存储整个工作流的状态数据"""
 
+    # 步骤间的数据依赖（步骤 -> 它使用其输出的上游步骤）
+    # 类别（Step 4）只依赖数据集位置，不依赖划分；LabelImg 命令（Step 6）只依赖数据集位置与 classes.txt
+    STEP_DEPENDENCIES = {
+        1: [],
+        2: [1],
+        3: [2],
+        4: [2],
+        5: [3, 4],
+        6: [2, 4],
+    }
+
     def __init__(self):
         # Step 1: 原始图片导入
-        self.raw_images_folder: Optional[str] = None
-        self.processed_images: List[str] = []  # 处理后的图片列表
+        self.raw_images_folder: Optional[str] = None  # 第一个来源文件夹（兼容单文件夹导入）
+        self.raw_source_folders: List[str] = []  # 全部来源文件夹（按导入顺序）
+        self.scan_recursive: bool = False  # 是否包含子文件夹
+        self.check_integrity: bool = False  # 扫描时是否检测并排除损坏的图片
+        self.raw_folder_fingerprint: Optional[List[List[int]]] = None  # 扫描时各来源文件夹的指纹（用于恢复时判断是否需要重新扫描）
+        self.image_table: ImageTable = ImageTable()  # 图片记录表（路径、编号、子集、大小）
         self.image_count: int = 0
 
         # Step 2: 数据集目录结构
         self.dataset_parent_dir: Optional[str] = None
         self.dataset_name: str = ""
         self.dataset_root: Optional[str] = None  # 完整路径
+        self.temp_folder: Optional[str] = None  # 临时文件夹路径（存放重命名后的图片）
+        self.dataset_mode: Optional[str] = None  # 数据集模式：'create' 或 'extend'
+        self.index_width: int = 0  # 编号位数设置（0 表示自动）
+        self.verify_copies: bool = False  # Step 2 / Step 3 复制后校验完整性
+        self.physical_order: bool = False  # Step 2 / Step 3 按磁盘物理位置顺序读取源文件
+        self.index_reservation: Optional[str] = None  # 扩展模式下预留编号区间的记录文件（Step 3 完成后释放）
+        self.batch_index_range: Optional[List[int]] = None  # 本批图片在数据集中的编号区间 [起始, 结束]（重新导入时据此撤回）
 
         # Step 3: 数据划分
         self.train_ratio: float = 70.0
@@ -32,6 +56,9 @@ class DatasetConfig:
 
         # Step 5: YAML 文件
         self.yaml_filename: str = "data.yaml"
+        self.yaml_list_mode: str = ""  # YAML 引用图片的方式（见 YAMLGenerator.LIST_MODES，空表示子集目录）
+        self.yaml_list_ratios: List[float] = [70.0, 20.0, 10.0]  # 按新比例重新划分时的比例
+        self.kfold_folds: int = 0  # K 折交叉验证的折数（0 表示不生成）
         self.yaml_path: Optional[str] = None
 
         # Step 6: LabelImg 命令
@@ -47,6 +74,15 @@ class DatasetConfig:
             6: StepState(6, "LabelImg 命令生成"),
         }
 
+    @property
+    def processed_images(self) -> Sequence[str]:
+        """处理后的图片路径列表（image_table 的路径视图）"""
+        return self.image_table.paths()
+
+    @processed_images.setter
+    def processed_images(self, paths: Sequence[str]):
+        self.image_table = ImageTable.from_paths(paths)
+
     def get_step(self, step_number: int) -> StepState:
         """获取指定步骤的状态"""
         return self.steps[step_number]
@@ -55,26 +91,59 @@ class DatasetConfig:
         """检查指定步骤是否已完成"""
         return self.steps[step_number].is_completed()
 
+    @classmethod
+    def dependent_steps(cls, step_number: int) -> List[int]:
+        """直接或间接依赖 step_number 输出的步骤（按编号排序）"""
+        dependents = set()
+        for step in sorted(cls.STEP_DEPENDENCIES):
+            if any(dep == step_number or dep in dependents for dep in cls.STEP_DEPENDENCIES[step]):
+                dependents.add(step)
+        return sorted(dependents)
+
     def mark_dependent_steps_need_regenerate(self, from_step: int):
         """
         标记依赖步骤需要重新生成
 
         Args:
-            from_step: 从哪个步骤开始标记（包含该步骤之后的所有步骤）
+            from_step: 输出发生变化的步骤（标记直接或间接依赖它的已完成步骤，见 STEP_DEPENDENCIES）
         """
-        for step_num in range(from_step + 1, 7):
+        for step_num in self.dependent_steps(from_step):
             if self.steps[step_num].is_completed():
                 self.steps[step_num].mark_need_regenerate()
 
-    def to_dict(self) -> dict:
-        """转换为字典（用于序列化）"""
+    def to_dict(self, compact: bool = False) -> dict:
+        """
+        转换为字典（用于序列化）
+
+        返回的字典不与配置共享可变列表（自动保存在后台线程写入该快照）。
+
+        Args:
+            compact: 为 True 时保存完整图片记录表（列数组压缩编码），
+                     否则只保存路径列表（旧格式）
+        """
+        if compact:
+            images = {'image_table': self.image_table.to_dict()}
+        else:
+            images = {'processed_images': list(self.processed_images)}
+
         return {
             'raw_images_folder': self.raw_images_folder,
-            'processed_images': self.processed_images,
+            'raw_source_folders': list(self.raw_source_folders),
+            'scan_recursive': self.scan_recursive,
+            'check_integrity': self.check_integrity,
+            'raw_folder_fingerprint': self.raw_folder_fingerprint,
+            **images,
             'image_count': self.image_count,
             'dataset_parent_dir': self.dataset_parent_dir,
             'dataset_name': self.dataset_name,
             'dataset_root': self.dataset_root,
+            'temp_folder': self.temp_folder,
+            'dataset_mode': self.dataset_mode,
+            'index_width': self.index_width,
+            'index_reservation': self.index_reservation,
+            'batch_index_range': self.batch_index_range,
+            'verify_copies': self.verify_copies,
+            'physical_order': self.physical_order,
             'train_ratio': self.train_ratio,
             'val_ratio': self.val_ratio,
             'test_ratio': self.test_ratio,
@@ -82,10 +151,13 @@ class DatasetConfig:
             'train_count': self.train_count,
             'val_count': self.val_count,
             'test_count': self.test_count,
-            'classes': self.classes,
+            'classes': list(self.classes),
             'yaml_filename': self.yaml_filename,
+            'yaml_list_mode': self.yaml_list_mode,
+            'yaml_list_ratios': list(self.yaml_list_ratios),
+            'kfold_folds': self.kfold_folds,
             'yaml_path': self.yaml_path,
-            'labelimg_commands': self.labelimg_commands,
+            'labelimg_commands': list(self.labelimg_commands),
             'steps': {k: v.to_dict() for k, v in self.steps.items()}
         }
 
@@ -96,11 +168,35 @@ class DatasetConfig:
 
         # 基本数据
         config.raw_images_folder = data.get('raw_images_folder')
-        config.processed_images = data.get('processed_images', [])
+        config.raw_source_folders = data.get('raw_source_folders') or (
+            [config.raw_images_folder] if config.raw_images_folder else []
+        )
+        config.scan_recursive = data.get('scan_recursive', False)
+        config.check_integrity = data.get('check_integrity', False)
+        fingerprint = data.get('raw_folder_fingerprint')
+        if fingerprint and not isinstance(fingerprint[0], list):
+            fingerprint = [fingerprint]  # 旧格式：单个文件夹的指纹
+        config.raw_folder_fingerprint = fingerprint
+        if 'image_table' in data:
+            # 当前格式：只解码列数组，访问时才拼接路径
+            config.image_table = ImageTable.from_dict(data['image_table'])
+        else:
+            # 旧格式：完整路径列表，或 CompactPathList（目录 + 编号区间）
+            processed_images = data.get('processed_images', [])
+            if isinstance(processed_images, dict):
+                processed_images = CompactPathList.from_dict(processed_images)
+            config.processed_images = processed_images
         config.image_count = data.get('image_count', 0)
         config.dataset_parent_dir = data.get('dataset_parent_dir')
         config.dataset_name = data.get('dataset_name', '')
         config.dataset_root = data.get('dataset_root')
+        config.temp_folder = data.get('temp_folder')
+        config.dataset_mode = data.get('dataset_mode')
+        config.index_width = data.get('index_width', 0)
+        config.index_reservation = data.get('index_reservation')
+        config.batch_index_range = data.get('batch_index_range')
+        config.verify_copies = data.get('verify_copies', False)
+        config.physical_order = data.get('physical_order', False)
         config.train_ratio = data.get('train_ratio', 70.0)
         config.val_ratio = data.get('val_ratio', 20.0)
         config.test_ratio = data.get('test_ratio', 10.0)
@@ -110,6 +206,9 @@ class DatasetConfig:
         config.test_count = data.get('test_count', 0)
         config.classes = data.get('classes', [])
         config.yaml_filename = data.get('yaml_filename', 'data.yaml')
+        config.yaml_list_mode = data.get('yaml_list_mode', '')
+        config.yaml_list_ratios = data.get('yaml_list_ratios', [70.0, 20.0, 10.0])
+        config.kfold_folds = data.get('kfold_folds', 0)
         config.yaml_path = data.get('yaml_path')
         config.labelimg_commands = data.get('labelimg_commands', [])
 
@@ -0,0 +1,412 @@
+"""图片记录表 - 以列式数组（struct-of-arrays）存储大量图片信息"""
+
+import base64
+import os
+import re
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+
+# 纯数字文件名（如 0001、12345）
+_DIGITS = re.compile(r'^[0-9]{1,18}$')
+
+
+class ImageRecord:
+    """ImageTable 中一行的只读视图（不复制数据）"""
+
+    __slots__ = ('_table', '_row')
+
+    def __init__(self, table: 'ImageTable', row: int):
+        self._table = table
+        self._row = row
+
+    @property
+    def row(self) -> int:
+        """行号"""
+        return self._row
+
+    @property
+    def directory(self) -> str:
+        """所在目录"""
+        return self._table.dirs[self._table.dir_ids[self._row]]
+
+    @property
+    def stem(self) -> str:
+        """不含扩展名的文件名"""
+        return self._table.stem(self._row)
+
+    @property
+    def ext(self) -> str:
+        """扩展名（含点，保留原始大小写）"""
+        return self._table.exts[self._table.ext_codes[self._row]]
+
+    @property
+    def name(self) -> str:
+        """文件名"""
+        return self.stem + self.ext
+
+    @property
+    def path(self) -> str:
+        """完整路径"""
+        return self._table.path(self._row)
+
+    @property
+    def index(self) -> int:
+        """数据集编号（纯数字文件名解析得到或重命名时分配，否则为 -1）"""
+        return self._table.indices[self._row]
+
+    @property
+    def subset(self) -> Optional[str]:
+        """所属子集（'train' / 'val' / 'test'，未划分时为 None）"""
+        code = self._table.subset_codes[self._row]
+        return ImageTable.SUBSETS[code] if code >= 0 else None
+
+    @property
+    def size(self) -> int:
+        """文件大小（字节）"""
+        return self._table.sizes[self._row]
+
+    @property
+    def source(self) -> Optional[str]:
+        """来源文件夹（未登记来源时为 None）"""
+        sources = self._table.sources
+        source_id = self._table.source_ids[self._row]
+        return sources[source_id] if source_id < len(sources) else None
+
+    def __repr__(self) -> str:
+        return f"ImageRecord({self.path!r}, index={self.index}, subset={self.subset})"
+
+
+class ImagePathView(Sequence):
+    """ImageTable 的路径视图：按需拼接路径，可直接传给接收 List[str] 的函数"""
+
+    def __init__(self, table: 'ImageTable', rows: Optional[Sequence[int]] = None):
+        self._table = table
+        self._rows = rows
+
+    def __len__(self) -> int:
+        return len(self._table) if self._rows is None else len(self._rows)
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        row = index if self._rows is None else self._rows[index]
+        if row < 0:
+            row += len(self._table)
+        return self._table.path(row)
+
+    def __iter__(self) -> Iterator[str]:
+        rows = range(len(self._table)) if self._rows is None else self._rows
+        for row in rows:
+            yield self._table.path(row)
+
+
+class ImageTable:
+    """
+    列式图片记录表
+
+    每张图片占用约 30-40 字节（不含文件名本身），100 万张图片仅需几十 MB，
+    而完整路径字符串列表通常需要数百 MB。
+
+    列:
+        dir_ids       目录 ID（目录字符串驻留在 dirs 中）
+        stem blob     文件名（不含扩展名）的 UTF-8 字节，按 name_ends 偏移切分
+        ext_codes     扩展名 ID（扩展名字符串驻留在 exts 中）
+        indices       数据集编号（纯数字文件名自动解析，重命名时重新分配；否则为 -1）
+        subset_codes  子集（0=train, 1=val, 2=test, -1=未划分）
+        sizes         文件大小（字节）
+        source_ids    来源文件夹 ID（多来源导入时的出处，来源字符串存放在 sources 中）
+    """
+
+    SUBSETS = ('train', 'val', 'test')
+
+    def __init__(self):
+        self.dirs: List[str] = []
+        self.exts: List[str] = []
+        self.sources: List[str] = []
+        self._dir_lookup = {}
+        self._ext_lookup = {}
+
+        self._names = bytearray()
+        self.name_ends = array('Q')
+        self.dir_ids = array('I')
+        self.ext_codes = array('B')
+        self.indices = array('q')
+        self.subset_codes = array('b')
+        self.sizes = array('Q')
+        self.source_ids = array('H')
+
+        # to_dict() 结果缓存（表未修改时自动保存无需重新压缩）
+        self._encoded: Optional[dict] = None
+
+    # ========== 构建 ==========
+
+    def _intern_dir(self, directory: str) -> int:
+        dir_id = self._dir_lookup.get(directory)
+        if dir_id is None:
+            dir_id = len(self.dirs)
+            self._dir_lookup[directory] = dir_id
+            self.dirs.append(directory)
+        return dir_id
+
+    def _intern_ext(self, ext: str) -> int:
+        code = self._ext_lookup.get(ext)
+        if code is None:
+            code = len(self.exts)
+            if code > 255:
+                raise ValueError("扩展名种类超过 256 种")
+            self._ext_lookup[ext] = code
+            self.exts.append(ext)
+        return code
+
+    def add_source(self, folder: str) -> int:
+        """登记一个来源文件夹，返回来源 ID"""
+        if folder in self.sources:
+            return self.sources.index(folder)
+        self.sources.append(folder)
+        return len(self.sources) - 1
+
+    def append(self, directory: str, name: str, size: int = 0, source_id: int = 0) -> int:
+        """
+        添加一条记录
+
+        Args:
+            directory: 所在目录
+            name: 文件名
+            size: 文件大小（字节）
+            source_id: 来源文件夹 ID（见 add_source）
+
+        Returns:
+            新记录的行号
+        """
+        self._encoded = None
+        stem, ext = os.path.splitext(name)
+        self._names += stem.encode('utf-8')
+        self.name_ends.append(len(self._names))
+        self.dir_ids.append(self._intern_dir(directory))
+        self.ext_codes.append(self._intern_ext(ext))
+        self.indices.append(int(stem) if _DIGITS.match(stem) else -1)
+        self.subset_codes.append(-1)
+        self.sizes.append(size)
+        self.source_ids.append(source_id)
+        return len(self.name_ends) - 1
+
+    @classmethod
+    def from_paths(cls, paths: Iterable[str]) -> 'ImageTable':
+        """从路径序列构建（保持顺序，大小记为 0）"""
+        table = cls()
+        for path in paths:
+            directory, name = os.path.split(path)
+            table.append(directory, name)
+        return table
+
+    def select_rows(self, rows: Iterable[int]) -> 'ImageTable':
+        """按行号挑选记录组成新表（保留编号、子集、大小与来源）"""
+        table = ImageTable()
+        table.sources = list(self.sources)
+        for row in rows:
+            record = self[row]
+            new_row = table.append(record.directory, record.name, record.size, self.source_ids[row])
+            table.indices[new_row] = self.indices[row]
+            table.subset_codes[new_row] = self.subset_codes[row]
+        return table
+
+    def select_index_range(self, first: int, last: int) -> 'ImageTable':
+        """挑选编号在 [first, last] 内的记录组成新表"""
+        return self.select_rows(
+            row for row, index in enumerate(self.indices) if first <= index <= last
+        )
+
+    # ========== 访问 ==========
+
+    def __len__(self) -> int:
+        return len(self.name_ends)
+
+    def __getitem__(self, row: int) -> ImageRecord:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("ImageTable row out of range")
+        return ImageRecord(self, row)
+
+    def __iter__(self) -> Iterator[ImageRecord]:
+        for row in range(len(self)):
+            yield ImageRecord(self, row)
+
+    def stem(self, row: int) -> str:
+        """第 row 行的文件名（不含扩展名）"""
+        start = self.name_ends[row - 1] if row > 0 else 0
+        return self._names[start:self.name_ends[row]].decode('utf-8')
+
+    def path(self, row: int) -> str:
+        """第 row 行的完整路径"""
+        name = self.stem(row) + self.exts[self.ext_codes[row]]
+        return os.path.join(self.dirs[self.dir_ids[row]], name)
+
+    def paths(self, subset: Optional[str] = None) -> ImagePathView:
+        """
+        路径视图
+
+        Args:
+            subset: 只包含指定子集的图片；None 表示全部
+        """
+        if subset is None:
+            return ImagePathView(self)
+        return ImagePathView(self, self.rows_in_subset(subset))
+
+    def rows_in_subset(self, subset: str) -> array:
+        """指定子集的行号数组"""
+        code = ImageTable.SUBSETS.index(subset)
+        return array('Q', (row for row, c in enumerate(self.subset_codes) if c == code))
+
+    def subset_counts(self) -> Tuple[int, int, int]:
+        """(train 数量, val 数量, test 数量)"""
+        return tuple(self.subset_codes.count(code) for code in range(len(ImageTable.SUBSETS)))
+
+    def index_range(self) -> Optional[Tuple[int, int]]:
+        """已分配编号的 (最小编号, 最大编号)，没有已分配编号时返回 None"""
+        assigned = [index for index in self.indices if index >= 0]
+        if not assigned:
+            return None
+        return min(assigned), max(assigned)
+
+    def total_size(self) -> int:
+        """全部文件的总大小（字节）"""
+        return sum(self.sizes)
+
+    def nbytes(self) -> int:
+        """列数组占用的内存（字节，不含驻留的目录 / 扩展名字符串）"""
+        columns = (self.name_ends, self.dir_ids, self.ext_codes,
+                   self.indices, self.subset_codes, self.sizes, self.source_ids)
+        return len(self._names) + sum(col.itemsize * len(col) for col in columns)
+
+    # ========== 修改 ==========
+
+    def assign_indices(self, start_index: int):
+        """按行顺序分配连续的数据集编号（start_index, start_index + 1, ...）"""
+        self._encoded = None
+        self.indices = array('q', range(start_index, start_index + len(self)))
+
+    def set_subset(self, row: int, subset: Optional[str]):
+        """设置某行的子集（None 表示未划分）"""
+        self._encoded = None
+        self.subset_codes[row] = ImageTable.SUBSETS.index(subset) if subset else -1
+
+    def set_subset_codes(self, codes: array):
+        """整列替换子集编码（长度必须与表一致）"""
+        if len(codes) != len(self):
+            raise ValueError("子集编码数量与记录数不一致")
+        self._encoded = None
+        self.subset_codes = array('b', codes)
+
+    def copy_subsets_by_index(self, other: 'ImageTable') -> int:
+        """
+        按数据集编号从另一张表同步子集划分（如 temp/ 划分结果 → 原始图片表）
+
+        Returns:
+            同步的记录数
+        """
+        code_by_index = {
+            index: code
+            for index, code in zip(other.indices, other.subset_codes)
+            if index >= 0
+        }
+        codes = array('b', self.subset_codes)
+        matched = 0
+        for row, index in enumerate(self.indices):
+            code = code_by_index.get(index)
+            if code is not None:
+                codes[row] = code
+                matched += 1
+        self.set_subset_codes(codes)
+        return matched
+
+    def clear_subsets(self):
+        """清除全部子集划分"""
+        self._encoded = None
+        self.subset_codes = array('b', bytes([0xFF]) * len(self))
+
+    # ========== 序列化 ==========
+
+    @staticmethod
+    def _delta(column: array) -> array:
+        """差分编码（连续编号 / 偏移差分后几乎全为常数，压缩率极高）"""
+        deltas = array('q', column)
+        for i in range(len(deltas) - 1, 0, -1):
+            deltas[i] -= deltas[i - 1]
+        return deltas
+
+    @staticmethod
+    def _undelta(deltas: array, typecode: str) -> array:
+        """差分解码"""
+        return array(typecode, accumulate(deltas))
+
+    @staticmethod
+    def _encode_column(data: bytes) -> str:
+        return base64.b64encode(zlib.compress(data, 1)).decode('ascii')
+
+    @staticmethod
+    def _decode_column(typecode: str, text: str) -> array:
+        column = array(typecode)
+        column.frombytes(zlib.decompress(base64.b64decode(text)))
+        return column
+
+    def to_dict(self) -> dict:
+        """
+        转换为字典（列数组经 zlib 压缩后 base64 编码；表未修改时返回缓存结果）
+
+        name_ends 与 indices 先做差分编码。
+        """
+        if self._encoded is None:
+            self._encoded = self._encode()
+        return self._encoded
+
+    def _encode(self) -> dict:
+        return {
+            'byteorder': sys.byteorder,
+            'dirs': list(self.dirs),
+            'exts': list(self.exts),
+            'sources': list(self.sources),
+            'names': self._encode_column(bytes(self._names)),
+            'name_ends': self._encode_column(self._delta(self.name_ends).tobytes()),
+            'dir_ids': self._encode_column(self.dir_ids.tobytes()),
+            'ext_codes': self._encode_column(self.ext_codes.tobytes()),
+            'indices': self._encode_column(self._delta(self.indices).tobytes()),
+            'subset_codes': self._encode_column(self.subset_codes.tobytes()),
+            'sizes': self._encode_column(self.sizes.tobytes()),
+            'source_ids': self._encode_column(self.source_ids.tobytes()),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ImageTable':
+        """从字典创建实例（只解码数组，不创建任何路径字符串）"""
+        table = cls()
+        table.dirs = list(data.get('dirs', []))
+        table.exts = list(data.get('exts', []))
+        table.sources = list(data.get('sources', []))
+        table._dir_lookup = {d: i for i, d in enumerate(table.dirs)}
+        table._ext_lookup = {e: i for i, e in enumerate(table.exts)}
+
+        table._names = bytearray(zlib.decompress(base64.b64decode(data['names'])))
+        for attr, typecode in (('name_ends', 'Q'), ('dir_ids', 'I'), ('ext_codes', 'B'),
+                               ('indices', 'q'), ('subset_codes', 'b'), ('sizes', 'Q')):
+            delta_encoded = attr in ('name_ends', 'indices')
+            column = cls._decode_column('q' if delta_encoded else typecode, data[attr])
+            if data.get('byteorder', sys.byteorder) != sys.byteorder:
+                column.byteswap()
+            if delta_encoded:
+                column = cls._undelta(column, typecode)
+            setattr(table, attr, column)
+
+        # 旧草稿没有来源列：全部视为来源 0
+        if 'source_ids' in data:
+            table.source_ids = cls._decode_column('H', data['source_ids'])
+            if data.get('byteorder', sys.byteorder) != sys.byteorder:
+                table.source_ids.byteswap()
+        else:
+            table.source_ids = array('H', bytes(2 * len(table)))
+
+        return table
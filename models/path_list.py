@@ -0,0 +1,140 @@
+"""紧凑路径列表 - 以目录 + 编号区间的形式存储大量图片路径"""
+
+import os
+import re
+from bisect import bisect_right
+from typing import Iterator, List, Sequence, Union
+
+
+# 文件名拆分：前缀 + 数字 + 扩展名，如 IMG_0123.JPG → ('IMG_', '0123', '.JPG')
+_NUMBERED_NAME = re.compile(r'^(.*?)(\d+)(\.[^.]*)?$')
+
+
+class CompactPathList(Sequence):
+    """
+    只读的紧凑路径序列
+
+    路径按目录驻留（interned），连续编号的文件名合并为一个区间：
+        ["n", 目录ID, 前缀, 起始编号, 数量, 位宽, 扩展名]
+    无法合并的文件名按原样存储：
+        ["l", 目录ID, [文件名, ...]]
+
+    访问单个元素时才拼接路径，遍历时逐个生成，不会一次性展开全部路径。
+    """
+
+    def __init__(self, dirs: List[str], runs: List[list]):
+        self._dirs = dirs
+        self._runs = runs
+
+        # 每个区间的起始位置（用于二分查找）
+        self._starts = []
+        total = 0
+        for run in runs:
+            self._starts.append(total)
+            total += CompactPathList._run_length(run)
+        self._length = total
+
+    @staticmethod
+    def _run_length(run: list) -> int:
+        """区间内的路径数量"""
+        if run[0] == 'n':
+            return run[4]
+        return len(run[2])
+
+    @classmethod
+    def from_paths(cls, paths: Sequence[str]) -> 'CompactPathList':
+        """
+        从路径列表构建（保持原有顺序）
+
+        Args:
+            paths: 路径列表
+        """
+        dirs: List[str] = []
+        dir_ids = {}
+        runs: List[list] = []
+
+        # 上一个编号区间的完整路径前缀（目录 + 分隔符 + 文件名前缀），用于快速匹配
+        run_head = None
+
+        for path in paths:
+            # 快速路径：正好是上一个编号区间的下一个文件，直接延长，无需拆分路径
+            if run_head is not None:
+                last = runs[-1]
+                if path == f"{run_head}{last[3] + last[4]:0{last[5]}d}{last[6]}":
+                    last[4] += 1
+                    continue
+
+            directory, name = os.path.split(path)
+            dir_id = dir_ids.get(directory)
+            if dir_id is None:
+                dir_id = len(dirs)
+                dir_ids[directory] = dir_id
+                dirs.append(directory)
+
+            # 开启新的编号区间（位宽取数字位数，保证前导零可精确还原）
+            match = _NUMBERED_NAME.match(name)
+            if match:
+                prefix, digits, ext = match.group(1), match.group(2), match.group(3) or ''
+                runs.append(['n', dir_id, prefix, int(digits), 1, len(digits), ext])
+                run_head = path[:len(path) - len(name)] + prefix
+                continue
+
+            run_head = None
+            last = runs[-1] if runs else None
+            if last is not None and last[0] == 'l' and last[1] == dir_id:
+                last[2].append(name)
+            else:
+                runs.append(['l', dir_id, [name]])
+
+        return cls(dirs, runs)
+
+    def _path_at(self, run_index: int, offset: int) -> str:
+        """拼接指定区间内第 offset 个路径"""
+        run = self._runs[run_index]
+        directory = self._dirs[run[1]]
+        if run[0] == 'n':
+            _, _, prefix, start, _, width, ext = run
+            name = f"{prefix}{start + offset:0{width}d}{ext}"
+        else:
+            name = run[2][offset]
+        return os.path.join(directory, name)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("CompactPathList index out of range")
+
+        run_index = bisect_right(self._starts, index) - 1
+        return self._path_at(run_index, index - self._starts[run_index])
+
+    def __iter__(self) -> Iterator[str]:
+        for run_index, run in enumerate(self._runs):
+            for offset in range(CompactPathList._run_length(run)):
+                yield self._path_at(run_index, offset)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CompactPathList):
+            return self._dirs == other._dirs and self._runs == other._runs
+        if isinstance(other, (list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def to_list(self) -> List[str]:
+        """展开为普通列表"""
+        return list(self)
+
+    def to_dict(self) -> dict:
+        """转换为字典（用于序列化）"""
+        return {'dirs': self._dirs, 'runs': self._runs}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'CompactPathList':
+        """从字典创建实例（不展开路径）"""
+        return cls(data.get('dirs', []), data.get('runs', []))
@@ -1,7 +1,7 @@
 """步骤状态管理模块"""
 
 from enum import Enum
-from typing import Optional
+from typing import List, Optional
 
 
 class StepStatus(Enum):
@@ -28,6 +28,11 @@ class StepState:
         self.status = StepStatus.NOT_STARTED
         self.summary = ""  # 参数摘要
         self.error_message: Optional[str] = None
+        # 完成时的输入指纹（参数 + 上游输出）与输出指纹，用于增量执行（见 PipelineRunner）
+        self.input_fingerprint: Optional[str] = None
+        self.output_fingerprint: Optional[str] = None
+        # 各次执行的文件操作事务（按执行顺序，可撤销，见 OperationLog）
+        self.transaction_ids: List[str] = []
 
     def start(self):
         """标记步骤为进行中"""
@@ -64,6 +69,9 @@ class StepState:
         self.status = StepStatus.NOT_STARTED
         self.summary = ""
         self.error_message = None
+        self.input_fingerprint = None
+        self.output_fingerprint = None
+        self.transaction_ids = []
 
     def is_completed(self) -> bool:
         """检查是否已完成"""
@@ -86,7 +94,10 @@ class StepState:
             'step_name': self.step_name,
             'status': self.status.value,
             'summary': self.summary,
-            'error_message': self.error_message
+            'error_message': self.error_message,
+            'input_fingerprint': self.input_fingerprint,
+            'output_fingerprint': self.output_fingerprint,
+            'transaction_ids': list(self.transaction_ids)
         }
 
     @classmethod
@@ -96,4 +107,7 @@ class StepState:
         step.status = StepStatus(data['status'])
         step.summary = data.get('summary', '')
         step.error_message = data.get('error_message')
+        step.input_fingerprint = data.get('input_fingerprint')
+        step.output_fingerprint = data.get('output_fingerprint')
+        step.transaction_ids = data.get('transaction_ids', [])
         return step
@@ -0,0 +1,24 @@
+"""测试公共配置：把项目根目录加入导入路径，应用数据目录指向临时目录"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app_data(tmp_path, monkeypatch):
+    """操作日志、任务队列等写入应用数据目录的模块改用临时目录（含测试启动的子进程）"""
+    from core.operation_log import OperationLog
+    from core.transfer_engine import TransferEngine
+
+    monkeypatch.setattr(OperationLog, 'LOG_DIR', str(tmp_path / 'oplog'))
+    monkeypatch.setattr(TransferEngine, 'LIMITS_PATH', str(tmp_path / 'home' / 'transfer_limits.json'))
+    monkeypatch.setattr(TransferEngine, 'TUNING_PATH', str(tmp_path / 'home' / 'worker_tuning.json'))
+    monkeypatch.setattr(TransferEngine, '_shared_limiter', None)
+    # 子进程按用户主目录重新计算应用数据目录
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    monkeypatch.setenv('USERPROFILE', str(tmp_path / 'home'))
+    return tmp_path
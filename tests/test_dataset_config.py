@@ -0,0 +1,55 @@
+"""DatasetConfig：步骤依赖标记、自动保存快照与原始文件夹指纹"""
+
+import os
+
+from core.image_processor import ImageProcessor
+from models.dataset_config import DatasetConfig
+from models.step_state import StepStatus
+from utils.draft_manager import DraftManager
+
+
+def test_dependent_steps():
+    assert DatasetConfig.dependent_steps(1) == [2, 3, 4, 5, 6]
+    assert DatasetConfig.dependent_steps(3) == [5]
+    assert DatasetConfig.dependent_steps(4) == [5, 6]
+    assert DatasetConfig.dependent_steps(6) == []
+
+
+def test_rerun_marks_only_completed_dependents():
+    config = DatasetConfig()
+    for step in (1, 2, 3, 5):
+        config.get_step(step).complete()
+    config.mark_dependent_steps_need_regenerate(3)
+    assert config.get_step(5).status == StepStatus.NEED_REGENERATE
+    assert config.is_step_completed(2)
+    assert config.get_step(4).status == StepStatus.NOT_STARTED  # 未完成的步骤保持原状
+
+
+def test_autosave_writes_snapshot(app_data):
+    """后台线程写入的是界面线程序列化时的快照，之后的修改不影响它"""
+    config = DatasetConfig()
+    config.processed_images = ['/raw/1.jpg', '/raw/2.jpg']
+    config.classes = ['cat']
+    config.get_step(1).complete("2 张图片")
+    snapshot = config.to_dict(compact=True)
+    config.classes.append('dog')
+    config.get_step(1).transaction_ids.append('txn')
+    config.processed_images = []
+
+    path = os.path.join(str(app_data), 'home', 'autosave.json')
+    DraftManager.write_draft_data(snapshot, path)
+    restored = DraftManager.load_draft(path)
+    assert restored.classes == ['cat']
+    assert list(restored.processed_images) == ['/raw/1.jpg', '/raw/2.jpg']
+    assert restored.get_step(1).summary == "2 张图片"
+    assert restored.get_step(1).transaction_ids == []
+    assert 'format_version' not in snapshot
+
+
+def test_folder_fingerprint(tmp_path):
+    fingerprint = ImageProcessor.get_folder_fingerprint(str(tmp_path))
+    assert fingerprint == ImageProcessor.get_folder_fingerprint(str(tmp_path))
+    (tmp_path / 'new.jpg').write_bytes(b'x')
+    os.utime(tmp_path, ns=(0, 0))
+    assert ImageProcessor.get_folder_fingerprint(str(tmp_path)) != fingerprint
+    assert ImageProcessor.get_folder_fingerprint(str(tmp_path / 'missing')) is None
@@ -0,0 +1,72 @@
+"""DatasetMerger：合并数据集（类别统一、事务回滚）与硬链接不覆盖已有目标"""
+
+import os
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from core.dataset_merger import DatasetMerger
+from core.label_rewriter import LabelRewriter
+from core.operation_log import OperationLog
+from core.transfer_engine import TransferEngine
+
+
+def _make_dataset(root, classes, images):
+    for kind in ('images', 'labels'):
+        for subset in ('train', 'val', 'test'):
+            (root / kind / subset).mkdir(parents=True)
+    (root / 'labels' / 'classes.txt').write_text('\n'.join(classes) + '\n', encoding='utf-8')
+    for subset, name, class_id in images:
+        (root / 'images' / subset / f'{name}.jpg').write_bytes(name.encode() * 10)
+        (root / 'labels' / subset / f'{name}.txt').write_text(f'{class_id} 0.5 0.5 0.1 0.1\n', encoding='utf-8')
+    return str(root)
+
+
+@pytest.fixture
+def sources(app_data):
+    first = _make_dataset(app_data / 'a', ['cat', 'dog'], [('train', 'a1', 0), ('val', 'a2', 1)])
+    second = _make_dataset(app_data / 'b', ['dog', 'bird'], [('train', 'b1', 0), ('test', 'b2', 1)])
+    return [first, second]
+
+
+def test_merge(app_data, sources):
+    summary, error = DatasetMerger.merge(sources, str(app_data), 'merged', link=True)
+    assert error == ""
+    assert summary['classes'] == ['cat', 'dog', 'bird']
+    assert summary['images'] == 4
+    assert summary['subsets'] == {'train': 2, 'val': 1, 'test': 1}
+    root = app_data / 'merged'
+    # 第二个数据集的 dog(0) / bird(1) 映射为 1 / 2
+    labels = sorted((root / 'labels' / subset / name).read_text(encoding='utf-8').split()[0]
+                    for subset in ('train', 'val', 'test')
+                    for name in os.listdir(root / 'labels' / subset))
+    assert labels == ['0', '1', '1', '2']
+    # 合并记录为一个已提交、可撤销的事务
+    txn = OperationLog.list_transactions()[0]
+    assert txn['end'] == 'commit'
+    assert OperationLog.undo(txn['id'])[1] == ""
+    assert not root.exists()
+
+
+def test_failed_merge_leaves_no_target(app_data, sources, monkeypatch):
+    def broken(*_args, **_kwargs):
+        raise OSError("磁盘已满")
+
+    monkeypatch.setattr(LabelRewriter, 'remap_file', staticmethod(broken))
+    summary, error = DatasetMerger.merge(sources, str(app_data), 'merged', link=False)
+    assert "磁盘已满" in error
+    assert "已撤销" in error
+    assert not (app_data / 'merged').exists()
+    assert OperationLog.active() is None
+    assert OperationLog.incomplete() == []
+
+
+def test_link_does_not_overwrite_existing_target(tmp_path):
+    src = tmp_path / 'src.jpg'
+    src.write_bytes(b'new')
+    dst = tmp_path / 'dst.jpg'
+    dst.write_bytes(b'existing')
+    size, _, state, reason = TransferEngine._copy_one(str(src), str(dst), False, 0, link=True)
+    assert reason == "目标文件已存在"
+    assert dst.read_bytes() == b'existing'
@@ -0,0 +1,82 @@
+"""DatasetStats：类别 / 子集汇总、异常标签统计与报告输出"""
+
+import json
+import os
+import struct
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from core.dataset_builder import DatasetBuilder
+from core.dataset_stats import DatasetStats
+
+
+def _png_header(width, height):
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I4sII', 13, b'IHDR', width, height) + b'\x08\x02\x00\x00\x00'
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    root, error = DatasetBuilder.create_structure(str(tmp_path), 'ds')
+    assert error == ""
+    with open(DatasetBuilder.get_classes_file_path(root), 'w', encoding='utf-8') as f:
+        f.write('cat\ndog\n')
+
+    def add(subset, stem, image, label=None):
+        with open(os.path.join(root, 'images', subset, stem + '.png'), 'wb') as f:
+            f.write(image)
+        if label is not None:
+            with open(os.path.join(root, 'labels', subset, stem + '.txt'), 'w', encoding='utf-8') as f:
+                f.write(label)
+
+    add('train', '0001', _png_header(640, 480), '0 0.5 0.5 0.2 0.1\n1 0.5 0.5 0.1 0.1\n0 0.3 0.3 0.2 0.2\n')
+    add('train', '0002', _png_header(640, 480))  # 没有标签
+    add('train', '0003', _png_header(320, 240), '')  # 背景图
+    add('val', '0004', _png_header(100, 100), '3 0.5 0.5 1.2 0.5\n')  # 类别超出 classes.txt，坐标越界
+    add('val', '0005', _png_header(100, 100), '0 0.5 0.5\n')  # 格式错误
+    add('test', '0006', b'broken', '1 0.5 0.5 0.5 0.5\n')
+    return root
+
+
+def test_collect(dataset):
+    stats, error = DatasetStats.collect(dataset, max_workers=2)
+    assert error == ""
+    assert stats['classes'] == ['cat', 'dog', '<未定义 2>', '<未定义 3>']
+    assert stats['totals']['images'] == 6
+    assert stats['totals']['boxes'] == 5
+    assert stats['totals']['out_of_range_boxes'] == 1
+    assert stats['totals']['image_width']['max'] == 640
+
+    train, val, test = (stats['subsets'][s] for s in ('train', 'val', 'test'))
+    assert (train['images'], train['labeled_images'], train['background_images'], train['missing_labels']) == (3, 1, 1, 1)
+    assert train['class_counts'] == [2, 1, 0, 0]
+    assert train['boxes_per_image']['max'] == 3
+    assert (val['invalid_labels'], val['boxes']) == (1, 1)
+    assert (test['unreadable_images'], test['boxes']) == (1, 1)
+
+    cat, dog, _, undefined = stats['per_class']
+    assert (cat['boxes'], cat['images']) == (2, 1)
+    assert dog['by_subset'] == {'train': 1, 'val': 0, 'test': 1}
+    assert undefined['boxes'] == 1
+    assert cat['width']['median'] == pytest.approx(0.2)
+    assert sum(stats['histograms']['boxes_per_image']['counts']) == 6
+
+
+def test_generate_report(dataset, tmp_path):
+    stats, paths, error = DatasetStats.generate_report(dataset, str(tmp_path / 'out'), max_workers=1)
+    assert error == ""
+    json_path, html_path = paths
+    with open(json_path, encoding='utf-8') as f:
+        assert json.load(f)['totals'] == stats['totals']
+    with open(html_path, encoding='utf-8') as f:
+        text = f.read()
+    assert '数据集统计报告' in text and '&lt;未定义 2&gt;' in text
+
+
+def test_empty_dataset(tmp_path):
+    root, _ = DatasetBuilder.create_structure(str(tmp_path), 'empty')
+    stats, error = DatasetStats.collect(root, max_workers=1)
+    assert error == ""
+    assert stats['totals']['images'] == 0 and stats['per_class'] == []
+    assert DatasetStats.render_html({**stats, 'dataset_root': root})
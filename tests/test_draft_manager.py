@@ -0,0 +1,103 @@
+"""草稿：原子写入、紧凑路径列表与各版本草稿格式的读写"""
+
+import json
+import os
+
+import pytest
+
+from models.dataset_config import DatasetConfig
+from models.path_list import CompactPathList
+from utils.draft_manager import DraftManager
+from utils.file_utils import atomic_write
+
+PATHS = (
+    [os.path.join('/raw', f'IMG_{i:04d}.JPG') for i in range(8, 120)]
+    + [os.path.join('/raw/b', name) for name in ('cat.png', 'dog.png', '007.jpg', '8.jpg', '9.jpg', '10.jpg')]
+    + [os.path.join('/raw', f'IMG_{i:04d}.JPG') for i in range(120, 125)]
+)
+
+
+def test_atomic_write(tmp_path):
+    path = tmp_path / 'sub' / 'draft.json'
+    with atomic_write(str(path)) as f:
+        f.write('一')
+    assert path.read_text(encoding='utf-8') == '一'
+    os.chmod(path, 0o640)
+
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(path)) as f:
+            f.write('二')
+            raise RuntimeError("写入中断")
+    assert path.read_text(encoding='utf-8') == '一'
+    assert os.listdir(path.parent) == ['draft.json']
+
+    with atomic_write(str(path), 'wb') as f:
+        f.write(b'\x00\x01')
+    assert path.read_bytes() == b'\x00\x01'
+    assert os.stat(path).st_mode & 0o777 == 0o640
+
+
+def test_compact_path_list_round_trip():
+    compact = CompactPathList.from_paths(PATHS)
+    assert compact == PATHS
+    assert len(compact) == len(PATHS)
+    assert compact[0] == PATHS[0] and compact[-1] == PATHS[-1] and compact[115] == PATHS[115]
+    assert compact[110:116] == PATHS[110:116]
+    with pytest.raises(IndexError):
+        compact[len(PATHS)]
+
+    data = json.loads(json.dumps(compact.to_dict()))
+    assert len(data['runs']) < 10
+    restored = CompactPathList.from_dict(data)
+    assert restored == compact
+    assert restored.to_list() == PATHS
+
+
+def _config():
+    config = DatasetConfig()
+    config.raw_source_folders = ['/raw', '/raw/b']
+    config.raw_images_folder = '/raw'
+    config.processed_images = PATHS
+    config.image_table.set_subset(3, 'val')
+    config.image_count = len(PATHS)
+    config.classes = ['猫', '狗']
+    config.index_width = 5
+    config.get_step(1).complete("导入 123 张图片")
+    return config
+
+
+def test_save_and_load_draft(tmp_path):
+    path = tmp_path / 'draft.json'
+    DraftManager.save_draft(_config(), str(path))
+    data = json.loads(path.read_text(encoding='utf-8'))
+    assert data['format_version'] == DraftManager.FORMAT_VERSION
+    assert 'image_table' in data and 'processed_images' not in data
+    assert b'\n' not in path.read_bytes()  # 不缩进
+
+    config = DraftManager.load_draft(str(path))
+    assert list(config.processed_images) == PATHS
+    assert config.image_table.subset_codes[3] == 1
+    assert config.classes == ['猫', '狗']
+    assert config.index_width == 5
+    assert config.is_step_completed(1) and not config.is_step_completed(2)
+    assert DraftManager.validate_draft_file(str(path)) == (True, "")
+
+
+@pytest.mark.parametrize('processed_images', [PATHS, CompactPathList.from_paths(PATHS).to_dict()])
+def test_load_older_formats(tmp_path, processed_images):
+    """版本 1（完整路径列表）与版本 2（CompactPathList）的草稿"""
+    data = _config().to_dict()
+    data['processed_images'] = processed_images
+    path = tmp_path / 'draft.json'
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding='utf-8')
+    assert list(DraftManager.load_draft(str(path)).processed_images) == PATHS
+
+
+def test_load_errors(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        DraftManager.load_draft(str(tmp_path / 'missing.json'))
+    path = tmp_path / 'broken.json'
+    path.write_text('{"classes": [', encoding='utf-8')
+    with pytest.raises(ValueError):
+        DraftManager.load_draft(str(path))
+    assert DraftManager.validate_draft_file(str(path)) == (False, "JSON 格式错误")
@@ -0,0 +1,68 @@
+"""文件系统操作工具：内核态复制的回退"""
+
+import os
+
+import pytest
+
+from utils import file_utils
+from utils.file_utils import fast_copy_file
+
+DATA = bytes(range(256)) * 4096  # 1 MB
+
+
+@pytest.fixture
+def src(tmp_path):
+    path = tmp_path / 'src.bin'
+    path.write_bytes(DATA)
+    return path
+
+
+def _stalled(*_args):
+    return 0
+
+
+def test_kernel_copy_returning_zero_falls_back(src, tmp_path, monkeypatch):
+    """copy_file_range / sendfile 不报错却不复制数据（部分 FUSE 挂载）时改用普通读写"""
+    monkeypatch.setattr(os, 'copy_file_range', _stalled, raising=False)
+    monkeypatch.setattr(os, 'sendfile', _stalled, raising=False)
+    dst = tmp_path / 'dst.bin'
+    assert fast_copy_file(str(src), str(dst)) == len(DATA)
+    assert dst.read_bytes() == DATA
+
+
+def test_kernel_copy_stalling_midway_is_completed(src, tmp_path, monkeypatch):
+    """内核调用复制了一部分后停止前进：从已复制处继续"""
+    real = getattr(os, 'copy_file_range', None)
+    if real is None:
+        pytest.skip("平台不支持 copy_file_range")
+    calls = []
+
+    def partial(fd_in, fd_out, count, *args):
+        calls.append(count)
+        return real(fd_in, fd_out, min(count, 1000)) if len(calls) == 1 else 0
+
+    monkeypatch.setattr(os, 'copy_file_range', partial)
+    dst = tmp_path / 'dst.bin'
+    assert fast_copy_file(str(src), str(dst), chunk_size=4096) == len(DATA)
+    assert dst.read_bytes() == DATA
+
+
+def test_next_kernel_method_is_tried(src, tmp_path, monkeypatch):
+    """copy_file_range 没有进展时先尝试 sendfile"""
+    if getattr(os, 'sendfile', None) is None:
+        pytest.skip("平台不支持 sendfile")
+    monkeypatch.setattr(os, 'copy_file_range', _stalled, raising=False)
+    dst = tmp_path / 'dst.bin'
+    with open(src, 'rb') as f_in, open(dst, 'wb') as f_out:
+        assert file_utils._kernel_copy(f_in.fileno(), f_out.fileno(), len(DATA), 65536)
+    assert dst.read_bytes() == DATA
+
+
+def test_source_truncated_during_copy(tmp_path):
+    src = tmp_path / 'src.bin'
+    src.write_bytes(DATA[:100])
+    dst = tmp_path / 'dst.bin'
+    with open(src, 'rb') as f_in, open(dst, 'wb') as f_out:
+        # 调用方记录的大小比实际大（复制前源文件被截断）
+        assert file_utils._kernel_copy(f_in.fileno(), f_out.fileno(), len(DATA), 65536)
+    assert dst.read_bytes() == DATA[:100]
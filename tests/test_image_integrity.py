@@ -0,0 +1,95 @@
+"""图片结构完整性检查：截断检测与合法的附加数据"""
+
+import struct
+import zlib
+
+import pytest
+
+from utils.image_integrity import check_image_integrity
+
+
+def _segment(code, payload):
+    return bytes([0xFF, code]) + struct.pack('>H', len(payload) + 2) + payload
+
+
+# SOI + APP0 + SOS 段头 + 熵编码数据（0xFF 已填充为 FF 00）+ EOI
+JPEG = (b'\xff\xd8' + _segment(0xE0, b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00')
+        + _segment(0xDA, b'\x01\x01\x00\x00\x3f\x00')
+        + b'\x12\x34\xff\x00\x56' * 50 + b'\xff\xd9')
+
+
+def _png(chunks):
+    data = b'\x89PNG\r\n\x1a\n'
+    for chunk_type, payload in chunks:
+        data += struct.pack('>I', len(payload)) + chunk_type + payload
+        data += struct.pack('>I', zlib.crc32(chunk_type + payload))
+    return data
+
+
+PNG = _png([(b'IHDR', struct.pack('>IIBBBBB', 1, 1, 8, 0, 0, 0, 0)),
+            (b'IDAT', zlib.compress(b'\x00\x00')), (b'IEND', b'')])
+
+
+def _check(tmp_path, data):
+    path = tmp_path / 'image'
+    path.write_bytes(data)
+    return check_image_integrity(str(path))
+
+
+@pytest.mark.parametrize('data', [
+    JPEG,
+    JPEG + b'\x00' * 16,  # EOI 之后补零
+    JPEG + b'\x00\x00\x00\x18ftypmp42' + bytes(range(256)) * 4,  # 动态照片：EOI 之后附加视频
+    JPEG + JPEG,  # MPF：EOI 之后附加第二张图像
+    PNG,
+])
+def test_valid(tmp_path, data):
+    assert _check(tmp_path, data) == ""
+
+
+def test_truncated_jpeg(tmp_path):
+    assert "缺少 EOI" in _check(tmp_path, JPEG[:-20])
+    assert "缺少 EOI" in _check(tmp_path, JPEG[:-2] + b'\x00' * 16)
+    assert "超出文件末尾" in _check(tmp_path, JPEG[:25])
+
+
+def test_jpeg_without_image_data(tmp_path):
+    assert _check(tmp_path, JPEG[:20] + b'\xff\xd9\x00\x00') == "JPEG 在图像数据之前结束"
+
+
+def test_png(tmp_path):
+    assert "缺少 IEND" in _check(tmp_path, PNG[:-12])
+    corrupted = bytearray(PNG)
+    corrupted[-20] ^= 0xFF
+    assert "CRC 校验失败" in _check(tmp_path, bytes(corrupted))
+
+
+def test_unknown_and_empty(tmp_path):
+    assert _check(tmp_path, b'') == "文件为空"
+    assert "无法识别" in _check(tmp_path, b'GIF89a')
+
+
+@pytest.mark.parametrize('count', [10, 100])
+def test_check_files(tmp_path, count):
+    """少量文件在当前进程检查，超过 INLINE_THRESHOLD 时用进程池，结果顺序一致"""
+    from core.image_auditor import ImageAuditor
+
+    paths = []
+    for i in range(count):
+        path = tmp_path / f'{i:04d}.jpg'
+        path.write_bytes(JPEG[:-20] if i % 7 == 3 else JPEG)
+        paths.append(str(path))
+    problems, error = ImageAuditor.check_files(paths, max_workers=2)
+    assert error == ""
+    assert [i for i, _, _ in problems] == [i for i in range(count) if i % 7 == 3]
+    assert all(paths[i] == path and "缺少 EOI" in reason for i, path, reason in problems)
+
+
+def test_scan_excludes_corrupt_images(tmp_path):
+    from core.image_processor import ImageProcessor
+
+    (tmp_path / 'good.jpg').write_bytes(JPEG + JPEG)
+    (tmp_path / 'bad.jpg').write_bytes(JPEG[:-20])
+    images, error = ImageProcessor.scan_images(str(tmp_path), check_integrity=True)
+    assert error == ""
+    assert images == [str(tmp_path / 'good.jpg')]
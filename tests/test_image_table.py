@@ -0,0 +1,113 @@
+"""ImageTable：列式记录表的构建、子集操作与序列化往返"""
+
+import json
+import os
+import sys
+
+import pytest
+
+from models.image_table import ImageTable
+
+
+@pytest.fixture
+def table():
+    table = ImageTable()
+    first = table.add_source('/raw/a')
+    second = table.add_source('/raw/b')
+    for i in range(1, 6):
+        table.append('/raw/a', f'{i:04d}.jpg', size=100 + i, source_id=first)
+    table.append('/raw/b/子目录', '猫 照片.PNG', size=7, source_id=second)
+    table.append('/raw/b', 'no_ext', size=8, source_id=second)
+    table.append('/raw/b', 'IMG.1.jpeg', size=9, source_id=second)
+    return table
+
+
+def _rows(table):
+    return [(r.path, r.index, r.subset, r.size, r.source) for r in table]
+
+
+def test_columns(table):
+    assert len(table) == 8
+    assert table.path(5) == os.path.join('/raw/b/子目录', '猫 照片.PNG')
+    assert (table[5].stem, table[5].ext) == ('猫 照片', '.PNG')
+    assert table[6].name == 'no_ext'
+    assert table[7].stem == 'IMG.1'
+    assert list(table.indices) == [1, 2, 3, 4, 5, -1, -1, -1]
+    assert table.index_range() == (1, 5)
+    assert table.total_size() == 515 + 24
+    assert table[-1].source == '/raw/b'
+    assert table.dirs == ['/raw/a', '/raw/b/子目录', '/raw/b']
+    with pytest.raises(IndexError):
+        table[8]
+
+
+def test_round_trip(table):
+    table.assign_indices(1000)
+    table.set_subset(0, 'val')
+    table.set_subset(6, 'test')
+    table.set_subset(7, 'train')
+    restored = ImageTable.from_dict(json.loads(json.dumps(table.to_dict())))
+    assert _rows(restored) == _rows(table)
+    assert restored.subset_counts() == (1, 1, 1)
+    assert list(restored.paths('test')) == [table.path(6)]
+    # 反序列化后继续追加：驻留表与原表一致
+    restored.append('/raw/a', '0099.jpg')
+    assert restored.dirs == table.dirs
+    assert restored[-1].index == 99
+
+
+def test_round_trip_other_byteorder(table):
+    data = table.to_dict()
+    swapped = dict(data)
+    swapped['byteorder'] = 'big' if sys.byteorder == 'little' else 'little'
+    for attr, typecode in (('dir_ids', 'I'), ('ext_codes', 'B'), ('subset_codes', 'b'),
+                           ('sizes', 'Q'), ('source_ids', 'H')):
+        column = ImageTable._decode_column(typecode, data[attr])
+        column.byteswap()
+        swapped[attr] = ImageTable._encode_column(column.tobytes())
+    for attr in ('name_ends', 'indices'):
+        column = ImageTable._decode_column('q', data[attr])
+        column.byteswap()
+        swapped[attr] = ImageTable._encode_column(column.tobytes())
+    assert _rows(ImageTable.from_dict(swapped)) == _rows(table)
+
+
+def test_draft_without_source_column(table):
+    data = dict(table.to_dict())
+    del data['source_ids']
+    restored = ImageTable.from_dict(data)
+    assert list(restored.source_ids) == [0] * len(table)
+    assert [r.path for r in restored] == [r.path for r in table]
+
+
+def test_encoded_cache_invalidated(table):
+    encoded = table.to_dict()
+    assert table.to_dict() is encoded
+    table.set_subset(1, 'train')
+    assert table.to_dict() is not encoded
+    assert ImageTable.from_dict(table.to_dict())[1].subset == 'train'
+
+
+def test_subset_operations(table):
+    table.assign_indices(1)
+    split = table.select_index_range(2, 4)
+    assert [r.index for r in split] == [2, 3, 4]
+    assert split.sources == table.sources
+    assert [r.source for r in split] == ['/raw/a'] * 3
+    split.set_subset(0, 'test')
+    split.set_subset(2, 'val')
+
+    assert table.copy_subsets_by_index(split) == 3
+    assert [r.subset for r in table][:5] == [None, 'test', None, 'val', None]
+
+    table.clear_subsets()
+    assert table.subset_counts() == (0, 0, 0)
+    with pytest.raises(ValueError):
+        table.set_subset_codes(split.subset_codes)
+
+
+def test_from_paths():
+    paths = [os.path.join('/d', f'{i}.jpg') for i in range(3)] + [os.path.join('/e', 'x.png')]
+    table = ImageTable.from_paths(paths)
+    assert list(table.paths()) == paths
+    assert table.paths()[1:3] == paths[1:3]
@@ -0,0 +1,99 @@
+"""IndexReservation：并发预留互不重叠的编号区间、过期锁接管与租约"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core.dataset_builder import DatasetBuilder
+from core.index_reservation import IndexReservation
+
+
+@pytest.fixture
+def dataset(app_data):
+    root, error = DatasetBuilder.create_structure(str(app_data), 'ds')
+    assert error == ""
+    open(os.path.join(root, 'images', 'train', '0041.jpg'), 'w').close()
+    return root
+
+
+def _lock_path(root):
+    return os.path.join(root, IndexReservation.DIR_NAME, IndexReservation.LOCK_NAME)
+
+
+def test_sequential_reservations(dataset):
+    first, error = IndexReservation.reserve(dataset, 10)
+    assert error == ""
+    assert (first.start, first.end, len(first)) == (42, 51, 10)
+    second, _ = IndexReservation.reserve(dataset, 5, min_start=100)
+    assert (second.start, second.end) == (100, 104)
+    assert [r['start'] for r in sorted(IndexReservation.list_active(dataset), key=lambda r: r['start'])] == [42, 100]
+
+    # 释放后高水位不回退
+    assert first.release() == "" and second.release() == ""
+    assert first.release() == ""
+    third, _ = IndexReservation.reserve(dataset, 1)
+    assert third.start == 105
+    assert not os.path.exists(_lock_path(dataset))
+    assert IndexReservation.reserve(dataset, 0) == (None, "预留数量必须大于 0")
+
+
+def test_concurrent_reservations_are_disjoint(dataset):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda count: IndexReservation.reserve(dataset, count), [3, 7] * 16))
+    assert all(error == "" for _, error in results)
+    indices = [i for reservation, _ in results for i in range(reservation.start, reservation.end + 1)]
+    assert len(indices) == len(set(indices)) == 16 * 10
+    assert min(indices) == 42 and max(indices) == 42 + 16 * 10 - 1
+
+
+def test_stale_lock_is_taken_over(dataset):
+    IndexReservation.reserve(dataset, 1)
+    lock_path = _lock_path(dataset)
+    with open(lock_path, 'w', encoding='utf-8') as f:
+        json.dump({'token': 'crashed', 'pid': -1}, f)
+    old = time.time() - IndexReservation.LOCK_STALE_SECONDS - 5
+    os.utime(lock_path, (old, old))
+
+    reservation, error = IndexReservation.reserve(dataset, 2, timeout=1.0)
+    assert error == ""
+    assert reservation.start == 43
+    assert not os.path.exists(lock_path)
+    assert not [name for name in os.listdir(os.path.dirname(lock_path)) if name.endswith('.taken')]
+
+
+def test_live_lock_times_out(dataset):
+    os.makedirs(os.path.dirname(_lock_path(dataset)))
+    with open(_lock_path(dataset), 'w', encoding='utf-8') as f:
+        json.dump({'token': 'other'}, f)
+    reservation, error = IndexReservation.reserve(dataset, 1, timeout=0.1)
+    assert reservation is None and "超时" in error
+    assert os.path.exists(_lock_path(dataset))
+
+
+def test_remove_lock_keeps_lock_of_other_owner(tmp_path):
+    lock_path = str(tmp_path / 'lock')
+    with open(lock_path, 'w', encoding='utf-8') as f:
+        json.dump({'token': 'other'}, f)
+    assert not IndexReservation._remove_lock(lock_path, 'mine')
+    assert IndexReservation._read_record(lock_path) == {'token': 'other'}
+    assert os.listdir(tmp_path) == ['lock']
+    assert IndexReservation._remove_lock(lock_path, 'other')
+    assert os.listdir(tmp_path) == []
+
+
+def test_lease(dataset):
+    expired, _ = IndexReservation.reserve(dataset, 10, lease_seconds=-1)
+    assert IndexReservation.load(dataset, expired.path) is None
+    # 过期记录在下一次预留时被清理，其区间不会被重新分配
+    reservation, _ = IndexReservation.reserve(dataset, 1, lease_seconds=60)
+    assert reservation.start == 52
+    assert not os.path.exists(expired.path)
+    assert expired.renew() == "编号预留已失效: 42-51"
+
+    loaded = IndexReservation.load(dataset, reservation.path)
+    assert (loaded.start, loaded.end) == (52, 52)
+    assert loaded.renew(lease_seconds=3600) == ""
+    assert IndexReservation.load(dataset, reservation.path).expires > time.time() + 3000
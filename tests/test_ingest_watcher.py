@@ -0,0 +1,88 @@
+"""IngestWatcher：收件箱分批入库、编号被占用时不覆盖已有文件"""
+
+import os
+
+import pytest
+
+from core import ingest_watcher
+from core.dataset_builder import DatasetBuilder
+from core.ingest_watcher import IngestWatcher
+from utils.file_utils import rename_noreplace
+
+
+@pytest.fixture
+def watcher(app_data):
+    root, error = DatasetBuilder.create_structure(str(app_data), 'ds')
+    assert error == ""
+    inbox = app_data / 'inbox'
+    inbox.mkdir()
+    for i in range(4):
+        (inbox / f'img{i}.jpg').write_bytes(f'image{i}'.encode())
+    watcher = IngestWatcher(str(inbox), root, use_inotify=False, index_width=4)
+    assert watcher.start() == ""
+    yield watcher
+    watcher.close()
+
+
+def _images(root):
+    return {
+        name: open(os.path.join(root, 'images', subset, name), 'rb').read()
+        for subset in ('train', 'val', 'test')
+        for name in os.listdir(os.path.join(root, 'images', subset))
+    }
+
+
+def test_process_batch(watcher):
+    placed, error = watcher.process_batch([f'img{i}.jpg' for i in range(4)])
+    assert (placed, error) == (4, "")
+    assert sorted(_images(watcher.dataset_root)) == ['0001.jpg', '0002.jpg', '0003.jpg', '0004.jpg']
+    assert sorted(_images(watcher.dataset_root).values()) == [f'image{i}'.encode() for i in range(4)]
+    assert sorted(os.listdir(watcher.done_dir)) == [f'img{i}.jpg' for i in range(4)]
+    assert watcher.next_index == 5
+    assert sum(watcher.subset_counts) == 4
+
+
+def test_target_created_during_copy_is_not_overwritten(watcher, monkeypatch):
+    """检查目标不存在之后、重命名之前另一写入者占用了同一编号"""
+    real_copy = ingest_watcher.fast_copy_file
+    intruders = []
+
+    def copy_then_intrude(src, tmp):
+        size = real_copy(src, tmp)
+        if not intruders:
+            dst = os.path.join(os.path.dirname(tmp), os.path.basename(tmp)[1:-len('.part')])
+            with open(dst, 'wb') as f:
+                f.write(b'other writer')
+            intruders.append(dst)
+        return size
+
+    monkeypatch.setattr(ingest_watcher, 'fast_copy_file', copy_then_intrude)
+    placed, error = watcher.process_batch([f'img{i}.jpg' for i in range(4)])
+    assert (placed, error) == (3, "")
+    with open(intruders[0], 'rb') as f:
+        assert f.read() == b'other writer'
+    # 被跳过的原图留在收件箱，没有遗留临时文件
+    assert len([name for name in os.listdir(watcher.inbox) if name.endswith('.jpg')]) == 1
+    assert not [name for name in _images(watcher.dataset_root) if name.endswith('.part')]
+    assert sum(watcher.subset_counts) == 3
+    assert watcher.next_index == 5
+
+
+@pytest.mark.parametrize('link_supported', [True, False])
+def test_rename_noreplace(tmp_path, monkeypatch, link_supported):
+    if not link_supported:
+        def no_link(*_args):
+            raise PermissionError("不支持硬链接")
+        monkeypatch.setattr(os, 'link', no_link)
+    src = tmp_path / 'src'
+    dst = tmp_path / 'dst'
+    src.write_bytes(b'new')
+    rename_noreplace(str(src), str(dst))
+    assert not src.exists()
+    assert dst.read_bytes() == b'new'
+
+    src.write_bytes(b'newer')
+    with pytest.raises(FileExistsError):
+        rename_noreplace(str(src), str(dst))
+    assert src.read_bytes() == b'newer'
+    assert dst.read_bytes() == b'new'
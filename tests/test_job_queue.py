@@ -0,0 +1,160 @@
+"""JobQueue：任务状态转换、运行中任务的持有者与接管"""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from core.job_queue import Job, JobQueue
+
+
+@pytest.fixture
+def queue(app_data):
+    return JobQueue(directory=str(app_data / 'jobs'))
+
+
+@pytest.fixture
+def config(app_data):
+    raw = app_data / 'raw'
+    raw.mkdir()
+    for i in range(5):
+        (raw / f'img{i}.jpg').write_bytes(b'x' * (100 + i))
+    config, error = JobQueue.new_config([str(raw)], str(app_data / 'ds'), classes=['cat', 'dog'])
+    assert error == ""
+    return config
+
+
+def _quiet(_message):
+    pass
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def _put_running(queue, **owner) -> Job:
+    """在队列中放入一个由其他调度器持有的"运行中"任务"""
+    job = Job('20240101-000000-000000', 'other', 10)
+    job.status = Job.RUNNING
+    job.started = time.time()
+    for key, value in owner.items():
+        setattr(job, key, value)
+    with queue._locked() as jobs:
+        jobs.append(job)
+    return job
+
+
+def _poll(queue) -> Job:
+    with queue._locked() as jobs:
+        queue._poll(jobs, _quiet)
+    return queue.jobs()[0]
+
+
+def test_status_transitions(queue, config):
+    job, error = queue.add(config)
+    assert error == ""
+    assert job.image_count == 5
+    assert [j.status for j in queue.jobs()] == [Job.PENDING]
+
+    assert queue.retry(job.id) == "任务等待中，无法执行此操作"
+    assert queue.cancel(job.id) == ""
+    assert queue.jobs()[0].status == Job.CANCELLED
+    assert queue.cancel(job.id) == "任务已取消，无法取消"
+
+    assert queue.retry(job.id) == ""
+    assert queue.jobs()[0].status == Job.PENDING
+
+    assert queue.remove(job.id) == ""
+    assert queue.jobs() == []
+    assert not os.path.exists(queue.config_path(job.id))
+    assert queue.cancel(job.id) == f"任务不存在: {job.id}"
+
+
+def test_run_to_completion(queue, config):
+    job, _ = queue.add(config)
+    done, failed = queue.run(log=_quiet)
+    assert (done, failed) == (1, 0)
+    finished = queue.jobs()[0]
+    assert finished.status == Job.DONE
+    assert finished.executed == [1, 2, 3, 4, 5, 6]
+    assert finished.lease is None
+
+    # 重新排队后已完成的步骤全部跳过
+    assert queue.retry(job.id) == ""
+    assert queue.run(log=_quiet) == (1, 0)
+    assert queue.jobs()[0].skipped == [1, 2, 3, 4, 5, 6]
+
+
+def test_live_owner_is_not_taken_over(queue):
+    # 同一主机上持有者与任务进程都在运行（这里用测试进程自身的进程号代替）
+    _put_running(queue, owner='other', host=queue.host, scheduler_pid=os.getpid(), pid=os.getpid(),
+                 lease=time.time() + JobQueue.LEASE_SECONDS)
+    job = _poll(queue)
+    assert job.status == Job.RUNNING
+    assert job.owner == 'other'
+
+
+def test_orphaned_job_process_is_not_taken_over(queue):
+    # 调度器已退出、租约已过期，但任务进程仍在运行
+    _put_running(queue, owner='other', host=queue.host, scheduler_pid=_dead_pid(), pid=os.getpid(),
+                 lease=time.time() - 1)
+    assert _poll(queue).status == Job.RUNNING
+
+
+def test_dead_owner_is_taken_over(queue):
+    _put_running(queue, owner='other', host=queue.host, scheduler_pid=_dead_pid(), pid=_dead_pid(),
+                 lease=time.time() + JobQueue.LEASE_SECONDS)
+    job = _poll(queue)
+    assert job.status == Job.PENDING
+    assert job.owner is None and job.pid is None
+
+
+def test_cancelling_job_of_dead_owner_is_cancelled(queue):
+    _put_running(queue, owner='other', host=queue.host, scheduler_pid=_dead_pid(), pid=_dead_pid(),
+                 status=Job.CANCELLING)
+    assert _poll(queue).status == Job.CANCELLED
+
+
+def test_unresponsive_owner_after_job_exit_is_taken_over(queue):
+    # 调度器进程仍在但不再续期，任务进程已结束
+    _put_running(queue, owner='other', host=queue.host, scheduler_pid=os.getpid(), pid=_dead_pid(),
+                 lease=time.time() - 1)
+    assert _poll(queue).status == Job.PENDING
+
+
+@pytest.mark.parametrize('lease_offset, status', [(JobQueue.LEASE_SECONDS, Job.RUNNING), (-1, Job.PENDING)])
+def test_other_host_uses_lease(queue, lease_offset, status):
+    _put_running(queue, owner='other', host=queue.host + '-other', scheduler_pid=os.getpid(), pid=os.getpid(),
+                 lease=time.time() + lease_offset)
+    assert _poll(queue).status == status
+
+
+def test_legacy_entry_without_owner(queue):
+    """旧版本写入的运行中任务（没有持有者信息）：任务进程已结束时接管"""
+    _put_running(queue, pid=_dead_pid())
+    assert _poll(queue).status == Job.PENDING
+
+
+def test_two_schedulers_do_not_share_jobs(app_data, config):
+    first = JobQueue(directory=str(app_data / 'jobs'))
+    second = JobQueue(directory=str(app_data / 'jobs'))
+    first.add(config)
+    with first._locked() as jobs:
+        first._start(first._pick(jobs))
+    try:
+        # 另一个调度器看到的是由 first 持有的运行中任务，不会重新启动它
+        job = _poll(second)
+        assert job.status == Job.RUNNING
+        assert job.owner == first.owner
+        with second._locked() as jobs:
+            assert second._pick(jobs) is None
+    finally:
+        done, failed = first.run(log=_quiet)
+    assert (done, failed) == (1, 0)
+    assert first.jobs()[0].status == Job.DONE
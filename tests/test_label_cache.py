@@ -0,0 +1,70 @@
+"""LabelCache：标签缓存的构建、加载、损坏标记与指纹复用"""
+
+import os
+import struct
+
+import pytest
+
+from core.label_cache import LabelCache
+
+
+def _png_header(width, height):
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I4sII', 13, b'IHDR', width, height) + b'\x08\x02\x00\x00\x00'
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    for kind in ('images', 'labels'):
+        for subset in LabelCache.SUBSETS:
+            (tmp_path / kind / subset).mkdir(parents=True)
+    images = tmp_path / 'images' / 'train'
+    labels = tmp_path / 'labels' / 'train'
+    (images / '0001.png').write_bytes(_png_header(640, 480))
+    (labels / '0001.txt').write_text('0 0.5 0.5 0.25 0.25\n\n1 0.1 0.2 0.3 0.4\n', encoding='utf-8')
+    (images / '0002.png').write_bytes(_png_header(32, 16))  # 没有标注文件
+    (images / '0003.png').write_bytes(b'not an image')
+    (labels / '0003.txt').write_text('0 0.5 0.5\n2 0.5 0.5 0.5 0.5\n', encoding='utf-8')
+    return tmp_path
+
+
+def test_build_and_load(dataset):
+    paths, error = LabelCache.build_all(str(dataset), max_workers=2)
+    assert error == ""
+    assert paths == [LabelCache.get_cache_path(str(dataset), subset) for subset in LabelCache.SUBSETS]
+
+    records, error = LabelCache.load_cache(paths[0])
+    assert error == ""
+    assert [r['path'] for r in records] == ['images/train/0001.png', 'images/train/0002.png', 'images/train/0003.png']
+
+    first, second, third = records
+    assert (first['width'], first['height'], first['flags']) == (640, 480, 0)
+    assert list(first['labels']) == pytest.approx([0, 0.5, 0.5, 0.25, 0.25, 1, 0.1, 0.2, 0.3, 0.4])
+    assert (second['width'], second['height'], second['flags']) == (32, 16, LabelCache.FLAG_MISSING_LABEL)
+    assert len(second['labels']) == 0
+    assert third['flags'] == LabelCache.FLAG_CORRUPT_IMAGE | LabelCache.FLAG_INVALID_LABEL
+    assert list(third['labels']) == [2, 0.5, 0.5, 0.5, 0.5]
+
+    assert LabelCache.load_cache(paths[1]) == ([], "")
+
+
+def test_cache_reused_until_files_change(dataset):
+    cache_path, _ = LabelCache.build_subset_cache(str(dataset), 'train')
+    assert LabelCache.is_cache_valid(str(dataset), 'train')
+    os.utime(cache_path, ns=(0, 0))
+    LabelCache.build_subset_cache(str(dataset), 'train')
+    assert os.stat(cache_path).st_mtime_ns == 0  # 指纹未变，未重写
+
+    (dataset / 'labels' / 'train' / '0002.txt').write_text('3 0.5 0.5 0.1 0.1\n', encoding='utf-8')
+    assert not LabelCache.is_cache_valid(str(dataset), 'train')
+    LabelCache.build_subset_cache(str(dataset), 'train')
+    assert os.stat(cache_path).st_mtime_ns != 0
+    records, _ = LabelCache.load_cache(cache_path)
+    assert records[1]['flags'] == 0
+
+
+def test_load_rejects_other_format(tmp_path):
+    path = tmp_path / 'train.labelcache'
+    path.write_bytes(b'XXXX' + bytes(40))
+    records, error = LabelCache.load_cache(str(path))
+    assert records == [] and "不支持的缓存格式" in error
+    assert not LabelCache.is_cache_valid(str(tmp_path), 'train')
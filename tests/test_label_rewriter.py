@@ -0,0 +1,104 @@
+"""LabelRewriter：类别编号改写（两阶段替换、事务回滚、日志批量落盘）"""
+
+import os
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from core.label_rewriter import LabelRewriter
+from core.operation_log import OperationLog
+
+
+@pytest.fixture
+def dataset(app_data):
+    root = app_data / 'ds'
+    for subset in ('train', 'val', 'test'):
+        (root / 'labels' / subset).mkdir(parents=True)
+    for i in range(30):
+        subset = ('train', 'val', 'test')[i % 3]
+        (root / 'labels' / subset / f'{i:04d}.txt').write_bytes(
+            b'0 0.5 0.5 0.1 0.1\n1 0.2 0.2 0.1 0.1\n2 0.3 0.3 0.1 0.1\n')
+    return root
+
+
+def _labels(root):
+    return {
+        os.path.join(subset, name): (root / 'labels' / subset / name).read_bytes()
+        for subset in ('train', 'val', 'test')
+        for name in sorted(os.listdir(root / 'labels' / subset))
+    }
+
+
+def test_remap_text():
+    remap = np.array([1, -1, 0], dtype=np.int32)
+    text = '﻿0 0.5 0.5 0.1 0.1\n1 0.1 0.1 0.1 0.1\n2.0 0.2 0.2 0.1 0.1\n+0 0.3 0.3 0.1 0.1\n# note\n'.encode('utf-8')
+    out, kept, dropped, remapped = LabelRewriter.remap_text(text, remap)
+    assert out == b'1 0.5 0.5 0.1 0.1\n0 0.2 0.2 0.1 0.1\n1 0.3 0.3 0.1 0.1\n# note\n'
+    assert (kept, dropped, remapped) == (3, 1, 3)
+
+
+def test_dry_run_writes_nothing(dataset):
+    before = _labels(dataset)
+    stats, error = LabelRewriter.rewrite_dataset(str(dataset), np.array([2, 1, 0], dtype=np.int32), dry_run=True)
+    assert error == ""
+    assert stats['files'] == stats['changed_files'] == 30
+    assert stats['remapped_boxes'] == 60
+    assert _labels(dataset) == before
+
+
+def test_rewrite_then_undo(dataset, monkeypatch):
+    before = _labels(dataset)
+    fsyncs = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, 'fsync', lambda fd: (fsyncs.append(fd), real_fsync(fd)))
+
+    stats, error = LabelRewriter.rewrite_dataset(str(dataset), np.array([2, -1, 0], dtype=np.int32))
+    assert error == ""
+    assert stats['changed_files'] == 30
+    assert stats['dropped_boxes'] == 30
+    # 日志整批落盘：fsync 次数与文件数无关
+    assert len(fsyncs) < 10
+    assert (dataset / 'labels' / 'train' / '0000.txt').read_bytes() == b'2 0.5 0.5 0.1 0.1\n0 0.3 0.3 0.1 0.1\n'
+    assert not [name for name in _labels(dataset) if name.endswith('.tmp')]
+
+    txn = OperationLog.list_transactions()[0]
+    assert txn['end'] == 'commit'
+    assert OperationLog.undo(txn['id'])[1] == ""
+    assert _labels(dataset) == before
+
+
+def test_failed_swap_restores_everything(dataset, monkeypatch):
+    before = _labels(dataset)
+    real_replace = os.replace
+    calls = []
+
+    def flaky_replace(src, dst):
+        calls.append(src)
+        if len(calls) == 10:
+            raise OSError("磁盘已满")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, 'replace', flaky_replace)
+    _, error = LabelRewriter.rewrite_dataset(str(dataset), np.array([2, 1, 0], dtype=np.int32), max_workers=1)
+    assert "磁盘已满" in error
+    assert "已恢复全部原文件" in error
+    assert _labels(dataset) == before
+
+
+def test_failed_staging_changes_nothing(dataset, monkeypatch):
+    before = _labels(dataset)
+    real_remap = LabelRewriter.remap_text
+    calls = []
+
+    def flaky_remap(text, remap):
+        calls.append(1)
+        if len(calls) == 20:
+            raise OSError("读取失败")
+        return real_remap(text, remap)
+
+    monkeypatch.setattr(LabelRewriter, 'remap_text', staticmethod(flaky_remap))
+    _, error = LabelRewriter.rewrite_dataset(str(dataset), np.array([2, 1, 0], dtype=np.int32), max_workers=1)
+    assert "未修改任何标签文件" in error
+    assert _labels(dataset) == before
+    assert OperationLog.list_transactions() == []
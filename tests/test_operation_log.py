@@ -0,0 +1,198 @@
+"""OperationLog：中途崩溃的事务回滚、正在执行的事务不被当作崩溃遗留"""
+
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from core.operation_log import OperationLog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _make_files(folder, names):
+    folder.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        (folder / name).write_text(name, encoding='utf-8')
+
+
+def _snapshot(folder):
+    return {
+        os.path.relpath(os.path.join(directory, name), folder): open(os.path.join(directory, name), encoding='utf-8').read()
+        for directory, _, names in os.walk(folder)
+        for name in names
+        if OperationLog.TRASH_DIR_NAME not in directory
+    }
+
+
+def _run_child(app_data, body, wait=False):
+    """在子进程中执行 body（已开始事务 txn），wait 为 True 时执行后等待标准输入"""
+    script = textwrap.dedent("""
+        import os, sys
+        sys.path.insert(0, {root!r})
+        from core.operation_log import OperationLog
+        OperationLog.LOG_DIR = {log_dir!r}
+        txn = OperationLog.begin('测试事务', trash_root={trash!r})
+    """).format(root=ROOT, log_dir=OperationLog.LOG_DIR, trash=str(app_data / 'data'))
+    script += textwrap.dedent(body)
+    if wait:
+        script += "\nprint('ready', flush=True)\nsys.stdin.readline()\n"
+    else:
+        # 模拟崩溃：不提交、不回滚、不刷新缓冲
+        script += "\nos._exit(0)\n"
+    return subprocess.Popen([sys.executable, '-c', script], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            text=True)
+
+
+def test_crashed_transaction_rolls_back(app_data):
+    data = app_data / 'data'
+    _make_files(data / 'a', ['1.txt', '2.txt', '3.txt', '4.txt'])
+    before = _snapshot(data)
+
+    child = _run_child(app_data, f"""
+        data = {str(data)!r}
+        a = os.path.join(data, 'a')
+        b = os.path.join(data, 'b')
+        OperationLog.makedirs(b)
+        OperationLog.rename(os.path.join(a, '1.txt'), os.path.join(b, '1.txt'))
+        OperationLog.remove(os.path.join(a, '2.txt'))
+        OperationLog.will_create(os.path.join(a, '3.txt'))
+        with open(os.path.join(a, '3.txt'), 'w', encoding='utf-8') as f:
+            f.write('覆盖')
+        OperationLog.will_create(os.path.join(b, 'new.txt'))
+        with open(os.path.join(b, 'new.txt'), 'w', encoding='utf-8') as f:
+            f.write('新建')
+        # 整批记录后只执行了一部分
+        pairs = [(os.path.join(a, '4.txt'), os.path.join(b, '4.txt')), (os.path.join(a, 'x.txt'), os.path.join(b, 'x.txt'))]
+        OperationLog.will_move(pairs)
+        os.rename(*pairs[0])
+    """)
+    assert child.wait(30) == 0
+    assert _snapshot(data) != before
+
+    incomplete = OperationLog.incomplete()
+    assert [item['name'] for item in incomplete] == ['测试事务']
+
+    undone, error = OperationLog.undo(incomplete[0]['id'])
+    assert error == ""
+    assert undone > 0
+    assert _snapshot(data) == before
+    assert not (data / 'b').exists()
+    assert OperationLog.incomplete() == []
+
+    # 已回滚的事务不再重复撤销
+    assert OperationLog.undo(incomplete[0]['id'])[1] == "该操作已撤销"
+
+
+def test_running_transaction_is_not_listed(app_data):
+    data = app_data / 'data'
+    _make_files(data, ['1.txt'])
+    child = _run_child(app_data, f"""
+        OperationLog.rename({str(data / '1.txt')!r}, {str(data / '2.txt')!r})
+    """, wait=True)
+    try:
+        assert child.stdout.readline().strip() == 'ready'
+        assert OperationLog.incomplete() == []
+        txn_id = OperationLog.list_transactions()[0]['id']
+        assert OperationLog.undo(txn_id) == (0, "该事务正在其他进程中执行")
+    finally:
+        child.stdin.write('\n')
+        child.stdin.flush()
+        child.wait(30)
+
+    # 进程结束（未提交）后成为崩溃遗留的事务
+    assert [item['id'] for item in OperationLog.incomplete()] == [txn_id]
+    assert OperationLog.undo(txn_id)[1] == ""
+    assert (data / '1.txt').exists()
+
+
+def test_failed_step_rolls_back_in_process(app_data):
+    data = app_data / 'data'
+    _make_files(data, ['1.txt', '2.txt', '3.txt'])
+    before = _snapshot(data)
+
+    txn = OperationLog.begin('失败的步骤', trash_root=str(data))
+    try:
+        OperationLog.remove_many([str(data / '1.txt'), str(data / '2.txt')])
+        OperationLog.rename(str(data / '3.txt'), str(data / '4.txt'))
+        assert OperationLog.incomplete() == []
+    finally:
+        undone, error = txn.rollback()
+    assert error == ""
+    assert undone == 3
+    assert _snapshot(data) == before
+    assert OperationLog.active() is None
+
+
+@pytest.mark.parametrize('count', [1, 600])
+def test_moves_and_deletes_are_on_disk_before_execution(app_data, count):
+    """移动 / 删除执行时，对应记录已经写入日志文件（不在内存缓冲中）"""
+    data = app_data / 'data'
+    names = [f'{i}.txt' for i in range(count)]
+    _make_files(data, names)
+    txn = OperationLog.begin('写入顺序', trash_root=str(data))
+    try:
+        OperationLog.will_move([(str(data / name), str(data / ('m' + name))) for name in names])
+        _, entries, _ = OperationLog.read(txn.id)
+        assert sum(record['op'] == 'move' for record in entries) == count
+
+        OperationLog.remove(str(data / names[0]))
+        _, entries, _ = OperationLog.read(txn.id)
+        assert entries[-1] == {'op': 'delete', 'path': str(data / names[0]),
+                               'trash': entries[-1]['trash']}
+    finally:
+        txn.rollback()
+
+
+def _commit_one(data, name):
+    (data / name).write_text(name, encoding='utf-8')
+    txn = OperationLog.begin(name, trash_root=str(data))
+    OperationLog.remove(str(data / name))
+    txn.commit()
+    return txn.id
+
+
+def test_purge_keeps_recent_and_unfinished(app_data, monkeypatch):
+    data = app_data / 'data'
+    data.mkdir()
+    ids = [_commit_one(data, f'{i}.txt') for i in range(6)]
+    # 崩溃遗留的最早事务：不被清理
+    crashed = '19990101-000000-000000-1'
+    with open(OperationLog.log_path(crashed), 'w', encoding='utf-8') as f:
+        f.write('{"op":"begin","id":"%s","name":"crashed","time":0}\n' % crashed)
+
+    OperationLog.purge(keep=2)
+    assert OperationLog._transaction_ids() == [ids[5], ids[4], crashed]
+    assert [item['id'] for item in OperationLog.incomplete()] == [crashed]
+    # 被清理事务的回收目录一并删除
+    trash = data / OperationLog.TRASH_DIR_NAME
+    assert sorted(os.listdir(trash)) == sorted(ids[4:])
+
+
+def test_commit_purges_only_past_slack(app_data, monkeypatch):
+    data = app_data / 'data'
+    data.mkdir()
+    monkeypatch.setattr(OperationLog, 'KEEP_TRANSACTIONS', 2)
+    monkeypatch.setattr(OperationLog, 'PURGE_SLACK', 3)
+    purges = []
+    real_purge = OperationLog.purge
+    monkeypatch.setattr(OperationLog, 'purge', staticmethod(lambda keep=None: (purges.append(1), real_purge(keep))))
+    for i in range(12):
+        _commit_one(data, f'{i}.txt')
+        assert len(OperationLog._transaction_ids()) <= 2 + 3
+    assert 0 < len(purges) < 12
+
+
+def test_end_read_from_tail_only(app_data):
+    data = app_data / 'data'
+    data.mkdir()
+    txn_id = _commit_one(data, 'a.txt')
+    assert OperationLog._end_of(txn_id) == 'commit'
+    assert OperationLog.undo(txn_id)[1] == ""
+    assert OperationLog._end_of(txn_id) == 'undo'
+    # 崩溃时写了一半的最后一行视为未结束
+    with open(OperationLog.log_path(txn_id), 'a', encoding='utf-8') as f:
+        f.write('{"op":"comm')
+    assert OperationLog._end_of(txn_id) is None
@@ -0,0 +1,47 @@
+"""按物理位置排序：FIEMAP 偏移优先、inode 回退与无法访问的文件"""
+
+import os
+
+from utils import physical_layout
+from utils.physical_layout import physical_order
+
+
+def _files(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f'{i}.jpg'
+        path.write_bytes(os.urandom(4096))
+        paths.append(str(path))
+    return paths
+
+
+def test_orders_by_physical_offset(tmp_path, monkeypatch):
+    paths = _files(tmp_path, 5)
+    offsets = {paths[0]: 500, paths[1]: 100, paths[2]: None, paths[3]: 300, paths[4]: None}
+    monkeypatch.setattr(physical_layout, 'physical_offset', offsets.get)
+    order = physical_order(paths)
+    # 位置未知的文件按 inode 排在前面，其余按物理偏移
+    unknown = sorted([2, 4], key=lambda i: os.stat(paths[i]).st_ino)
+    assert order == unknown + [1, 3, 0]
+
+
+def test_fallback_and_missing_files(tmp_path, monkeypatch):
+    paths = _files(tmp_path, 4)
+    paths.insert(1, str(tmp_path / 'missing-a.jpg'))
+    paths.append(str(tmp_path / 'missing-b.jpg'))
+    monkeypatch.setattr(physical_layout, 'physical_offset', lambda path: None)
+    order = physical_order(paths)
+    assert sorted(order) == list(range(len(paths)))
+    assert order[-2:] == [1, 5]  # 无法 stat 的文件保持原顺序排在最后
+    inodes = [os.stat(paths[i]).st_ino for i in order[:-2]]
+    assert inodes == sorted(inodes)
+
+
+def test_real_offsets(tmp_path):
+    """在真实文件系统上可以调用（不支持 FIEMAP 时返回 None）"""
+    paths = _files(tmp_path, 3)
+    for path in paths:
+        offset = physical_layout.physical_offset(path)
+        assert offset is None or offset >= 0
+    assert physical_layout.physical_offset(str(tmp_path / 'missing')) is None
+    assert sorted(physical_order(paths)) == [0, 1, 2]
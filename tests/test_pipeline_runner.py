@@ -0,0 +1,143 @@
+"""PipelineRunner 增量执行：输入指纹未变化的步骤跳过"""
+
+import os
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from core.pipeline_runner import PipelineRunner
+from models.dataset_config import DatasetConfig
+
+
+def _quiet(_message):
+    pass
+
+
+@pytest.fixture
+def config(app_data):
+    """10 张图片、新建数据集、两个类别的会话（首次全部运行已完成）"""
+    raw = app_data / 'raw'
+    raw.mkdir()
+    for i in range(10):
+        (raw / f'img{i}.jpg').write_bytes(b'x' * (100 + i))
+    config = DatasetConfig()
+    config.raw_source_folders = [str(raw)]
+    config.raw_images_folder = str(raw)
+    config.dataset_mode = 'create'
+    config.dataset_parent_dir = str(app_data)
+    config.dataset_name = 'ds'
+    config.classes = ['cat', 'dog']
+
+    executed, skipped, error = PipelineRunner.run_all(config, log=_quiet)
+    assert error == ""
+    assert executed == [1, 2, 3, 4, 5, 6]
+    assert skipped == []
+    return config
+
+
+def _subset_files(config):
+    files = {}
+    for subset in ('train', 'val', 'test'):
+        folder = os.path.join(config.dataset_root, 'images', subset)
+        for name in os.listdir(folder):
+            files[name] = (subset, os.stat(os.path.join(folder, name)).st_mtime_ns)
+    return files
+
+
+def test_unchanged_run_skips_everything(config):
+    before = _subset_files(config)
+    executed, skipped, error = PipelineRunner.run_all(config, log=_quiet)
+    assert error == ""
+    assert executed == []
+    assert skipped == [1, 2, 3, 4, 5, 6]
+    assert _subset_files(config) == before
+
+
+def test_yaml_name_change_reruns_only_step5(config):
+    old_yaml = config.yaml_path
+    before = _subset_files(config)
+    config.yaml_filename = 'other.yaml'
+    executed, skipped, error = PipelineRunner.run_all(config, log=_quiet)
+    assert error == ""
+    assert executed == [5]
+    assert skipped == [1, 2, 3, 4, 6]
+    assert os.path.basename(config.yaml_path) == 'other.yaml'
+    assert not os.path.exists(old_yaml)
+    assert _subset_files(config) == before
+
+
+def test_ratio_change_moves_images_without_recopying(config):
+    before = _subset_files(config)
+    config.train_ratio, config.val_ratio, config.test_ratio = 60.0, 30.0, 10.0
+    executed, skipped, error = PipelineRunner.run_all(config, log=_quiet)
+    assert error == ""
+    assert 3 in executed
+    assert {1, 2, 4, 6} <= set(skipped)
+    after = _subset_files(config)
+    assert set(after) == set(before)
+    assert (config.train_count, config.val_count, config.test_count) == (6, 3, 1)
+    # 留在原子集中的图片未被重新复制
+    kept = [name for name in before if before[name][0] == after[name][0]]
+    assert kept
+    assert all(before[name][1] == after[name][1] for name in kept)
+
+
+def test_deleted_output_is_regenerated(config):
+    os.remove(config.yaml_path)
+    executed, skipped, error = PipelineRunner.run_all(config, log=_quiet)
+    assert error == ""
+    assert executed == [5]
+    assert os.path.isfile(config.yaml_path)
+
+
+def test_new_source_image_reruns_from_step1(config):
+    with open(os.path.join(config.raw_source_folders[0], 'img99.jpg'), 'wb') as f:
+        f.write(b'y' * 50)
+    executed, skipped, error = PipelineRunner.run_all(config, log=_quiet)
+    assert error == ""
+    assert executed[:3] == [1, 2, 3]
+    assert config.image_count == 11
+    assert len(_subset_files(config)) == 11
+
+
+def test_rescan_with_same_images_keeps_downstream(config):
+    """递归扫描总会重新执行 Step 1，结果不变时下游步骤仍然跳过"""
+    config.scan_recursive = True
+    config.get_step(1).input_fingerprint = PipelineRunner.input_fingerprint(config, 1)
+    executed, skipped, error = PipelineRunner.run_all(config, log=_quiet)
+    assert error == ""
+    assert executed == [1]
+    assert skipped == [2, 3, 4, 5, 6]
+
+
+def _fold_files(config):
+    return sorted(name for name in os.listdir(config.dataset_root)
+                  if name.startswith(('fold_', 'data_fold_')))
+
+
+def test_kfold_survives_step5_rerun(config):
+    config.kfold_folds = 3
+    executed, _, error = PipelineRunner.run_all(config, log=_quiet)
+    assert error == ""
+    assert executed == [5]
+    folds = _fold_files(config)
+    assert [name for name in folds if name.endswith('.yaml')] == [
+        'data_fold_1.yaml', 'data_fold_2.yaml', 'data_fold_3.yaml']
+    assert len(folds) == 9
+
+    # 重新执行 Step 5（删除全部旧 YAML）后折配置仍在
+    config.yaml_filename = 'other.yaml'
+    executed, _, error = PipelineRunner.run_all(config, log=_quiet)
+    assert error == ""
+    assert executed == [5]
+    assert _fold_files(config) == folds
+
+    assert PipelineRunner.run_all(config, log=_quiet)[0] == []
+
+    # 不再生成交叉验证时清理折列表
+    config.kfold_folds = 0
+    executed, _, error = PipelineRunner.run_all(config, log=_quiet)
+    assert error == ""
+    assert executed == [5]
+    assert _fold_files(config) == []
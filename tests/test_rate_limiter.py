@@ -0,0 +1,90 @@
+"""令牌桶限速：平均速率、大文件透支、运行中调整与配置文件热加载"""
+
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from core.transfer_engine import TransferEngine
+from utils.rate_limiter import RateLimiter, TokenBucket
+
+
+def _elapsed(func, *args):
+    start = time.monotonic()
+    func(*args)
+    return time.monotonic() - start
+
+
+def test_unlimited_does_not_block():
+    bucket = TokenBucket(0)
+    assert _elapsed(lambda: [bucket.consume(10 ** 9) for _ in range(1000)]) < 0.5
+
+
+def test_average_rate():
+    bucket = TokenBucket(50)
+    # 桶初始为空：第一次请求透支，其后每次等待 1/50 秒
+    elapsed = _elapsed(lambda: [bucket.consume(1) for _ in range(11)])
+    assert 0.15 < elapsed < 1.0
+
+
+def test_large_request_overdraws():
+    bucket = TokenBucket(1000)
+    assert _elapsed(bucket.consume, 300) < 0.1  # 超过桶容量的单次请求不阻塞
+    assert 0.2 < _elapsed(bucket.consume, 1) < 1.0  # 下一次请求等待透支被偿还
+
+
+def test_raising_rate_wakes_waiters():
+    bucket = TokenBucket(1)
+    bucket.consume(100)  # 按原速率需要等待 100 秒
+    waiter = threading.Thread(target=bucket.consume, args=(1,))
+    start = time.monotonic()
+    waiter.start()
+    time.sleep(0.1)
+    bucket.set_rate(0)
+    waiter.join(timeout=5)
+    assert not waiter.is_alive()
+    assert time.monotonic() - start < 1.0
+
+
+def test_set_limits_and_config_reload(tmp_path):
+    path = tmp_path / 'transfer_limits.json'
+    limiter = RateLimiter(config_path=str(path))
+    assert not limiter.active
+    assert limiter.describe() == "不限速"
+
+    limiter.set_limits(50 * 1024 * 1024, 200, 'low', save=True)
+    assert json.loads(path.read_text(encoding='utf-8')) == limiter.to_dict()
+    assert limiter.describe() == "50.0 MB/s，200 文件/秒，优先级 low"
+    with pytest.raises(ValueError):
+        limiter.set_limits(0, 0, 'realtime')
+
+    # 另一个进程修改配置：下一次检查时生效
+    other = RateLimiter(config_path=str(path))
+    assert other.to_dict() == limiter.to_dict()
+    path.write_text(json.dumps({'bytes_per_sec': 0, 'files_per_sec': 5, 'io_priority': 'bogus'}), encoding='utf-8')
+    os.utime(path, ns=(0, 0))
+    limiter._next_check = 0.0
+    assert limiter.active
+    assert limiter.to_dict() == {'bytes_per_sec': 0.0, 'files_per_sec': 5.0, 'io_priority': ''}
+
+    # 格式错误的配置保持当前设置
+    path.write_text('{', encoding='utf-8')
+    os.utime(path, ns=(1, 1))
+    limiter.reload()
+    assert limiter.files_per_sec == 5.0
+
+
+def test_copy_files_respects_file_rate(app_data):
+    src_dir = app_data / 'src'
+    src_dir.mkdir()
+    pairs = []
+    for i in range(11):
+        (src_dir / f'{i}.jpg').write_bytes(b'x')
+        pairs.append((str(src_dir / f'{i}.jpg'), str(app_data / 'dst' / f'{i}.jpg')))
+    limiter = RateLimiter(files_per_sec=50)
+    start = time.monotonic()
+    report, error = TransferEngine.copy_files(pairs, limiter=limiter)
+    assert error == "" and report.copied == 11
+    assert time.monotonic() - start > 0.15
@@ -0,0 +1,50 @@
+"""重命名预览：新文件名生成与按需计算的虚拟表格模型"""
+
+import pytest
+
+from core.image_processor import ImageProcessor
+from models.image_table import ImageTable
+
+
+@pytest.mark.parametrize('last_index, width, expected', [(9, 0, 4), (12345, 0, 5), (99, 6, 6), (1234567, 6, 7)])
+def test_resolve_index_width(last_index, width, expected):
+    assert ImageProcessor.resolve_index_width(last_index, width) == expected
+
+
+def test_format_new_name():
+    assert ImageProcessor.format_new_name(7, '.JPG') == '0007.jpg'
+    assert ImageProcessor.format_new_name(12345, '.png', 4) == '12345.png'
+    assert ImageProcessor.format_new_name(3, '', 6) == '000003.jpg'
+
+
+@pytest.fixture
+def model():
+    pytest.importorskip('PySide6')
+    from PySide6.QtCore import QCoreApplication
+    from ui.preview_dialog import RenamePreviewModel
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    table = ImageTable.from_paths([f'/raw/IMG_{i}.JPG' for i in range(200)] + ['/raw/cat.png'])
+    yield RenamePreviewModel(table, start_index=996, width=4)
+    assert app is not None
+
+
+def test_model_rows(model):
+    assert model.rowCount() == 201
+    assert model.data(model.index(0, 0)) == '1'
+    assert model.data(model.index(0, 1)) == 'IMG_0.JPG'
+    assert model.data(model.index(0, 2)) == '0996.jpg'
+    assert model.data(model.index(200, 2)) == '1196.png'
+
+    changed = []
+    model.dataChanged.connect(lambda first, last, roles=(): changed.append((first.column(), last.row())))
+    model.set_width(6)
+    assert changed == [(2, 200)]
+    assert model.new_name(0) == '000996.jpg'
+
+
+def test_model_find_row(model):
+    assert model.find_row('cat', 0) == 200
+    assert model.find_row('img_1', 5) == 10
+    assert model.find_row('0996.jpg', 1) == 0  # 到末尾后回绕
+    assert model.find_row('missing', 0) == -1
@@ -0,0 +1,149 @@
+"""重新编号：统一位数 / 连续编号、冲突检测与中断后的恢复"""
+
+import os
+
+import pytest
+
+from core.dataset_builder import DatasetBuilder
+from core.storage import LocalStorage
+
+# (子集, 原文件名, 是否有标签)
+FILES = [('train', '1.jpg', True), ('train', '0007.png', True), ('val', '03.jpg', False),
+         ('test', '12.jpg', True), ('train', '10000.jpg', True)]
+
+
+@pytest.fixture
+def dataset(app_data):
+    root, error = DatasetBuilder.create_structure(str(app_data), 'ds')
+    assert error == ""
+    for subset, name, labelled in FILES:
+        stem = os.path.splitext(name)[0]
+        with open(os.path.join(root, 'images', subset, name), 'w') as f:
+            f.write(f'image {stem}')
+        if labelled:
+            with open(os.path.join(root, 'labels', subset, stem + '.txt'), 'w') as f:
+                f.write(f'0 0.5 0.5 0.1 0.1 #{stem}')
+    return root
+
+
+def _tree(root):
+    tree = {}
+    for kind in ('images', 'labels'):
+        for subset in ('train', 'val', 'test'):
+            directory = os.path.join(root, kind, subset)
+            for name in os.listdir(directory):
+                with open(os.path.join(directory, name)) as f:
+                    tree[f'{kind}/{subset}/{name}'] = f.read()
+    return tree
+
+
+class Crash(BaseException):
+    """模拟进程在重命名中途被终止（不经过 except Exception 的恢复路径）"""
+
+
+def _crash_after(monkeypatch, calls_before, renames):
+    """第 calls_before + 1 次 rename_many 只完成前 renames 个重命名后"崩溃" """
+    real = LocalStorage.rename_many
+    calls = []
+
+    def rename_many(self, pairs, max_workers=None):
+        calls.append(len(pairs))
+        if len(calls) <= calls_before:
+            return real(self, pairs, max_workers)
+        real(self, pairs[:renames], 1)
+        raise Crash()
+
+    monkeypatch.setattr(LocalStorage, 'rename_many', rename_many)
+    return real
+
+
+def test_renumber_width(dataset):
+    renamed, error = DatasetBuilder.renumber_dataset(dataset, max_workers=2)
+    assert (renamed, error) == (4, "")
+    tree = _tree(dataset)
+    assert sorted(name for name in tree if name.startswith('images/')) == [
+        'images/test/00012.jpg', 'images/train/00001.jpg', 'images/train/00007.png',
+        'images/train/10000.jpg', 'images/val/00003.jpg']
+    assert tree['labels/train/00007.txt'].endswith('#0007')
+    assert not os.path.exists(os.path.join(dataset, DatasetBuilder.RENUMBER_PLAN_NAME))
+
+
+def test_renumber_compact(dataset):
+    renamed, error = DatasetBuilder.renumber_dataset(dataset, compact=True, max_workers=2)
+    assert (renamed, error) == (5, "")
+    tree = _tree(dataset)
+    # 按原编号顺序: 1, 3, 7, 12, 10000 -> 1..5
+    assert tree['images/train/0001.jpg'] == 'image 1'
+    assert tree['images/val/0002.jpg'] == 'image 03'
+    assert tree['images/train/0003.png'] == 'image 0007'
+    assert tree['labels/test/0004.txt'].endswith('#12')
+    assert tree['labels/train/0005.txt'].endswith('#10000')
+
+
+def test_duplicate_index_changes_nothing(dataset):
+    with open(os.path.join(dataset, 'images', 'val', '00001.png'), 'w') as f:
+        f.write('dup')
+    before = _tree(dataset)
+    renamed, error = DatasetBuilder.renumber_dataset(dataset)
+    assert renamed == 0 and "重复编号" in error
+    assert _tree(dataset) == before
+
+
+def test_orphan_label_conflict_changes_nothing(dataset):
+    with open(os.path.join(dataset, 'labels', 'train', '00001.txt'), 'w') as f:
+        f.write('orphan')
+    before = _tree(dataset)
+    renamed, error = DatasetBuilder.renumber_dataset(dataset)
+    assert renamed == 0 and "目标文件已存在" in error
+    assert _tree(dataset) == before
+
+
+def test_failure_restores_in_process(dataset, monkeypatch):
+    before = _tree(dataset)
+    real = LocalStorage.rename_many
+    calls = []
+
+    def rename_many(self, pairs, max_workers=None):
+        calls.append(1)
+        if len(calls) == 2:
+            real(self, pairs[:3], 1)
+            raise OSError("磁盘错误")
+        return real(self, pairs, max_workers)
+
+    monkeypatch.setattr(LocalStorage, 'rename_many', rename_many)
+    renamed, error = DatasetBuilder.renumber_dataset(dataset, compact=True)
+    assert renamed == 0 and "已恢复" in error
+    assert _tree(dataset) == before
+    assert not os.path.exists(os.path.join(dataset, DatasetBuilder.RENUMBER_PLAN_NAME))
+
+
+@pytest.mark.parametrize('calls_before, renames', [(0, 0), (0, 4), (1, 0), (1, 5)])
+def test_crash_then_restore(dataset, monkeypatch, calls_before, renames):
+    """第一阶段（改临时名）或第二阶段（改目标名）中途崩溃，之后按计划恢复原名"""
+    before = _tree(dataset)
+    real = _crash_after(monkeypatch, calls_before, renames)
+    with pytest.raises(Crash):
+        DatasetBuilder.renumber_dataset(dataset, compact=True)
+    assert os.path.exists(os.path.join(dataset, DatasetBuilder.RENUMBER_PLAN_NAME))
+    monkeypatch.setattr(LocalStorage, 'rename_many', real)
+
+    restored, error = DatasetBuilder.restore_renumber(dataset)
+    assert error == ""
+    assert _tree(dataset) == before
+    assert not os.path.exists(os.path.join(dataset, DatasetBuilder.RENUMBER_PLAN_NAME))
+    # 可重复执行：计划已删除时报告失败但不修改文件
+    assert DatasetBuilder.restore_renumber(dataset)[1] != ""
+    assert _tree(dataset) == before
+
+
+def test_renumber_recovers_leftover_plan(dataset, monkeypatch):
+    real = _crash_after(monkeypatch, 1, 3)
+    with pytest.raises(Crash):
+        DatasetBuilder.renumber_dataset(dataset, compact=True)
+    monkeypatch.setattr(LocalStorage, 'rename_many', real)
+
+    renamed, error = DatasetBuilder.renumber_dataset(dataset, compact=True)
+    assert (renamed, error) == (5, "")
+    tree = _tree(dataset)
+    assert tree['images/val/0002.jpg'] == 'image 03'
+    assert not [name for name in tree if '.renumber-' in name]
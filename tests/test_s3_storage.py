@@ -0,0 +1,108 @@
+"""S3Storage（moto 模拟的 S3）：列目录、读写、批量移动与数据集重新编号"""
+
+import pytest
+
+pytest.importorskip('boto3')
+moto = pytest.importorskip('moto')
+
+from core.dataset_builder import DatasetBuilder
+from core.storage import StorageBackend
+
+BUCKET = 'datasets'
+
+
+@pytest.fixture
+def storage(app_data, monkeypatch):
+    from core.s3_storage import S3Storage
+
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with moto.mock_aws():
+        storage = S3Storage(config_path=str(app_data / 'storage.json'))
+        storage.client.create_bucket(Bucket=BUCKET)
+        monkeypatch.setitem(StorageBackend._instances, 's3', storage)
+        yield storage
+
+
+def _put(storage, path, body=b'x'):
+    bucket, key = storage._parse(path)
+    storage.client.put_object(Bucket=bucket, Key=key, Body=body)
+
+
+def _keys(storage, prefix=''):
+    pages = storage.client.get_paginator('list_objects_v2').paginate(Bucket=BUCKET, Prefix=prefix)
+    return sorted(item['Key'] for page in pages for item in page.get('Contents', []))
+
+
+def test_for_path_selects_s3(storage):
+    assert StorageBackend.for_path(f's3://{BUCKET}/a') is storage
+
+
+def test_write_and_read_text(storage):
+    path = f's3://{BUCKET}/ds/classes.txt'
+    assert not storage.exists(path)
+    storage.write_text(path, '猫\n狗\n')
+    assert storage.exists(path)
+    assert storage.read_text(path) == '猫\n狗\n'
+    assert storage.isdir(f's3://{BUCKET}/ds')
+    with pytest.raises(FileNotFoundError):
+        storage.read_text(f's3://{BUCKET}/ds/missing.txt')
+
+
+def test_list_directory_and_tree(storage):
+    root = f's3://{BUCKET}/raw'
+    for name in ('img10.jpg', 'img2.jpg', 'img1.png', 'notes.txt'):
+        _put(storage, f'{root}/{name}', b'x' * len(name))
+    _put(storage, f'{root}/sub/img3.jpg')
+
+    listing = storage.list_directory(root)
+    assert listing.images() == [('img1.png', 8), ('img2.jpg', 8), ('img10.jpg', 9)]
+    assert 'notes.txt' in listing.files()
+    assert listing.subdirs() == ['sub']
+
+    tree = sorted((storage.relpath(directory, root), name) for directory, name, _ in storage.list_tree(root))
+    assert tree == [('', 'img1.png'), ('', 'img10.jpg'), ('', 'img2.jpg'), ('sub', 'img3.jpg')]
+
+
+def test_rename_many(storage):
+    pairs = [(f's3://{BUCKET}/a/{i}.jpg', f's3://{BUCKET}/b/{i}.jpg') for i in range(25)]
+    for src, _ in pairs:
+        _put(storage, src, src.encode())
+    assert storage.rename_many(pairs, max_workers=4) == 25
+    assert _keys(storage, 'a/') == []
+    assert _keys(storage, 'b/') == sorted(f'b/{i}.jpg' for i in range(25))
+    assert storage.read_text(pairs[3][1]) == pairs[3][0]
+
+
+def test_rename_many_failure_keeps_every_file(storage):
+    """中途失败：每个文件都仍在源或目标之一"""
+    pairs = [(f's3://{BUCKET}/a/{i}.jpg', f's3://{BUCKET}/b/{i}.jpg') for i in range(10)]
+    for src, _ in pairs[:-1]:
+        _put(storage, src)
+    with pytest.raises(OSError):
+        storage.rename_many(pairs, max_workers=1)
+    for src, dst in pairs[:-1]:
+        assert storage.exists(src) or storage.exists(dst)
+
+
+def test_renumber_dataset(storage):
+    root, error = DatasetBuilder.create_structure(f's3://{BUCKET}', 'ds')
+    assert error == ""
+    valid, error = DatasetBuilder.validate_existing_structure(root)
+    assert valid, error
+    for subset, index in (('train', 1), ('train', 7), ('val', 3), ('test', 12)):
+        _put(storage, f'{root}/images/{subset}/{index:d}.jpg', f'{subset}{index}'.encode())
+        _put(storage, f'{root}/labels/{subset}/{index:d}.txt', f'0 0.5 0.5 0.1 0.1 #{index}'.encode())
+
+    renamed, error = DatasetBuilder.renumber_dataset(root, width=4, compact=True, max_workers=4)
+    assert error == ""
+    assert renamed == 4
+    # 按原编号顺序连续编号: 1 -> 1, 3 -> 2, 7 -> 3, 12 -> 4
+    assert [key for key in _keys(storage, 'ds/') if not key.endswith('/')] == [
+        'ds/images/test/0004.jpg', 'ds/images/train/0001.jpg', 'ds/images/train/0003.jpg', 'ds/images/val/0002.jpg',
+        'ds/labels/classes.txt', 'ds/labels/test/0004.txt', 'ds/labels/train/0001.txt', 'ds/labels/train/0003.txt', 'ds/labels/val/0002.txt',
+    ]
+    assert storage.read_text(f'{root}/images/train/0003.jpg') == 'train7'
+    assert storage.read_text(f'{root}/labels/test/0004.txt').endswith('#12')
+    assert not storage.exists(f'{root}/{DatasetBuilder.RENUMBER_PLAN_NAME}')
@@ -0,0 +1,126 @@
+"""ScanCache：目录未变化时复用排序结果（内存 / 磁盘两级缓存、失效与淘汰）"""
+
+import os
+import time
+
+import pytest
+
+from utils.scan_cache import DirectoryListing, ScanCache
+
+
+@pytest.fixture
+def cache(app_data, monkeypatch):
+    monkeypatch.setattr(ScanCache, 'CACHE_DIR', str(app_data / 'scan_cache'))
+    monkeypatch.setattr(ScanCache, 'PERSIST_MIN_ENTRIES', 3)
+    ScanCache.clear()
+    yield app_data / 'scan_cache'
+    ScanCache.clear()
+
+
+def _settle(directory):
+    """把目录修改时间调到 RACY_SECONDS 之前（刚修改过的目录不缓存）"""
+    old = time.time() - ScanCache.RACY_SECONDS - 10
+    os.utime(directory, (old, old))
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / 'raw'
+    (folder / 'sub').mkdir(parents=True)
+    for name in ('img10.jpg', 'img2.JPG', 'img1.png', 'notes.txt'):
+        (folder / name).write_bytes(b'x' * len(name))
+    os.symlink(folder / 'sub', folder / 'link')
+    _settle(folder)
+    return folder
+
+
+def test_listing(cache, folder):
+    listing = ScanCache.list_directory(str(folder))
+    assert len(listing) == 6
+    assert listing.images() == [('img1.png', 8), ('img2.JPG', 8), ('img10.jpg', 9)]
+    assert listing.files() == ['img1.png', 'img2.JPG', 'img10.jpg', 'notes.txt']
+    assert listing.subdirs() == ['sub']
+    assert listing.subdirs(follow_symlinks=True) == ['link', 'sub']
+    with pytest.raises(OSError):
+        ScanCache.list_directory(str(folder / 'missing'))
+
+
+def test_memory_hit_and_invalidation(cache, folder):
+    listing = ScanCache.list_directory(str(folder))
+    assert ScanCache.list_directory(str(folder)) is listing
+
+    (folder / 'img3.jpg').write_bytes(b'y')
+    _settle(folder)
+    listing = ScanCache.list_directory(str(folder))
+    assert [name for name, _ in listing.images()] == ['img1.png', 'img2.JPG', 'img3.jpg', 'img10.jpg']
+
+
+def test_recently_modified_directory_is_not_cached(cache, folder):
+    os.utime(folder)
+    first = ScanCache.list_directory(str(folder))
+    assert ScanCache.list_directory(str(folder)) is not first
+    assert not cache.exists()
+
+
+def test_disk_cache(cache, folder, monkeypatch):
+    listing = ScanCache.list_directory(str(folder))
+    assert len(os.listdir(cache)) == 1
+
+    # 新进程：内存缓存为空，从磁盘加载，不读取目录
+    with ScanCache._lock:
+        ScanCache._memory.clear()
+        ScanCache._memory_entries = 0
+    monkeypatch.setattr(ScanCache, '_scan', lambda *args: pytest.fail("不应重新扫描目录"))
+    loaded = ScanCache.list_directory(str(folder))
+    assert loaded is not listing
+    assert (loaded.names, loaded.flags, list(loaded.sizes)) == (listing.names, listing.flags, list(listing.sizes))
+
+
+def test_corrupt_disk_cache_is_ignored(cache, folder):
+    listing = ScanCache.list_directory(str(folder))
+    (path,) = [cache / name for name in os.listdir(cache)]
+    path.write_bytes(path.read_bytes()[:-5])
+    with ScanCache._lock:
+        ScanCache._memory.clear()
+        ScanCache._memory_entries = 0
+    assert ScanCache.list_directory(str(folder)).names == listing.names
+
+
+def test_disk_eviction(cache, tmp_path, monkeypatch):
+    folders = []
+    for i in range(3):
+        folder = tmp_path / f'd{i}'
+        folder.mkdir()
+        for j in range(200):
+            (folder / f'{j}_{"x" * 40}.jpg').write_bytes(b'')
+        _settle(folder)
+        folders.append(folder)
+    ScanCache.list_directory(str(folders[0]))
+    size = os.path.getsize(cache / os.listdir(cache)[0])
+    monkeypatch.setattr(ScanCache, 'DISK_MAX_BYTES', size * 2 + size // 2)
+
+    old = time.time() - 100
+    os.utime(cache / os.listdir(cache)[0], (old, old))
+    ScanCache.list_directory(str(folders[1]))
+    ScanCache.list_directory(str(folders[2]))
+    # 最久未使用的缓存文件被淘汰
+    assert len(os.listdir(cache)) == 2
+    assert ScanCache._disk_path(ScanCache._key(str(folders[0]))) not in [str(cache / n) for n in os.listdir(cache)]
+
+
+def test_memory_limit(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(ScanCache, 'MEMORY_MAX_ENTRIES', 5)
+    monkeypatch.setattr(ScanCache, 'PERSIST_MIN_ENTRIES', 1000)
+    folders = []
+    for i in range(3):
+        folder = tmp_path / f'm{i}'
+        folder.mkdir()
+        for j in range(3):
+            (folder / f'{j}.jpg').write_bytes(b'')
+        _settle(folder)
+        folders.append(folder)
+    listings = [ScanCache.list_directory(str(folder)) for folder in folders]
+    assert ScanCache._memory_entries <= 5
+    assert ScanCache.list_directory(str(folders[2])) is listings[2]
+    assert ScanCache.list_directory(str(folders[0])) is not listings[0]
+    assert isinstance(listings[0], DirectoryListing)
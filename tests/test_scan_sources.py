@@ -0,0 +1,65 @@
+"""多来源导入：并发扫描、确定的合并顺序与重复来源去重"""
+
+import os
+
+import pytest
+
+from core.image_processor import ImageProcessor
+
+
+@pytest.fixture
+def folders(app_data):
+    first = app_data / 'a'
+    (first / 'sub').mkdir(parents=True)
+    for name in ('img10.jpg', 'img2.jpg', 'img1.png', 'notes.txt'):
+        (first / name).write_bytes(b'x' * len(name))
+    (first / 'sub' / 'img3.jpg').write_bytes(b'y')
+    second = app_data / 'b'
+    second.mkdir()
+    (second / 'b1.jpg').write_bytes(b'z')
+    return str(first), str(second)
+
+
+def _names(table):
+    return [(record.source, os.path.basename(record.path)) for record in table]
+
+
+@pytest.mark.parametrize('workers', [None, 1, 4])
+def test_order_follows_sources(folders, workers):
+    first, second = folders
+    table, error = ImageProcessor.scan_sources([second, first], max_workers=workers)
+    assert error == ""
+    assert _names(table) == [(second, 'b1.jpg'), (first, 'img1.png'), (first, 'img2.jpg'), (first, 'img10.jpg')]
+    assert table[1].size == len('img1.png')
+
+
+def test_recursive_and_overlapping_sources(folders):
+    first, second = folders
+    sub = os.path.join(first, 'sub')
+    table, error = ImageProcessor.scan_sources([sub, first, second, first + os.sep], recursive=True)
+    assert error == ""
+    # sub 中的文件只保留一次（归属先列出的来源），重复的来源文件夹被忽略
+    assert _names(table) == [(sub, 'img3.jpg'), (first, 'img1.png'), (first, 'img2.jpg'),
+                             (first, 'img10.jpg'), (second, 'b1.jpg')]
+    assert table.sources == [sub, first, second]
+
+    table, _ = ImageProcessor.scan_sources([first], recursive=True)
+    assert [os.path.relpath(record.path, first) for record in table] == [
+        'img1.png', 'img2.jpg', 'img10.jpg', os.path.join('sub', 'img3.jpg')]
+
+
+def test_errors(folders, app_data):
+    first, _ = folders
+    assert ImageProcessor.scan_sources([])[1] == "没有选择来源文件夹"
+    missing = str(app_data / 'missing')
+    assert ImageProcessor.scan_sources([first, missing])[1] == f"文件夹不存在: {missing}"
+    (app_data / 'empty').mkdir()
+    table, error = ImageProcessor.scan_sources([str(app_data / 'empty')])
+    assert len(table) == 0 and "没有找到图片文件" in error
+
+
+def test_sources_fingerprint(folders, app_data):
+    first, second = folders
+    fingerprints = ImageProcessor.get_sources_fingerprint([first, second])
+    assert len(fingerprints) == 2
+    assert ImageProcessor.get_sources_fingerprint([first, str(app_data / 'missing')]) is None
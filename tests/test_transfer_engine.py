@@ -0,0 +1,95 @@
+"""TransferEngine：并发复制、复制后校验与重试、失败报告"""
+
+import os
+
+import pytest
+
+from core import transfer_engine
+from core.transfer_engine import TransferEngine, TransferReport
+
+
+@pytest.fixture
+def pairs(app_data):
+    src_dir = app_data / 'src'
+    src_dir.mkdir()
+    result = []
+    for i in range(20):
+        src = src_dir / f'{i}.jpg'
+        src.write_bytes(os.urandom(1000 + i))
+        result.append((str(src), str(app_data / 'dst' / ('a' if i % 2 else 'b') / f'{i:04d}.jpg')))
+    return result
+
+
+def _same(pairs):
+    for src, dst in pairs:
+        with open(src, 'rb') as a, open(dst, 'rb') as b:
+            assert a.read() == b.read()
+
+
+@pytest.mark.parametrize('verify', [False, True])
+def test_copy_files(pairs, verify):
+    report, error = TransferEngine.copy_files(pairs, verify=verify, max_workers=4)
+    assert error == ""
+    assert report.ok
+    assert report.copied == 20
+    assert report.verified == (20 if verify else 0)
+    assert report.bytes == sum(1000 + i for i in range(20))
+    _same(pairs)
+
+
+def test_verify_retries_corrupted_copy(pairs, monkeypatch):
+    """目标读回的哈希不一致时重新复制"""
+    real_hash = transfer_engine.hash_file
+    corrupted = []
+
+    def flaky_hash(path, *args, **kwargs):
+        size, digest = real_hash(path, *args, **kwargs)
+        if path == pairs[3][1] and not corrupted:
+            corrupted.append(path)
+            return size, '0' * len(digest)
+        return size, digest
+
+    monkeypatch.setattr(transfer_engine, 'hash_file', flaky_hash)
+    report, error = TransferEngine.copy_files(pairs, verify=True, max_workers=4)
+    assert error == ""
+    assert report.ok and report.verified == 20
+    assert report.retried == 1
+    assert "重试 1 次" in report.summary()
+
+
+def test_persistent_mismatch_is_reported(pairs, monkeypatch):
+    monkeypatch.setattr(transfer_engine, 'hash_file', lambda path, *args, **kwargs: (0, 'bad'))
+    report, error = TransferEngine.copy_files(pairs[:2], verify=True, retries=2, max_workers=1)
+    assert error == ""
+    assert report.copied == 0
+    assert report.retried == 4
+    assert [reason for _, _, reason in report.failures] == ["内容哈希不一致"] * 2
+
+
+def test_failed_file_does_not_stop_others(pairs):
+    os.remove(pairs[5][0])
+    report, error = TransferEngine.copy_files(pairs, max_workers=4, retries=1)
+    assert error == ""
+    assert report.copied == 19
+    assert [(src, dst) for src, dst, _ in report.failures] == [pairs[5]]
+    assert pairs[5][0] in report.format_failures()
+    _same(pairs[:5] + pairs[6:])
+
+
+def test_link_and_physical_order(pairs):
+    report, error = TransferEngine.copy_files(pairs, link=True, physical_order=True, max_workers=4)
+    assert error == ""
+    assert report.linked == 20
+    assert os.stat(pairs[0][0]).st_ino == os.stat(pairs[0][1]).st_ino
+    _same(pairs)
+
+
+def test_empty_and_report_formatting(app_data):
+    report, error = TransferEngine.copy_files([])
+    assert error == "" and report.ok and report.copied == 0
+
+    report = TransferReport()
+    report.failures = [(f'/s/{i}', f'/d/{i}', '错误') for i in range(12)]
+    text = report.format_failures(limit=10)
+    assert text.count('\n') == 10
+    assert text.endswith("…… 共 12 个文件失败")
@@ -0,0 +1,80 @@
+"""传输预检：磁盘空间判断、试探复制估计耗时与摘要文本"""
+
+import os
+import shutil
+from collections import namedtuple
+
+import pytest
+
+from core.transfer_engine import TransferEngine, TransferPlan
+
+Usage = namedtuple('Usage', 'total used free')
+
+
+@pytest.fixture
+def sources(app_data):
+    src_dir = app_data / 'src'
+    src_dir.mkdir()
+    paths = []
+    for i in range(50):
+        path = src_dir / f'{i}.jpg'
+        path.write_bytes(b'x' * 10000)
+        paths.append(str(path))
+    return paths
+
+
+def _free(monkeypatch, free):
+    monkeypatch.setattr(shutil, 'disk_usage', lambda path: Usage(free * 2, free, free))
+
+
+def test_preflight_with_probe(sources, app_data, monkeypatch):
+    _free(monkeypatch, TransferEngine.RESERVE_BYTES + 10 * 1024 * 1024)
+    target = app_data / 'dataset' / 'temp'  # 尚未创建
+    plan, error = TransferEngine.preflight(sources, 50 * 10000, str(target))
+    assert error == ""
+    assert plan.fits and plan.fits_followup
+    assert plan.files == 50 and plan.bytes == 500000
+    assert plan.required > plan.bytes  # 含块对齐开销
+    assert plan.free == 10 * 1024 * 1024
+    assert plan.probe_mb > 0 and plan.estimated_seconds > 0 and not plan.probing
+    assert "预计耗时" in plan.summary()
+    # 试探文件已删除，目标目录没有被创建
+    assert not target.parent.exists()
+    assert not [name for name in os.listdir(app_data) if name.startswith(TransferEngine.PROBE_DIR_NAME)]
+
+
+def test_preflight_not_enough_space(sources, app_data, monkeypatch):
+    _free(monkeypatch, TransferEngine.RESERVE_BYTES + 100000)
+    plan, error = TransferEngine.preflight(sources, 50 * 10000, str(app_data / 'dst'), followup_bytes=10)
+    assert error == ""
+    assert not plan.fits
+    assert plan.estimated_seconds is None  # 空间不足时不试探
+    assert "空间不足: 还差" in plan.summary()
+
+
+def test_preflight_followup_warning(sources, app_data, monkeypatch):
+    _free(monkeypatch, TransferEngine.RESERVE_BYTES + 1024 * 1024)
+    plan, _ = TransferEngine.preflight(sources, 50 * 10000, str(app_data / 'dst'),
+                                       followup_bytes=1024 * 1024, probe=False)
+    assert plan.fits and not plan.fits_followup
+    assert "后续步骤还需要约" in plan.summary()
+
+
+def test_hard_links_need_no_space(sources, app_data, monkeypatch):
+    _free(monkeypatch, 0)
+    plan, _ = TransferEngine.preflight(sources, 50 * 10000, str(app_data / 'dst'), link=True)
+    assert plan.required == 0 and plan.fits
+
+
+def test_formatting():
+    assert TransferPlan.format_bytes(512) == "512 B"
+    assert TransferPlan.format_bytes(1536) == "1.5 KB"
+    assert TransferPlan.format_bytes(3 * 1024 ** 4) == "3.00 TB"
+    assert TransferPlan.format_duration(0.2) == "不到 1 秒"
+    assert TransferPlan.format_duration(125) == "2 分 5 秒"
+    assert TransferPlan.format_duration(7260) == "2 小时 1 分"
+
+    plan = TransferPlan(10, 1000, 1000, 5000, '/dst')
+    plan.estimated_seconds, plan.probe_mb = 30.0, 1.0
+    assert "预计耗时: 30 秒" in plan.summary()
+    assert "预计耗时: 1 分 0 秒" in plan.summary(verify=True)
@@ -0,0 +1,60 @@
+"""WorkerTuner 爬山调节：模拟不同吞吐曲线，检查收敛位置与稳定性"""
+
+import random
+
+import pytest
+
+import utils.worker_tuner as worker_tuner
+from utils.worker_tuner import WorkerTuner
+
+
+def simulate(curve, windows=300, noise=0.0, seed=1):
+    """按吞吐曲线逐窗口调节，返回 (调节器, 每个窗口后的 best_workers)"""
+    rng = random.Random(seed)
+    tuner = WorkerTuner('test', start=8)
+    history = []
+    for _ in range(windows):
+        workers = tuner.workers
+        throughput = curve(workers) * rng.uniform(1 - noise, 1 + noise)
+        tuner._adjust(throughput, workers / throughput)
+        history.append(tuner.best_workers)
+    return tuner, history
+
+
+@pytest.fixture(autouse=True)
+def eight_cpus(monkeypatch):
+    monkeypatch.setattr(worker_tuner, 'available_cpus', lambda: 8.0)
+
+
+@pytest.mark.parametrize('noise', [0.0, 0.03])
+def test_linear_throughput_does_not_drift_down(noise):
+    """吞吐随并发线性增长：停在上限附近，不因"持平且更少"逐步下滑"""
+    tuner, history = simulate(lambda w: 100.0 * w, noise=noise)
+    assert tuner.settled
+    assert len(set(history[-200:])) == 1
+    assert tuner.best_workers >= tuner.maximum * (1 - 2 * WorkerTuner.IMPROVE_RATIO)
+
+
+@pytest.mark.parametrize('noise', [0.0, 0.03])
+def test_peaked_throughput_settles(noise):
+    """吞吐在 40 线程处最高：停止探索，最好值不再来回变化"""
+    curve = lambda w: 100.0 * (40 - abs(40 - w) * 0.5)
+    tuner, history = simulate(curve, noise=noise)
+    assert tuner.settled
+    assert len(set(history[-200:])) == 1
+    assert curve(tuner.best_workers) >= curve(40) * 0.85
+
+
+def test_saturated_throughput_prefers_fewer_workers():
+    """吞吐在 16 线程后饱和：选择饱和点，而不是上限"""
+    tuner, _ = simulate(lambda w: 100.0 * min(w, 16))
+    assert tuner.settled
+    assert tuner.best_workers == 16
+
+
+def test_retune_after_load_change():
+    """停止探索后吞吐大幅下降时重新探索"""
+    tuner, _ = simulate(lambda w: 100.0 * min(w, 16), windows=100)
+    assert tuner.settled
+    tuner._adjust(100.0, 1.0)
+    assert not tuner.settled
@@ -0,0 +1,82 @@
+"""YAMLGenerator：图片列表、按新比例重新划分与 K 折交叉验证（不复制图片）"""
+
+import os
+
+import pytest
+
+from core.dataset_builder import DatasetBuilder
+from core.yaml_generator import YAMLGenerator
+
+CLASSES = ['cat', 'dog']
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    root, error = DatasetBuilder.create_structure(str(tmp_path), 'ds')
+    assert error == ""
+    for index in range(1, 21):
+        subset = 'train' if index <= 14 else ('val' if index <= 18 else 'test')
+        open(os.path.join(root, 'images', subset, f'{index:04d}.jpg'), 'w').close()
+    return root
+
+
+def _read_list(root, name):
+    with open(os.path.join(root, name), encoding='utf-8') as f:
+        return f.read().splitlines()
+
+
+def _read_yaml(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def test_subset_lists(dataset):
+    yaml_path, error = YAMLGenerator.generate_training_yaml(dataset, CLASSES, 'data.yaml',
+                                                            YAMLGenerator.LIST_MODE_SUBSETS)
+    assert error == ""
+    assert _read_list(dataset, 'val.txt') == [f'./images/val/{i:04d}.jpg' for i in range(15, 19)]
+    assert len(_read_list(dataset, 'train.txt')) == 14
+    text = _read_yaml(yaml_path)
+    assert 'train: train.txt' in text and 'test: test.txt' in text
+    assert text.endswith('names:\n  - cat\n  - dog')
+
+
+def test_resplit_lists(dataset):
+    yaml_path, error = YAMLGenerator.generate_training_yaml(
+        dataset, CLASSES, 'data.yaml', YAMLGenerator.LIST_MODE_RESPLIT, ratios=(50.0, 50.0, 0.0), seed=1)
+    assert error == ""
+    train, val = _read_list(dataset, 'train.txt'), _read_list(dataset, 'val.txt')
+    assert len(train) == len(val) == 10
+    assert sorted(train + val) == sorted(f'./{p}' for p in YAMLGenerator.collect_image_pool(dataset))
+    assert _read_list(dataset, 'test.txt') == []
+    assert 'test:' not in _read_yaml(yaml_path)
+    # 同样的种子得到同样的划分
+    YAMLGenerator.generate_split_lists(dataset, CLASSES, 50.0, 50.0, 0.0, seed=1)
+    assert _read_list(dataset, 'train.txt') == train
+
+
+def test_kfold(dataset):
+    paths, error = YAMLGenerator.generate_kfold(dataset, CLASSES, k=4, seed=3)
+    assert error == ""
+    assert [os.path.basename(p) for p in paths] == [f'data_fold_{i}.yaml' for i in range(1, 5)]
+
+    pool = sorted(f'./{p}' for p in YAMLGenerator.collect_image_pool(dataset, ('train', 'val')))
+    folds = [_read_list(dataset, f'fold_{i}_val.txt') for i in range(1, 5)]
+    assert sorted(sum(folds, [])) == pool  # 各折的 val 互不重叠且覆盖全部图片
+    for i, val in enumerate(folds, start=1):
+        assert sorted(_read_list(dataset, f'fold_{i}_train.txt') + val) == pool
+        assert 'test: images/test' in _read_yaml(paths[i - 1])
+
+    # 折数变少时清理多余的文件
+    YAMLGenerator.generate_kfold(dataset, CLASSES, k=2)
+    names = os.listdir(dataset)
+    assert 'data_fold_3.yaml' not in names and 'fold_4_val.txt' not in names
+    assert YAMLGenerator.remove_kfold_files(dataset) == ""
+    assert not [name for name in os.listdir(dataset) if name.startswith(('fold_', 'data_fold_'))]
+
+
+def test_errors(dataset):
+    assert YAMLGenerator.generate_kfold(dataset, CLASSES, k=1)[1] == "折数至少为 2"
+    assert YAMLGenerator.generate_kfold(dataset, [], k=3)[1] == "类别列表不能为空"
+    assert "少于折数" in YAMLGenerator.generate_kfold(dataset, CLASSES, k=50)[1]
+    assert "未知的 YAML 引用方式" in YAMLGenerator.generate_training_yaml(dataset, CLASSES, list_mode='x')[1]
@@ -0,0 +1,248 @@
+"""批量任务队列对话框"""
+
+import os
+import time
+from typing import Optional
+
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget,
+    QTableWidgetItem, QAbstractItemView, QHeaderView, QSpinBox, QFileDialog,
+    QMessageBox
+)
+from PySide6.QtGui import QFont, QDesktopServices
+from PySide6.QtCore import Qt, QTimer, QUrl
+
+from core.job_queue import Job, JobQueue
+from models.dataset_config import DatasetConfig
+
+
+class JobQueueDialog(QDialog):
+    """
+    查看与管理批量任务队列（非模态，关闭对话框后调度继续在后台运行）
+
+    队列保存在文件中，与无界面运行器（main.py --job-run）共用；界面每秒刷新一次。
+    """
+
+    COLUMNS = ["名称", "图片数", "状态", "已执行步骤", "耗时", "错误"]
+    REFRESH_MS = 1000
+
+    def __init__(self, current_config_getter, parent=None):
+        """
+        Args:
+            current_config_getter: 返回当前会话 DatasetConfig 的函数（"加入当前会话"使用）
+        """
+        super().__init__(parent)
+        self.current_config_getter = current_config_getter
+        self.queue: Optional[JobQueue] = None
+        self.scheduler_thread = None
+        self.stop_event = None
+        self.init_ui()
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(self.REFRESH_MS)
+        self.refresh()
+
+    def init_ui(self):
+        """初始化 UI"""
+        self.setWindowTitle("批量任务队列")
+        self.setMinimumSize(820, 480)
+
+        layout = QVBoxLayout(self)
+
+        # 标题
+        title = QLabel("批量任务队列")
+        title_font = QFont()
+        title_font.setPointSize(12)
+        title_font.setBold(True)
+        title.setFont(title_font)
+        layout.addWidget(title)
+
+        # 说明
+        desc = QLabel(
+            "每个任务是一份会话配置，按保存的参数执行 Step 1-6（已完成的步骤跳过），多个任务在独立进程中并行。\n"
+            "大任务不会占满全部运行位置，小任务不必排在大任务后面。队列与命令行 --job-run 共用。"
+        )
+        desc.setStyleSheet("color: #666; margin-bottom: 10px;")
+        desc.setWordWrap(True)
+        layout.addWidget(desc)
+
+        # 任务表格 + 操作按钮
+        table_layout = QHBoxLayout()
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(len(self.COLUMNS) - 1, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        table_layout.addWidget(self.table)
+
+        button_layout = QVBoxLayout()
+        for text, slot in (
+            ("加入当前会话", self.on_add_current),
+            ("加入草稿文件…", self.on_add_drafts),
+            ("取消任务", self.on_cancel),
+            ("重新排队", self.on_retry),
+            ("移除", self.on_remove),
+            ("查看日志", self.on_open_log),
+        ):
+            button = QPushButton(text)
+            button.setAutoDefault(False)
+            button.clicked.connect(slot)
+            button_layout.addWidget(button)
+        button_layout.addStretch()
+        table_layout.addLayout(button_layout)
+        layout.addLayout(table_layout)
+
+        # 并发设置 + 运行控制
+        control_layout = QHBoxLayout()
+        control_layout.addWidget(QLabel("同时运行任务数:"))
+        self.max_jobs_spin = QSpinBox()
+        self.max_jobs_spin.setRange(1, 32)
+        self.max_jobs_spin.setValue(JobQueue.DEFAULT_MAX_JOBS)
+        control_layout.addWidget(self.max_jobs_spin)
+        control_layout.addWidget(QLabel("每个任务线程数:"))
+        self.job_workers_spin = QSpinBox()
+        self.job_workers_spin.setRange(1, 64)
+        self.job_workers_spin.setValue(JobQueue.DEFAULT_JOB_WORKERS)
+        control_layout.addWidget(self.job_workers_spin)
+        control_layout.addStretch()
+
+        self.status_label = QLabel()
+        self.status_label.setStyleSheet("color: #666;")
+        control_layout.addWidget(self.status_label)
+        self.run_btn = QPushButton("开始运行")
+        self.run_btn.setAutoDefault(False)
+        self.run_btn.clicked.connect(self.on_toggle_run)
+        control_layout.addWidget(self.run_btn)
+        layout.addLayout(control_layout)
+
+    # ========== 状态 ==========
+
+    def _queue(self) -> JobQueue:
+        """运行中的队列（沿用其并发设置），否则按当前设置新建"""
+        if self.is_running():
+            return self.queue
+        return JobQueue(max_jobs=self.max_jobs_spin.value(), job_workers=self.job_workers_spin.value())
+
+    def is_running(self) -> bool:
+        return self.scheduler_thread is not None and self.scheduler_thread.is_alive()
+
+    def _selected_job(self) -> Optional[Job]:
+        rows = self.table.selectionModel().selectedRows()
+        if not rows:
+            QMessageBox.information(self, "未选择任务", "请先在列表中选择一个任务")
+            return None
+        job_id = self.table.item(rows[0].row(), 0).data(Qt.UserRole)
+        for job in self._queue().jobs():
+            if job.id == job_id:
+                return job
+        return None
+
+    @staticmethod
+    def _format_elapsed(job: Job) -> str:
+        if not job.started:
+            return ""
+        seconds = int((job.finished or time.time()) - job.started)
+        return f"{seconds // 60}:{seconds % 60:02d}"
+
+    def refresh(self):
+        """从队列文件刷新表格（保持选中的任务）"""
+        jobs = self._queue().jobs()
+        selected = None
+        rows = self.table.selectionModel().selectedRows()
+        if rows:
+            selected = self.table.item(rows[0].row(), 0).data(Qt.UserRole)
+
+        self.table.setRowCount(len(jobs))
+        for row, job in enumerate(jobs):
+            values = [
+                job.name,
+                str(job.image_count),
+                job.get_status_display(),
+                ', '.join(map(str, job.executed)),
+                self._format_elapsed(job),
+                job.error,
+            ]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column == 0:
+                    item.setData(Qt.UserRole, job.id)
+                self.table.setItem(row, column, item)
+            if job.id == selected:
+                self.table.selectRow(row)
+
+        running = sum(job.is_active for job in jobs)
+        pending = sum(job.status == Job.PENDING for job in jobs)
+        self.status_label.setText(f"运行中 {running} / 等待中 {pending}")
+        self.run_btn.setText("停止" if self.is_running() else "开始运行")
+        self.max_jobs_spin.setEnabled(not self.is_running())
+        self.job_workers_spin.setEnabled(not self.is_running())
+
+    # ========== 操作 ==========
+
+    def on_add_current(self):
+        config: DatasetConfig = self.current_config_getter()
+        job, error = self._queue().add(config)
+        if error:
+            QMessageBox.warning(self, "无法加入队列", f"{error}\n\n请先在主界面中完成各步骤的设置。")
+            return
+        print(f"任务队列: 已加入 {job.name}")
+        self.refresh()
+
+    def on_add_drafts(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, "选择草稿文件", "", "会话草稿 (*.json)")
+        errors = []
+        for path in paths:
+            _, error = self._queue().add_draft(path)
+            if error:
+                errors.append(f"{os.path.basename(path)}: {error}")
+        if errors:
+            QMessageBox.warning(self, "部分草稿未加入", '\n'.join(errors))
+        self.refresh()
+
+    def _apply(self, action_name: str):
+        job = self._selected_job()
+        if job is None:
+            return
+        error = getattr(self._queue(), action_name)(job.id)
+        if error:
+            QMessageBox.warning(self, "操作失败", error)
+        self.refresh()
+
+    def on_cancel(self):
+        self._apply('cancel')
+
+    def on_retry(self):
+        self._apply('retry')
+
+    def on_remove(self):
+        self._apply('remove')
+
+    def on_open_log(self):
+        job = self._selected_job()
+        if job is None:
+            return
+        log_path = self._queue().log_path(job.id)
+        if not os.path.exists(log_path):
+            QMessageBox.information(self, "没有日志", "该任务尚未运行")
+            return
+        QDesktopServices.openUrl(QUrl.fromLocalFile(log_path))
+
+    def on_toggle_run(self):
+        if self.is_running():
+            # 不再启动新任务，运行中的任务完成后调度停止
+            self.stop_event.set()
+            self.run_btn.setEnabled(False)
+            QTimer.singleShot(self.REFRESH_MS, lambda: self.run_btn.setEnabled(True))
+            return
+        self.queue = JobQueue(max_jobs=self.max_jobs_spin.value(), job_workers=self.job_workers_spin.value())
+        self.scheduler_thread, self.stop_event = self.queue.start_background()
+        self.refresh()
+
+    def shutdown(self):
+        """退出程序时终止运行中的任务（下次运行队列时回滚中断的步骤并重新排队）"""
+        if self.is_running():
+            self.queue.shutdown()
+            self.scheduler_thread.join(10)
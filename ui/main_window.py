@@ -1,12 +1,13 @@
 """YOLO 数据集预处理工具 - 主窗口"""
 
 import os
-from PySide6.QtGui import QIcon
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtGui import QIcon, QDesktopServices
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QSplitter,
     QFileDialog, QMessageBox, QInputDialog, QDialog
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer, QUrl
 
 from ui.pipeline_panel import PipelinePanel
 from ui.tree_view_panel import TreeViewPanel
@@ -15,47 +16,63 @@ from ui.preview_dialog import PreviewDialog
 from ui.ratio_dialog import RatioDialog
 from ui.split_preview_dialog import SplitPreviewDialog
 from ui.classes_dialog import ClassesDialog
+from ui.sources_dialog import SourcesDialog
+from ui.merge_dialog import MergeDialog
+from ui.throttle_dialog import ThrottleDialog
+from ui.job_queue_dialog import JobQueueDialog
 from core.image_processor import ImageProcessor
+from core.image_auditor import ImageAuditor
+from core.dataset_stats import DatasetStats
+from core.dataset_merger import DatasetMerger
+from core.label_rewriter import LabelRewriter
 from core.dataset_builder import DatasetBuilder
 from core.data_splitter import DataSplitter
+from core.index_reservation import IndexReservation
+from core.operation_log import OperationLog
+from core.pipeline_runner import PipelineRunner
+from core.storage import StorageBackend
+from core.transfer_engine import TransferEngine
 from core.yaml_generator import YAMLGenerator
 from core.command_generator import CommandGenerator
+from models.dataset_config import DatasetConfig
+from models.step_state import StepStatus
+from utils.draft_manager import DraftManager
 
 
 class MainWindow(QMainWindow):
     """主窗口"""
 
+    # 自动保存防抖间隔（毫秒）：连续操作只在最后一次之后保存一次
+    AUTOSAVE_DELAY_MS = 1500
+
+    # 步骤卡片状态颜色
+    COLOR_CONFIGURED = "#2196F3"  # 蓝色：已配置（Step 1）
+    COLOR_COMPLETED = "#4CAF50"  # 绿色：已完成
+    COLOR_NEED_REGENERATE = "#FF9800"  # 橙色：上游步骤变化，需要重新生成
+
     def __init__(self):
         super().__init__()
-        # Step 1 数据
-        self.raw_images_folder = None  # 原始图片文件夹路径
-        self.scanned_images = []  # 扫描到的图片列表
-        self.image_count = 0  # 图片数量
-
-        # Step 2 数据
-        self.dataset_parent_dir = None  # 数据集父目录
-        self.dataset_name = ""  # 数据集名称
-        self.dataset_root = None  # 数据集根路径
-        self.temp_folder = None  # 临时文件夹路径（存放重命名后的图片）
-        self.dataset_mode = None  # 数据集模式：'create' 或 'extend'
-
-        # Step 3 数据
-        self.train_ratio = 70.0
-        self.val_ratio = 20.0
-        self.test_ratio = 10.0
-        self.train_images = []
-        self.val_images = []
-        self.test_images = []
-
-        # Step 4 数据
-        self.classes = []
-
-        # Step 5 数据
-        self.yaml_filename = "data.yaml"
-        self.yaml_path = None
+        # 整个工作流的状态（Step 1-6 数据 + 步骤状态），自动保存即序列化此对象
+        self.config = DatasetConfig()
+
+        # 自动保存：单次定时器做防抖，单线程执行器在后台写盘（保证写入顺序）
+        self.autosave_path = DraftManager.get_autosave_path()
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.setSingleShot(True)
+        self.autosave_timer.setInterval(self.AUTOSAVE_DELAY_MS)
+        self.autosave_timer.timeout.connect(self._autosave_now)
+        self.autosave_executor = ThreadPoolExecutor(max_workers=1)
+        # 传输预检的试探复制在后台执行，预览对话框先显示空间检查结果
+        self.probe_executor = ThreadPoolExecutor(max_workers=1)
+
+        # 批量任务队列对话框（首次打开时创建，关闭后调度继续在后台运行）
+        self.job_queue_dialog = None
 
         self.init_ui()
 
+        # 窗口显示后再询问是否恢复上次会话
+        QTimer.singleShot(0, self._offer_restore_session)
+
     def init_ui(self):
         """初始化 UI"""
         self.setWindowTitle("YOLO Dataset Preprocessing Tool")
@@ -76,6 +93,7 @@ class MainWindow(QMainWindow):
         # 左侧：步骤面板
         self.pipeline_panel = PipelinePanel()
         self.pipeline_panel.step_execute.connect(self.on_step_execute)
+        self.pipeline_panel.run_all_clicked.connect(self.run_all_steps)
 
         # 右侧：目录树视图
         self.tree_view_panel = TreeViewPanel()
@@ -93,13 +111,44 @@ class MainWindow(QMainWindow):
         self.command_panel = CommandPanel()
         main_layout.addWidget(self.command_panel, stretch=3)
 
+        # 菜单：独立于 Step 1-6 流程的数据集工具
+        self.init_menu()
+
+    def init_menu(self):
+        """初始化菜单栏"""
+        tools_menu = self.menuBar().addMenu("工具")
+        tools_menu.addAction("重新编号数据集…", self.tool_renumber_dataset)
+        tools_menu.addAction("检查数据集图片完整性…", self.tool_audit_dataset)
+        tools_menu.addAction("生成数据集统计报告…", self.tool_dataset_stats)
+        tools_menu.addAction("合并数据集…", self.tool_merge_datasets)
+        tools_menu.addSeparator()
+        tools_menu.addAction("撤销步骤的文件修改…", self.tool_undo_step)
+        tools_menu.addAction("传输限速…", self.tool_transfer_limits)
+        tools_menu.addSeparator()
+        tools_menu.addAction("批量任务队列…", self.tool_job_queue)
+
     def on_step_execute(self, step_number: int):
         """
         步骤执行槽函数
 
+        步骤中的文件修改记录在一个事务中（OperationLog）：步骤完成时提交（之后可撤销），
+        未完成（失败）时询问是否回滚。
+
         Args:
             step_number: 步骤编号 (1-6)
         """
+        try:
+            txn = PipelineRunner.begin_transaction(self.config, step_number)
+        except (OSError, RuntimeError) as e:
+            QMessageBox.critical(self, "无法记录文件操作", f"无法开始记录文件操作:\n{str(e)}")
+            return
+        try:
+            self._dispatch_step(step_number)
+        finally:
+            if OperationLog.active() is txn:
+                self._finish_incomplete_transaction(step_number, txn)
+
+    def _dispatch_step(self, step_number: int):
         if step_number == 1:
             self.execute_step1()
         elif step_number == 2:
@@ -117,61 +166,64 @@ class MainWindow(QMainWindow):
             print(f"Step {step_number} 执行按钮被点击（暂无功能）")
 
     def execute_step1(self):
-        """执行 Step 1：选择原始图片文件夹 + 扫描图片"""
-        # 打开文件夹选择对话框
-        folder = QFileDialog.getExistingDirectory(
-            self,
-            "选择原始图片文件夹",
-            "",
-            QFileDialog.ShowDirsOnly | QFileDialog.DontResolveSymlinks
+        """执行 Step 1：选择原始图片文件夹（可多个）+ 并发扫描图片"""
+        dialog = SourcesDialog(
+            self.config.raw_source_folders, self.config.scan_recursive, self,
+            check_integrity=self.config.check_integrity
         )
 
         # 用户取消选择
-        if not folder:
-            return
-
-        # 验证路径
-        if not os.path.exists(folder):
-            QMessageBox.warning(self, "路径无效", f"选择的路径不存在:\n{folder}")
+        if dialog.exec() != QDialog.Accepted:
             return
 
-        if not os.path.isdir(folder):
-            QMessageBox.warning(self, "路径无效", f"选择的路径不是文件夹:\n{folder}")
-            return
+        folders = dialog.folders
+        recursive = dialog.recursive
 
-        # 扫描图片
-        images, error = ImageProcessor.scan_images(folder)
+        # 扫描图片（列式记录表，含文件大小与来源；路径校验由扫描负责）
+        table, error = ImageProcessor.scan_sources(folders, recursive)
 
         if error:
             QMessageBox.warning(self, "扫描失败", error)
             return
 
-        if not images:
-            QMessageBox.warning(
-                self,
-                "未找到图片",
-                "文件夹中没有找到图片文件\n\n支持的格式：jpg, jpeg, png, bmp, tiff, tif"
-            )
-            return
+        # 检测并排除损坏的图片（结构检查，不解码像素）
+        if dialog.check_integrity:
+            problems, error = ImageAuditor.check_files(table.paths())
+            if error:
+                QMessageBox.warning(self, "检查失败", error)
+                return
+            if problems:
+                if len(problems) == len(table):
+                    QMessageBox.warning(self, "图片均已损坏", "所选文件夹中的图片均未通过完整性检查")
+                    return
+                corrupt = {row for row, _, _ in problems}
+                table = table.select_rows(row for row in range(len(table)) if row not in corrupt)
+                self._show_problems(
+                    "发现损坏的图片",
+                    f"{len(problems)} 张图片未通过完整性检查，已从导入列表中排除。",
+                    problems
+                )
 
         # 保存数据
-        self.raw_images_folder = folder
-        self.scanned_images = images
-        self.image_count = len(images)
+        self.config.check_integrity = dialog.check_integrity
+        self.config.raw_images_folder = folders[0]
+        self.config.raw_source_folders = list(table.sources)
+        self.config.scan_recursive = recursive
+        self.config.raw_folder_fingerprint = ImageProcessor.get_sources_fingerprint(table.sources)
+        self.config.image_table = table
+        self.config.image_count = len(table)
 
         # 更新 UI
-        card = self.pipeline_panel.step_cards[1]
-        summary_text = f"路径: {folder}\n找到 {self.image_count} 张图片"
-        card.update_summary(summary_text)
-        card.update_status("#2196F3")  # 蓝色表示已配置
+        summary_text = PipelineRunner.step1_summary(self.config)
+        self._complete_step(1, summary_text)
 
-        print(f"Step 1: 已选择文件夹: {folder}")
-        print(f"Step 1: 扫描到 {self.image_count} 张图片")
+        print(f"Step 1: 已选择 {len(table.sources)} 个文件夹: {', '.join(table.sources)}")
+        print(f"Step 1: 扫描到 {self.config.image_count} 张图片")
 
     def execute_step2(self):
         """执行 Step 2: 创建新数据集或扩展已有数据集"""
         # 检查 Step 1 是否完成
-        if not self.scanned_images:
+        if not self._has_step_data(1):
             QMessageBox.warning(
                 self,
                 "前置条件未满足",
@@ -230,19 +282,21 @@ class MainWindow(QMainWindow):
             )
             return
 
-        # 4. 准备 dry-run 预览数据
-        preview_images = []
-        for i, img_path in enumerate(self.scanned_images, 1):
-            old_name = os.path.basename(img_path)
-            _, ext = os.path.splitext(img_path)
-            new_name = f"{i:04d}{ext.lower()}"
-            preview_images.append((old_name, new_name))
-
-        # 5. 显示 dry-run 预览对话框
-        dialog = PreviewDialog(dataset_root, self.image_count, preview_images, self)
+        # 4-5. 显示 dry-run 预览对话框（新文件名在列表滚动时按需计算）
+        dialog = PreviewDialog(
+            dataset_root, self.config.image_table, 1, self,
+            index_width=self.config.index_width,
+            verify=self.config.verify_copies,
+            plan=self._preflight(self.config.image_table, os.path.join(dataset_root, 'temp'), followup=True),
+            physical_order=self.config.physical_order
+        )
         if dialog.exec() != QDialog.Accepted:
             print("用户取消了操作")
             return
+        self.config.physical_order = dialog.physical_order
+        self.config.index_width = dialog.index_width
+        self.config.verify_copies = dialog.verify
+        width = dialog.effective_width
 
         # 6. 执行创建
         try:
@@ -254,13 +308,16 @@ class MainWindow(QMainWindow):
 
             # 创建 temp 文件夹
             temp_folder = os.path.join(dataset_root, "temp")
-            os.makedirs(temp_folder, exist_ok=True)
+            OperationLog.makedirs(temp_folder)
 
             # 重命名并复制图片
             _, error = ImageProcessor.rename_and_copy(
-                self.scanned_images,
+                self.config.processed_images,
                 temp_folder,
-                start_index=1
+                start_index=1,
+                width=width,
+                verify=self.config.verify_copies,
+                physical_order=self.config.physical_order
             )
 
             if error:
@@ -268,17 +325,17 @@ class MainWindow(QMainWindow):
                 return
 
             # 保存数据
-            self.dataset_parent_dir = parent_dir
-            self.dataset_name = dataset_name
-            self.dataset_root = dataset_root
-            self.temp_folder = temp_folder
-            self.dataset_mode = "create"
+            self.config.image_table.assign_indices(1)
+            self.config.batch_index_range = [1, self.config.image_count]
+            self.config.dataset_parent_dir = parent_dir
+            self.config.dataset_name = dataset_name
+            self.config.dataset_root = dataset_root
+            self.config.temp_folder = temp_folder
+            self.config.dataset_mode = "create"
 
             # 更新 UI
-            card = self.pipeline_panel.step_cards[2]
-            summary_text = f"数据集: {dataset_root}\n已复制 {self.image_count} 张图片到 temp/"
-            card.update_summary(summary_text)
-            card.update_status("#4CAF50")  # 绿色表示已完成
+            summary_text = f"数据集: {dataset_root}\n已复制 {self.config.image_count} 张图片到 temp/"
+            self._complete_step(2, summary_text)
 
             # 更新预览树（新建模式 Step 2）
             self.tree_view_panel.build_tree_create_step2(dataset_name, dataset_root)
@@ -287,7 +344,7 @@ class MainWindow(QMainWindow):
                 self,
                 "创建成功",
                 f"数据集目录结构已创建:\n{dataset_root}\n\n"
-                f"已将 {self.image_count} 张图片重命名并复制到 temp/ 文件夹"
+                f"已将 {self.config.image_count} 张图片重命名并复制到 temp/ 文件夹"
             )
 
             print(f"Step 2 (新建): 数据集已创建: {dataset_root}")
@@ -320,8 +377,8 @@ class MainWindow(QMainWindow):
             )
             return
 
-        # 3. 查找最大图片编号
-        max_index, error = DatasetBuilder.find_max_image_index(dataset_root)
+        # 3. 查找最大图片编号（一次遍历，同时统计已有文件的编号位数）
+        max_index, widths, error = DatasetBuilder.scan_index_stats(dataset_root)
         if error:
             QMessageBox.critical(
                 self,
@@ -330,63 +387,80 @@ class MainWindow(QMainWindow):
             )
             return
 
-        # 4. 生成预览数据（新图片从 max_index + 1 开始编号）
-        start_index = max_index + 1
-        preview_images = []
-        for i, src_path in enumerate(self.scanned_images, start=start_index):
-            old_name = os.path.basename(src_path)
-            _, ext = os.path.splitext(src_path)
-            new_name = f"{i:04d}{ext.lower()}"
-            preview_images.append((old_name, new_name))
+        # 4. 预留编号区间（其他人同时扩展同一数据集时区间互不重叠），默认沿用已有的编号位数
+        self._release_index_reservation()
+        reservation, error = IndexReservation.reserve(
+            dataset_root, self.config.image_count, min_start=max_index + 1
+        )
+        if error:
+            QMessageBox.critical(self, "预留编号失败", error)
+            return
+        start_index = reservation.start
+        existing_width = DatasetBuilder.dominant_index_width(widths)
+        width_info = "、".join(f"{w} 位 {n} 张" for w, n in sorted(widths.items())) or "无"
 
         # 5. 显示预览对话框（扩展模式）
         extra_info = (
-            f"当前数据集最大编号: {max_index:04d}\n"
-            f"新图片起始编号: {start_index:04d}\n"
+            f"当前数据集最大编号: {max_index}\n"
+            f"新图片起始编号: {start_index}\n"
+            f"已有编号位数: {width_info}\n"
         )
         dialog = PreviewDialog(
             dataset_root,
-            self.image_count,
-            preview_images,
+            self.config.image_table,
+            start_index,
             self,
             mode="extend",
-            extra_info=extra_info
+            extra_info=extra_info,
+            index_width=self.config.index_width or existing_width,
+            verify=self.config.verify_copies,
+            plan=self._preflight(self.config.image_table, os.path.join(dataset_root, 'temp'), followup=True),
+            physical_order=self.config.physical_order
         )
         if dialog.exec() != QDialog.Accepted:
+            reservation.release()
             print("用户取消了操作")
             return
+        self.config.physical_order = dialog.physical_order
+        self.config.verify_copies = dialog.verify
+        width = dialog.effective_width
 
         # 6. 执行扩展操作
         try:
             # 确保 temp/ 文件夹存在
             temp_folder = os.path.join(dataset_root, "temp")
-            os.makedirs(temp_folder, exist_ok=True)
+            OperationLog.makedirs(temp_folder)
 
             # 重命名并复制图片（从 start_index 开始编号）
             _, error = ImageProcessor.rename_and_copy(
-                self.scanned_images,
+                self.config.processed_images,
                 temp_folder,
-                start_index=start_index
+                start_index=start_index,
+                width=width,
+                verify=self.config.verify_copies,
+                physical_order=self.config.physical_order
             )
 
             if error:
+                reservation.release()
                 QMessageBox.critical(self, "复制失败", error)
                 return
 
-            # 保存状态
-            self.dataset_root = dataset_root
-            self.temp_folder = temp_folder
-            self.dataset_mode = "extend"
+            # 保存状态（预留保持到 Step 3 把图片放入数据集之后）
+            self.config.index_reservation = reservation.path
+            self.config.image_table.assign_indices(start_index)
+            self.config.batch_index_range = [start_index, start_index + self.config.image_count - 1]
+            self.config.dataset_root = dataset_root
+            self.config.temp_folder = temp_folder
+            self.config.dataset_mode = "extend"
 
             # 更新 UI
-            card = self.pipeline_panel.step_cards[2]
-            end_index = start_index + self.image_count - 1
+            end_index = start_index + self.config.image_count - 1
             summary_text = (
                 f"扩展数据集: {dataset_root}\n"
-                f"新增 {self.image_count} 张图片 (编号 {start_index:04d}-{end_index:04d})"
+                f"新增 {self.config.image_count} 张图片 (编号 {start_index:0{width}d}-{end_index:0{width}d})"
             )
-            card.update_summary(summary_text)
-            card.update_status("#4CAF50")
+            self._complete_step(2, summary_text)
 
             # 更新预览树（扩展模式 Step 2）
             self.tree_view_panel.build_tree_extend(dataset_root)
@@ -394,16 +468,16 @@ class MainWindow(QMainWindow):
             QMessageBox.information(
                 self,
                 "扩展成功",
-                f"已将 {self.image_count} 张新图片添加到数据集！\n\n"
-                f"原有最大编号: {max_index:04d}\n"
-                f"新图片编号范围: {start_index:04d} - {end_index:04d}\n\n"
+                f"已将 {self.config.image_count} 张新图片添加到数据集！\n\n"
+                f"原有最大编号: {max_index:0{width}d}\n"
+                f"新图片编号范围: {start_index:0{width}d} - {end_index:0{width}d}\n\n"
                 f"新图片已复制到 temp/ 文件夹，可以继续下一步。"
             )
 
             print(f"Step 2 (扩展): 数据集扩展完成: {dataset_root}")
-            print(f"  原有最大编号: {max_index:04d}")
-            print(f"  新增图片: {self.image_count} 张")
-            print(f"  新图片编号: {start_index:04d} - {end_index:04d}")
+            print(f"  原有最大编号: {max_index:0{width}d}")
+            print(f"  新增图片: {self.config.image_count} 张")
+            print(f"  新图片编号: {start_index:0{width}d} - {end_index:0{width}d}")
 
         except Exception as e:
             QMessageBox.critical(
@@ -414,10 +488,196 @@ class MainWindow(QMainWindow):
             import traceback
             traceback.print_exc()
 
+    def tool_renumber_dataset(self):
+        """工具：统一已有数据集的编号位数（可选重新连续编号）"""
+        dataset_root = QFileDialog.getExistingDirectory(
+            self,
+            "选择要重新编号的数据集目录",
+            self.config.dataset_root or "",
+            QFileDialog.ShowDirsOnly | QFileDialog.DontResolveSymlinks
+        )
+        if not dataset_root:
+            return
+
+        valid, error = DatasetBuilder.validate_existing_structure(dataset_root)
+        if not valid:
+            QMessageBox.warning(self, "数据集结构无效", error)
+            return
+
+        max_index, widths, error = DatasetBuilder.scan_index_stats(dataset_root)
+        if error:
+            QMessageBox.critical(self, "扫描失败", error)
+            return
+        if not widths:
+            QMessageBox.information(self, "无需重新编号", "数据集中没有数字编号的图片")
+            return
+
+        width_info = "、".join(f"{w} 位 {n} 张" for w, n in sorted(widths.items()))
+        width, ok = QInputDialog.getInt(
+            self,
+            "重新编号数据集",
+            f"当前最大编号: {max_index}\n已有编号位数: {width_info}\n\n"
+            f"目标编号位数（不足时自动加宽到 {len(str(max_index))} 位）:",
+            max(DatasetBuilder.dominant_index_width(widths), ImageProcessor.DEFAULT_INDEX_WIDTH),
+            1, 12
+        )
+        if not ok:
+            return
+
+        reply = QMessageBox.question(
+            self,
+            "重新编号数据集",
+            "是否同时按原编号顺序从 1 开始连续编号（去除编号空缺）？\n\n"
+            "选择“否”只统一位数，编号数值不变。",
+            QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel,
+            QMessageBox.No
+        )
+        if reply == QMessageBox.Cancel:
+            return
+        compact = reply == QMessageBox.Yes
+
+        count, error = DatasetBuilder.renumber_dataset(dataset_root, width, compact)
+        if error:
+            QMessageBox.critical(self, "重新编号失败", error)
+            return
+
+        # 当前工作流使用的数据集编号已变化：Step 3 之后的结果需要重新生成
+        if compact and count and dataset_root == self.config.dataset_root:
+            self.config.mark_dependent_steps_need_regenerate(2)
+            self._refresh_step_cards()
+            self._schedule_autosave()
+        if dataset_root == self.config.dataset_root:
+            self.tree_view_panel.build_tree_extend(dataset_root)
+
+        QMessageBox.information(
+            self, "重新编号完成",
+            f"已重命名 {count} 张图片（及其标签文件）:\n{dataset_root}"
+        )
+        print(f"重新编号: {dataset_root}，{count} 张图片，位数 {width}，连续编号: {compact}")
+
+    def tool_audit_dataset(self):
+        """工具：检查已有数据集中全部图片的结构完整性"""
+        dataset_root = QFileDialog.getExistingDirectory(
+            self,
+            "选择要检查的数据集目录",
+            self.config.dataset_root or "",
+            QFileDialog.ShowDirsOnly | QFileDialog.DontResolveSymlinks
+        )
+        if not dataset_root:
+            return
+
+        valid, error = DatasetBuilder.validate_existing_structure(dataset_root)
+        if not valid:
+            QMessageBox.warning(self, "数据集结构无效", error)
+            return
+
+        checked, problems, error = ImageAuditor.audit_dataset(dataset_root)
+        if error:
+            QMessageBox.critical(self, "检查失败", error)
+            return
+
+        print(f"完整性检查: {dataset_root}，{checked} 张图片，{len(problems)} 张有问题")
+        if not problems:
+            QMessageBox.information(self, "检查完成", f"已检查 {checked} 张图片，未发现损坏的文件")
+            return
+
+        self._show_problems(
+            "发现损坏的图片",
+            f"已检查 {checked} 张图片，{len(problems)} 张未通过完整性检查（文件未做任何修改）。",
+            problems
+        )
+
+    def tool_dataset_stats(self):
+        """工具：统计类别分布、每图标注框数、标注框尺寸，生成 JSON + HTML 报告"""
+        dataset_root = QFileDialog.getExistingDirectory(
+            self,
+            "选择要统计的数据集目录",
+            self.config.dataset_root or "",
+            QFileDialog.ShowDirsOnly | QFileDialog.DontResolveSymlinks
+        )
+        if not dataset_root:
+            return
+
+        valid, error = DatasetBuilder.validate_existing_structure(dataset_root)
+        if not valid:
+            QMessageBox.warning(self, "数据集结构无效", error)
+            return
+
+        stats, report_paths, error = DatasetStats.generate_report(dataset_root)
+        if error:
+            QMessageBox.critical(self, "统计失败", error)
+            return
+
+        totals = stats['totals']
+        print(f"统计报告: {dataset_root}，{totals['images']} 张图片，{totals['boxes']} 个标注框，"
+              f"耗时 {stats['elapsed_seconds']} 秒")
+        QMessageBox.information(
+            self,
+            "统计完成",
+            f"图片: {totals['images']} 张\n标注框: {totals['boxes']} 个\n\n"
+            f"报告已生成:\n" + "\n".join(report_paths)
+        )
+        QDesktopServices.openUrl(QUrl.fromLocalFile(report_paths[1]))
+
+    def tool_merge_datasets(self):
+        """工具：合并多个数据集（统一类别列表，重新编号，保留或重新划分子集）"""
+        dialog = MergeDialog(self)
+        if dialog.exec() != QDialog.Accepted:
+            return
+
+        ratios = None
+        if dialog.resplit:
+            ratio_dialog = RatioDialog(self)
+            if ratio_dialog.exec() != QDialog.Accepted:
+                return
+            ratios = (ratio_dialog.train_ratio, ratio_dialog.val_ratio, ratio_dialog.test_ratio)
+
+        summary, error = DatasetMerger.merge(
+            dialog.datasets, dialog.parent_dir, dialog.dataset_name,
+            ratios=ratios, link=dialog.link
+        )
+        if error:
+            QMessageBox.critical(self, "合并失败", error)
+            return
+
+        subsets = summary['subsets']
+        text = (f"已合并 {len(dialog.datasets)} 个数据集:\n{summary['dataset_root']}\n\n"
+                f"图片: {summary['images']} 张（train {subsets['train']} / val {subsets['val']} / "
+                f"test {subsets['test']}）\n"
+                f"标签: {summary['labels']} 个，标注框 {summary['boxes']} 个\n"
+                f"类别: {len(summary['classes'])} 个")
+        if summary['dropped_boxes']:
+            text += f"\n\n已丢弃 {summary['dropped_boxes']} 个类别编号超出 classes.txt 范围的标注框"
+        QMessageBox.information(self, "合并完成", text)
+        print(f"合并数据集: {summary['dataset_root']}，{summary['images']} 张图片，"
+              f"硬链接 {summary['linked']} 张，类别 {len(summary['classes'])} 个")
+
+    def tool_transfer_limits(self):
+        """工具：设置复制限速与复制线程优先级"""
+        limiter = TransferEngine.shared_limiter()
+        dialog = ThrottleDialog(limiter, self)
+        if dialog.exec() == QDialog.Accepted:
+            print(f"复制限速: {limiter.describe()}")
+
+    def tool_job_queue(self):
+        """工具：批量任务队列（非模态）"""
+        if self.job_queue_dialog is None:
+            self.job_queue_dialog = JobQueueDialog(lambda: self.config, self)
+        self.job_queue_dialog.show()
+        self.job_queue_dialog.raise_()
+        self.job_queue_dialog.activateWindow()
+
+    def _show_problems(self, title: str, text: str, problems: list):
+        """显示问题列表（前 10 条直接显示，完整列表在详细信息中）"""
+        box = QMessageBox(QMessageBox.Warning, title, text, QMessageBox.Ok, self)
+        box.setInformativeText(ImageAuditor.format_problems(problems, 10))
+        box.setDetailedText(ImageAuditor.format_problems(problems))
+        box.exec()
+
     def execute_step3(self):
         """执行 Step 3：train / val / test 数据拆分"""
         # 检查 Step 2 是否完成
-        if not self.dataset_root or not self.temp_folder:
+        if not self._has_step_data(2):
             QMessageBox.warning(
                 self,
                 "前置条件未满足",
@@ -436,24 +696,23 @@ class MainWindow(QMainWindow):
         val_ratio = ratio_dialog.val_ratio
         test_ratio = ratio_dialog.test_ratio
 
-        # 2. 获取 temp/ 文件夹中的图片
-        temp_images = []
-        for filename in os.listdir(self.temp_folder):
-            filepath = os.path.join(self.temp_folder, filename)
-            if os.path.isfile(filepath):
-                temp_images.append(filepath)
+        # 2. 获取 temp/ 文件夹中本次编号范围内的图片（temp/ 中可能还有其他扩展批次的文件）
+        temp_table, _ = ImageProcessor.scan_image_table(self.config.temp_folder)
+        index_range = self.config.image_table.index_range()
+        if index_range:
+            temp_table = temp_table.select_index_range(*index_range)
 
-        if not temp_images:
+        if not len(temp_table):
             QMessageBox.warning(self, "错误", "temp/ 文件夹中没有图片")
             return
 
-        # 3. 划分数据
-        train_list, val_list, test_list, error = DataSplitter.split_data(
-            temp_images,
+        # 3. 划分数据（结果写入记录表的子集列）
+        (train_count, val_count, test_count), error = DataSplitter.split_table(
+            temp_table,
             train_ratio,
             val_ratio,
             test_ratio,
-            seed=42
+            seed=self.config.random_seed
         )
 
         if error:
@@ -462,51 +721,44 @@ class MainWindow(QMainWindow):
 
         # 4. 显示 dry-run 预览
         preview_dialog = SplitPreviewDialog(
-            len(train_list),
-            len(val_list),
-            len(test_list),
-            self
+            train_count,
+            val_count,
+            test_count,
+            self,
+            verify=self.config.verify_copies,
+            plan=self._preflight(temp_table, DatasetBuilder.get_images_path(self.config.dataset_root, 'train'))
         )
         if preview_dialog.exec() != QDialog.Accepted:
             print("用户取消了拆分")
             return
+        self.config.verify_copies = preview_dialog.verify
+        verify = self.config.verify_copies
 
-        # 5. 执行复制
+        # 5. 放入各子集（重新划分时已在数据集中的图片只在子集间移动，标签随图片移动）
         try:
-            # 复制到 train
-            train_dir = DatasetBuilder.get_images_path(self.dataset_root, 'train')
-            _, error = DataSplitter.copy_images_to_subset(train_list, train_dir)
-            if error:
-                raise Exception(f"复制到 train 失败: {error}")
-
-            # 复制到 val
-            val_dir = DatasetBuilder.get_images_path(self.dataset_root, 'val')
-            _, error = DataSplitter.copy_images_to_subset(val_list, val_dir)
-            if error:
-                raise Exception(f"复制到 val 失败: {error}")
-
-            # 复制到 test
-            test_dir = DatasetBuilder.get_images_path(self.dataset_root, 'test')
-            _, error = DataSplitter.copy_images_to_subset(test_list, test_dir)
+            (copied, moved, kept), error = DataSplitter.place_split(
+                temp_table, self.config.dataset_root, verify, self.config.physical_order
+            )
             if error:
-                raise Exception(f"复制到 test 失败: {error}")
+                raise Exception(error)
+            print(f"Step 3: 复制 {copied} 张，在子集间移动 {moved} 张，{kept} 张保持不变")
 
             # 保存数据
-            self.train_ratio = train_ratio
-            self.val_ratio = val_ratio
-            self.test_ratio = test_ratio
-            self.train_images = train_list
-            self.val_images = val_list
-            self.test_images = test_list
+            self.config.train_ratio = train_ratio
+            self.config.val_ratio = val_ratio
+            self.config.test_ratio = test_ratio
+            self.config.train_count = train_count
+            self.config.val_count = val_count
+            self.config.test_count = test_count
+            self.config.image_table.copy_subsets_by_index(temp_table)
+            self._release_index_reservation()
 
             # 更新 UI
-            card = self.pipeline_panel.step_cards[3]
             summary_text = (
                 f"比例: {train_ratio:.0f}% / {val_ratio:.0f}% / {test_ratio:.0f}%\n"
-                f"Train: {len(train_list)} 张 | Val: {len(val_list)} 张 | Test: {len(test_list)} 张"
+                f"Train: {train_count} 张 | Val: {val_count} 张 | Test: {test_count} 张"
             )
-            card.update_summary(summary_text)
-            card.update_status("#4CAF50")  # 绿色表示已完成
+            self._complete_step(3, summary_text)
 
             # 更新预览树（两种模式都更新）
             self.tree_view_panel.update_images_in_tree()
@@ -515,15 +767,15 @@ class MainWindow(QMainWindow):
                 self,
                 "拆分成功",
                 f"数据已成功拆分:\n\n"
-                f"Train: {len(train_list)} 张图片\n"
-                f"Val: {len(val_list)} 张图片\n"
-                f"Test: {len(test_list)} 张图片"
+                f"Train: {train_count} 张图片\n"
+                f"Val: {val_count} 张图片\n"
+                f"Test: {test_count} 张图片"
             )
 
             print(f"Step 3: 数据拆分完成")
-            print(f"  Train: {len(train_list)} 张")
-            print(f"  Val: {len(val_list)} 张")
-            print(f"  Test: {len(test_list)} 张")
+            print(f"  Train: {train_count} 张")
+            print(f"  Val: {val_count} 张")
+            print(f"  Test: {test_count} 张")
 
         except Exception as e:
             QMessageBox.critical(self, "错误", f"拆分过程中出现错误:\n{str(e)}")
@@ -531,7 +783,7 @@ class MainWindow(QMainWindow):
     def execute_step4(self):
         """执行 Step 4：类别管理（生成 classes.txt）"""
         # 检查 Step 3 是否完成
-        if not self.train_images:
+        if not self._has_step_data(3):
             QMessageBox.warning(
                 self,
                 "前置条件未满足",
@@ -541,8 +793,8 @@ class MainWindow(QMainWindow):
 
         # 检测是否为扩展模式，如果是则预加载已有 classes.txt
         existing_classes = []
-        if self.dataset_root:
-            classes_file_path = os.path.join(self.dataset_root, 'labels', 'classes.txt')
+        if self.config.dataset_root:
+            classes_file_path = os.path.join(self.config.dataset_root, 'labels', 'classes.txt')
             if os.path.exists(classes_file_path):
                 try:
                     with open(classes_file_path, 'r', encoding='utf-8') as f:
@@ -560,9 +812,13 @@ class MainWindow(QMainWindow):
         # 获取类别列表
         classes = dialog.classes
 
-        # 2. 写入 classes.txt
+        # 2. 类别顺序变化或有删除时，同步改写已有标签中的类别编号
+        if existing_classes and not self._rewrite_labels_for_classes(existing_classes, classes):
+            return
+
+        # 3. 写入 classes.txt
         try:
-            classes_file = DatasetBuilder.get_classes_file_path(self.dataset_root)
+            classes_file = DatasetBuilder.get_classes_file_path(self.config.dataset_root)
             success, error = YAMLGenerator.write_classes_file(classes_file, classes)
 
             if not success:
@@ -570,19 +826,17 @@ class MainWindow(QMainWindow):
                 return
 
             # 保存数据
-            self.classes = classes
+            self.config.classes = classes
 
             # 更新 UI
-            card = self.pipeline_panel.step_cards[4]
             preview_classes = ", ".join(classes[:3])
             if len(classes) > 3:
                 preview_classes += f", ... ({len(classes) - 3} 个更多)"
             summary_text = f"{len(classes)} 个类别: {preview_classes}"
-            card.update_summary(summary_text)
-            card.update_status("#4CAF50")  # 绿色表示已完成
+            self._complete_step(4, summary_text)
 
             # 更新预览树（仅新建模式）
-            if self.dataset_mode == "create":
+            if self.config.dataset_mode == "create":
                 self.tree_view_panel.build_tree_create_step4()
 
             QMessageBox.information(
@@ -596,10 +850,66 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "错误", f"保存类别时出现错误:\n{str(e)}")
 
+    def _rewrite_labels_for_classes(self, old_classes: list, new_classes: list) -> bool:
+        """
+        按新旧类别列表的差异改写数据集中已有的标签文件
+
+        Returns:
+            是否继续保存 classes.txt（用户取消或改写失败时返回 False）
+        """
+        remap, deleted, added = LabelRewriter.diff_classes(old_classes, new_classes)
+        if LabelRewriter.is_identity(remap):
+            return True  # 只在末尾追加了类别：已有编号不变
+
+        dataset_root = self.config.dataset_root
+        stats, error = LabelRewriter.rewrite_dataset(dataset_root, remap, dry_run=True)
+        if error:
+            QMessageBox.critical(self, "读取标签失败", error)
+            return False
+        if not stats['changed_files']:
+            return True
+
+        text = (f"类别列表的顺序或内容已变化，{stats['files']} 个标签文件中有 "
+                f"{stats['changed_files']} 个需要改写:\n\n"
+                f"  编号变化的标注框: {stats['remapped_boxes']} 个\n"
+                f"  将被删除的标注框: {stats['dropped_boxes']} 个\n")
+        if deleted:
+            text += f"\n删除的类别: {', '.join(deleted)}"
+        if added:
+            text += f"\n新增的类别: {', '.join(added)}"
+        # 不提供“只保存 classes.txt”：已有标签的编号会与新类别列表不一致
+        text += ("\n\n选择“是”改写标签文件（改名的类别会被视为删除 + 新增）；"
+                 "选择“取消”不修改 classes.txt 与标签文件。")
+        reply = QMessageBox.question(
+            self, "改写标签文件", text,
+            QMessageBox.Yes | QMessageBox.Cancel,
+            QMessageBox.Cancel
+        )
+        if reply != QMessageBox.Yes:
+            return False
+
+        stats, error = LabelRewriter.rewrite_dataset(dataset_root, remap)
+        if error:
+            # 替换阶段的修改记录在本步骤的事务中：回滚后全部标签恢复为原编号
+            txn = OperationLog.active()
+            rollback_error = ""
+            if txn is not None and txn.count:
+                undone, rollback_error = txn.rollback()
+                print(f"Step 4: 改写标签失败，已回滚 {undone} 项文件修改")
+            if rollback_error:
+                error += f"\n\n回滚未完成（可修复后通过“撤销步骤”重试）:\n{rollback_error}"
+            else:
+                error += "\n\n标签文件保持原编号"
+            QMessageBox.critical(self, "改写标签失败", f"{error}，classes.txt 未修改。")
+            return False
+        print(f"Step 4: 已改写 {stats['changed_files']} 个标签文件，编号变化 {stats['remapped_boxes']} 个，"
+              f"删除 {stats['dropped_boxes']} 个标注框")
+        return True
+
     def execute_step5(self):
         """执行 Step 5：生成 YAML 文件"""
         # 检查 Step 4 是否完成
-        if not self.classes:
+        if not self._has_step_data(4):
             QMessageBox.warning(
                 self,
                 "前置条件未满足",
@@ -629,24 +939,39 @@ class MainWindow(QMainWindow):
             )
             return
 
+        # YAML 引用图片的方式：子集目录，或图片列表（可按新比例重新划分，不移动图片）
+        modes = list(YAMLGenerator.LIST_MODES)
+        labels = list(YAMLGenerator.LIST_MODES.values())
+        current = modes.index(self.config.yaml_list_mode) if self.config.yaml_list_mode in modes else 0
+        label, ok = QInputDialog.getItem(
+            self, "YAML 引用方式", "train / val / test 引用:", labels, current, False
+        )
+        if not ok:
+            return
+        list_mode = modes[labels.index(label)]
+        list_ratios = self.config.yaml_list_ratios
+        if list_mode == YAMLGenerator.LIST_MODE_RESPLIT:
+            ratio_dialog = RatioDialog(self)
+            if ratio_dialog.exec() != QDialog.Accepted:
+                return
+            list_ratios = [ratio_dialog.train_ratio, ratio_dialog.val_ratio, ratio_dialog.test_ratio]
+
         # 2. 删除所有旧的 YAML 文件
-        deleted_files = []
-        try:
-            for item in os.listdir(self.dataset_root):
-                item_path = os.path.join(self.dataset_root, item)
-                if os.path.isfile(item_path) and (item.lower().endswith('.yaml') or item.lower().endswith('.yml')):
-                    os.remove(item_path)
-                    deleted_files.append(item)
-                    print(f"已删除旧 YAML 文件: {item}")
-        except Exception as e:
-            print(f"删除旧 YAML 文件时出错: {e}")
+        deleted_files, error = YAMLGenerator.remove_yaml_files(self.config.dataset_root)
+        for item in deleted_files:
+            print(f"已删除旧 YAML 文件: {item}")
+        if error:
+            print(error)
 
         # 3. 生成新 YAML 文件
         try:
-            yaml_path, error = YAMLGenerator.generate_yaml(
-                self.dataset_root,
-                self.classes,
-                filename
+            yaml_path, error = YAMLGenerator.generate_training_yaml(
+                self.config.dataset_root,
+                self.config.classes,
+                filename,
+                list_mode,
+                list_ratios,
+                self.config.random_seed
             )
 
             if error:
@@ -654,14 +979,54 @@ class MainWindow(QMainWindow):
                 return
 
             # 保存数据
-            self.yaml_filename = filename
-            self.yaml_path = yaml_path
+            self.config.yaml_filename = filename
+            self.config.yaml_list_mode = list_mode
+            self.config.yaml_list_ratios = list_ratios
+            self.config.yaml_path = yaml_path
+
+            # 可选：生成训练标签缓存
+            cache_paths = []
+            reply = QMessageBox.question(
+                self,
+                "生成标签缓存",
+                "是否同时生成训练标签缓存？\n\n"
+                "缓存包含图片尺寸、标注与损坏标记，训练时无需重新扫描数据集。",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No
+            )
+            if reply == QMessageBox.Yes:
+                cache_paths, error = YAMLGenerator.generate_label_cache(self.config.dataset_root)
+                if error:
+                    QMessageBox.warning(self, "标签缓存生成失败", error)
+
+            # 可选：K 折交叉验证（只生成图片列表与 YAML，不复制图片）；
+            # 折数保存在会话中，之后"全部运行"重新执行 Step 5 时一并重新生成
+            fold_paths = []
+            folds, ok = QInputDialog.getInt(
+                self,
+                "交叉验证",
+                "生成 K 折交叉验证 YAML（images/test 保留为共同的测试集）\n"
+                "折数 K（0 表示不生成）:",
+                self.config.kfold_folds, 0, 20
+            )
+            if ok:
+                self.config.kfold_folds = folds
+            if self.config.kfold_folds:
+                fold_paths, error = YAMLGenerator.generate_kfold(
+                    self.config.dataset_root, self.config.classes, self.config.kfold_folds,
+                    self.config.random_seed
+                )
+                if error:
+                    self.config.kfold_folds = 0
+                    QMessageBox.warning(self, "交叉验证配置生成失败", error)
+            if not self.config.kfold_folds:
+                error = YAMLGenerator.remove_kfold_files(self.config.dataset_root)
+                if error:
+                    QMessageBox.warning(self, "交叉验证配置清理失败", error)
 
             # 更新 UI
-            card = self.pipeline_panel.step_cards[5]
             summary_text = f"YAML 文件: {yaml_path}"
-            card.update_summary(summary_text)
-            card.update_status("#4CAF50")  # 绿色表示已完成
+            self._complete_step(5, summary_text)
 
             # 更新预览树（新建模式和扩展模式都更新）
             self.tree_view_panel.update_yaml_in_tree(filename, deleted_files)
@@ -670,6 +1035,12 @@ class MainWindow(QMainWindow):
             info_msg = f"YAML 文件已生成:\n{yaml_path}"
             if deleted_files:
                 info_msg += f"\n\n已删除旧的 YAML 文件:\n" + "\n".join(deleted_files)
+            if cache_paths:
+                info_msg += f"\n\n已生成标签缓存:\n" + "\n".join(cache_paths)
+            if fold_paths:
+                info_msg += f"\n\n已生成 {len(fold_paths)} 折交叉验证 YAML:\n" + "\n".join(
+                    os.path.basename(path) for path in fold_paths
+                )
 
             QMessageBox.information(
                 self,
@@ -685,7 +1056,7 @@ class MainWindow(QMainWindow):
     def execute_step6(self):
         """执行 Step 6：生成 LabelImg 命令"""
         # 检查 Step 5 是否完成
-        if not self.yaml_path:
+        if not self._has_step_data(5):
             QMessageBox.warning(
                 self,
                 "前置条件未满足",
@@ -695,9 +1066,9 @@ class MainWindow(QMainWindow):
 
         try:
             # 生成命令
-            classes_file = DatasetBuilder.get_classes_file_path(self.dataset_root)
+            classes_file = DatasetBuilder.get_classes_file_path(self.config.dataset_root)
             commands, error = CommandGenerator.generate_commands(
-                self.dataset_root,
+                self.config.dataset_root,
                 classes_file
             )
 
@@ -707,12 +1078,11 @@ class MainWindow(QMainWindow):
 
             # 显示命令到命令面板
             self.command_panel.set_commands(commands)
+            self.config.labelimg_commands = commands
 
             # 更新 UI
-            card = self.pipeline_panel.step_cards[6]
             summary_text = "命令已生成"
-            card.update_summary(summary_text)
-            card.update_status("#4CAF50")  # 绿色表示已完成
+            self._complete_step(6, summary_text)
 
             QMessageBox.information(
                 self,
@@ -728,6 +1098,303 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "错误", f"生成命令时出现错误:\n{str(e)}")
 
+    # ========== 工作流状态 / 自动保存 / 会话恢复 ==========
+
+    def _preflight(self, table, target_dir: str, followup: bool = False):
+        """
+        复制前预检（大小取自扫描结果，不重新 stat；试探复制在后台线程中进行）
+
+        Args:
+            table: 待复制的图片记录表
+            target_dir: 目标目录
+            followup: Step 2 复制到 temp/ 后 Step 3 还会在同一磁盘上再复制一份
+
+        Returns:
+            预检结果，失败时返回 None（不阻止操作）
+        """
+        total_bytes = table.total_size()
+        paths = table.paths()
+        plan, error = TransferEngine.preflight(
+            paths, total_bytes, target_dir,
+            followup_bytes=total_bytes if followup else 0,
+            probe=False
+        )
+        if error:
+            print(error)
+            return None
+        print(f"传输预检: {plan.summary()}")
+        # 试探复制只适用于本地来源（对象存储的下载速度与本地复制无关）
+        if plan.required and plan.fits and all(StorageBackend.is_local(source) for source in table.sources):
+            plan.probing = True
+            self.probe_executor.submit(TransferEngine.estimate_duration, plan, paths)
+        return plan
+
+    def _release_index_reservation(self):
+        """释放扩展模式预留的编号区间（图片已放入数据集，或放弃本次扩展）"""
+        path = self.config.index_reservation
+        if not path:
+            return
+        reservation = IndexReservation.load(self.config.dataset_root or "", path)
+        if reservation:
+            error = reservation.release()
+            if error:
+                print(error)
+        self.config.index_reservation = None
+
+    def _has_step_data(self, step_number: int) -> bool:
+        """步骤是否已执行过（已完成或因上游变化需重新生成，数据仍可用）"""
+        return self.config.get_step(step_number).status in (
+            StepStatus.COMPLETED, StepStatus.NEED_REGENERATE
+        )
+
+    def _finish_incomplete_transaction(self, step_number: int, txn: OperationLog):
+        """步骤未完成（取消或失败）：没有文件修改时直接结束事务，否则询问是否回滚"""
+        if txn.count == 0:
+            txn.discard()
+            return
+
+        reply = QMessageBox.question(
+            self, "步骤未完成",
+            f"Step {step_number} 未完成，已做了 {txn.count} 项文件修改。\n\n是否回滚这些修改？",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes
+        )
+        if reply == QMessageBox.Yes:
+            undone, error = txn.rollback()
+            if error:
+                QMessageBox.warning(self, "回滚未完成", error)
+            print(f"Step {step_number}: 已回滚 {undone} 项文件修改")
+        else:
+            # 保留修改，之后仍可通过"撤销步骤"撤销
+            txn.commit()
+            self.config.get_step(step_number).transaction_ids.append(txn.id)
+            self._schedule_autosave()
+
+    def tool_undo_step(self):
+        """撤销某个步骤（及依赖它的步骤）的全部文件修改"""
+        steps = [n for n in range(1, 7) if self.config.get_step(n).transaction_ids]
+        if not steps:
+            QMessageBox.information(self, "撤销步骤", "当前会话中没有可撤销的文件修改")
+            return
+
+        items = [f"Step {n}（{PipelineRunner.STEP_NAMES[n]}）" for n in steps]
+        item, ok = QInputDialog.getItem(
+            self, "撤销步骤", "选择要撤销的步骤（依赖它的步骤一并撤销）:", items, len(items) - 1, False
+        )
+        if not ok:
+            return
+        step_number = steps[items.index(item)]
+
+        affected = [m for m in DatasetConfig.dependent_steps(step_number)
+                    if self.config.get_step(m).status != StepStatus.NOT_STARTED]
+        message = f"将撤销 Step {step_number} 各次执行对文件所做的全部修改"
+        if affected:
+            message += f"，以及 {', '.join(f'Step {m}' for m in affected)} 的修改"
+        reply = QMessageBox.question(self, "确认撤销", message + "。\n\n是否继续？",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
 
+        undone, count, error = PipelineRunner.undo_step(self.config, step_number)
+        self._refresh_step_cards()
+        self._schedule_autosave()
+        if self.config.dataset_root:
+            self.tree_view_panel.build_tree_extend(self.config.dataset_root)
+        else:
+            self.tree_view_panel.populate_preview_tree()
+
+        if error:
+            QMessageBox.critical(self, "撤销失败", error)
+        else:
+            QMessageBox.information(
+                self, "撤销完成",
+                f"已撤销 {', '.join(f'Step {n}' for n in undone)}，共 {count} 项文件修改"
+            )
 
+    def _offer_rollback_incomplete(self):
+        """启动时检测上次运行中断时未完成的事务，询问是否回滚"""
+        incomplete = OperationLog.incomplete()
+        if not incomplete:
+            return
+
+        lines = [f"{item['name']}: {item['changes']} 项文件修改" for item in incomplete[:10]]
+        reply = QMessageBox.question(
+            self, "上次运行中断",
+            "以下步骤在上次运行中未完成:\n\n" + '\n'.join(lines) + "\n\n是否回滚这些修改？",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            return
+        for item in incomplete:
+            undone, error = OperationLog.undo(item['id'])
+            if error:
+                QMessageBox.warning(self, "回滚未完成", f"{item['name']}:\n{error}")
+            else:
+                print(f"{item['name']}: 已回滚 {undone} 项文件修改")
+
+    def _complete_step(self, step_number: int, summary_text: str):
+        """
+        标记步骤完成：更新步骤状态、刷新卡片并安排自动保存
+
+        Args:
+            step_number: 步骤编号 (1-6)
+            summary_text: 卡片摘要
+        """
+        txn = OperationLog.active()
+        if txn is not None:
+            txn.commit()
+            if txn.count:
+                self.config.get_step(step_number).transaction_ids.append(txn.id)
+
+        # 输出与上次相同（如用相同参数重新执行）时，下游步骤不需要重新生成
+        if PipelineRunner.record(self.config, step_number):
+            self.config.mark_dependent_steps_need_regenerate(step_number)
+        self.config.get_step(step_number).complete(summary_text)
+        self._refresh_step_cards()
+        self._schedule_autosave()
+
+    def run_all_steps(self):
+        """全部运行：按保存的参数增量执行 Step 1-6（输入未变化的步骤跳过）"""
+        if self.config.get_step(1).status == StepStatus.NOT_STARTED:
+            QMessageBox.warning(self, "前置条件未满足", "请先手动执行一次 Step 1-6，之后可以全部运行")
+            return
 
+        executed, skipped, error = PipelineRunner.run_all(self.config)
+        self._refresh_step_cards()
+        self._schedule_autosave()
+
+        if self.config.dataset_root and os.path.isdir(self.config.dataset_root):
+            self.tree_view_panel.build_tree_extend(self.config.dataset_root)
+        if 6 in executed:
+            self.command_panel.set_commands(self.config.labelimg_commands)
+
+        text = (f"已执行: {', '.join(f'Step {n}' for n in executed) or '无'}\n"
+                f"未变化跳过: {', '.join(f'Step {n}' for n in skipped) or '无'}")
+        if error:
+            QMessageBox.warning(self, "全部运行中断", f"{text}\n\n{error}")
+        else:
+            QMessageBox.information(self, "全部运行完成", text)
+
+    def _refresh_step_cards(self):
+        """根据 DatasetConfig 中的步骤状态刷新左侧卡片"""
+        for step_number, card in self.pipeline_panel.step_cards.items():
+            step = self.config.get_step(step_number)
+            if step.status == StepStatus.COMPLETED:
+                card.update_summary(step.summary)
+                card.update_status(self.COLOR_CONFIGURED if step_number == 1 else self.COLOR_COMPLETED)
+            elif step.status == StepStatus.NEED_REGENERATE:
+                card.update_summary(f"{step.summary}\n（{step.get_status_display()}）")
+                card.update_status(self.COLOR_NEED_REGENERATE)
+            else:
+                card.update_summary(step.get_status_display())
+                card.update_status("#ccc")
+
+    def _schedule_autosave(self):
+        """安排一次自动保存（防抖：定时器重新计时）"""
+        self.autosave_timer.start()
+
+    def _autosave_now(self):
+        """序列化当前状态并在后台线程原子写入自动保存文件"""
+        # 序列化在主线程完成（记录表未修改时直接复用缓存的编码结果），写盘交给后台线程
+        data = self.config.to_dict(compact=True)
+        future = self.autosave_executor.submit(DraftManager.write_draft_data, data, self.autosave_path)
+        future.add_done_callback(self._on_autosave_done)
+
+    @staticmethod
+    def _on_autosave_done(future):
+        """自动保存完成回调（在后台线程中执行，只输出日志）"""
+        error = future.exception()
+        if error:
+            print(f"自动保存失败: {error}")
+
+    def _offer_restore_session(self):
+        """启动时检测上次会话的自动保存，询问是否恢复"""
+        self._offer_rollback_incomplete()
+        if not os.path.exists(self.autosave_path):
+            return
+
+        try:
+            config = DraftManager.load_draft(self.autosave_path)
+        except (ValueError, OSError) as e:
+            print(f"读取自动保存失败: {e}")
+            return
+
+        if config.get_step(1).status == StepStatus.NOT_STARTED:
+            return
+
+        completed = [n for n in range(1, 7) if config.get_step(n).status != StepStatus.NOT_STARTED]
+        message = (
+            f"检测到上次会话的自动保存（已执行到 Step {max(completed)}）：\n\n"
+            f"原始图片: {', '.join(config.raw_source_folders)}（{config.image_count} 张）\n"
+        )
+        if config.dataset_root:
+            message += f"数据集: {config.dataset_root}\n"
+        message += "\n是否恢复上次会话？"
+
+        reply = QMessageBox.question(
+            self, "恢复会话", message,
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes
+        )
+        if reply == QMessageBox.Yes:
+            self._restore_session(config)
+
+    def _restore_session(self, config: DatasetConfig):
+        """
+        恢复会话状态
+
+        原始图片文件夹指纹未变化时直接使用保存的图片列表，否则重新扫描
+        （包含子文件夹时指纹无法反映子文件夹的变化，总是重新扫描并比较结果）；
+        数据集目录已不存在时，重置 Step 2 及之后的步骤。
+        """
+        PipelineRunner.adopt_legacy_state(config)
+        folders = config.raw_source_folders
+        fingerprint = ImageProcessor.get_sources_fingerprint(folders) if folders else None
+
+        if fingerprint is None:
+            QMessageBox.warning(
+                self, "原始图片文件夹不存在",
+                f"上次的原始图片文件夹已不存在:\n{chr(10).join(folders)}\n\n请重新执行 Step 1"
+            )
+            config.get_step(1).reset()
+        elif config.scan_recursive or fingerprint != config.raw_folder_fingerprint:
+            # 文件夹内容可能有变化：重新扫描，结果不同时下游步骤需要重新生成
+            table, error = ImageProcessor.scan_sources(folders, config.scan_recursive)
+            if error:
+                QMessageBox.warning(self, "扫描失败", error)
+                config.get_step(1).reset()
+            elif list(table.paths()) != list(config.processed_images):
+                config.image_table = table
+                config.image_count = len(table)
+                config.raw_folder_fingerprint = fingerprint
+                PipelineRunner.record(config, 1)
+                config.get_step(1).complete(PipelineRunner.step1_summary(config))
+                config.mark_dependent_steps_need_regenerate(1)
+                print(f"恢复会话: 原始图片文件夹已变化，重新扫描到 {len(table)} 张图片")
+            else:
+                config.raw_folder_fingerprint = fingerprint
+
+        if config.dataset_root and not os.path.isdir(config.dataset_root):
+            for step_number in range(2, 7):
+                config.get_step(step_number).reset()
+            config.dataset_root = None
+            config.temp_folder = None
+
+        self.config = config
+        self._refresh_step_cards()
+
+        if config.dataset_root:
+            self.tree_view_panel.build_tree_extend(config.dataset_root)
+        if self._has_step_data(6) and config.labelimg_commands:
+            self.command_panel.set_commands(config.labelimg_commands)
+
+        print(f"已恢复上次会话: {self.autosave_path}")
+
+    def closeEvent(self, event):
+        """关闭窗口前立即写入待保存的状态"""
+        if self.autosave_timer.isActive():
+            self.autosave_timer.stop()
+            self._autosave_now()
+        self.autosave_executor.shutdown(wait=True)
+        self.probe_executor.shutdown(wait=True)
+        if self.job_queue_dialog is not None:
+            self.job_queue_dialog.shutdown()
+        super().closeEvent(event)
@@ -0,0 +1,188 @@
+"""数据集合并对话框"""
+
+import os
+from typing import List
+
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QListWidget, QPushButton,
+    QCheckBox, QDialogButtonBox, QFileDialog, QAbstractItemView, QLineEdit,
+    QFormLayout, QPlainTextEdit
+)
+from PySide6.QtGui import QFont
+
+from core.dataset_builder import DatasetBuilder
+from core.dataset_merger import DatasetMerger
+
+
+class MergeDialog(QDialog):
+    """选择要合并的数据集（顺序决定类别与编号顺序）与输出位置"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.datasets: List[str] = []
+        self.parent_dir = ""
+        self.dataset_name = ""
+        self.resplit = False
+        self.link = True
+        self.init_ui()
+
+    def init_ui(self):
+        """初始化 UI"""
+        self.setWindowTitle("合并数据集")
+        self.setMinimumSize(600, 520)
+
+        layout = QVBoxLayout(self)
+
+        # 标题
+        title = QLabel("合并多个 YOLO 数据集")
+        title_font = QFont()
+        title_font.setPointSize(12)
+        title_font.setBold(True)
+        title.setFont(title_font)
+        layout.addWidget(title)
+
+        # 说明
+        desc = QLabel("同名类别合并为同一类，类别编号与图片编号按列表顺序重新分配：")
+        desc.setStyleSheet("color: #666; margin-bottom: 10px;")
+        desc.setWordWrap(True)
+        layout.addWidget(desc)
+
+        # 数据集列表 + 操作按钮
+        list_layout = QHBoxLayout()
+        self.dataset_list = QListWidget()
+        self.dataset_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        list_layout.addWidget(self.dataset_list)
+
+        button_layout = QVBoxLayout()
+        add_btn = QPushButton("添加数据集…")
+        add_btn.setAutoDefault(False)
+        add_btn.clicked.connect(self.on_add)
+        remove_btn = QPushButton("移除所选")
+        remove_btn.setAutoDefault(False)
+        remove_btn.clicked.connect(self.on_remove)
+        button_layout.addWidget(add_btn)
+        button_layout.addWidget(remove_btn)
+        button_layout.addStretch()
+        list_layout.addLayout(button_layout)
+        layout.addLayout(list_layout)
+
+        # 合并预览（类别与图片数）
+        self.preview_text = QPlainTextEdit()
+        self.preview_text.setReadOnly(True)
+        self.preview_text.setMaximumHeight(140)
+        layout.addWidget(self.preview_text)
+
+        # 输出位置
+        form = QFormLayout()
+        parent_layout = QHBoxLayout()
+        self.parent_edit = QLineEdit()
+        self.parent_edit.textChanged.connect(self.update_ok_button)
+        browse_btn = QPushButton("浏览…")
+        browse_btn.setAutoDefault(False)
+        browse_btn.clicked.connect(self.on_browse_parent)
+        parent_layout.addWidget(self.parent_edit)
+        parent_layout.addWidget(browse_btn)
+        form.addRow("输出父目录:", parent_layout)
+        self.name_edit = QLineEdit("merged_dataset")
+        self.name_edit.textChanged.connect(self.update_ok_button)
+        form.addRow("数据集名称:", self.name_edit)
+        layout.addLayout(form)
+
+        # 选项
+        self.resplit_check = QCheckBox("重新划分 train / val / test（否则保留每张图片原来的子集）")
+        layout.addWidget(self.resplit_check)
+        self.link_check = QCheckBox("图片使用硬链接（同一磁盘时不复制数据，与源文件共享内容）")
+        self.link_check.setChecked(self.link)
+        layout.addWidget(self.link_check)
+
+        # 按钮
+        self.button_box = QDialogButtonBox(
+            QDialogButtonBox.Ok | QDialogButtonBox.Cancel
+        )
+        self.button_box.button(QDialogButtonBox.Ok).setText("开始合并")
+        self.button_box.button(QDialogButtonBox.Cancel).setText("取消")
+        self.button_box.accepted.connect(self.accept_selection)
+        self.button_box.rejected.connect(self.reject)
+        layout.addWidget(self.button_box)
+
+        self.update_ok_button()
+
+    def on_add(self):
+        """选择数据集目录并添加（忽略重复项与无效结构）"""
+        folder = QFileDialog.getExistingDirectory(
+            self,
+            "选择要合并的数据集目录",
+            os.path.dirname(self.datasets[-1]) if self.datasets else "",
+            QFileDialog.ShowDirsOnly | QFileDialog.DontResolveSymlinks
+        )
+        if not folder:
+            return
+
+        key = os.path.normcase(os.path.abspath(folder))
+        if any(os.path.normcase(os.path.abspath(d)) == key for d in self.datasets):
+            return
+        valid, error = DatasetBuilder.validate_existing_structure(folder)
+        if not valid:
+            self.preview_text.setPlainText(error)
+            return
+
+        self.datasets.append(folder)
+        self.dataset_list.addItem(folder)
+        if not self.parent_edit.text():
+            self.parent_edit.setText(os.path.dirname(folder))
+        self.refresh_preview()
+
+    def on_remove(self):
+        """移除选中的数据集"""
+        rows = sorted((self.dataset_list.row(item) for item in self.dataset_list.selectedItems()), reverse=True)
+        for row in rows:
+            self.dataset_list.takeItem(row)
+            del self.datasets[row]
+        self.refresh_preview()
+
+    def on_browse_parent(self):
+        """选择输出父目录"""
+        folder = QFileDialog.getExistingDirectory(
+            self,
+            "选择输出父目录",
+            self.parent_edit.text(),
+            QFileDialog.ShowDirsOnly | QFileDialog.DontResolveSymlinks
+        )
+        if folder:
+            self.parent_edit.setText(folder)
+
+    def refresh_preview(self):
+        """显示合并后的类别列表与每个来源的图片数"""
+        if not self.datasets:
+            self.preview_text.clear()
+            self.update_ok_button()
+            return
+
+        classes, rows, error = DatasetMerger.preview(self.datasets)
+        if error:
+            self.preview_text.setPlainText(error)
+        else:
+            lines = [f"合并后 {len(classes)} 个类别: {', '.join(classes)}", ""]
+            for root, count, added in rows:
+                line = f"{root}: {count} 张图片"
+                if added:
+                    line += f"，新增类别 {', '.join(added)}"
+                lines.append(line)
+            self.preview_text.setPlainText('\n'.join(lines))
+        self.update_ok_button()
+
+    def update_ok_button(self):
+        """至少两个数据集且填写了输出位置时才允许确认"""
+        self.button_box.button(QDialogButtonBox.Ok).setEnabled(
+            len(self.datasets) >= 2
+            and bool(self.parent_edit.text().strip())
+            and bool(self.name_edit.text().strip())
+        )
+
+    def accept_selection(self):
+        """保存选项并接受"""
+        self.parent_dir = self.parent_edit.text().strip()
+        self.dataset_name = self.name_edit.text().strip()
+        self.resplit = self.resplit_check.isChecked()
+        self.link = self.link_check.isChecked()
+        self.accept()
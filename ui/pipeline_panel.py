@@ -89,6 +89,7 @@ class PipelinePanel(QWidget):
     """步骤流程面板"""
 
     step_execute = Signal(int)  # 步骤执行信号
+    run_all_clicked = Signal()  # 全部运行信号
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -106,7 +107,17 @@ class PipelinePanel(QWidget):
         title_font.setBold(True)
         title.setFont(title_font)
 
-        layout.addWidget(title)
+        # 全部运行：按保存的参数增量执行，跳过未变化的步骤
+        self.run_all_btn = QPushButton("全部运行")
+        self.run_all_btn.setToolTip("使用已保存的参数依次执行 Step 1-6，输入未变化的步骤自动跳过")
+        self.run_all_btn.clicked.connect(self.run_all_clicked.emit)
+        self.run_all_btn.setMaximumWidth(100)
+
+        header_layout = QHBoxLayout()
+        header_layout.addWidget(title)
+        header_layout.addStretch()
+        header_layout.addWidget(self.run_all_btn)
+        layout.addLayout(header_layout)
 
         # 滚动区域
         scroll = QScrollArea()
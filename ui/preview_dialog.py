@@ -1,39 +1,127 @@
 """Dry-Run 预览对话框"""
 
 from PySide6.QtWidgets import (
-    QDialog, QVBoxLayout, QHBoxLayout, QLabel,
-    QTextEdit, QPushButton, QDialogButtonBox
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
+    QTextEdit, QPushButton, QDialogButtonBox, QTableView, QHeaderView,
+    QAbstractItemView, QSpinBox, QCheckBox
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer
 from PySide6.QtGui import QFont
 
+from core.image_processor import ImageProcessor
+from core.transfer_engine import TransferPlan
+from models.image_table import ImageTable
+
+
+class RenamePreviewModel(QAbstractTableModel):
+    """
+    重命名映射的虚拟表格模型
+
+    不预先生成任何 (原文件名, 新文件名) 列表，视图只对可见行调用 data()，
+    因此 50 万张图片的预览也能立即打开。
+    """
+
+    HEADERS = ["#", "原文件名", "新文件名"]
+
+    def __init__(self, image_table: ImageTable, start_index: int, width: int, parent=None):
+        super().__init__(parent)
+        self.image_table = image_table
+        self.start_index = start_index
+        self.width = width
+
+    def set_width(self, width: int):
+        """修改编号位数（只刷新新文件名列）"""
+        self.width = width
+        if len(self.image_table):
+            self.dataChanged.emit(self.index(0, 2), self.index(len(self.image_table) - 1, 2))
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.image_table)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+
+        row = index.row()
+        if index.column() == 0:
+            return str(row + 1)
+        if index.column() == 1:
+            return self.old_name(row)
+        return self.new_name(row)
+
+    def old_name(self, row: int) -> str:
+        """第 row 行的原文件名"""
+        return self.image_table[row].name
+
+    def new_name(self, row: int) -> str:
+        """第 row 行的新文件名（按需计算）"""
+        return ImageProcessor.format_new_name(
+            self.start_index + row, self.image_table[row].ext, self.width
+        )
+
+    def find_row(self, text: str, start_row: int) -> int:
+        """
+        从 start_row 开始向后查找原文件名或新文件名包含 text 的行（到末尾后回绕）
+
+        Returns:
+            行号，未找到返回 -1
+        """
+        text = text.lower()
+        total = len(self.image_table)
+        for offset in range(total):
+            row = (start_row + offset) % total
+            if text in self.old_name(row).lower() or text in self.new_name(row).lower():
+                return row
+        return -1
+
 
 class PreviewDialog(QDialog):
     """Dry-Run 预览对话框"""
 
-    def __init__(self, dataset_root: str, image_count: int, preview_images: list,
-                 parent=None, mode="create", extra_info=""):
+    PLAN_POLL_MS = 200
+
+    def __init__(self, dataset_root: str, image_table: ImageTable, start_index: int = 1,
+                 parent=None, mode="create", extra_info="", index_width: int = 0,
+                 verify: bool = False, plan: TransferPlan = None, physical_order: bool = False):
         """
         Args:
             dataset_root: 数据集根目录
-            image_count: 图片数量
-            preview_images: [(原文件名, 新文件名), ...] 列表
+            image_table: 待重命名的图片记录表
+            start_index: 新文件名的起始编号
             parent: 父窗口
             mode: "create" 或 "extend"
             extra_info: 扩展模式下的额外信息（如最大编号）
+            index_width: 编号位数设置（0 表示自动）
+            verify: 是否默认勾选"复制后校验"
+            plan: 传输预检结果（磁盘空间不足时禁止确认）
+            physical_order: 是否默认勾选"按磁盘物理位置顺序读取"
         """
         super().__init__(parent)
         self.dataset_root = dataset_root
-        self.image_count = image_count
-        self.preview_images = preview_images
+        self.image_table = image_table
+        self.image_count = len(image_table)
+        self.start_index = start_index
         self.mode = mode
         self.extra_info = extra_info
+        self.index_width = index_width
+        self.verify = verify
+        self.plan = plan
+        self.physical_order = physical_order
+        self.last_index = start_index + max(self.image_count, 1) - 1
         self.init_ui()
 
     def init_ui(self):
         """初始化 UI"""
         self.setWindowTitle("预览：即将创建的内容")
-        self.setMinimumSize(600, 500)
+        self.setMinimumSize(600, 600)
 
         layout = QVBoxLayout(self)
 
@@ -50,13 +138,62 @@ class PreviewDialog(QDialog):
         desc.setStyleSheet("color: #666; margin-bottom: 10px;")
         layout.addWidget(desc)
 
-        # 预览内容
+        # 预览内容（目录结构 / 编号信息）
         preview_text = self.generate_preview_text()
         text_edit = QTextEdit()
         text_edit.setReadOnly(True)
         text_edit.setPlainText(preview_text)
         text_edit.setStyleSheet("font-family: Consolas, monospace; background-color: #f5f5f5;")
-        layout.addWidget(text_edit)
+        layout.addWidget(text_edit, stretch=2)
+
+        # 编号位数（0 = 自动；小于最大编号位数时自动加宽）
+        width_layout = QHBoxLayout()
+        width_layout.addWidget(QLabel("编号位数:"))
+        self.width_spin = QSpinBox()
+        self.width_spin.setRange(0, 12)
+        self.width_spin.setSpecialValueText("自动")
+        self.width_spin.setValue(self.index_width)
+        self.width_spin.valueChanged.connect(self.on_width_changed)
+        width_layout.addWidget(self.width_spin)
+        self.width_hint = QLabel("")
+        self.width_hint.setStyleSheet("color: #999;")
+        width_layout.addWidget(self.width_hint)
+        width_layout.addStretch()
+        layout.addLayout(width_layout)
+
+        # 查找 / 跳转
+        search_layout = QHBoxLayout()
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("输入行号跳转，或输入文件名关键字查找")
+        self.search_edit.returnPressed.connect(self.on_search)
+        search_btn = QPushButton("查找下一个")
+        search_btn.setAutoDefault(False)
+        search_btn.clicked.connect(self.on_search)
+        self.search_status = QLabel("")
+        self.search_status.setStyleSheet("color: #999;")
+        search_layout.addWidget(self.search_edit)
+        search_layout.addWidget(search_btn)
+        search_layout.addWidget(self.search_status)
+        layout.addLayout(search_layout)
+
+        # 完整重命名映射（虚拟列表，只渲染可见行）
+        self.model = RenamePreviewModel(self.image_table, self.start_index, self.effective_width, self)
+        self.table_view = QTableView()
+        self.table_view.setModel(self.model)
+        self.table_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table_view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table_view.setStyleSheet("font-family: Consolas, monospace;")
+        self.table_view.verticalHeader().setVisible(False)
+        # 固定行高：避免视图为计算行高而遍历所有行
+        self.table_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table_view.verticalHeader().setDefaultSectionSize(22)
+        header = self.table_view.horizontalHeader()
+        header.setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(1, QHeaderView.Stretch)
+        header.setSectionResizeMode(2, QHeaderView.Stretch)
+        layout.addWidget(self.table_view, stretch=5)
+        self.on_width_changed(self.index_width)
 
         # 提示
         tip = QLabel(f"⚠️ 将复制 {self.image_count} 张图片到临时文件夹，原始图片不受影响")
@@ -64,6 +201,23 @@ class PreviewDialog(QDialog):
         tip.setWordWrap(True)
         layout.addWidget(tip)
 
+        # 磁盘空间与耗时预检
+        self.plan_label = QLabel("")
+        self.plan_label.setWordWrap(True)
+        layout.addWidget(self.plan_label)
+
+        # 完整性校验
+        self.verify_check = QCheckBox("复制后校验完整性（比较大小与内容哈希，失败自动重试）")
+        self.verify_check.setChecked(self.verify)
+        self.verify_check.toggled.connect(self.on_verify_toggled)
+        layout.addWidget(self.verify_check)
+
+        # 读取顺序
+        self.order_check = QCheckBox("按磁盘物理位置顺序读取原始图片（机械硬盘 / 归档盘减少寻道，新文件名不变）")
+        self.order_check.setChecked(self.physical_order)
+        self.order_check.toggled.connect(lambda checked: setattr(self, 'physical_order', checked))
+        layout.addWidget(self.order_check)
+
         # 按钮
         button_box = QDialogButtonBox(
             QDialogButtonBox.Ok | QDialogButtonBox.Cancel
@@ -74,8 +228,43 @@ class PreviewDialog(QDialog):
         button_box.rejected.connect(self.reject)
         layout.addWidget(button_box)
 
+        # 空间不足时禁止确认
+        if self.plan is not None and not self.plan.fits:
+            button_box.button(QDialogButtonBox.Ok).setEnabled(False)
+        self.update_plan_label()
+
+        # 试探复制在后台进行：完成后显示预计耗时
+        if self.plan is not None and self.plan.probing:
+            self.plan_timer = QTimer(self)
+            self.plan_timer.timeout.connect(self.on_plan_timer)
+            self.plan_timer.start(self.PLAN_POLL_MS)
+
+    def on_verify_toggled(self, checked: bool):
+        """校验选项变化：更新预计耗时"""
+        self.verify = checked
+        self.update_plan_label()
+
+    def on_plan_timer(self):
+        if not self.plan.probing:
+            self.plan_timer.stop()
+        self.update_plan_label()
+
+    def update_plan_label(self):
+        """显示预检结果（空间不足红色，后续步骤空间不足橙色）"""
+        if self.plan is None:
+            self.plan_label.hide()
+            return
+        if not self.plan.fits:
+            color = "#f44336"
+        elif not self.plan.fits_followup:
+            color = "#ff9800"
+        else:
+            color = "#666"
+        self.plan_label.setStyleSheet(f"color: {color};")
+        self.plan_label.setText(self.plan.summary(self.verify))
+
     def generate_preview_text(self) -> str:
-        """生成预览文本"""
+        """生成预览文本（完整的重命名映射显示在下方表格中）"""
         lines = []
 
         if self.mode == "extend":
@@ -84,7 +273,7 @@ class PreviewDialog(QDialog):
             lines.append("")
             lines.append(self.extra_info.strip())  # 显示最大编号和起始编号
             lines.append("")
-            lines.append(f"新增图片重命名（共 {self.image_count} 张）：")
+            lines.append(f"新增图片重命名（共 {self.image_count} 张，见下方列表）")
         else:
             # 创建模式：显示完整目录结构（保持原有逻辑）
             lines.append(f"数据集根目录: {self.dataset_root}")
@@ -102,13 +291,41 @@ class PreviewDialog(QDialog):
             lines.append("├─ temp/  ← 重命名后的图片将存放于此")
             lines.append("└─ data.yaml")
             lines.append("")
-            lines.append(f"图片重命名（共 {self.image_count} 张）：")
+            lines.append(f"图片重命名（共 {self.image_count} 张，见下方列表）")
 
-        # 共同部分：显示前10张图片的重命名预览
-        for i, (old_name, new_name) in enumerate(self.preview_images[:10], 1):
-            lines.append(f"  {old_name} → {new_name}")
+        return '\n'.join(lines)
 
-        if len(self.preview_images) > 10:
-            lines.append(f"  ... （还有 {len(self.preview_images) - 10} 张）")
+    @property
+    def effective_width(self) -> int:
+        """实际使用的编号位数"""
+        return ImageProcessor.resolve_index_width(self.last_index, self.index_width)
 
-        return '\n'.join(lines)
+    def on_width_changed(self, value: int):
+        """编号位数变化：刷新新文件名列"""
+        self.index_width = value
+        width = self.effective_width
+        self.model.set_width(width)
+        example = ImageProcessor.format_new_name(self.last_index, '.jpg', width)
+        self.width_hint.setText(f"实际 {width} 位，最后一个文件: {example}")
+
+    def on_search(self):
+        """查找 / 跳转：纯数字按行号跳转，否则从当前行之后查找文件名"""
+        text = self.search_edit.text().strip()
+        if not text or self.image_count == 0:
+            return
+
+        if text.isdigit() and 1 <= int(text) <= self.image_count:
+            row = int(text) - 1
+        else:
+            current = self.table_view.currentIndex()
+            start_row = current.row() + 1 if current.isValid() else 0
+            row = self.model.find_row(text, start_row)
+
+        if row < 0:
+            self.search_status.setText("未找到")
+            return
+
+        self.search_status.setText(f"第 {row + 1} 行")
+        index = self.model.index(row, 1)
+        self.table_view.setCurrentIndex(index)
+        self.table_view.scrollTo(index, QAbstractItemView.PositionAtCenter)
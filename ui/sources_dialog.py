@@ -0,0 +1,166 @@
+"""来源文件夹选择对话框"""
+
+import os
+from typing import List
+
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QListWidget, QPushButton,
+    QCheckBox, QDialogButtonBox, QFileDialog, QAbstractItemView, QInputDialog, QMessageBox
+)
+from PySide6.QtGui import QFont
+
+from core.s3_storage import S3Storage
+from core.storage import StorageBackend
+
+
+class SourcesDialog(QDialog):
+    """选择一个或多个原始图片文件夹（可选包含子文件夹）"""
+
+    def __init__(self, folders: List[str] = None, recursive: bool = False, parent=None,
+                 check_integrity: bool = False):
+        """
+        Args:
+            folders: 预先填入的来源文件夹（如上次的选择）
+            recursive: 是否默认包含子文件夹
+            parent: 父窗口
+            check_integrity: 是否默认检测损坏图片
+        """
+        super().__init__(parent)
+        self.folders: List[str] = []
+        self.recursive = recursive
+        self.check_integrity = check_integrity
+        self.init_ui()
+        for folder in folders or []:
+            self.add_folder(folder)
+
+    def init_ui(self):
+        """初始化 UI"""
+        self.setWindowTitle("选择原始图片文件夹")
+        self.setMinimumSize(520, 380)
+
+        layout = QVBoxLayout(self)
+
+        # 标题
+        title = QLabel("选择原始图片来源")
+        title_font = QFont()
+        title_font.setPointSize(12)
+        title_font.setBold(True)
+        title.setFont(title_font)
+        layout.addWidget(title)
+
+        # 说明
+        desc = QLabel("可添加多个文件夹，将并发扫描并按列表顺序合并（每个文件夹内部按文件名自然排序）：")
+        desc.setStyleSheet("color: #666; margin-bottom: 10px;")
+        desc.setWordWrap(True)
+        layout.addWidget(desc)
+
+        # 文件夹列表 + 操作按钮
+        list_layout = QHBoxLayout()
+        self.folder_list = QListWidget()
+        self.folder_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        list_layout.addWidget(self.folder_list)
+
+        button_layout = QVBoxLayout()
+        add_btn = QPushButton("添加文件夹…")
+        add_btn.setAutoDefault(False)
+        add_btn.clicked.connect(self.on_add)
+        add_remote_btn = QPushButton("添加对象存储路径…")
+        add_remote_btn.setAutoDefault(False)
+        add_remote_btn.clicked.connect(self.on_add_remote)
+        remove_btn = QPushButton("移除所选")
+        remove_btn.setAutoDefault(False)
+        remove_btn.clicked.connect(self.on_remove)
+        button_layout.addWidget(add_btn)
+        button_layout.addWidget(add_remote_btn)
+        button_layout.addWidget(remove_btn)
+        button_layout.addStretch()
+        list_layout.addLayout(button_layout)
+        layout.addLayout(list_layout)
+
+        # 递归选项
+        self.recursive_check = QCheckBox("包含子文件夹")
+        self.recursive_check.setChecked(self.recursive)
+        layout.addWidget(self.recursive_check)
+
+        # 完整性检查选项
+        self.integrity_check = QCheckBox("扫描时检测损坏的图片（截断的 JPEG、CRC 错误的 PNG 等）并排除")
+        self.integrity_check.setChecked(self.check_integrity)
+        layout.addWidget(self.integrity_check)
+
+        # 按钮
+        self.button_box = QDialogButtonBox(
+            QDialogButtonBox.Ok | QDialogButtonBox.Cancel
+        )
+        self.button_box.button(QDialogButtonBox.Ok).setText("开始扫描")
+        self.button_box.button(QDialogButtonBox.Cancel).setText("取消")
+        self.button_box.accepted.connect(self.accept_selection)
+        self.button_box.rejected.connect(self.reject)
+        layout.addWidget(self.button_box)
+
+        self.update_ok_button()
+
+    def add_folder(self, folder: str):
+        """添加文件夹（忽略重复项）"""
+        key = self._folder_key(folder)
+        if any(self._folder_key(f) == key for f in self.folders):
+            return
+        self.folders.append(folder)
+        self.folder_list.addItem(folder)
+        self.update_ok_button()
+
+    @staticmethod
+    def _folder_key(folder: str) -> str:
+        if StorageBackend.is_local(folder):
+            return os.path.normcase(os.path.abspath(folder))
+        return folder.rstrip('/')
+
+    def on_add(self):
+        """打开文件夹选择对话框并添加"""
+        folder = QFileDialog.getExistingDirectory(
+            self,
+            "选择原始图片文件夹",
+            self.folders[-1] if self.folders else "",
+            QFileDialog.ShowDirsOnly | QFileDialog.DontResolveSymlinks
+        )
+        if folder:
+            self.add_folder(folder)
+
+    def on_add_remote(self):
+        """输入对象存储路径（如 s3://bucket/raw/2024-06）并检查是否存在"""
+        path, ok = QInputDialog.getText(
+            self, "添加对象存储路径",
+            f"路径（如 s3://bucket/raw/2024-06）：\n连接参数见 {S3Storage.CONFIG_PATH}，凭证使用 AWS 标准配置"
+        )
+        path = path.strip()
+        if not ok or not path:
+            return
+        if StorageBackend.is_local(path):
+            QMessageBox.warning(self, "路径无效", "请输入 s3:// 开头的路径，本地文件夹请使用“添加文件夹…”")
+            return
+        try:
+            found = StorageBackend.for_path(path).isdir(path)
+        except Exception as e:
+            QMessageBox.warning(self, "无法访问对象存储", str(e))
+            return
+        if not found:
+            QMessageBox.warning(self, "路径不存在", f"对象存储中没有找到: {path}")
+            return
+        self.add_folder(path)
+
+    def on_remove(self):
+        """移除选中的文件夹"""
+        rows = sorted((self.folder_list.row(item) for item in self.folder_list.selectedItems()), reverse=True)
+        for row in rows:
+            self.folder_list.takeItem(row)
+            del self.folders[row]
+        self.update_ok_button()
+
+    def update_ok_button(self):
+        """至少选择一个文件夹时才允许确认"""
+        self.button_box.button(QDialogButtonBox.Ok).setEnabled(bool(self.folders))
+
+    def accept_selection(self):
+        """保存选项并接受"""
+        self.recursive = self.recursive_check.isChecked()
+        self.check_integrity = self.integrity_check.isChecked()
+        self.accept()
@@ -1,19 +1,27 @@
 """数据拆分预览对话框"""
 
 from PySide6.QtWidgets import (
-    QDialog, QVBoxLayout, QLabel, QTextEdit, QDialogButtonBox
+    QDialog, QVBoxLayout, QLabel, QTextEdit, QDialogButtonBox, QCheckBox
 )
 from PySide6.QtGui import QFont
+from PySide6.QtCore import QTimer
+
+from core.transfer_engine import TransferPlan
 
 
 class SplitPreviewDialog(QDialog):
     """数据拆分 Dry-Run 预览对话框"""
 
-    def __init__(self, train_count: int, val_count: int, test_count: int, parent=None):
+    PLAN_POLL_MS = 200
+
+    def __init__(self, train_count: int, val_count: int, test_count: int, parent=None,
+                 verify: bool = False, plan: TransferPlan = None):
         super().__init__(parent)
         self.train_count = train_count
         self.val_count = val_count
         self.test_count = test_count
+        self.verify = verify
+        self.plan = plan
         self.init_ui()
 
     def init_ui(self):
@@ -51,6 +59,17 @@ class SplitPreviewDialog(QDialog):
         tip.setWordWrap(True)
         layout.addWidget(tip)
 
+        # 磁盘空间与耗时预检
+        self.plan_label = QLabel("")
+        self.plan_label.setWordWrap(True)
+        layout.addWidget(self.plan_label)
+
+        # 完整性校验
+        self.verify_check = QCheckBox("复制后校验完整性（比较大小与内容哈希，失败自动重试）")
+        self.verify_check.setChecked(self.verify)
+        self.verify_check.toggled.connect(self.on_verify_toggled)
+        layout.addWidget(self.verify_check)
+
         # 按钮
         button_box = QDialogButtonBox(
             QDialogButtonBox.Ok | QDialogButtonBox.Cancel
@@ -61,6 +80,35 @@ class SplitPreviewDialog(QDialog):
         button_box.rejected.connect(self.reject)
         layout.addWidget(button_box)
 
+        # 空间不足时禁止确认
+        if self.plan is not None and not self.plan.fits:
+            button_box.button(QDialogButtonBox.Ok).setEnabled(False)
+        self.update_plan_label()
+
+        # 试探复制在后台进行：完成后显示预计耗时
+        if self.plan is not None and self.plan.probing:
+            self.plan_timer = QTimer(self)
+            self.plan_timer.timeout.connect(self.on_plan_timer)
+            self.plan_timer.start(self.PLAN_POLL_MS)
+
+    def on_verify_toggled(self, checked: bool):
+        """校验选项变化：更新预计耗时"""
+        self.verify = checked
+        self.update_plan_label()
+
+    def on_plan_timer(self):
+        if not self.plan.probing:
+            self.plan_timer.stop()
+        self.update_plan_label()
+
+    def update_plan_label(self):
+        """显示预检结果（空间不足时为红色）"""
+        if self.plan is None:
+            self.plan_label.hide()
+            return
+        self.plan_label.setStyleSheet(f"color: {'#666' if self.plan.fits else '#f44336'};")
+        self.plan_label.setText(self.plan.summary(self.verify))
+
     def generate_preview_text(self) -> str:
         """生成预览文本"""
         total = self.train_count + self.val_count + self.test_count
@@ -0,0 +1,92 @@
+"""传输限速设置对话框"""
+
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QLabel, QDialogButtonBox, QDoubleSpinBox,
+    QSpinBox, QComboBox, QFormLayout
+)
+from PySide6.QtGui import QFont
+
+from utils.rate_limiter import RateLimiter
+
+
+class ThrottleDialog(QDialog):
+    """设置复制限速与优先级（保存到共享配置文件）"""
+
+    PRIORITY_LABELS = [
+        ("", "正常"),
+        ("low", "低（best-effort 最低级别，nice 10）"),
+        ("idle", "空闲（磁盘空闲时才读写，nice 19）"),
+    ]
+
+    def __init__(self, limiter: RateLimiter, parent=None):
+        super().__init__(parent)
+        self.limiter = limiter
+        self.init_ui()
+
+    def init_ui(self):
+        """初始化 UI"""
+        self.setWindowTitle("传输限速")
+        self.setMinimumWidth(460)
+
+        layout = QVBoxLayout(self)
+
+        # 标题
+        title = QLabel("复制限速与优先级")
+        title_font = QFont()
+        title_font.setPointSize(12)
+        title_font.setBold(True)
+        title.setFont(title_font)
+        layout.addWidget(title)
+
+        # 说明
+        desc = QLabel(
+            "数据集位于与训练任务共享的存储上时，限制复制速度以免影响训练读取。\n"
+            "设置保存在配置文件中，正在进行的复制（包括无界面入库进程）会在 1 秒内按新设置执行。"
+        )
+        desc.setStyleSheet("color: #666; margin-bottom: 10px;")
+        desc.setWordWrap(True)
+        layout.addWidget(desc)
+
+        form = QFormLayout()
+        self.mbps_spin = QDoubleSpinBox()
+        self.mbps_spin.setRange(0, 100000)
+        self.mbps_spin.setDecimals(1)
+        self.mbps_spin.setSuffix(" MB/s")
+        self.mbps_spin.setSpecialValueText("不限")
+        self.mbps_spin.setValue(self.limiter.bytes_per_sec / 1024 / 1024)
+        form.addRow("数据速率:", self.mbps_spin)
+
+        self.files_spin = QSpinBox()
+        self.files_spin.setRange(0, 1000000)
+        self.files_spin.setSuffix(" 文件/秒")
+        self.files_spin.setSpecialValueText("不限")
+        self.files_spin.setValue(int(self.limiter.files_per_sec))
+        form.addRow("文件速率:", self.files_spin)
+
+        self.priority_combo = QComboBox()
+        for mode, label in self.PRIORITY_LABELS:
+            self.priority_combo.addItem(label, mode)
+        modes = [mode for mode, _ in self.PRIORITY_LABELS]
+        self.priority_combo.setCurrentIndex(modes.index(self.limiter.io_priority))
+        form.addRow("复制线程优先级（Linux）:", self.priority_combo)
+        layout.addLayout(form)
+
+        # 按钮
+        button_box = QDialogButtonBox(
+            QDialogButtonBox.Ok | QDialogButtonBox.Cancel
+        )
+        button_box.button(QDialogButtonBox.Ok).setText("保存")
+        button_box.button(QDialogButtonBox.Cancel).setText("取消")
+        button_box.accepted.connect(self.save_and_accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    def save_and_accept(self):
+        """应用并保存设置"""
+        self.limiter.set_limits(
+            self.mbps_spin.value() * 1024 * 1024,
+            self.files_spin.value(),
+            self.priority_combo.currentData(),
+            save=True
+        )
+        self.accept()
@@ -9,6 +9,8 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QFont
 
+from utils.scan_cache import ScanCache
+
 
 class TreeViewPanel(QWidget):
     """目录树视图面板"""
@@ -207,11 +209,9 @@ class TreeViewPanel(QWidget):
             if not subset_path or not os.path.exists(subset_path):
                 continue
 
-            # 扫描图片文件
+            # 扫描图片文件（文件夹未变化时使用扫描缓存）
             try:
-                files = [f for f in os.listdir(subset_path)
-                        if os.path.isfile(os.path.join(subset_path, f))
-                        and f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif'))]
+                files = [name for name, _ in ScanCache.list_directory(subset_path).images()]
                 files.sort()  # 排序以保持一致性
 
                 count = len(files)
@@ -321,7 +321,7 @@ class TreeViewPanel(QWidget):
             parent_item: 父节点
         """
         try:
-            items = os.listdir(dir_path)
+            listing = ScanCache.list_directory(dir_path)
         except PermissionError:
             hint_item = QTreeWidgetItem(parent_item, ["<权限不足>"])
             hint_item.setForeground(0, Qt.red)
@@ -332,14 +332,11 @@ class TreeViewPanel(QWidget):
             return
 
         # 分离文件夹和文件
-        folders = []
-        files = []
-        for item_name in items:
-            item_path = os.path.join(dir_path, item_name)
-            if os.path.isdir(item_path):
-                folders.append((item_name, item_path))
-            elif os.path.isfile(item_path):
-                files.append((item_name, item_path))
+        # 隐藏文件（如 .reservations/ 编号预留、.part 临时文件）不显示
+        folders = [(name, os.path.join(dir_path, name))
+                   for name in listing.subdirs(follow_symlinks=True) if not name.startswith('.')]
+        files = [(name, os.path.join(dir_path, name))
+                 for name in listing.files() if not name.startswith('.')]
 
         # 先添加文件夹（递归扫描）
         for folder_name, folder_path in sorted(folders):
@@ -1,6 +1,6 @@
 """Utils 模块 - 工具函数"""
 
-from .file_utils import safe_create_directory, safe_copy_file, natural_sort
+from .file_utils import safe_create_directory, safe_copy_file, natural_sort, atomic_write
 from .validator import validate_ratios, validate_classes
 from .draft_manager import DraftManager
 
@@ -8,6 +8,7 @@ __all__ = [
     'safe_create_directory',
     'safe_copy_file',
     'natural_sort',
+    'atomic_write',
     'validate_ratios',
     'validate_classes',
     'DraftManager'
@@ -4,16 +4,32 @@ import json
 import os
 from typing import Optional, Tuple
 from models.dataset_config import DatasetConfig
+from utils.file_utils import atomic_write
 
 
 class DraftManager:
     """草稿管理器"""
 
+    # 草稿格式版本：1 = 缩进 JSON + 完整路径列表，2 = 紧凑 JSON + 压缩路径列表，
+    # 3 = 紧凑 JSON + 列式图片记录表
+    FORMAT_VERSION = 3
+
+    # 自动保存文件所在目录（用户主目录下）
+    APP_DATA_DIR = os.path.join(os.path.expanduser('~'), '.yolo_dataset_tool')
+
+    @staticmethod
+    def get_autosave_path() -> str:
+        """获取自动保存草稿的路径"""
+        return os.path.join(DraftManager.APP_DATA_DIR, 'autosave.json')
+
     @staticmethod
     def save_draft(config: DatasetConfig, filepath: str) -> None:
         """
         保存草稿到 JSON 文件
 
+        图片记录表以压缩列数组的形式存储，JSON 不缩进，
+        并通过临时文件 + 重命名原子写入（写入中途崩溃不会损坏已有草稿）。
+
         Args:
             config: 数据集配置
             filepath: 保存路径
@@ -21,17 +37,26 @@ class DraftManager:
         Raises:
             OSError: 保存失败时抛出异常
         """
-        try:
-            # 确保目录存在
-            directory = os.path.dirname(filepath)
-            if directory:
-                os.makedirs(directory, exist_ok=True)
+        DraftManager.write_draft_data(config.to_dict(compact=True), filepath)
+
+    @staticmethod
+    def write_draft_data(data: dict, filepath: str) -> None:
+        """
+        写入已序列化的草稿数据（可在后台线程调用，不访问 DatasetConfig）
+
+        Args:
+            data: DatasetConfig.to_dict(compact=True) 的结果
+            filepath: 保存路径
 
-            # 转换为字典并保存
-            data = config.to_dict()
+        Raises:
+            OSError: 保存失败时抛出异常
+        """
+        try:
+            data = dict(data)
+            data['format_version'] = DraftManager.FORMAT_VERSION
 
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with atomic_write(filepath) as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
 
         except Exception as e:
             raise OSError(f"保存草稿失败: {str(e)}")
@@ -59,7 +84,7 @@ class DraftManager:
             with open(filepath, 'r', encoding='utf-8') as f:
                 data = json.load(f)
 
-            # 从字典恢复配置
+            # 从字典恢复配置（兼容旧版完整路径列表；紧凑格式的路径在访问时才展开）
             config = DatasetConfig.from_dict(data)
             return config
 
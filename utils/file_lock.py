@@ -0,0 +1,68 @@
+"""跨进程文件锁 - POSIX 使用 flock，Windows 使用 msvcrt.locking"""
+
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# Windows 的区域锁是强制锁（锁住的字节其他进程无法读写）：
+# 锁住远在文件内容之外的一个字节，其他进程仍可读取日志、队列等文件的内容
+_WINDOWS_LOCK_OFFSET = 1 << 40
+_POLL_SECONDS = 0.05
+
+
+def _windows_lock(fd: int, mode: int):
+    position = os.lseek(fd, 0, os.SEEK_CUR)
+    os.lseek(fd, _WINDOWS_LOCK_OFFSET, os.SEEK_SET)
+    try:
+        msvcrt.locking(fd, mode, 1)
+    finally:
+        os.lseek(fd, position, os.SEEK_SET)
+
+
+def try_lock(f) -> bool:
+    """
+    取得文件的排他锁（不等待）
+
+    锁随文件打开对象持有；进程退出（包括崩溃）时由系统释放。
+
+    Args:
+        f: 打开的文件对象
+
+    Returns:
+        是否取得（其他进程持有时为 False）
+    """
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            _windows_lock(f.fileno(), msvcrt.LK_NBLCK)
+        return True
+    except OSError:
+        return False
+
+
+def lock(f):
+    """取得文件的排他锁（等待其他进程释放）"""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    # msvcrt.LK_LOCK 最多重试 10 秒后报错，改为轮询
+    while not try_lock(f):
+        time.sleep(_POLL_SECONDS)
+
+
+def unlock(f):
+    """释放锁（关闭文件前调用；未持有时忽略）"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            _windows_lock(f.fileno(), msvcrt.LK_UNLCK)
+    except OSError:
+        pass
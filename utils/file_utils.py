@@ -1,9 +1,24 @@
 """文件系统操作工具"""
 
+import errno
 import os
 import shutil
 import re
-from typing import List
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from typing import List, Optional, Set, Tuple
+
+
+# 流式复制 / 哈希的块大小：足够大以减少系统调用，hashlib 在大块上会释放 GIL
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# 内核态复制（copy_file_range / sendfile）每次调用的最大字节数
+KERNEL_COPY_CHUNK_SIZE = 64 * 1024 * 1024
+
+# 内核态复制不可用时（跨文件系统、文件系统不支持、系统调用不存在）改用下一种方式
+_KERNEL_COPY_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP,
+                                errno.ENOTSUP, errno.EBADF, errno.ETXTBSY, errno.EPERM}
 
 
 def safe_create_directory(path: str) -> None:
@@ -48,6 +63,281 @@ def safe_copy_file(src: str, dst: str) -> None:
         raise OSError(f"复制文件失败: {src} -> {dst}\n错误: {str(e)}")
 
 
+def ensure_directory(path: str, created: Set[str]) -> None:
+    """
+    创建目录（同一批操作中每个目录只创建一次）
+
+    Args:
+        path: 目录路径（空字符串表示当前目录，忽略）
+        created: 本批已创建目录的集合（调用方持有，函数内更新）
+
+    Raises:
+        OSError: 创建失败时抛出异常
+    """
+    if path and path not in created:
+        safe_create_directory(path)
+        created.add(path)
+
+
+def _kernel_copy(fd_in: int, fd_out: int, size: int, chunk_size: int) -> bool:
+    """
+    在内核中复制 fd_in 的全部内容（copy_file_range 优先，其次 sendfile）
+
+    copy_file_range 在支持的文件系统上可使用 reflink / 服务端复制（NFS 4.2、SMB），
+    数据不经过用户态；sendfile 至少省去一次用户态拷贝。
+
+    部分文件系统（如某些 FUSE / 网络挂载）上内核调用不报错却返回 0、不复制数据：
+    此时按 fstat 确认源文件确实还有未读的数据，换下一种方式，或交给调用方用普通读写完成剩余部分。
+
+    Returns:
+        是否已完成复制；False 表示未完成，两个文件的读写位置已设在已复制的字节数处，
+        调用方应从该位置起改用普通读写
+    """
+    for name in ('copy_file_range', 'sendfile'):
+        func = getattr(os, name, None)
+        if func is None:
+            continue
+        offset = 0
+        try:
+            while True:
+                if name == 'copy_file_range':
+                    n = func(fd_in, fd_out, chunk_size)
+                else:
+                    n = func(fd_out, fd_in, offset, chunk_size)
+                if n == 0:
+                    break
+                offset += n
+        except OSError as e:
+            if offset == 0 and e.errno in _KERNEL_COPY_FALLBACK_ERRNOS:
+                continue
+            raise
+        if os.fstat(fd_in).st_size <= offset:
+            if offset < size:
+                # 复制过程中源文件被截断：按实际读到的数据为准（与 shutil 行为一致）
+                os.ftruncate(fd_out, offset)
+            return True
+        # 源文件仍有数据而内核调用不再前进：从已复制处继续
+        os.lseek(fd_in, offset, os.SEEK_SET)
+        os.lseek(fd_out, offset, os.SEEK_SET)
+        if offset == 0:
+            continue
+        return False
+    return False
+
+
+def fast_copy_file(src: str, dst: str, preserve_metadata: bool = True,
+                   chunk_size: int = KERNEL_COPY_CHUNK_SIZE) -> int:
+    """
+    快速复制单个文件（目标目录必须已存在，见 ensure_directory）
+
+    与 safe_copy_file 相比：不做存在性预检查与逐文件创建目录；
+    数据优先通过 copy_file_range / sendfile 在内核中复制（不可用时退回大块读写）；
+    源文件提示顺序读取（posix_fadvise）；元数据只复制权限与时间戳，
+    使用已打开文件的 fstat / fchmod / futime，不像 copy2 那样再按路径 stat 与复制扩展属性。
+
+    Args:
+        src: 源文件路径
+        dst: 目标文件路径（已存在时覆盖）
+        preserve_metadata: 是否保留权限与修改时间
+        chunk_size: 每次内核复制调用的最大字节数
+
+    Returns:
+        复制的字节数
+
+    Raises:
+        OSError: 读写失败
+    """
+    binary = getattr(os, 'O_BINARY', 0)
+    fd_in = os.open(src, os.O_RDONLY | binary)
+    try:
+        st = os.fstat(fd_in)
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd_in, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+        fd_out = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | binary, 0o666)
+        try:
+            if not _kernel_copy(fd_in, fd_out, st.st_size, chunk_size):
+                while True:
+                    data = os.read(fd_in, COPY_CHUNK_SIZE)
+                    if not data:
+                        break
+                    view = memoryview(data)
+                    while view:
+                        view = view[os.write(fd_out, view):]
+            copied = os.lseek(fd_out, 0, os.SEEK_END)
+
+            if preserve_metadata:
+                if os.chmod in os.supports_fd:
+                    os.chmod(fd_out, st.st_mode & 0o7777)
+                if os.utime in os.supports_fd:
+                    os.utime(fd_out, ns=(st.st_atime_ns, st.st_mtime_ns))
+        finally:
+            os.close(fd_out)
+    finally:
+        os.close(fd_in)
+
+    # 不支持按文件描述符修改元数据的平台（Windows）在关闭后按路径设置
+    if preserve_metadata and os.chmod not in os.supports_fd:
+        os.chmod(dst, st.st_mode & 0o7777)
+    if preserve_metadata and os.utime not in os.supports_fd:
+        os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+    return copied
+
+
+def copy_file_with_hash(src: str, dst: str, algorithm: str = 'blake2b',
+                        chunk_size: int = COPY_CHUNK_SIZE) -> Tuple[int, str]:
+    """
+    复制文件并在复制过程中计算源数据的哈希（每个字节只读一次），保留元数据（同 copy2）
+
+    Args:
+        src: 源文件路径
+        dst: 目标文件路径（所在目录必须已存在）
+        algorithm: hashlib 算法名
+        chunk_size: 块大小
+
+    Returns:
+        (复制的字节数, 十六进制哈希)
+
+    Raises:
+        OSError: 读写失败
+    """
+    digest = hashlib.new(algorithm)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    total = 0
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        while True:
+            n = fsrc.readinto(buffer)
+            if not n:
+                break
+            chunk = view[:n]
+            digest.update(chunk)
+            fdst.write(chunk)
+            total += n
+        fdst.flush()
+        os.fsync(fdst.fileno())
+    shutil.copystat(src, dst)
+    return total, digest.hexdigest()
+
+
+def hash_file(path: str, algorithm: str = 'blake2b', chunk_size: int = COPY_CHUNK_SIZE,
+              drop_cache: bool = False) -> Tuple[int, str]:
+    """
+    流式计算文件哈希
+
+    Args:
+        path: 文件路径
+        algorithm: hashlib 算法名
+        chunk_size: 块大小
+        drop_cache: 读取前丢弃该文件的页缓存（校验刚写入的文件时，确保读到的是存储上的数据）
+
+    Returns:
+        (读取的字节数, 十六进制哈希)
+
+    Raises:
+        OSError: 读取失败
+    """
+    digest = hashlib.new(algorithm)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    total = 0
+    with open(path, 'rb') as f:
+        if drop_cache and hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+            total += n
+    return total, digest.hexdigest()
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = 'w', encoding: Optional[str] = 'utf-8'):
+    """
+    原子写入文件：先写同目录下的临时文件，fsync 后再 os.replace 覆盖目标
+
+    写入过程中崩溃或抛出异常时，目标文件保持原样，临时文件被清理。
+
+    Args:
+        path: 目标文件路径
+        mode: 'w'（文本）或 'wb'（二进制）
+        encoding: 文本模式下的编码
+
+    Example:
+        >>> with atomic_write('draft.json') as f:
+        ...     json.dump(data, f)
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        safe_create_directory(directory)
+
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory or '.',
+        prefix='.' + os.path.basename(path) + '.',
+        suffix='.tmp'
+    )
+    try:
+        # mkstemp 默认权限为 0600，沿用目标文件权限（新文件使用 0644）
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        except OSError:
+            os.chmod(tmp_path, 0o644)
+
+        if 'b' in mode:
+            f = os.fdopen(fd, mode)
+        else:
+            f = os.fdopen(fd, mode, encoding=encoding)
+        with f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def rename_noreplace(src: str, dst: str) -> None:
+    """
+    将文件重命名为 dst，dst 已存在时抛出 FileExistsError 而不是覆盖
+
+    先检查再 os.replace 存在竞态：检查之后别的进程写入的 dst 会被静默覆盖。
+    这里由文件系统原子地判定 dst 是否存在：
+        - 优先 os.link + 删除原名（目标已存在时 link 失败）
+        - 不支持硬链接时：Windows 上 os.rename 本身不覆盖；
+          其他系统先以 O_EXCL 独占创建 dst 占位，再用 src 替换自己创建的占位文件
+
+    Args:
+        src: 源文件路径（与 dst 位于同一文件系统）
+        dst: 目标文件路径
+
+    Raises:
+        FileExistsError: 目标文件已存在
+        OSError: 重命名失败
+    """
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        raise
+    except OSError:
+        if os.name == 'nt':
+            os.rename(src, dst)
+            return
+        os.close(os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+        try:
+            os.replace(src, dst)
+        except OSError:
+            os.remove(dst)
+            raise
+        return
+    os.unlink(src)
+
+
 def natural_sort_key(text: str) -> List:
     """
     自然排序的键函数
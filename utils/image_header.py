@@ -0,0 +1,133 @@
+"""图片文件头解析工具（不解码像素，仅读取尺寸）"""
+
+import struct
+from typing import Tuple
+
+
+# JPEG 中携带图像尺寸的 SOF 标记（排除 DHT=C4、JPG=C8、DAC=CC）
+_JPEG_SOF_MARKERS = {
+    0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+    0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF
+}
+
+# 读取文件头时的最大字节数（JPEG 的 SOF 可能位于较大的 EXIF 段之后）
+_HEADER_READ_LIMIT = 1024 * 1024
+
+
+def _read_jpeg_size(f) -> Tuple[int, int]:
+    """逐段扫描 JPEG 标记，直到遇到 SOF 段"""
+    f.seek(2)
+    read = 2
+    while read < _HEADER_READ_LIMIT:
+        byte = f.read(1)
+        if not byte:
+            break
+        if byte != b'\xff':
+            read += 1
+            continue
+
+        marker = f.read(1)
+        # 跳过填充字节
+        while marker == b'\xff':
+            marker = f.read(1)
+        if not marker:
+            break
+
+        code = marker[0]
+        # 无长度字段的独立标记
+        if code in (0x01, 0xD8) or 0xD0 <= code <= 0xD7:
+            read += 2
+            continue
+        if code == 0xD9:
+            break
+
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            break
+        (length,) = struct.unpack('>H', length_bytes)
+
+        if code in _JPEG_SOF_MARKERS:
+            data = f.read(5)
+            if len(data) < 5:
+                break
+            height, width = struct.unpack('>HH', data[1:5])
+            return width, height
+
+        f.seek(length - 2, 1)
+        read += length + 2
+
+    raise ValueError("未找到 JPEG SOF 段")
+
+
+def _read_tiff_size(f, header: bytes) -> Tuple[int, int]:
+    """读取 TIFF 第一个 IFD 中的 ImageWidth / ImageLength"""
+    endian = '<' if header[:2] == b'II' else '>'
+    (ifd_offset,) = struct.unpack(endian + 'I', header[4:8])
+    f.seek(ifd_offset)
+
+    count_bytes = f.read(2)
+    if len(count_bytes) < 2:
+        raise ValueError("TIFF IFD 不完整")
+    (entry_count,) = struct.unpack(endian + 'H', count_bytes)
+
+    width = height = 0
+    for _ in range(entry_count):
+        entry = f.read(12)
+        if len(entry) < 12:
+            break
+        tag, field_type = struct.unpack(endian + 'HH', entry[:4])
+        if field_type == 3:  # SHORT
+            (value,) = struct.unpack(endian + 'H', entry[8:10])
+        else:  # LONG
+            (value,) = struct.unpack(endian + 'I', entry[8:12])
+
+        if tag == 256:
+            width = value
+        elif tag == 257:
+            height = value
+
+        if width and height:
+            return width, height
+
+    raise ValueError("TIFF 缺少尺寸标签")
+
+
+def read_image_size(path: str) -> Tuple[int, int]:
+    """
+    只解析文件头获取图片尺寸
+
+    Args:
+        path: 图片路径
+
+    Returns:
+        (宽度, 高度)
+
+    Raises:
+        ValueError: 无法识别的格式或文件头损坏
+        OSError: 读取失败
+    """
+    with open(path, 'rb') as f:
+        header = f.read(32)
+
+        if header[:8] == b'\x89PNG\r\n\x1a\n':
+            if header[12:16] != b'IHDR':
+                raise ValueError("PNG 缺少 IHDR 块")
+            return struct.unpack('>II', header[16:24])
+
+        if header[:2] == b'\xff\xd8':
+            return _read_jpeg_size(f)
+
+        if header[:2] == b'BM':
+            if len(header) < 26:
+                raise ValueError("BMP 文件头不完整")
+            (dib_size,) = struct.unpack('<I', header[14:18])
+            if dib_size == 12:  # OS/2 BITMAPCOREHEADER
+                width, height = struct.unpack('<HH', header[18:22])
+            else:
+                width, height = struct.unpack('<ii', header[18:26])
+            return abs(width), abs(height)
+
+        if header[:4] in (b'II*\x00', b'MM\x00*'):
+            return _read_tiff_size(f, header)
+
+    raise ValueError("无法识别的图片格式")
@@ -0,0 +1,182 @@
+"""图片结构完整性检查（不解码像素，只校验文件结构）"""
+
+import mmap
+import os
+import struct
+import zlib
+
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# TIFF 字段类型 -> 单个值的字节数
+_TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 16: 8}
+# (数据偏移标签, 数据长度标签)：StripOffsets / StripByteCounts、TileOffsets / TileByteCounts
+_TIFF_DATA_TAGS = ((273, 279), (324, 325))
+
+
+def _check_jpeg(data) -> str:
+    """SOI 开头、标记段长度不越界、图像数据之后有 EOI"""
+    size = len(data)
+    pos = 2
+    # 逐段检查到 SOS（之后是熵编码数据，没有段长度）
+    while pos + 4 <= size:
+        if data[pos] != 0xFF:
+            return f"JPEG 标记段错位（偏移 {pos}）"
+        code = data[pos + 1]
+        if code == 0xFF:
+            pos += 1  # 填充字节
+            continue
+        if code == 0xD8 or code == 0x01 or 0xD0 <= code <= 0xD7:
+            pos += 2
+            continue
+        if code == 0xD9:
+            return "JPEG 在图像数据之前结束"
+        (length,) = struct.unpack_from('>H', data, pos + 2)
+        if length < 2 or pos + 2 + length > size:
+            return f"JPEG 标记段超出文件末尾（偏移 {pos}，文件可能被截断）"
+        if code == 0xDA:
+            break
+        pos += 2 + length
+    else:
+        return "JPEG 缺少图像数据（SOS 段）"
+
+    # 部分设备会在 EOI 之后补零
+    end = size
+    while end > pos and data[end - 1] == 0x00:
+        end -= 1
+    if data[end - 2:end] == b'\xff\xd9':
+        return ""
+    # EOI 之后还可能附加数据（动态照片的视频、MPF 多图的后续图像等）：
+    # 熵编码数据中的 0xFF 都会被填充为 FF 00，SOS 之后出现的 FF D9 只能是结束标记
+    if data.rfind(b'\xff\xd9', pos) == -1:
+        return "JPEG 缺少 EOI 结束标记（文件可能被截断）"
+    return ""
+
+
+def _check_png(data) -> str:
+    """逐块校验长度与 CRC，IHDR 开头、IEND 结尾"""
+    size = len(data)
+    pos = len(_PNG_SIGNATURE)
+    first = True
+    view = memoryview(data)
+    try:
+        while pos + 12 <= size:
+            length, chunk_type = struct.unpack_from('>I4s', data, pos)
+            end = pos + 12 + length
+            if end > size:
+                return f"PNG 数据块 {chunk_type.decode('latin-1')} 超出文件末尾（文件可能被截断）"
+            if first and chunk_type != b'IHDR':
+                return "PNG 第一个数据块不是 IHDR"
+            first = False
+
+            (crc,) = struct.unpack_from('>I', data, end - 4)
+            if zlib.crc32(view[pos + 4:end - 4]) != crc:
+                return f"PNG 数据块 {chunk_type.decode('latin-1')} CRC 校验失败（偏移 {pos}）"
+
+            if chunk_type == b'IEND':
+                return ""
+            pos = end
+    finally:
+        view.release()
+    return "PNG 缺少 IEND 结束块（文件可能被截断）"
+
+
+def _check_bmp(data) -> str:
+    """文件头中的像素数据偏移与（未压缩时）像素数据大小不超过文件大小"""
+    size = len(data)
+    if size < 30:
+        return "BMP 文件头不完整"
+    declared_size, = struct.unpack_from('<I', data, 2)
+    pixel_offset, = struct.unpack_from('<I', data, 10)
+    if declared_size > size:
+        return f"BMP 文件头声明 {declared_size} 字节，实际只有 {size} 字节（文件可能被截断）"
+    if pixel_offset >= size:
+        return "BMP 像素数据偏移超出文件末尾"
+
+    header_size, = struct.unpack_from('<I', data, 14)
+    if header_size >= 40 and size >= 34:
+        width, height, _, bpp, compression = struct.unpack_from('<iiHHI', data, 18)
+        if compression == 0:  # BI_RGB：像素数据大小可由尺寸计算
+            row_bytes = (bpp * abs(width) + 31) // 32 * 4
+            if pixel_offset + row_bytes * abs(height) > size:
+                return "BMP 像素数据不完整（文件可能被截断）"
+    return ""
+
+
+def _check_tiff(data) -> str:
+    """第一个 IFD 及其引用的条带 / 图块数据不超过文件大小"""
+    size = len(data)
+    endian = '<' if data[:2] == b'II' else '>'
+    if size < 8:
+        return "TIFF 文件头不完整"
+    ifd_offset, = struct.unpack_from(endian + 'I', data, 4)
+    if ifd_offset + 2 > size:
+        return "TIFF IFD 偏移超出文件末尾（文件可能被截断）"
+
+    count, = struct.unpack_from(endian + 'H', data, ifd_offset)
+    if ifd_offset + 2 + count * 12 > size:
+        return "TIFF IFD 不完整（文件可能被截断）"
+
+    tags = {}
+    for i in range(count):
+        entry = ifd_offset + 2 + i * 12
+        tag, field_type, value_count = struct.unpack_from(endian + 'HHI', data, entry)
+        item_size = _TIFF_TYPE_SIZES.get(field_type)
+        if item_size is None:
+            continue
+        total = item_size * value_count
+        value_offset = entry + 8
+        if total > 4:
+            value_offset, = struct.unpack_from(endian + 'I', data, entry + 8)
+            if value_offset + total > size:
+                return f"TIFF 标签 {tag} 的数据超出文件末尾（文件可能被截断）"
+        if field_type in (3, 4):
+            code = 'H' if field_type == 3 else 'I'
+            tags[tag] = struct.unpack_from(f"{endian}{value_count}{code}", data, value_offset)
+
+    for offsets_tag, counts_tag in _TIFF_DATA_TAGS:
+        offsets = tags.get(offsets_tag)
+        counts = tags.get(counts_tag)
+        if offsets and counts:
+            if max(o + c for o, c in zip(offsets, counts)) > size:
+                return "TIFF 图像数据超出文件末尾（文件可能被截断）"
+    return ""
+
+
+def check_image_integrity(path: str) -> str:
+    """
+    检查图片文件结构是否完整（按文件内容识别格式，与扩展名无关）
+
+        JPEG: SOI 开头，标记段长度不越界，图像数据之后有 EOI（允许附加数据）
+        PNG:  签名、每个数据块的长度与 CRC、IHDR 开头、IEND 结尾
+        BMP:  文件头声明的大小、像素数据偏移与大小不超过文件大小
+        TIFF: IFD 及条带 / 图块数据不超过文件大小
+
+    通过 mmap 读取，只访问文件头、块头与文件尾（PNG 需计算全部 CRC）。
+    为顶层函数，可直接提交给进程池。
+
+    Args:
+        path: 图片路径
+
+    Returns:
+        问题描述，结构完整时返回空字符串
+    """
+    try:
+        size = os.path.getsize(path)
+        if size == 0:
+            return "文件为空"
+
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data[:2] == b'\xff\xd8':
+                    return _check_jpeg(data)
+                if data[:8] == _PNG_SIGNATURE:
+                    return _check_png(data)
+                if data[:2] == b'BM':
+                    return _check_bmp(data)
+                if data[:4] in (b'II*\x00', b'MM\x00*'):
+                    return _check_tiff(data)
+                return "无法识别的图片格式（文件头不是 JPEG / PNG / BMP / TIFF）"
+
+    except (OSError, ValueError, struct.error) as e:
+        return f"读取失败: {str(e)}"
@@ -0,0 +1,95 @@
+"""Linux inotify 的最小封装（ctypes，无第三方依赖）"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+from typing import List, Optional, Tuple
+
+
+# inotify 事件掩码（见 <sys/inotify.h>）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+# struct inotify_event { int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[]; }
+_EVENT = struct.Struct('iIII')
+
+
+class Inotify:
+    """
+    监视单个目录的 inotify 句柄
+
+    不可用（非 Linux、libc 缺少 inotify、达到 watch 数上限等）时构造函数抛出 OSError，
+    调用方应退回轮询。
+    """
+
+    def __init__(self, path: str, mask: int = IN_CLOSE_WRITE | IN_MOVED_TO):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify 仅支持 Linux")
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("当前 libc 不支持 inotify")
+
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1 失败: {os.strerror(errno)}")
+
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch 失败: {path}: {os.strerror(errno)}")
+
+    def read_events(self, timeout: Optional[float]) -> Tuple[List[Tuple[int, str]], bool]:
+        """
+        等待并读取事件
+
+        Args:
+            timeout: 最长等待秒数（None 表示一直等待）
+
+        Returns:
+            ([(事件掩码, 文件名), ...], 是否发生队列溢出)
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return [], False
+
+        events = []
+        overflow = False
+        while True:
+            try:
+                buffer = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not buffer:
+                break
+
+            offset = 0
+            while offset + _EVENT.size <= len(buffer):
+                _, mask, _, length = _EVENT.unpack_from(buffer, offset)
+                offset += _EVENT.size
+                name = buffer[offset:offset + length].rstrip(b'\0')
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif name and not mask & IN_IGNORED:
+                    events.append((mask, os.fsdecode(name)))
+
+        return events, overflow
+
+    def close(self):
+        """关闭句柄"""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
@@ -0,0 +1,71 @@
+"""降低当前线程的 CPU / 磁盘 I/O 优先级（Linux ioprio_set + nice，ctypes，无第三方依赖）"""
+
+import ctypes
+import ctypes.util
+import os
+import platform
+import sys
+
+
+# I/O 调度类（见 <linux/ioprio.h>）
+IOPRIO_CLASS_BE = 2  # best-effort，级别 0（高）~ 7（低）
+IOPRIO_CLASS_IDLE = 3  # 磁盘空闲时才获得 I/O
+_IOPRIO_CLASS_SHIFT = 13
+_IOPRIO_WHO_PROCESS = 1
+
+# ioprio_set 系统调用号（glibc 没有包装函数）
+_SYS_IOPRIO_SET = {
+    'x86_64': 251,
+    'i386': 289,
+    'i686': 289,
+    'aarch64': 30,
+    'armv7l': 314,
+    'ppc64le': 273,
+    'riscv64': 30,
+}
+
+# 优先级模式 -> (I/O 调度类, 级别, nice 值)
+PRIORITY_MODES = {
+    'low': (IOPRIO_CLASS_BE, 7, 10),
+    'idle': (IOPRIO_CLASS_IDLE, 0, 19),
+}
+
+
+def lower_current_thread_priority(mode: str = 'low') -> str:
+    """
+    降低调用线程的 I/O 与 CPU 优先级（在复制线程池的每个工作线程中调用）
+
+    Linux 上 ioprio_set / setpriority 以线程 ID 为对象，只影响调用线程，
+    不会拖慢界面线程。I/O 优先级只对本地块设备的 BFQ / CFQ 调度器有效，
+    NAS 上的限速需依靠令牌桶。
+
+    Args:
+        mode: 'low'（best-effort 最低级别）或 'idle'（磁盘空闲时才读写）
+
+    Returns:
+        错误消息（不支持的平台或调用失败时返回说明，不抛出异常）
+    """
+    if mode not in PRIORITY_MODES:
+        return f"未知的优先级模式: {mode}"
+    if not sys.platform.startswith('linux'):
+        return "I/O 优先级仅支持 Linux"
+
+    io_class, level, nice_value = PRIORITY_MODES[mode]
+    errors = []
+
+    try:
+        os.setpriority(os.PRIO_PROCESS, 0, nice_value)
+    except OSError as e:
+        errors.append(f"设置 nice 失败: {str(e)}")
+
+    number = _SYS_IOPRIO_SET.get(platform.machine())
+    if number is None:
+        errors.append(f"未知的 CPU 架构: {platform.machine()}")
+    else:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        value = (io_class << _IOPRIO_CLASS_SHIFT) | level
+        if libc.syscall(number, _IOPRIO_WHO_PROCESS, 0, value) != 0:
+            errno = ctypes.get_errno()
+            errors.append(f"ioprio_set 失败: {os.strerror(errno)}")
+
+    return '；'.join(errors)
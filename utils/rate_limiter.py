@@ -0,0 +1,171 @@
+"""令牌桶限速器 - 多个复制线程共享的字节 / 文件速率上限，可在运行中调整"""
+
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from utils.file_utils import atomic_write
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶
+
+    单次请求可以超过桶容量（大文件）：令牌允许透支，透支部分由后续请求等待偿还，
+    长期平均速率不超过设定值。rate 为 0 表示不限速。
+    """
+
+    def __init__(self, rate: float = 0.0, burst_seconds: float = 1.0):
+        self._lock = threading.Lock()
+        self.burst_seconds = burst_seconds
+        self.rate = 0.0
+        self.capacity = 0.0
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate: float):
+        """修改速率（立即生效，正在等待的线程在下一次醒来时按新速率计算）"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(0.0, float(rate))
+            self.capacity = self.rate * self.burst_seconds
+            self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, amount: float):
+        """取走 amount 个令牌，不足时阻塞到透支被偿还"""
+        while True:
+            with self._lock:
+                if self.rate <= 0:
+                    return
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 0:
+                    self.tokens -= amount
+                    return
+                wait = -self.tokens / self.rate
+            # 分段等待：速率被调高（或取消限速）时尽快生效
+            time.sleep(min(wait, 0.25))
+
+
+class RateLimiter:
+    """
+    复制限速：每秒字节数 + 每秒文件数，两个令牌桶在所有复制线程间共享
+
+    绑定配置文件时，每秒最多检查一次文件修改时间，变化后重新加载，
+    因此可以在复制进行中（包括另一个进程、无界面入库模式）调整限速。
+
+    配置文件格式:
+        {"bytes_per_sec": 52428800, "files_per_sec": 200, "io_priority": "low"}
+    """
+
+    CHECK_INTERVAL = 1.0
+    IO_PRIORITY_MODES = ('', 'low', 'idle')
+
+    def __init__(self, bytes_per_sec: float = 0, files_per_sec: float = 0,
+                 io_priority: str = '', config_path: Optional[str] = None):
+        self.bytes_bucket = TokenBucket(bytes_per_sec)
+        self.files_bucket = TokenBucket(files_per_sec)
+        self.io_priority = io_priority
+        self.config_path = config_path
+        self._config_mtime = None
+        self._next_check = 0.0
+        self._check_lock = threading.Lock()
+        if config_path:
+            self.reload()
+
+    @property
+    def bytes_per_sec(self) -> float:
+        return self.bytes_bucket.rate
+
+    @property
+    def files_per_sec(self) -> float:
+        return self.files_bucket.rate
+
+    @property
+    def active(self) -> bool:
+        """是否启用了任一限制（含优先级）"""
+        self._maybe_reload()
+        return bool(self.bytes_per_sec or self.files_per_sec or self.io_priority)
+
+    def set_limits(self, bytes_per_sec: float, files_per_sec: float, io_priority: str = '',
+                   save: bool = False):
+        """
+        修改限速（立即对所有线程生效）
+
+        Args:
+            bytes_per_sec: 每秒字节数（0 表示不限）
+            files_per_sec: 每秒文件数（0 表示不限）
+            io_priority: '' / 'low' / 'idle'（新建的复制线程生效）
+            save: 同时写入配置文件
+        """
+        if io_priority not in self.IO_PRIORITY_MODES:
+            raise ValueError(f"未知的优先级模式: {io_priority}")
+        self.bytes_bucket.set_rate(bytes_per_sec)
+        self.files_bucket.set_rate(files_per_sec)
+        self.io_priority = io_priority
+        if save and self.config_path:
+            with atomic_write(self.config_path) as f:
+                json.dump(self.to_dict(), f)
+            self._config_mtime = os.stat(self.config_path).st_mtime_ns
+
+    def to_dict(self) -> dict:
+        return {
+            'bytes_per_sec': self.bytes_per_sec,
+            'files_per_sec': self.files_per_sec,
+            'io_priority': self.io_priority,
+        }
+
+    def reload(self):
+        """从配置文件加载（文件不存在或格式错误时保持当前设置）"""
+        try:
+            mtime = os.stat(self.config_path).st_mtime_ns
+            if mtime == self._config_mtime:
+                return
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._config_mtime = mtime
+            io_priority = data.get('io_priority', '')
+            self.set_limits(
+                float(data.get('bytes_per_sec', 0)),
+                float(data.get('files_per_sec', 0)),
+                io_priority if io_priority in self.IO_PRIORITY_MODES else ''
+            )
+        except (OSError, ValueError, TypeError, AttributeError):
+            pass
+
+    def _maybe_reload(self):
+        if not self.config_path:
+            return
+        now = time.monotonic()
+        if now < self._next_check or not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = now + self.CHECK_INTERVAL
+            self.reload()
+        finally:
+            self._check_lock.release()
+
+    def acquire(self, nbytes: int):
+        """复制一个 nbytes 字节的文件之前调用（按需阻塞）"""
+        self._maybe_reload()
+        self.files_bucket.consume(1)
+        self.bytes_bucket.consume(nbytes)
+
+    def describe(self) -> str:
+        """当前限速的文字描述"""
+        parts = []
+        if self.bytes_per_sec:
+            parts.append(f"{self.bytes_per_sec / 1024 / 1024:.1f} MB/s")
+        if self.files_per_sec:
+            parts.append(f"{self.files_per_sec:.0f} 文件/秒")
+        if self.io_priority:
+            parts.append(f"优先级 {self.io_priority}")
+        return "，".join(parts) if parts else "不限速"
@@ -0,0 +1,242 @@
+"""目录扫描缓存 - 目录未变化时复用上次的排序结果（一次 stat 校验，内存 + 磁盘两级 LRU）"""
+
+import hashlib
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from utils.draft_manager import DraftManager
+from utils.file_utils import atomic_write, is_image_file, natural_sort_key
+
+
+class DirectoryListing:
+    """
+    一个目录的扫描结果（按文件名自然排序）
+
+    每个目录项有名称、类型标记与大小；大小只记录图片文件（其他文件为 0）。
+    """
+
+    # 类型标记
+    FILE = 1          # 普通文件（跟随符号链接）
+    DIR = 2           # 目录（不跟随符号链接）
+    DIR_OR_LINK = 4   # 目录或指向目录的符号链接
+
+    __slots__ = ('path', 'mtime_ns', 'inode', 'names', 'flags', 'sizes')
+
+    def __init__(self, path: str, mtime_ns: int, inode: int, names: List[str], flags: bytes, sizes: array):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+        self.names = names
+        self.flags = flags
+        self.sizes = sizes
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def images(self) -> List[Tuple[str, int]]:
+        """图片文件 [(文件名, 大小), ...]，自然排序"""
+        return [(name, self.sizes[i]) for i, name in enumerate(self.names)
+                if self.flags[i] & self.FILE and is_image_file(name)]
+
+    def files(self) -> List[str]:
+        """全部普通文件名，自然排序"""
+        return [name for i, name in enumerate(self.names) if self.flags[i] & self.FILE]
+
+    def subdirs(self, follow_symlinks: bool = False) -> List[str]:
+        """子目录名，自然排序"""
+        mask = self.DIR_OR_LINK if follow_symlinks else self.DIR
+        return [name for i, name in enumerate(self.names) if self.flags[i] & mask]
+
+
+class ScanCache:
+    """
+    按目录绝对路径缓存扫描结果
+
+    校验只需对目录做一次 stat：目录中增删、重命名文件都会改变目录的修改时间，
+    修改时间与 inode 都不变时直接返回缓存的排序结果。
+    注意：文件内容被原地改写不会改变目录的修改时间，缓存中的图片大小可能过时。
+
+    刚修改过（RACY_SECONDS 内）的目录不缓存：修改时间精度较粗的文件系统上，
+    扫描后同一时间刻度内的修改不会改变修改时间。
+
+    内存中按目录项总数限制（MEMORY_MAX_ENTRIES），磁盘上按文件总大小限制（DISK_MAX_BYTES），
+    都按最近使用时间淘汰；只有目录项不少于 PERSIST_MIN_ENTRIES 的目录写入磁盘（小目录重新扫描很快）。
+    """
+
+    CACHE_DIR = os.path.join(DraftManager.APP_DATA_DIR, 'scan_cache')
+    SUFFIX = '.scancache'
+    MEMORY_MAX_ENTRIES = 2_000_000
+    DISK_MAX_BYTES = 64 * 1024 * 1024
+    PERSIST_MIN_ENTRIES = 1000
+    RACY_SECONDS = 2.0
+
+    MAGIC = b'YSC1'
+    # 文件头: magic + mtime_ns + inode + 目录项数 + 压缩数据长度
+    _HEADER = struct.Struct('<4sqQII')
+
+    _lock = threading.Lock()
+    _memory: 'OrderedDict[str, DirectoryListing]' = OrderedDict()
+    _memory_entries = 0
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normcase(os.path.abspath(path))
+
+    @staticmethod
+    def _disk_path(key: str) -> str:
+        digest = hashlib.sha1(key.encode('utf-8', 'surrogateescape')).hexdigest()
+        return os.path.join(ScanCache.CACHE_DIR, digest + ScanCache.SUFFIX)
+
+    @staticmethod
+    def list_directory(path: str) -> DirectoryListing:
+        """
+        获取目录的扫描结果（缓存有效时不读取目录）
+
+        Args:
+            path: 目录路径
+
+        Returns:
+            DirectoryListing
+
+        Raises:
+            OSError: 目录不存在或无法读取
+        """
+        key = ScanCache._key(path)
+        st = os.stat(path)
+
+        with ScanCache._lock:
+            listing = ScanCache._memory.get(key)
+            if listing is not None:
+                if listing.mtime_ns == st.st_mtime_ns and listing.inode == st.st_ino:
+                    ScanCache._memory.move_to_end(key)
+                    return listing
+                ScanCache._forget(key)
+
+        listing = ScanCache._load(key, st)
+        if listing is None:
+            listing = ScanCache._scan(path, st)
+            if time.time() - st.st_mtime_ns / 1e9 < ScanCache.RACY_SECONDS:
+                return listing
+            if len(listing) >= ScanCache.PERSIST_MIN_ENTRIES:
+                ScanCache._save(key, listing)
+
+        with ScanCache._lock:
+            ScanCache._forget(key)
+            ScanCache._memory[key] = listing
+            ScanCache._memory_entries += len(listing)
+            while ScanCache._memory_entries > ScanCache.MEMORY_MAX_ENTRIES and len(ScanCache._memory) > 1:
+                ScanCache._forget(next(iter(ScanCache._memory)))
+        return listing
+
+    @staticmethod
+    def _forget(key: str):
+        """从内存缓存移除（调用方持有锁）"""
+        listing = ScanCache._memory.pop(key, None)
+        if listing is not None:
+            ScanCache._memory_entries -= len(listing)
+
+    @staticmethod
+    def _scan(path: str, st: os.stat_result) -> DirectoryListing:
+        """读取目录并按文件名自然排序"""
+        items = []
+        with os.scandir(path) as it:
+            for entry in it:
+                flags = 0
+                size = 0
+                if entry.is_dir(follow_symlinks=False):
+                    flags = DirectoryListing.DIR | DirectoryListing.DIR_OR_LINK
+                elif entry.is_file():
+                    flags = DirectoryListing.FILE
+                    if is_image_file(entry.name):
+                        size = entry.stat().st_size
+                elif entry.is_dir():
+                    flags = DirectoryListing.DIR_OR_LINK
+                items.append((natural_sort_key(entry.name), entry.name, flags, size))
+        items.sort()
+        return DirectoryListing(
+            path, st.st_mtime_ns, st.st_ino,
+            [item[1] for item in items],
+            bytes(item[2] for item in items),
+            array('q', (item[3] for item in items))
+        )
+
+    @staticmethod
+    def _load(key: str, st: os.stat_result) -> Optional[DirectoryListing]:
+        """从磁盘缓存加载（不存在、已过期或损坏时返回 None）"""
+        disk_path = ScanCache._disk_path(key)
+        try:
+            with open(disk_path, 'rb') as f:
+                header = f.read(ScanCache._HEADER.size)
+                magic, mtime_ns, inode, count, length = ScanCache._HEADER.unpack(header)
+                if magic != ScanCache.MAGIC or mtime_ns != st.st_mtime_ns or inode != st.st_ino:
+                    return None
+                payload = zlib.decompress(f.read(length))
+
+            sizes = array('q')
+            sizes.frombytes(payload[:count * sizes.itemsize])
+            flags = payload[count * sizes.itemsize:count * (sizes.itemsize + 1)]
+            text = payload[count * (sizes.itemsize + 1):].decode('utf-8', 'surrogateescape').split('\0')
+            # 第一项是目录路径（防止哈希冲突）
+            if text[0] != key or len(text) != count + 1:
+                return None
+            # 更新修改时间作为磁盘 LRU 的最近使用时间
+            os.utime(disk_path)
+            return DirectoryListing(text[0], mtime_ns, inode, text[1:], flags, sizes)
+
+        except (OSError, ValueError, struct.error, zlib.error):
+            return None
+
+    @staticmethod
+    def _save(key: str, listing: DirectoryListing):
+        """写入磁盘缓存并按总大小淘汰最久未使用的缓存文件（失败时忽略）"""
+        try:
+            os.makedirs(ScanCache.CACHE_DIR, exist_ok=True)
+            text = '\0'.join([key] + listing.names).encode('utf-8', 'surrogateescape')
+            payload = zlib.compress(listing.sizes.tobytes() + listing.flags + text, 1)
+            with atomic_write(ScanCache._disk_path(key), 'wb', encoding=None) as f:
+                f.write(ScanCache._HEADER.pack(ScanCache.MAGIC, listing.mtime_ns, listing.inode,
+                                               len(listing), len(payload)))
+                f.write(payload)
+            ScanCache._evict()
+        except OSError as e:
+            print(f"保存扫描缓存失败: {str(e)}")
+
+    @staticmethod
+    def _evict():
+        files = []
+        total = 0
+        with os.scandir(ScanCache.CACHE_DIR) as it:
+            for entry in it:
+                if entry.name.endswith(ScanCache.SUFFIX):
+                    st = entry.stat()
+                    files.append((st.st_mtime_ns, entry.path, st.st_size))
+                    total += st.st_size
+        files.sort()
+        for _, path, size in files:
+            if total <= ScanCache.DISK_MAX_BYTES:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    @staticmethod
+    def clear():
+        """清空内存与磁盘缓存"""
+        with ScanCache._lock:
+            ScanCache._memory.clear()
+            ScanCache._memory_entries = 0
+        if os.path.isdir(ScanCache.CACHE_DIR):
+            for name in os.listdir(ScanCache.CACHE_DIR):
+                if name.endswith(ScanCache.SUFFIX):
+                    try:
+                        os.remove(os.path.join(ScanCache.CACHE_DIR, name))
+                    except OSError:
+                        pass
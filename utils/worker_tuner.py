@@ -0,0 +1,303 @@
+"""并发度自动调节 - 按实测吞吐爬山搜索线程数，按设备记录结果供下次运行直接使用"""
+
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+from utils.file_utils import atomic_write
+
+
+def available_cpus() -> float:
+    """
+    本进程可用的 CPU 数（考虑 CPU 亲和性与 cgroup v1 / v2 的 CPU 配额，容器内按配额计算）
+
+    Returns:
+        可用 CPU 数（可能是小数，如配额 1.5 核）
+    """
+    try:
+        cpus = float(len(os.sched_getaffinity(0)))
+    except (AttributeError, OSError):
+        cpus = float(os.cpu_count() or 1)
+
+    quota = None
+    try:
+        # cgroup v2: "max 100000" 或 "150000 100000"
+        with open('/sys/fs/cgroup/cpu.max', 'r') as f:
+            limit, period = f.read().split()[:2]
+        if limit != 'max':
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: quota 为 -1 表示不限
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us', 'r') as f:
+                limit = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us', 'r') as f:
+                period = int(f.read())
+            if limit > 0 and period > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota is not None:
+        cpus = min(cpus, quota)
+    return max(cpus, 1.0)
+
+
+def mount_point(path: str) -> str:
+    """path 所在文件系统的挂载点（path 不存在时取最近的已存在上级目录）"""
+    path = os.path.realpath(os.path.abspath(path))
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+class WorkerTuner:
+    """
+    运行中调节同时执行的任务数（爬山法）
+
+    每个时间窗口统计吞吐（单位由调用方决定：字节或条目数）与平均单任务延迟，
+    与目前最好的设置比较：
+    - 吞吐提升超过 IMPROVE_RATIO，或并发更少而吞吐不低于本轮探索测得的最高吞吐的 (1 - IMPROVE_RATIO)
+      时记为新的最好值，沿当前方向继续，步长加倍（与最高吞吐而非当前最好值比较，
+      减少并发不会一步步累积下滑）
+    - 否则回到最好值并反向，步长减半；步长为 1 时两个方向都没有改进即停止探索
+    - 停止探索后吞吐下降超过 RETUNE_RATIO（如其他任务开始争用磁盘）时重新探索
+
+    上限为 min(MAX_WORKERS, 可用 CPU × per_cpu)，受 cgroup CPU 配额约束。
+    绑定配置文件时，按 key（如挂载点）读取上次的最好值作为起点，结束时写回。
+
+    配置文件格式:
+        {"copy:/data->/mnt/nas": {"workers": 12, "throughput": 1.2e8, "latency": 0.004, "updated": "..."}}
+    """
+
+    WINDOW_SECONDS = 0.5
+    # 窗口内至少完成的任务数（相对当前并发数的倍数），避免个别慢任务决定结果
+    WINDOW_TASKS_PER_WORKER = 2
+    IMPROVE_RATIO = 0.05
+    RETUNE_RATIO = 0.3
+    MAX_WORKERS = 64
+    # 少于这个窗口数的运行不写回配置（样本太少）
+    MIN_WINDOWS_TO_SAVE = 3
+
+    def __init__(self, key: str, start: int = 8, per_cpu: float = 8.0, minimum: int = 1,
+                 config_path: Optional[str] = None, unit: str = 'bytes'):
+        """
+        Args:
+            key: 设备 / 任务类型标识（配置文件中的键）
+            start: 没有历史记录时的初始并发数
+            per_cpu: 每个可用 CPU 允许的并发数（I/O 密集取大，哈希等 CPU 密集取小）
+            minimum: 最小并发数
+            config_path: 历史记录文件（None 表示不读写）
+            unit: 吞吐单位，'bytes' 显示为 MB/s，其他显示为 "<unit>/秒"
+        """
+        self.key = key
+        self.config_path = config_path
+        self.unit = unit
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, min(self.MAX_WORKERS, int(math.ceil(available_cpus() * per_cpu))))
+
+        history = self._load().get(key) if config_path else None
+        if isinstance(history, dict) and isinstance(history.get('workers'), int):
+            start = history['workers']
+            self.from_history = True
+        else:
+            self.from_history = False
+        self.workers = self._clamp(start)
+
+        self.best_workers = self.workers
+        self.best_throughput = None
+        self.best_latency = 0.0
+        self.peak_throughput = 0.0  # 本轮探索中测得的最高吞吐
+        self.direction = 1
+        # 有历史记录时从附近开始微调，否则大步探索
+        self.step = 1 if self.from_history else max(1, self.workers // 2)
+        self.failures = 0
+        self.settled = False
+        self.windows = 0
+        self._reset_window()
+
+    def _clamp(self, workers: int) -> int:
+        return max(self.minimum, min(self.maximum, int(workers)))
+
+    def _reset_window(self):
+        self._window_start = time.perf_counter()
+        self._window_amount = 0.0
+        self._window_tasks = 0
+        self._window_latency = 0.0
+
+    def record(self, amount: float, latency: float):
+        """
+        记录一个完成的任务（由收集结果的线程调用，不要求线程安全）
+
+        Args:
+            amount: 任务完成的工作量（字节数、条目数等）
+            latency: 任务耗时（秒）
+        """
+        self._window_amount += amount
+        self._window_tasks += 1
+        self._window_latency += latency
+
+        elapsed = time.perf_counter() - self._window_start
+        if elapsed < self.WINDOW_SECONDS or self._window_tasks < self.workers * self.WINDOW_TASKS_PER_WORKER:
+            return
+
+        throughput = self._window_amount / elapsed
+        latency = self._window_latency / self._window_tasks
+        self.windows += 1
+        self._reset_window()
+        self._adjust(throughput, latency)
+
+    def _is_better(self, throughput: float) -> bool:
+        if throughput > self.best_throughput * (1 + self.IMPROVE_RATIO):
+            return True
+        return (self.workers < self.best_workers
+                and throughput >= self.peak_throughput * (1 - self.IMPROVE_RATIO))
+
+    def _adjust(self, throughput: float, latency: float):
+        if self.best_throughput is None or self.workers == self.best_workers:
+            # 第一个窗口，或在最好值上复测：更新基准（吞吐随负载变化）
+            if self.settled and throughput < self.best_throughput * (1 - self.RETUNE_RATIO):
+                # 负载变化，重新探索：之前的最高吞吐不再可比
+                self.settled = False
+                self.step = 1
+                self.failures = 0
+                self.peak_throughput = 0.0
+            self.best_throughput = throughput
+            self.best_latency = latency
+        elif self._is_better(throughput):
+            self.best_workers = self.workers
+            self.best_throughput = throughput
+            self.best_latency = latency
+            self.step *= 2
+            self.failures = 0
+        else:
+            self._reverse()
+        self.peak_throughput = max(self.peak_throughput, self.best_throughput)
+
+        candidate = self.best_workers
+        if not self.settled:
+            candidate = self._clamp(self.best_workers + self.direction * self.step)
+            if candidate == self.best_workers:
+                # 已到上限 / 下限：换方向
+                self._reverse()
+                candidate = self._clamp(self.best_workers + self.direction * self.step)
+            if candidate == self.best_workers:
+                self.settled = True
+        self.workers = self.best_workers if self.settled else candidate
+
+    def _reverse(self):
+        """回到最好值并反向搜索；步长为 1 时两个方向都没有改进即停止探索"""
+        self.direction = -self.direction
+        if self.step == 1:
+            self.failures += 1
+            if self.failures >= 2:
+                self.settled = True
+        self.step = max(1, self.step // 2)
+
+    def format_throughput(self, value: Optional[float]) -> str:
+        if value is None:
+            return "未测得"
+        if self.unit == 'bytes':
+            return f"{value / 1024 / 1024:.1f} MB/s"
+        return f"{value:.0f} {self.unit}/秒"
+
+    def describe(self) -> str:
+        """调节结果的文字描述"""
+        return (f"{self.key}: {self.best_workers} 线程（{self.format_throughput(self.best_throughput)}，"
+                f"平均延迟 {self.best_latency * 1000:.1f} ms，上限 {self.maximum}）")
+
+    def finish(self):
+        """结束调节：打印选定的并发数，并在样本足够时写回历史记录"""
+        if self.best_throughput is None:
+            return
+        print(f"并发调节: {self.describe()}")
+        if not self.config_path or self.windows < self.MIN_WINDOWS_TO_SAVE:
+            return
+        try:
+            data = self._load()
+            data[self.key] = {
+                'workers': self.best_workers,
+                'throughput': self.best_throughput,
+                'latency': self.best_latency,
+                'updated': datetime.now().isoformat(timespec='seconds'),
+            }
+            os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
+            with atomic_write(self.config_path) as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+        except OSError as e:
+            print(f"保存并发调节记录失败: {str(e)}")
+
+    def _load(self) -> dict:
+        try:
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+
+def map_unordered(
+    func: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_workers: int = 8,
+    tuner: Optional[WorkerTuner] = None,
+    measure: Optional[Callable[[Any], float]] = None,
+    initializer: Optional[Callable[[], None]] = None
+) -> Iterator[Tuple[Any, Any]]:
+    """
+    线程池执行 func(item)，按完成顺序产出 (item, 结果)
+
+    任务按需从 items 取出（items 可以是惰性序列）。
+    有 tuner 时线程池按 tuner.maximum 创建，同时执行的任务数跟随 tuner.workers 调整
+    （tuner 可跨多次调用共用，由调用方在全部完成后调用 tuner.finish()）；
+    否则固定 max_workers 个线程，最多 4 倍任务排队。任务抛出的异常原样向上传递。
+
+    Args:
+        func: 任务函数
+        items: 任务参数序列
+        max_workers: 固定线程数（tuner 为 None 时）
+        tuner: 并发调节器
+        measure: 由结果计算工作量，提供给 tuner（默认每个任务计 1）
+        initializer: 工作线程初始化函数
+    """
+    def timed(item):
+        start = time.perf_counter()
+        result = func(item)
+        return result, time.perf_counter() - start
+
+    pool_size = tuner.maximum if tuner else max_workers
+    iterator = iter(items)
+    exhausted = False
+    tasks = {}
+    with ThreadPoolExecutor(max_workers=pool_size, initializer=initializer) as executor:
+        while True:
+            limit = tuner.workers if tuner else max_workers * 4
+            while not exhausted and len(tasks) < limit:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                tasks[executor.submit(timed, item)] = item
+            if not tasks:
+                break
+
+            done, _ = wait(list(tasks), return_when=FIRST_COMPLETED)
+            for future in done:
+                item = tasks.pop(future)
+                result, latency = future.result()
+                if tuner:
+                    tuner.record(measure(result) if measure else 1, latency)
+                yield item, result